@@ -5,3 +5,7 @@ class BiometricsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'biometrics'
     verbose_name = 'Control Biométrico'
+
+    def ready(self):
+        """Importa los signals cuando la app está lista."""
+        import biometrics.signals  # noqa: F401
@@ -0,0 +1,30 @@
+# Generated by Django 5.0 on 2026-10-17 01:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biometrics', '0006_attendanceperiodsummary'),
+        ('payroll_core', '0065_payrollperiod_closing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceDirtyDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('marked_at', models.DateTimeField(help_text='Última vez que el día recibió marcajes nuevos', verbose_name='Marcado el')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_dirty_days', to='payroll_core.employee', verbose_name='Empleado')),
+            ],
+            options={
+                'verbose_name': 'Día de Asistencia Pendiente',
+                'verbose_name_plural': 'Días de Asistencia Pendientes',
+                'indexes': [models.Index(fields=['date'], name='biometrics__date_caf18a_idx')],
+                'unique_together': {('employee', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0 on 2026-10-17 01:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biometrics', '0007_attendancedirtyday'),
+        ('payroll_core', '0065_payrollperiod_closing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('schedule_name', models.CharField(max_length=100, verbose_name='Nombre del horario')),
+                ('event_count', models.PositiveSmallIntegerField(default=0, verbose_name='Marcajes del día')),
+                ('effective_hours', models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name='Horas Efectivas')),
+                ('day_hours', models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name='Horas Diurnas')),
+                ('night_hours', models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name='Horas Nocturnas')),
+                ('overtime_day_hours', models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name='Horas Extras Diurnas')),
+                ('overtime_night_hours', models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name='Horas Extras Nocturnas')),
+                ('late_minutes', models.PositiveIntegerField(default=0, verbose_name='Minutos de retraso')),
+                ('status', models.CharField(choices=[('COMPLETE', 'Completo'), ('INCOMPLETE', 'Incompleto'), ('NO_MARKS', 'Sin marcaje')], default='NO_MARKS', max_length=12, verbose_name='Estado')),
+                ('calculated_at', models.DateTimeField(verbose_name='Calculado el')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_days', to='payroll_core.employee', verbose_name='Empleado')),
+                ('entry_event', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='biometrics.attendanceevent', verbose_name='Entrada')),
+                ('exit_event', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='biometrics.attendanceevent', verbose_name='Salida')),
+                ('lunch_in_event', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='biometrics.attendanceevent', verbose_name='Regreso de almuerzo')),
+                ('lunch_out_event', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='biometrics.attendanceevent', verbose_name='Salida a almuerzo')),
+                ('work_schedule', models.ForeignKey(blank=True, help_text='Vacío si se usó el horario por defecto (8:00 a 17:00)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='payroll_core.workschedule', verbose_name='Horario usado')),
+            ],
+            options={
+                'verbose_name': 'Asistencia Diaria',
+                'verbose_name_plural': 'Asistencias Diarias',
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['date'], name='biometrics__date_7a25af_idx')],
+                'unique_together': {('employee', 'date')},
+            },
+        ),
+    ]
@@ -431,3 +431,124 @@ class AttendancePeriodSummary(models.Model):
     def __str__(self):
         return f"{self.employee} - {self.period.name}: {self.total_hours}h ({self.get_status_display()})"
 
+
+
+class AttendanceDirtyDay(models.Model):
+    """
+    Día (fecha local) de un empleado con marcajes nuevos desde el último
+    cálculo de su resumen de asistencia.
+
+    La sincronización de dispositivos marca los días afectados y la
+    actualización incremental de resúmenes recalcula solo esos días.
+    """
+    employee = models.ForeignKey(
+        'payroll_core.Employee',
+        on_delete=models.CASCADE,
+        related_name='attendance_dirty_days',
+        verbose_name='Empleado'
+    )
+    date = models.DateField(verbose_name='Fecha')
+    marked_at = models.DateTimeField(
+        verbose_name='Marcado el',
+        help_text='Última vez que el día recibió marcajes nuevos'
+    )
+
+    class Meta:
+        verbose_name = 'Día de Asistencia Pendiente'
+        verbose_name_plural = 'Días de Asistencia Pendientes'
+        unique_together = ['employee', 'date']
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f"{self.employee} - {self.date}"
+
+
+class AttendanceDay(models.Model):
+    """
+    Asistencia calculada de un empleado en un día (fecha local).
+
+    Guarda el horario usado, los marcajes asignados a cada bloque y las horas
+    del día. La mantiene AttendanceDayService y la leen tanto la vista diaria
+    como los resúmenes por periodo, de modo que ambos muestren las mismas cifras.
+    """
+    class Status(models.TextChoices):
+        COMPLETE = 'COMPLETE', 'Completo'
+        INCOMPLETE = 'INCOMPLETE', 'Incompleto'
+        NO_MARKS = 'NO_MARKS', 'Sin marcaje'
+
+    employee = models.ForeignKey(
+        'payroll_core.Employee',
+        on_delete=models.CASCADE,
+        related_name='attendance_days',
+        verbose_name='Empleado'
+    )
+    date = models.DateField(verbose_name='Fecha')
+    work_schedule = models.ForeignKey(
+        'payroll_core.WorkSchedule',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Horario usado',
+        help_text='Vacío si se usó el horario por defecto (8:00 a 17:00)'
+    )
+    schedule_name = models.CharField(max_length=100, verbose_name='Nombre del horario')
+    entry_event = models.ForeignKey(
+        AttendanceEvent, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='+', verbose_name='Entrada'
+    )
+    lunch_out_event = models.ForeignKey(
+        AttendanceEvent, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='+', verbose_name='Salida a almuerzo'
+    )
+    lunch_in_event = models.ForeignKey(
+        AttendanceEvent, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='+', verbose_name='Regreso de almuerzo'
+    )
+    exit_event = models.ForeignKey(
+        AttendanceEvent, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='+', verbose_name='Salida'
+    )
+    event_count = models.PositiveSmallIntegerField(default=0, verbose_name='Marcajes del día')
+    effective_hours = models.DecimalField(
+        max_digits=5, decimal_places=2, default=0,
+        verbose_name='Horas Efectivas'
+    )
+    day_hours = models.DecimalField(
+        max_digits=5, decimal_places=2, default=0,
+        verbose_name='Horas Diurnas'
+    )
+    night_hours = models.DecimalField(
+        max_digits=5, decimal_places=2, default=0,
+        verbose_name='Horas Nocturnas'
+    )
+    overtime_day_hours = models.DecimalField(
+        max_digits=5, decimal_places=2, default=0,
+        verbose_name='Horas Extras Diurnas'
+    )
+    overtime_night_hours = models.DecimalField(
+        max_digits=5, decimal_places=2, default=0,
+        verbose_name='Horas Extras Nocturnas'
+    )
+    late_minutes = models.PositiveIntegerField(default=0, verbose_name='Minutos de retraso')
+    status = models.CharField(
+        max_length=12,
+        choices=Status.choices,
+        default=Status.NO_MARKS,
+        verbose_name='Estado'
+    )
+    calculated_at = models.DateTimeField(verbose_name='Calculado el')
+
+    class Meta:
+        verbose_name = 'Asistencia Diaria'
+        verbose_name_plural = 'Asistencias Diarias'
+        unique_together = ['employee', 'date']
+        ordering = ['date']
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f"{self.employee} - {self.date}: {self.effective_hours}h ({self.get_status_display()})"
@@ -0,0 +1,475 @@
+"""
+Motor único de asistencia diaria.
+
+Calcula, por empleado y fecha, los marcajes asignados a cada bloque
+(entrada, almuerzo, salida), el horario usado, las horas efectivas,
+diurnas/nocturnas y extras, y los minutos de retraso. El resultado se
+guarda en AttendanceDay y lo leen la vista diaria y los resúmenes por
+periodo, de modo que ambos usen la misma lógica de turnos nocturnos.
+
+Reglas de un día D (hora local):
+  - Marcajes del día: de las 00:00 a las 23:59:59 de D (los del empleado y,
+    si no están mapeados, los que coinciden con su cédula).
+  - Lookback: si el primer marcaje es antes de las 05:00 y el día anterior
+    tuvo un número impar de marcajes, ese marcaje es la salida del turno
+    anterior y se descarta.
+  - Lookahead: con un número impar de marcajes, el primero de la madrugada
+    siguiente (hasta las 05:00) cierra el turno nocturno.
+  - Horario: turno diario asignado > horario más cercano a la entrada
+    (±3 h) > horario del empleado > horario por defecto 8:00-17:00.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from itertools import groupby
+from operator import attrgetter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from payroll_core.models import Employee, EmployeeDailyShift, WorkSchedule
+from biometrics.models import AttendanceDay, AttendanceDirtyDay, AttendanceEvent
+from biometrics.services.daily_attendance import DailyAttendanceService
+
+# ── Constantes LOTTT ──
+DAY_START = time(5, 0)    # Jornada diurna: 5:00 AM
+DAY_END = time(19, 0)     # Jornada diurna termina: 7:00 PM
+MAX_DAY_HOURS = 8         # Máximo horas diurnas antes de extras
+MAX_NIGHT_HOURS = 7       # Máximo horas nocturnas antes de extras
+
+# Marcajes de la madrugada (hasta esta hora) que pueden cerrar el turno del día anterior
+NEXT_DAY_LIMIT = time(5, 0)
+
+# Diferencia máxima (minutos) entre la entrada y un horario para tomarlo como el del día
+BEST_FIT_MINUTES = 180
+
+# Marcajes por bloque al leerlos con un cursor del servidor
+EVENT_CHUNK_SIZE = 5000
+
+# Filas por sentencia INSERT ... ON CONFLICT
+DAY_BATCH_SIZE = 1000
+
+# Columnas que se recalculan al rehacer un día existente
+DAY_UPDATE_FIELDS = [
+    'work_schedule', 'schedule_name', 'entry_event', 'lunch_out_event', 'lunch_in_event', 'exit_event',
+    'event_count', 'effective_hours', 'day_hours', 'night_hours', 'overtime_day_hours',
+    'overtime_night_hours', 'late_minutes', 'status', 'calculated_at',
+]
+
+# Relaciones que necesita la vista diaria al leer AttendanceDay
+DAY_RELATED = ['work_schedule', 'entry_event', 'lunch_out_event', 'lunch_in_event', 'exit_event']
+
+# Clasificación diurna/nocturna por minutos (en microsegundos de reloj local)
+MINUTE_US = 60 * 1_000_000
+DAY_US = 24 * 60 * MINUTE_US
+MINUTES_PER_DAY = 24 * 60
+
+
+def _time_of_day_us(value: time) -> int:
+    """Hora del día en microsegundos desde la medianoche."""
+    return ((value.hour * 60 + value.minute) * 60 + value.second) * 1_000_000 + value.microsecond
+
+
+_DAY_START_US = _time_of_day_us(DAY_START)
+_DAY_END_US = _time_of_day_us(DAY_END)
+_DAY_BAND_MINUTES = (_DAY_END_US - _DAY_START_US) // MINUTE_US
+
+
+def _shift_minutes(duration: timedelta) -> int:
+    """Minutos iniciados en el turno (el último minuto parcial cuenta completo)."""
+    duration_us = duration // timedelta(microseconds=1)
+    return max(0, -(-duration_us // MINUTE_US))
+
+
+def _count_day_minutes(start_us: int, minutes: int) -> int:
+    """
+    Cuántos de los minutos que comienzan en start_us, start_us + 1 min, ...
+    caen en la franja diurna [DAY_START, DAY_END).
+    """
+    full_days, rest = divmod(minutes, MINUTES_PER_DAY)
+    count = full_days * _DAY_BAND_MINUTES
+    for offset in (0, DAY_US):
+        first = min(max(-((start_us - (_DAY_START_US + offset)) // MINUTE_US), 0), rest)
+        last = min(max(-((start_us - (_DAY_END_US + offset)) // MINUTE_US), 0), rest)
+        count += last - first
+    return count
+
+
+def _day_night_hours(day_seconds: float, night_seconds: float, lunch_seconds: float) -> tuple:
+    """Descuenta el almuerzo proporcionalmente y convierte a horas (Decimal, 2 decimales)."""
+    # Proportionally subtract lunch from the larger bucket
+    total = day_seconds + night_seconds
+    if total > 0 and lunch_seconds > 0:
+        day_ratio = day_seconds / total
+        day_seconds -= lunch_seconds * day_ratio
+        night_seconds -= lunch_seconds * (1 - day_ratio)
+
+    day_hours = Decimal(str(max(0, round(day_seconds / 3600, 2))))
+    night_hours = Decimal(str(max(0, round(night_seconds / 3600, 2))))
+
+    return day_hours, night_hours
+
+
+def _digits(value: Optional[str]) -> str:
+    """Parte numérica de una cédula o ID de dispositivo (V-15798914 -> 15798914)."""
+    return ''.join(c for c in (value or '') if c.isdigit())
+
+
+def default_schedule(name: str = 'Default') -> WorkSchedule:
+    """Horario virtual (sin guardar) para empleados sin horario asignado."""
+    return WorkSchedule(
+        name=name,
+        check_in_time=time(8, 0),
+        lunch_start_time=time(12, 0),
+        lunch_end_time=time(13, 0),
+        check_out_time=time(17, 0),
+        tolerance_minutes=15
+    )
+
+
+class AttendanceDayService:
+    """Calcula y guarda AttendanceDay (una fila por empleado y fecha)."""
+
+    @staticmethod
+    def materialize(employees: Iterable[Employee], dates: List[date], calc_tz=None) -> List[AttendanceDay]:
+        """Calcula los días y los guarda; devuelve las filas calculadas."""
+        days = AttendanceDayService.calculate(employees, dates, calc_tz)
+        AttendanceDayService.save(days)
+        return days
+
+    @staticmethod
+    def save(days: List[AttendanceDay]) -> None:
+        """Inserta o actualiza los días con INSERT ... ON CONFLICT sobre (employee, date)."""
+        AttendanceDay.objects.bulk_create(
+            days,
+            batch_size=DAY_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['employee', 'date'],
+            update_fields=DAY_UPDATE_FIELDS,
+        )
+
+    @staticmethod
+    def mark_dirty(days: Set[Tuple[int, date]]) -> int:
+        """
+        Marca como pendientes de recalcular los días dados: {(employee_id, fecha)}.
+        Volver a marcar un día actualiza su marked_at. Devuelve la cantidad de días.
+        """
+        if not days:
+            return 0
+
+        marked_at = timezone.now()
+        AttendanceDirtyDay.objects.bulk_create(
+            [AttendanceDirtyDay(employee_id=employee_id, date=day, marked_at=marked_at) for employee_id, day in days],
+            batch_size=DAY_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['employee', 'date'],
+            update_fields=['marked_at'],
+        )
+        return len(days)
+
+    @staticmethod
+    def mark_dirty_rows(days: QuerySet) -> int:
+        """
+        Marca como pendientes las filas de AttendanceDay del queryset (p. ej.
+        las que usaron un horario modificado), por lotes. Devuelve la cantidad.
+        """
+        count = 0
+        batch: Set[Tuple[int, date]] = set()
+        for key in days.values_list('employee_id', 'date').iterator(chunk_size=DAY_BATCH_SIZE):
+            batch.add(key)
+            if len(batch) >= DAY_BATCH_SIZE:
+                count += AttendanceDayService.mark_dirty(batch)
+                batch = set()
+        return count + AttendanceDayService.mark_dirty(batch)
+
+    @staticmethod
+    def calculate(employees: Iterable[Employee], dates: List[date], calc_tz=None) -> List[AttendanceDay]:
+        """
+        AttendanceDay (sin guardar) de cada empleado en cada fecha de dates.
+        Los marcajes se leen en una pasada ordenada por empleado; los turnos
+        diarios y los horarios candidatos, en una consulta cada uno.
+        """
+        employees = sorted(employees, key=attrgetter('id'))
+        dates = sorted(set(dates))
+        if not employees or not dates:
+            return []
+
+        calc_tz = calc_tz or timezone.get_current_timezone()
+        calculated_at = timezone.now()
+        employee_ids = [emp.id for emp in employees]
+
+        # Desde el día anterior (lookback) hasta la madrugada siguiente a la última fecha (lookahead)
+        window_start = timezone.make_aware(datetime.combine(dates[0] - timedelta(days=1), time.min), calc_tz)
+        window_end = timezone.make_aware(datetime.combine(dates[-1] + timedelta(days=1), NEXT_DAY_LIMIT), calc_tz)
+
+        daily_shifts: Dict[int, Dict[date, WorkSchedule]] = {}
+        for ds in EmployeeDailyShift.objects.filter(
+            employee_id__in=employee_ids,
+            date__range=(dates[0], dates[-1])
+        ).select_related('work_schedule'):
+            daily_shifts.setdefault(ds.employee_id, {})[ds.date] = ds.work_schedule
+
+        unmapped = AttendanceDayService._unmapped_by_employee(employees, window_start, window_end)
+        # Horarios candidatos para el "best fit" (se consultan solo si hacen falta)
+        candidates: List[WorkSchedule] = []
+        candidates_loaded = False
+
+        events = (
+            AttendanceEvent.objects.filter(
+                employee_id__in=employee_ids,
+                timestamp__range=(window_start, window_end)
+            )
+            .only('id', 'employee_id', 'timestamp')
+            .order_by('employee_id', 'timestamp', 'id')
+            .iterator(chunk_size=EVENT_CHUNK_SIZE)
+        )
+
+        days = []
+        for emp, emp_events in AttendanceDayService._iter_employee_events(employees, events):
+            timestamps = [e.timestamp for e in emp_events]
+            emp_days = []
+            shifts = []
+            for target_date in dates:
+                day_events = AttendanceDayService._day_events(
+                    emp_events, timestamps, unmapped.get(emp.id, []), target_date, calc_tz
+                )
+
+                # Determinar horario a usar: Prioridad Dinámico > Best fit > Fijo > Por defecto
+                schedule = daily_shifts.get(emp.id, {}).get(target_date)
+                if not schedule and day_events:
+                    if not candidates_loaded:
+                        candidates = list(WorkSchedule.objects.filter(is_active=True))
+                        candidates_loaded = True
+                    schedule = AttendanceDayService._best_fit(day_events[0], candidates, calc_tz)
+                if not schedule:
+                    schedule = emp.work_schedule
+                if not schedule:
+                    schedule = default_schedule()
+
+                day, shift = AttendanceDayService._build_day(emp, target_date, schedule, day_events, calc_tz)
+                day.calculated_at = calculated_at
+                emp_days.append(day)
+                if shift:
+                    shifts.append((day, shift))
+
+            # Clasificación diurna/nocturna de todos los turnos del empleado a la vez
+            split = AttendanceDayService._split_day_night_batch([shift for _, shift in shifts])
+            for (day, _), (day_hrs, night_hrs) in zip(shifts, split):
+                AttendanceDayService._apply_day_night(day, day_hrs, night_hrs)
+            days.extend(emp_days)
+
+        return days
+
+    @staticmethod
+    def _iter_employee_events(employees, events: Iterator[AttendanceEvent]) -> Iterator[Tuple[Employee, List[AttendanceEvent]]]:
+        """
+        Cruza empleados y marcajes (ambos ordenados por id de empleado) y entrega
+        (empleado, marcajes) sin tener en memoria más que los de un empleado.
+        """
+        groups = groupby(events, key=attrgetter('employee_id'))
+        current = next(groups, None)
+        for employee in employees:
+            while current is not None and current[0] < employee.id:
+                current = next(groups, None)
+            if current is not None and current[0] == employee.id:
+                yield employee, list(current[1])
+                current = next(groups, None)
+            else:
+                yield employee, []
+
+    @staticmethod
+    def _unmapped_by_employee(employees: List[Employee], window_start: datetime, window_end: datetime) -> Dict[int, List[AttendanceEvent]]:
+        """Marcajes sin empleado cuyo ID en el dispositivo coincide con la cédula de un empleado."""
+        cedula_to_emp_id = {}
+        for emp in employees:
+            raw_ni = _digits(emp.national_id)
+            if raw_ni:
+                cedula_to_emp_id[raw_ni] = emp.id
+
+        by_employee: Dict[int, List[AttendanceEvent]] = {}
+        for evt in AttendanceEvent.objects.filter(
+            employee__isnull=True,
+            timestamp__range=(window_start, window_end)
+        ).only('id', 'employee_device_id', 'timestamp').order_by('timestamp', 'id'):
+            emp_id = cedula_to_emp_id.get(_digits(evt.employee_device_id))
+            if emp_id:
+                by_employee.setdefault(emp_id, []).append(evt)
+        return by_employee
+
+    @staticmethod
+    def _day_events(
+        events: List[AttendanceEvent],
+        timestamps: List[datetime],
+        unmapped: List[AttendanceEvent],
+        target_date: date,
+        calc_tz
+    ) -> List[AttendanceEvent]:
+        """Marcajes que pertenecen al día, tras aplicar lookback y lookahead."""
+        day_start = timezone.make_aware(datetime.combine(target_date, time.min), calc_tz)
+        day_end = timezone.make_aware(datetime.combine(target_date, time.max), calc_tz)
+        next_day_limit = timezone.make_aware(datetime.combine(target_date + timedelta(days=1), NEXT_DAY_LIMIT), calc_tz)
+
+        first = bisect_left(timestamps, day_start)
+        last = bisect_right(timestamps, day_end)
+        day_events = events[first:last]
+        # Los no mapeados (por cédula) van después de los del empleado
+        day_events += [evt for evt in unmapped if day_start <= evt.timestamp <= day_end]
+
+        # Lookback: un marcaje de madrugada que cierra el turno abierto del día anterior no es de hoy
+        if day_events and timezone.localtime(day_events[0].timestamp, calc_tz).time() < NEXT_DAY_LIMIT:
+            prev_start = timezone.make_aware(datetime.combine(target_date - timedelta(days=1), time.min), calc_tz)
+            prev_end = timezone.make_aware(datetime.combine(target_date - timedelta(days=1), time.max), calc_tz)
+            prev_count = bisect_right(timestamps, prev_end) - bisect_left(timestamps, prev_start)
+            if prev_count % 2 != 0:
+                day_events.pop(0)
+
+        # Lookahead: con un turno abierto, el primer marcaje de la madrugada siguiente es la salida
+        if len(day_events) % 2 != 0:
+            next_index = bisect_right(timestamps, day_end)
+            if next_index < len(timestamps) and timestamps[next_index] <= next_day_limit:
+                day_events.append(events[next_index])
+
+        return day_events
+
+    @staticmethod
+    def _best_fit(first_event: AttendanceEvent, candidates: List[WorkSchedule], calc_tz) -> Optional[WorkSchedule]:
+        """Horario cuya entrada teórica es la más cercana (±3 h) al primer marcaje."""
+        check_in_time = timezone.localtime(first_event.timestamp, calc_tz).time()
+        real_minutes = check_in_time.hour * 60 + check_in_time.minute
+
+        best_fit = None
+        min_delta = float('inf')
+        for cand in candidates:
+            expected_minutes = cand.check_in_time.hour * 60 + cand.check_in_time.minute
+            delta = abs(real_minutes - expected_minutes)
+            if delta < BEST_FIT_MINUTES and delta < min_delta:
+                min_delta = delta
+                best_fit = cand
+        return best_fit
+
+    @staticmethod
+    def _build_day(
+        employee: Employee,
+        target_date: date,
+        schedule: WorkSchedule,
+        events: List[AttendanceEvent],
+        calc_tz
+    ) -> Tuple[AttendanceDay, Optional[tuple]]:
+        """
+        Día con marcajes asignados, horas efectivas y retraso, sin clasificar en
+        diurnas/nocturnas. Returns: (día, (entrada local, salida local, segundos
+        de almuerzo) o None si no tiene entrada y salida).
+        """
+        assigned = DailyAttendanceService._assign_events_by_sequence(events, schedule, target_date)
+        entry_evt = assigned.get('entry')
+        lunch_out = assigned.get('lunch_out')
+        lunch_in = assigned.get('lunch_in')
+        exit_evt = assigned.get('exit')
+
+        day = AttendanceDay(
+            employee=employee,
+            date=target_date,
+            work_schedule=schedule if schedule.pk else None,
+            schedule_name=schedule.name,
+            entry_event=entry_evt,
+            lunch_out_event=lunch_out,
+            lunch_in_event=lunch_in,
+            exit_event=exit_evt,
+            event_count=len(events),
+            effective_hours=Decimal('0.00'),
+            day_hours=Decimal('0.00'),
+            night_hours=Decimal('0.00'),
+            overtime_day_hours=Decimal('0.00'),
+            overtime_night_hours=Decimal('0.00'),
+            status=AttendanceDay.Status.NO_MARKS if not events else AttendanceDay.Status.INCOMPLETE,
+        )
+
+        if entry_evt:
+            expected_in = timezone.make_aware(datetime.combine(target_date, schedule.check_in_time))
+            day.late_minutes = max(0, round((entry_evt.timestamp - expected_in).total_seconds() / 60))
+
+        if not entry_evt or not exit_evt:
+            return day, None
+
+        day.status = AttendanceDay.Status.COMPLETE
+        total_seconds = (exit_evt.timestamp - entry_evt.timestamp).total_seconds()
+        lunch_seconds = 0
+        if lunch_out and lunch_in:
+            lunch_seconds = (lunch_in.timestamp - lunch_out.timestamp).total_seconds()
+
+        effective_seconds = max(0, total_seconds - lunch_seconds)
+        day.effective_hours = Decimal(str(round(effective_seconds / 3600, 2)))
+
+        entry_local = timezone.localtime(entry_evt.timestamp, calc_tz)
+        exit_local = timezone.localtime(exit_evt.timestamp, calc_tz)
+        return day, (entry_local, exit_local, lunch_seconds)
+
+    @staticmethod
+    def _apply_day_night(day: AttendanceDay, day_hrs: Decimal, night_hrs: Decimal) -> None:
+        """Asigna las horas diurnas/nocturnas del día y separa las extras."""
+        day.day_hours = day_hrs
+        day.night_hours = night_hrs
+
+        if day_hrs > MAX_DAY_HOURS:
+            day.overtime_day_hours = day_hrs - MAX_DAY_HOURS
+            day.day_hours = Decimal(str(MAX_DAY_HOURS))
+
+        if night_hrs > MAX_NIGHT_HOURS:
+            day.overtime_night_hours = night_hrs - MAX_NIGHT_HOURS
+            day.night_hours = Decimal(str(MAX_NIGHT_HOURS))
+
+    @staticmethod
+    def _split_day_night(entry_dt: datetime, exit_dt: datetime, lunch_seconds: float = 0) -> tuple:
+        """
+        Divide las horas trabajadas entre diurnas (5:00-19:00) y nocturnas (19:00-5:00).
+        Cada minuto iniciado desde la entrada cuenta completo en la franja de
+        la hora (local) en que comienza; el conteo se obtiene por intersección
+        de intervalos, sin recorrer el turno minuto a minuto.
+        Returns: (day_hours: Decimal, night_hours: Decimal)
+        """
+        minutes = _shift_minutes(exit_dt - entry_dt)
+        day_minutes = _count_day_minutes(_time_of_day_us(entry_dt.time()), minutes)
+        return _day_night_hours(day_minutes * 60, (minutes - day_minutes) * 60, lunch_seconds)
+
+    @staticmethod
+    def _split_day_night_batch(shifts: List[tuple]) -> List[tuple]:
+        """
+        Variante vectorizada de _split_day_night para varios turnos:
+        shifts = [(entrada local, salida local, segundos de almuerzo), ...].
+        Returns: [(day_hours, night_hours), ...] en el mismo orden.
+        """
+        if not shifts:
+            return []
+        start = np.array([_time_of_day_us(entry.time()) for entry, _, _ in shifts], dtype=np.int64)
+        minutes = np.array([_shift_minutes(exit - entry) for entry, exit, _ in shifts], dtype=np.int64)
+        full_days, rest = np.divmod(minutes, MINUTES_PER_DAY)
+        day_minutes = full_days * _DAY_BAND_MINUTES
+        # La franja diurna del día de entrada y la del día siguiente (turnos que cruzan medianoche)
+        for offset in (0, DAY_US):
+            first = np.clip(-((start - (_DAY_START_US + offset)) // MINUTE_US), 0, rest)
+            last = np.clip(-((start - (_DAY_END_US + offset)) // MINUTE_US), 0, rest)
+            day_minutes += last - first
+        night_minutes = minutes - day_minutes
+        return [
+            _day_night_hours(int(day) * 60, int(night) * 60, lunch_seconds)
+            for day, night, (_, _, lunch_seconds) in zip(day_minutes, night_minutes, shifts)
+        ]
+
+    @staticmethod
+    def detail(day: AttendanceDay) -> Dict[str, Any]:
+        """Entrada del detalle diario de un resumen por periodo (detail_json)."""
+        return {
+            'date': day.date.isoformat(),
+            'weekday': day.date.strftime('%A'),
+            'is_sunday': day.date.weekday() == 6,
+            'effective_hours': float(day.effective_hours),
+            'day_hours': float(day.day_hours),
+            'night_hours': float(day.night_hours),
+            'overtime_day': float(day.overtime_day_hours),
+            'overtime_night': float(day.overtime_night_hours),
+            'has_marks': day.event_count > 0,
+            'entry': day.entry_event.timestamp.isoformat() if day.entry_event else None,
+            'exit': day.exit_event.timestamp.isoformat() if day.exit_event else None,
+        }
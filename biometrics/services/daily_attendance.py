@@ -2,8 +2,8 @@ from datetime import datetime, date, time, timedelta
 from typing import List, Dict, Any, Optional
 from django.utils import timezone
 from django.conf import settings
-from payroll_core.models import Employee, WorkSchedule, EmployeeDailyShift
-from biometrics.models import AttendanceEvent
+from payroll_core.models import Employee, WorkSchedule
+from biometrics.models import AttendanceDay, AttendanceDirtyDay, AttendanceEvent
 
 class DailyAttendanceService:
     """
@@ -57,237 +57,70 @@ class DailyAttendanceService:
         end = start + page_size
         employees = list(queryset[start:end])
         
-        # 2.1 Obtener turnos dinámicos para este día (solo para los empleados de la página)
-        # Mapa: employee_id -> work_schedule
-        daily_shifts = {
-            ds.employee_id: ds.work_schedule
-            for ds in EmployeeDailyShift.objects.filter(
-                date=target_date,
-                employee__in=employees
-            ).select_related('work_schedule')
-        }
-        
-        # 3. Obtener eventos del día + madrugada siguiente (para turnos nocturnos)
-        day_start = timezone.make_aware(datetime.combine(target_date, time.min), calc_tz)
-        
-        # [MODIFICADO] Límite de búsqueda: Hasta las 05:00 AM del día siguiente
-        # El usuario solicitó un límite explícito (ej: 5:00 AM) para "tomar prestado" el evento.
-        next_day_limit = timezone.make_aware(datetime.combine(target_date + timedelta(days=1), time(5, 0)), calc_tz)
-        
-        # Para el "Lookback" (evitar duplicados en el día actual), necesitamos saber si el día ANTERIOR
-        # reclamó algún evento de la madrugada de HOY.
-        # Estrategia: Consultar eventos del día anterior (ventana normal + extendida) para ver si quedó abierto.
-        # Esto es costoso (n+1), pero necesario para la deduplicación estricta sin estado persistente.
-        # Optimizacion: Solo hacerlo si encontramos eventos "tempraneros" (antes de las 5 AM) hoy.
-        
-        from django.db.models import Q
-        all_events = AttendanceEvent.objects.filter(
-            timestamp__range=(day_start, next_day_limit)
-        ).filter(
-            Q(employee__in=employees) | Q(employee__isnull=True)
-        ).select_related('device').order_by('timestamp')
-        
-        # Separar eventos del día objetivo y del día siguiente
-        day_end_strict = timezone.make_aware(datetime.combine(target_date, time.max), calc_tz)
-        
-        events_today = []
-        events_next_day = []
-        
-        for evt in all_events:
-            if evt.timestamp <= day_end_strict:
-                events_today.append(evt)
-            else:
-                events_next_day.append(evt)
-
-        # 3.1 Agrupar eventos de HOY por empleado
-        events_by_employee = {}
-        unmapped_events = []
-        
-        for evt in events_today:
-            if evt.employee_id:
-                if evt.employee_id not in events_by_employee:
-                    events_by_employee[evt.employee_id] = []
-                events_by_employee[evt.employee_id].append(evt)
-            else:
-                unmapped_events.append(evt)
+        # 3. Asistencia diaria materializada (AttendanceDay); se recalcula la que
+        # falta o quedó desactualizada por marcajes o turnos nuevos. Con una zona
+        # horaria de prueba se calcula al vuelo, sin guardar.
+        from biometrics.services.attendance_day import DAY_RELATED, AttendanceDayService
 
-        # 3.2 Agrupar eventos de MAÑANA por empleado (para lookahead)
-        next_day_by_employee = {}
-        for evt in events_next_day:
-            if evt.employee_id:
-                if evt.employee_id not in next_day_by_employee:
-                    next_day_by_employee[evt.employee_id] = []
-                next_day_by_employee[evt.employee_id].append(evt)
-        
-        # Fallback: intentar vincular eventos sin mapear por cédula (solo para HOY)
-        if unmapped_events:
-            # Construir índice: parte numérica de national_id -> employee.id
-            cedula_to_emp_id = {}
-            for emp in employees:
-                raw_ni = ''.join(c for c in (emp.national_id or '') if c.isdigit())
-                if raw_ni:
-                    cedula_to_emp_id[raw_ni] = emp.id
-            
-            for evt in unmapped_events:
-                raw_dev = ''.join(c for c in (evt.employee_device_id or '') if c.isdigit())
-                emp_id = cedula_to_emp_id.get(raw_dev)
-                if emp_id:
-                    if emp_id not in events_by_employee:
-                        events_by_employee[emp_id] = []
-                    events_by_employee[emp_id].append(evt)
-        
-        # 4. Procesar cada empleado
-        summary = []
-        for emp in employees:
-            emp_events = events_by_employee.get(emp.id, [])
-            
-            # --- PRE-PROCESAMIENTO: DEDUPLICACIÓN (LOOKBACK) ---
-            # Si el PRIMER evento de hoy es de madrugada (antes de las 5:00 AM),
-            # verificar si el día anterior tenía un turno abierto que lo pudiera reclamar.
-            if emp_events:
-                first_evt = emp_events[0]
-                local_first = timezone.localtime(first_evt.timestamp, calc_tz)
-                
-                # Si es antes de las 5 AM
-                if local_first.time() < time(5, 0):
-                    # Chequear el día anterior
-                    prev_date = target_date - timedelta(days=1)
-                    
-                    # Consultamos conteo simple de eventos del día anterior (optimizado)
-                    # Si es IMPAR -> Quedó abierto -> Reclama este evento -> Lo quitamos de hoy.
-                    # Rango del día anterior estricto (00:00 - 23:59)
-                    prev_start = timezone.make_aware(datetime.combine(prev_date, time.min), calc_tz)
-                    prev_end = timezone.make_aware(datetime.combine(prev_date, time.max), calc_tz)
-                    
-                    prev_count = AttendanceEvent.objects.filter(
-                        employee=emp,
-                        timestamp__range=(prev_start, prev_end)
-                    ).count()
-                    
-                    if prev_count % 2 != 0:
-                        # El día anterior quedó abierto. Asumimos que reclamó este evento.
-                        # Lo removemos de la lista de hoy para no duplicar.
-                        emp_events.pop(0)
+        if tz_name:
+            days = {day.employee_id: day for day in AttendanceDayService.calculate(employees, [target_date], calc_tz)}
+        else:
+            days = {
+                day.employee_id: day
+                for day in AttendanceDay.objects.filter(
+                    date=target_date,
+                    employee__in=employees
+                ).select_related(*DAY_RELATED)
+            }
+            dirty = dict(
+                AttendanceDirtyDay.objects.filter(
+                    date=target_date,
+                    employee__in=employees
+                ).values_list('employee_id', 'marked_at')
+            )
+            pending = [
+                emp for emp in employees
+                if emp.id not in days or (emp.id in dirty and dirty[emp.id] >= days[emp.id].calculated_at)
+            ]
+            if pending:
+                for day in AttendanceDayService.materialize(pending, [target_date], calc_tz):
+                    days[day.employee_id] = day
 
-            # --- LOGICA DE TURNO NOCTURNO (DAYBREAKER - LOOKAHEAD) ---
-            # Si el empleado tiene un número impar de marcajes hoy (ej: Entrada, Salida, Entrada...)
-            # significa que quedó con un turno abierto. Buscamos el primer marcaje del día siguiente
-            # para cerrarlo, asumiendo que es la salida del turno nocturno.
-            if len(emp_events) % 2 != 0:
-                next_events = next_day_by_employee.get(emp.id, [])
-                if next_events:
-                    # Tomamos el primer evento de la madrugada siguiente y lo añadimos a "hoy"
-                    # para que el cálculo de horas lo tome en cuenta.
-                    # OJO: Solo tomamos el primero.
-                    orphan_exit = next_events[0]
-                    emp_events.append(orphan_exit)
+        # 4. Armar la respuesta de cada empleado
+        summary = [DailyAttendanceService._process_employee_day(emp, days[emp.id]) for emp in employees]
 
-            # Determinar horario a usar: Prioridad Dinámico > Fijo
-            schedule = daily_shifts.get(emp.id)
-            
-            # Si no hay turno asignado explícitamente, intentar "Best Fit" basado en marcajes
-            if not schedule and emp_events:
-                # Buscar primer marcaje del día
-                first_event = emp_events[0] # Ya están ordenados
-                
-                # Convertir a datetime naive en la zona horaria de cálculo para comparar con horarios simples
-                local_dt = timezone.localtime(first_event.timestamp, calc_tz)
-                check_in_time = local_dt.time()
-                
-                # Obtener candidatos (cachear esto sería ideal para performance)
-                candidates = WorkSchedule.objects.filter(is_active=True)
-                
-                best_fit = None
-                min_delta = float('inf')
-                
-                for cand in candidates:
-                    # Calcular diferencia en minutos entre check_in real y teórico
-                    # Convertir a minutos desde medianoche para facilitar resta
-                    real_minutes = check_in_time.hour * 60 + check_in_time.minute
-                    expected_minutes = cand.check_in_time.hour * 60 + cand.check_in_time.minute
-                    
-                    delta = abs(real_minutes - expected_minutes)
-                    
-                    # Umbral de "enganche": ej. +/- 3 horas (180 min)
-                    if delta < 180 and delta < min_delta:
-                        min_delta = delta
-                        best_fit = cand
-                
-                if best_fit:
-                    schedule = best_fit
-            
-            # Fallback final: horario por defecto del empleado
-            if not schedule:
-                schedule = emp.work_schedule
-            
-            # Si aún no tiene horario, usar uno por defecto virtual
-            if not schedule:
-                # Default 8-5 fallback logic handled in UI or here?
-                # Create a dummy schedule for calculation
-                schedule = WorkSchedule(
-                    name="Default",
-                    check_in_time=time(8, 0),
-                    lunch_start_time=time(12, 0),
-                    lunch_end_time=time(13, 0),
-                    check_out_time=time(17, 0),
-                    tolerance_minutes=15
-                )
-
-            summary.append(DailyAttendanceService._process_employee_day(emp, schedule, emp_events, target_date))
-            
         return {
             'count': total_count,
             'results': summary
         }
 
     @staticmethod
-    def _process_employee_day(employee: Employee, schedule: WorkSchedule, events: List[AttendanceEvent], target_date: date) -> Dict[str, Any]:
-        """Procesa los eventos de un empleado para generar sus bloques."""
-        
+    def _process_employee_day(employee: Employee, day: AttendanceDay) -> Dict[str, Any]:
+        """Genera los bloques del empleado a partir de su asistencia del día."""
+        from biometrics.services.attendance_day import default_schedule
+
+        schedule = day.work_schedule or default_schedule(day.schedule_name)
+
         # Helpers
         def get_dt(t: time):
-            return timezone.make_aware(datetime.combine(target_date, t))
-            
+            return timezone.make_aware(datetime.combine(day.date, t))
+
         expected_in = get_dt(schedule.check_in_time)
         expected_lunch_out = get_dt(schedule.lunch_start_time)
         expected_lunch_in = get_dt(schedule.lunch_end_time)
         expected_out = get_dt(schedule.check_out_time)
-        
+
         # Tolerancia
         tolerance = timedelta(minutes=schedule.tolerance_minutes)
-        
-        # --- CLASIFICACIÓN DINÁMICA POR SECUENCIA ---
-        # Ignora el event_type del dispositivo. Asigna roles basándose
-        # en el orden cronológico de las marcaciones del día.
-        assigned = DailyAttendanceService._assign_events_by_sequence(
-            events, schedule, target_date
-        )
-        
-        entry_evt = assigned.get('entry')
-        lunch_out_evt = assigned.get('lunch_out')
-        lunch_in_evt = assigned.get('lunch_in')
-        exit_evt = assigned.get('exit')
-        
-        # Calcular Status de Bloques
+
+        # Los marcajes ya vienen asignados por secuencia (ver _assign_events_by_sequence)
         blocks = {
-            'entry': DailyAttendanceService._build_block(entry_evt, expected_in, tolerance, is_entry=True),
-            'lunch_out': DailyAttendanceService._build_block(lunch_out_evt, expected_lunch_out, tolerance, is_entry=False),
-            'lunch_in': DailyAttendanceService._build_block(lunch_in_evt, expected_lunch_in, tolerance, is_entry=True),
-            'exit': DailyAttendanceService._build_block(exit_evt, expected_out, tolerance, is_entry=False),
+            'entry': DailyAttendanceService._build_block(day.entry_event, expected_in, tolerance, is_entry=True),
+            'lunch_out': DailyAttendanceService._build_block(day.lunch_out_event, expected_lunch_out, tolerance, is_entry=False),
+            'lunch_in': DailyAttendanceService._build_block(day.lunch_in_event, expected_lunch_in, tolerance, is_entry=True),
+            'exit': DailyAttendanceService._build_block(day.exit_event, expected_out, tolerance, is_entry=False),
         }
-        
-        # Calcular Tiempo Efectivo
-        effective_hours = 0
-        if entry_evt and exit_evt:
-            total = (exit_evt.timestamp - entry_evt.timestamp).total_seconds()
-            
-            lunch_duration = 0
-            if lunch_out_evt and lunch_in_evt:
-                lunch_duration = (lunch_in_evt.timestamp - lunch_out_evt.timestamp).total_seconds()
-            
-            effective_seconds = total - lunch_duration
-            effective_hours = max(0, effective_seconds / 3600)
-            
+
         return {
             'employee': {
                 'id': employee.id,
@@ -296,9 +129,9 @@ class DailyAttendanceService:
                 'department': employee.department.name if employee.department_id else '',
             },
             'blocks': blocks,
-            'effective_hours': round(effective_hours, 2),
-            'schedule_name': schedule.name,
-            'is_synced': len(events) > 0,
+            'effective_hours': float(day.effective_hours),
+            'schedule_name': day.schedule_name,
+            'is_synced': day.event_count > 0,
         }
 
     @staticmethod
@@ -1,27 +1,39 @@
 """
 Servicio para calcular resúmenes de asistencia por periodo de nómina.
 
-Agrega las marcaciones biométricas del rango del periodo,
-calcula horas totales, extras, nocturnas, domingos, etc.
+Agrega las asistencias diarias (AttendanceDay, ver attendance_day.py) del
+rango del periodo: horas totales, extras, nocturnas, domingos, etc.
 """
-from datetime import date, time, datetime, timedelta
+import math
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta
 from decimal import Decimal
-from typing import Dict, List, Optional, Any
+from itertools import groupby
+from operator import attrgetter
+from typing import Dict, List, Optional, Any, Tuple
 
+from django.conf import settings
 from django.utils import timezone
-from django.db import transaction
-from django.db.models import Q
+from django.db import close_old_connections, connection, connections, transaction
+from django.db.models import Q, QuerySet
 
-from payroll_core.models import Employee, PayrollPeriod, PayrollNovelty, WorkSchedule, EmployeeDailyShift
-from biometrics.models import AttendanceEvent, AttendancePeriodSummary
+from payroll_core.models import Employee, PayrollPeriod
+from biometrics.models import AttendanceDay, AttendanceDirtyDay, AttendancePeriodSummary
+from biometrics.services.attendance_day import NEXT_DAY_LIMIT, AttendanceDayService
+from vacations.services.work_calendar import WorkCalendar
 
-# ── Constantes LOTTT ──
-DAY_START = time(5, 0)    # Jornada diurna: 5:00 AM
-DAY_END = time(19, 0)     # Jornada diurna termina: 7:00 PM
-MAX_DAY_HOURS = 8         # Máximo horas diurnas antes de extras
-MAX_NIGHT_HOURS = 7       # Máximo horas nocturnas antes de extras
 ROUNDING_THRESHOLD = Decimal('0.85')  # Si la fracción >= 0.85, redondea hacia arriba
 
+# Resúmenes por sentencia INSERT ... ON CONFLICT
+SUMMARY_BATCH_SIZE = 1000
+
+# Columnas que se recalculan al regenerar un resumen existente
+SUMMARY_UPDATE_FIELDS = [
+    'total_hours', 'regular_day_hours', 'night_hours', 'overtime_day_hours', 'overtime_night_hours',
+    'sunday_hours', 'sunday_count', 'absences', 'days_worked', 'detail_json',
+    'status', 'approved_by', 'approved_at', 'updated_at',
+]
+
 # Códigos de concepto para PayrollNovelty
 CONCEPT_CODES = {
     'overtime_day': 'H_EXTRA_DIURNA',
@@ -35,85 +47,293 @@ class PeriodAttendanceService:
     """Servicio para calcular y gestionar resúmenes de asistencia por periodo."""
 
     @staticmethod
-    def generate_summaries(period_id: int, auto_approve: bool = False, user=None) -> Dict[str, Any]:
+    def generate_summaries(
+        period_id: int,
+        auto_approve: bool = False,
+        user=None,
+        workers: Optional[int] = None
+    ) -> Dict[str, Any]:
         """
         Genera (o recalcula) los resúmenes de asistencia para todos los
-        empleados activos en el rango del periodo dado.
+        empleados activos en el rango del periodo dado. También recalcula
+        y guarda la asistencia diaria (AttendanceDay) de cada día del periodo.
 
         Args:
             period_id: ID del PayrollPeriod.
             auto_approve: Si True, auto-aprueba los resúmenes generados.
             user: Usuario que ejecuta la acción (para auditoría).
+            workers: procesos para calcular en paralelo (None = settings.PAYROLL_PARALLEL_WORKERS).
 
         Returns:
             Dict con 'created', 'updated', 'total' conteos.
         """
         period = PayrollPeriod.objects.get(id=period_id)
-        employees = Employee.objects.filter(is_active=True).select_related(
-            'work_schedule', 'department', 'branch'
-        )
-
-        import pytz
         calc_tz = timezone.get_current_timezone()
+        calculated_at = timezone.now()
 
-        created_count = 0
-        updated_count = 0
+        summaries, days = PeriodAttendanceService._calculate_period(period, calc_tz, workers)
+        with transaction.atomic():
+            AttendanceDayService.save(days)
+            counts = PeriodAttendanceService._save_summaries(period, summaries, auto_approve, user)
+        PeriodAttendanceService._clear_dirty_days(period, calculated_at)
 
-        for emp in employees:
-            summary_data = PeriodAttendanceService._calculate_employee_period(
-                emp, period, calc_tz
+        # Si auto-approve, también generar las novedades
+        if auto_approve:
+            PeriodAttendanceService._push_novelties_bulk(
+                AttendancePeriodSummary.objects.filter(
+                    period=period,
+                    status=AttendancePeriodSummary.Status.APPROVED
+                )
             )
 
-            # Crear o actualizar el resumen
-            obj, created = AttendancePeriodSummary.objects.update_or_create(
-                employee=emp,
-                period=period,
-                defaults={
-                    'total_hours': summary_data['total_hours'],
-                    'regular_day_hours': summary_data['regular_day_hours'],
-                    'night_hours': summary_data['night_hours'],
-                    'overtime_day_hours': summary_data['overtime_day_hours'],
-                    'overtime_night_hours': summary_data['overtime_night_hours'],
-                    'sunday_hours': summary_data['sunday_hours'],
-                    'sunday_count': summary_data['sunday_count'],
-                    'absences': summary_data['absences'],
-                    'days_worked': summary_data['days_worked'],
-                    'detail_json': summary_data['detail'],
-                    'status': AttendancePeriodSummary.Status.APPROVED if auto_approve else AttendancePeriodSummary.Status.PENDING,
-                    'approved_by': user if auto_approve else None,
-                    'approved_at': timezone.now() if auto_approve else None,
-                }
-            )
+        return counts
 
-            if created:
-                created_count += 1
-            else:
-                updated_count += 1
+    @staticmethod
+    def refresh_summaries(period_id: int, auto_approve: bool = False, user=None) -> Dict[str, Any]:
+        """
+        Actualiza los resúmenes del periodo recalculando solo los días marcados
+        por la sincronización (AttendanceDirtyDay) y re-agregando los totales
+        desde las asistencias diarias guardadas. Los días del periodo que aún
+        no tienen AttendanceDay se calculan también.
+
+        Returns:
+            Dict con 'created', 'updated', 'total' y 'days' (días recalculados).
+        """
+        period = PayrollPeriod.objects.get(id=period_id)
+        calc_tz = timezone.get_current_timezone()
+        calculated_at = timezone.now()
+
+        dirty: Dict[int, set] = {}
+        for employee_id, day in AttendanceDirtyDay.objects.filter(
+            date__range=(period.start_date, period.end_date),
+            employee__is_active=True,
+            marked_at__lte=calculated_at
+        ).values_list('employee_id', 'date'):
+            dirty.setdefault(employee_id, set()).add(day)
+
+        if not dirty:
+            return {'created': 0, 'updated': 0, 'total': 0, 'days': 0}
+
+        employees = list(Employee.objects.filter(id__in=dirty).select_related('work_schedule'))
+        period_dates = PeriodAttendanceService._period_dates(period)
+
+        with transaction.atomic():
+            days_by_employee: Dict[int, Dict[date, AttendanceDay]] = {}
+            for day in AttendanceDay.objects.filter(
+                employee_id__in=dirty,
+                date__range=(period.start_date, period.end_date)
+            ).select_related('entry_event', 'exit_event'):
+                days_by_employee.setdefault(day.employee_id, {})[day.date] = day
+
+            # Empleados con días del periodo aún sin calcular: todo el periodo;
+            # el resto, solo sus días pendientes (en una sola pasada)
+            incomplete = [emp for emp in employees if len(days_by_employee.get(emp.id, {})) < len(period_dates)]
+            complete = [emp for emp in employees if emp not in incomplete]
+            recalculated = AttendanceDayService.materialize(incomplete, period_dates, calc_tz)
+            if complete:
+                recalculated += AttendanceDayService.materialize(
+                    complete, sorted(set().union(*(dirty[emp.id] for emp in complete))), calc_tz
+                )
+            for day in recalculated:
+                days_by_employee.setdefault(day.employee_id, {})[day.date] = day
+
+            summaries = [
+                (emp.id, PeriodAttendanceService._summarize_days([
+                    AttendanceDayService.detail(days_by_employee[emp.id][day]) for day in period_dates
+                ]))
+                for emp in employees
+            ]
+            counts = PeriodAttendanceService._save_summaries(period, summaries, auto_approve, user)
+        PeriodAttendanceService._clear_dirty_days(period, calculated_at, list(dirty))
 
-        # Si auto-approve, también generar las novedades
         if auto_approve:
-            summaries = AttendancePeriodSummary.objects.filter(
-                period=period,
-                status=AttendancePeriodSummary.Status.APPROVED
+            PeriodAttendanceService._push_novelties_bulk(
+                AttendancePeriodSummary.objects.filter(
+                    period=period,
+                    employee_id__in=dirty,
+                    status=AttendancePeriodSummary.Status.APPROVED
+                )
             )
-            for s in summaries:
-                PeriodAttendanceService._push_novelties(s)
 
+        counts['days'] = len(recalculated)
+        return counts
+
+    @staticmethod
+    def mark_dirty_days(events: List[Tuple[int, datetime]]) -> int:
+        """
+        Registra los días afectados por marcajes nuevos: [(employee_id, timestamp)].
+        Un marcaje afecta su día, el siguiente (cuenta para el lookback) y, si es
+        de madrugada, el anterior (puede ser la salida de un turno nocturno).
+        Devuelve la cantidad de días marcados.
+        """
+        calc_tz = timezone.get_current_timezone()
+        days = set()
+        for employee_id, timestamp in events:
+            if timezone.is_naive(timestamp):
+                timestamp = timezone.make_aware(timestamp, calc_tz)
+            local = timezone.localtime(timestamp, calc_tz)
+            days.add((employee_id, local.date()))
+            days.add((employee_id, local.date() + timedelta(days=1)))
+            if local.time() <= NEXT_DAY_LIMIT:
+                days.add((employee_id, local.date() - timedelta(days=1)))
+        return AttendanceDayService.mark_dirty(days)
+
+    @staticmethod
+    def _clear_dirty_days(
+        period: PayrollPeriod,
+        calculated_at: datetime,
+        employee_ids: Optional[List[int]] = None
+    ) -> None:
+        """
+        Descarta los días pendientes del periodo ya incluidos en el cálculo
+        (los marcados después de calculated_at quedan para la próxima vez).
+        Solo los de employee_ids, o los de empleados activos si no se indica:
+        los inactivos no se recalculan y conservan sus días pendientes.
+        """
+        marks = AttendanceDirtyDay.objects.filter(
+            date__range=(period.start_date, period.end_date),
+            employee__is_active=True,
+            marked_at__lte=calculated_at
+        )
+        if employee_ids is not None:
+            marks = marks.filter(employee_id__in=employee_ids)
+        marks.delete()
+
+    @staticmethod
+    def _period_dates(period: PayrollPeriod) -> List[date]:
+        return [
+            period.start_date + timedelta(days=offset)
+            for offset in range((period.end_date - period.start_date).days + 1)
+        ]
+
+    @staticmethod
+    def _calculate_period(
+        period: PayrollPeriod,
+        calc_tz,
+        workers: Optional[int] = None
+    ) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[AttendanceDay]]:
+        """
+        ([(employee_id, totales del periodo)], [AttendanceDay sin guardar]) de
+        los empleados activos, por id. Con dos o más procesos y suficientes
+        empleados reparte bloques de empleados consecutivos en el pool de
+        procesos de la nómina.
+        """
+        from payroll_core.services.parallel import CHUNKS_PER_WORKER, ParallelPayrollRunner, get_worker_count
+
+        employees = Employee.objects.filter(is_active=True).order_by('id')
+        workers = get_worker_count(workers)
+        min_employees = getattr(settings, 'PAYROLL_PARALLEL_MIN_EMPLOYEES', 200)
+        if workers < 2:
+            return PeriodAttendanceService._calculate_summaries(period, employees, calc_tz)
+
+        employee_ids = list(employees.values_list('id', flat=True))
+        if len(employee_ids) < max(min_employees, 2):
+            return PeriodAttendanceService._calculate_summaries(period, employees, calc_tz)
+
+        pool_size, executor = ParallelPayrollRunner._get_pool(workers)
+        workers = min(workers, pool_size)
+        size = math.ceil(len(employee_ids) / (workers * CHUNKS_PER_WORKER))
+        chunks = [
+            (employee_ids[i], employee_ids[min(i + size, len(employee_ids)) - 1])
+            for i in range(0, len(employee_ids), size)
+        ]
+        args = (connection.settings_dict['NAME'], connection.schema_name, period.id, calc_tz)
+        try:
+            futures = [
+                executor.submit(_calculate_summary_chunk, *args, chunk)
+                for chunk in chunks
+            ]
+            summaries = []
+            days = []
+            for future in futures:
+                chunk_summaries, chunk_days = future.result()
+                summaries.extend(chunk_summaries)
+                days.extend(chunk_days)
+            return summaries, days
+        except BrokenProcessPool:
+            ParallelPayrollRunner.shutdown(executor)
+            raise
+
+    @staticmethod
+    def _calculate_summaries(
+        period: PayrollPeriod,
+        employees,
+        calc_tz
+    ) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[AttendanceDay]]:
+        """
+        Asistencia diaria de employees en cada día del periodo y los totales
+        del periodo de cada empleado (por id).
+        """
+        days = AttendanceDayService.calculate(
+            employees.select_related('work_schedule'), PeriodAttendanceService._period_dates(period), calc_tz
+        )
+        summaries = [
+            (employee_id, PeriodAttendanceService._summarize_days([AttendanceDayService.detail(day) for day in emp_days]))
+            for employee_id, emp_days in groupby(days, key=attrgetter('employee_id'))
+        ]
+        return summaries, days
+
+    @staticmethod
+    @transaction.atomic
+    def _save_summaries(
+        period: PayrollPeriod,
+        summaries: List[Tuple[int, Dict[str, Any]]],
+        auto_approve: bool,
+        user
+    ) -> Dict[str, int]:
+        """
+        Inserta o actualiza los resúmenes con INSERT ... ON CONFLICT sobre
+        (employee, period) en lugar de un update_or_create por empleado.
+        """
+        existing = set(AttendancePeriodSummary.objects.filter(
+            period=period,
+            employee_id__in=[employee_id for employee_id, _ in summaries]
+        ).values_list('employee_id', flat=True))
+
+        status = AttendancePeriodSummary.Status.APPROVED if auto_approve else AttendancePeriodSummary.Status.PENDING
+        approved_by = user if auto_approve else None
+        approved_at = timezone.now() if auto_approve else None
+        AttendancePeriodSummary.objects.bulk_create(
+            [
+                AttendancePeriodSummary(
+                    employee_id=employee_id,
+                    period=period,
+                    total_hours=data['total_hours'],
+                    regular_day_hours=data['regular_day_hours'],
+                    night_hours=data['night_hours'],
+                    overtime_day_hours=data['overtime_day_hours'],
+                    overtime_night_hours=data['overtime_night_hours'],
+                    sunday_hours=data['sunday_hours'],
+                    sunday_count=data['sunday_count'],
+                    absences=data['absences'],
+                    days_worked=data['days_worked'],
+                    detail_json=data['detail'],
+                    status=status,
+                    approved_by=approved_by,
+                    approved_at=approved_at,
+                )
+                for employee_id, data in summaries
+            ],
+            batch_size=SUMMARY_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['employee', 'period'],
+            update_fields=SUMMARY_UPDATE_FIELDS,
+        )
+
+        updated = len(existing)
         return {
-            'created': created_count,
-            'updated': updated_count,
-            'total': created_count + updated_count,
+            'created': len(summaries) - updated,
+            'updated': updated,
+            'total': len(summaries),
         }
 
     @staticmethod
-    def _calculate_employee_period(employee: Employee, period: PayrollPeriod, calc_tz) -> Dict[str, Any]:
+    def _summarize_days(daily_detail: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
-        Calcula los totales de asistencia para un empleado en un periodo.
-        Itera día por día en el rango del periodo.
+        Totales del periodo a partir del detalle diario (detail_json), de modo
+        que un resumen se pueda re-agregar tras recalcular solo algunos días.
+        Las horas del detalle tienen dos decimales: Decimal(str(x)) las recupera exactas.
         """
-        current_date = period.start_date
-        end_date = period.end_date
-
         total_hours = Decimal('0.00')
         regular_day_hours = Decimal('0.00')
         night_hours = Decimal('0.00')
@@ -123,53 +343,25 @@ class PeriodAttendanceService:
         sunday_count = 0
         absences = 0
         days_worked = 0
-        daily_detail = []
-
-        # Pre-fetch daily shifts for this employee in the period
-        daily_shifts = {
-            ds.date: ds.work_schedule
-            for ds in EmployeeDailyShift.objects.filter(
-                employee=employee,
-                date__range=(period.start_date, period.end_date)
-            ).select_related('work_schedule')
-        }
-
-        while current_date <= end_date:
-            day_data = PeriodAttendanceService._process_single_day(
-                employee, current_date, calc_tz, daily_shifts
-            )
-
-            total_hours += day_data['effective_hours']
-            regular_day_hours += day_data['day_hours']
-            night_hours += day_data['night_hours']
-            overtime_day_hours += day_data['overtime_day']
-            overtime_night_hours += day_data['overtime_night']
-
-            if day_data['is_sunday'] and day_data['effective_hours'] > 0:
-                sunday_hours += day_data['effective_hours']
+        work_calendar = WorkCalendar.current()
+
+        for day in daily_detail:
+            effective_hours = Decimal(str(day['effective_hours']))
+            total_hours += effective_hours
+            regular_day_hours += Decimal(str(day['day_hours']))
+            night_hours += Decimal(str(day['night_hours']))
+            overtime_day_hours += Decimal(str(day['overtime_day']))
+            overtime_night_hours += Decimal(str(day['overtime_night']))
+
+            if day['is_sunday'] and effective_hours > 0:
+                sunday_hours += effective_hours
                 sunday_count += 1
 
-            if day_data['has_marks']:
+            if day['has_marks']:
                 days_worked += 1
-            elif current_date.weekday() < 5:  # Lun-Vie sin marcaje = ausencia (excluyendo fines de semana)
+            elif work_calendar.is_business_day(date.fromisoformat(day['date'])):  # Día hábil sin marcaje = ausencia (excluye fines de semana y feriados)
                 absences += 1
 
-            daily_detail.append({
-                'date': current_date.isoformat(),
-                'weekday': current_date.strftime('%A'),
-                'is_sunday': day_data['is_sunday'],
-                'effective_hours': float(day_data['effective_hours']),
-                'day_hours': float(day_data['day_hours']),
-                'night_hours': float(day_data['night_hours']),
-                'overtime_day': float(day_data['overtime_day']),
-                'overtime_night': float(day_data['overtime_night']),
-                'has_marks': day_data['has_marks'],
-                'entry': day_data.get('entry_time'),
-                'exit': day_data.get('exit_time'),
-            })
-
-            current_date += timedelta(days=1)
-
         # Redondear totales a enteros con umbral de sensibilidad
         total_hours = PeriodAttendanceService._round_hours(total_hours)
         regular_day_hours = PeriodAttendanceService._round_hours(regular_day_hours)
@@ -191,153 +383,6 @@ class PeriodAttendanceService:
             'detail': daily_detail,
         }
 
-    @staticmethod
-    def _process_single_day(employee: Employee, target_date: date, calc_tz, daily_shifts: dict) -> Dict[str, Any]:
-        """
-        Procesa un solo día para un empleado: busca marcajes, calcula horas
-        y clasifica en diurnas/nocturnas/extras.
-        """
-        result = {
-            'effective_hours': Decimal('0.00'),
-            'day_hours': Decimal('0.00'),
-            'night_hours': Decimal('0.00'),
-            'overtime_day': Decimal('0.00'),
-            'overtime_night': Decimal('0.00'),
-            'is_sunday': target_date.weekday() == 6,
-            'has_marks': False,
-            'entry_time': None,
-            'exit_time': None,
-        }
-
-        # Get events for this day
-        day_start = timezone.make_aware(datetime.combine(target_date, time.min), calc_tz)
-        next_day_limit = timezone.make_aware(
-            datetime.combine(target_date + timedelta(days=1), time(5, 0)), calc_tz
-        )
-
-        events = list(
-            AttendanceEvent.objects.filter(
-                employee=employee,
-                timestamp__range=(day_start, next_day_limit)
-            ).order_by('timestamp')
-        )
-
-        if not events:
-            return result
-
-        result['has_marks'] = True
-
-        # Determine schedule
-        schedule = daily_shifts.get(target_date) or employee.work_schedule
-        if not schedule:
-            schedule = WorkSchedule(
-                name="Default",
-                check_in_time=time(8, 0),
-                lunch_start_time=time(12, 0),
-                lunch_end_time=time(13, 0),
-                check_out_time=time(17, 0),
-                tolerance_minutes=15
-            )
-
-        # Assign events by sequence (reuse same logic as daily service)
-        assigned = PeriodAttendanceService._assign_events_simple(events)
-        entry_evt = assigned.get('entry')
-        exit_evt = assigned.get('exit')
-        lunch_out = assigned.get('lunch_out')
-        lunch_in = assigned.get('lunch_in')
-
-        if not entry_evt or not exit_evt:
-            # Only entry without exit — count partial hours if possible
-            if entry_evt and not exit_evt:
-                result['entry_time'] = entry_evt.timestamp.isoformat()
-            return result
-
-        result['entry_time'] = entry_evt.timestamp.isoformat()
-        result['exit_time'] = exit_evt.timestamp.isoformat()
-
-        # Calculate total seconds worked
-        total_seconds = (exit_evt.timestamp - entry_evt.timestamp).total_seconds()
-
-        # Subtract lunch
-        lunch_seconds = 0
-        if lunch_out and lunch_in:
-            lunch_seconds = (lunch_in.timestamp - lunch_out.timestamp).total_seconds()
-
-        effective_seconds = max(0, total_seconds - lunch_seconds)
-        effective_hours = Decimal(str(round(effective_seconds / 3600, 2)))
-        result['effective_hours'] = effective_hours
-
-        # Classify hours into day/night
-        entry_local = timezone.localtime(entry_evt.timestamp, calc_tz)
-        exit_local = timezone.localtime(exit_evt.timestamp, calc_tz)
-
-        day_hrs, night_hrs = PeriodAttendanceService._split_day_night(
-            entry_local, exit_local, lunch_seconds
-        )
-        
-        result['day_hours'] = day_hrs
-        result['night_hours'] = night_hrs
-
-        # Calculate overtime
-        if day_hrs > MAX_DAY_HOURS:
-            result['overtime_day'] = day_hrs - MAX_DAY_HOURS
-            result['day_hours'] = Decimal(str(MAX_DAY_HOURS))
-
-        if night_hrs > MAX_NIGHT_HOURS:
-            result['overtime_night'] = night_hrs - MAX_NIGHT_HOURS
-            result['night_hours'] = Decimal(str(MAX_NIGHT_HOURS))
-
-        return result
-
-    @staticmethod
-    def _split_day_night(entry_dt: datetime, exit_dt: datetime, lunch_seconds: float = 0) -> tuple:
-        """
-        Divide las horas trabajadas entre diurnas (5:00-19:00) y nocturnas (19:00-5:00).
-        Returns: (day_hours: Decimal, night_hours: Decimal)
-        """
-        day_seconds = 0
-        night_seconds = 0
-
-        current = entry_dt
-        while current < exit_dt:
-            local_time = current.time()
-            # Check if current moment is in day range (5:00 - 19:00)
-            if DAY_START <= local_time < DAY_END:
-                day_seconds += 60
-            else:
-                night_seconds += 60
-            current += timedelta(minutes=1)
-
-        # Proportionally subtract lunch from the larger bucket
-        total = day_seconds + night_seconds
-        if total > 0 and lunch_seconds > 0:
-            day_ratio = day_seconds / total
-            day_seconds -= lunch_seconds * day_ratio
-            night_seconds -= lunch_seconds * (1 - day_ratio)
-
-        day_hours = Decimal(str(max(0, round(day_seconds / 3600, 2))))
-        night_hours = Decimal(str(max(0, round(night_seconds / 3600, 2))))
-
-        return day_hours, night_hours
-
-    @staticmethod
-    def _assign_events_simple(events: list) -> Dict[str, Optional[AttendanceEvent]]:
-        """Simple chronological assignment of events to roles."""
-        result = {'entry': None, 'lunch_out': None, 'lunch_in': None, 'exit': None}
-        sorted_events = sorted(events, key=lambda e: e.timestamp)
-        n = len(sorted_events)
-
-        if n >= 1:
-            result['entry'] = sorted_events[0]
-        if n >= 2:
-            result['exit'] = sorted_events[-1]
-        if n >= 3:
-            result['lunch_out'] = sorted_events[1]
-        if n >= 4:
-            result['lunch_in'] = sorted_events[2]
-
-        return result
-
     @staticmethod
     def _round_hours(value: Decimal) -> Decimal:
         """
@@ -373,40 +418,93 @@ class PeriodAttendanceService:
     @transaction.atomic
     def approve_all(period_id: int, user) -> int:
         """Aprueba todos los resúmenes pendientes de un periodo."""
-        summaries = AttendancePeriodSummary.objects.filter(
+        summary_ids = list(AttendancePeriodSummary.objects.filter(
             period_id=period_id,
             status=AttendancePeriodSummary.Status.PENDING
-        ).select_for_update()
-
-        count = 0
-        for summary in summaries:
-            summary.status = AttendancePeriodSummary.Status.APPROVED
-            summary.approved_by = user
-            summary.approved_at = timezone.now()
-            summary.save()
-            PeriodAttendanceService._push_novelties(summary)
-            count += 1
-
-        return count
+        ).select_for_update().values_list('id', flat=True))
+        if not summary_ids:
+            return 0
+
+        # Un UPDATE para todos los resúmenes y un upsert para sus novedades
+        now = timezone.now()
+        approved = AttendancePeriodSummary.objects.filter(id__in=summary_ids)
+        approved.update(
+            status=AttendancePeriodSummary.Status.APPROVED,
+            approved_by=user,
+            approved_at=now,
+            updated_at=now,
+        )
+        PeriodAttendanceService._push_novelties_bulk(approved)
+        return len(summary_ids)
 
     @staticmethod
-    def _push_novelties(summary: AttendancePeriodSummary):
-        """
-        Crea o actualiza las PayrollNovelty para el empleado/periodo
-        basándose en los totales del resumen aprobado.
-        """
+    def _novelty_values(summary: AttendancePeriodSummary) -> Dict[Tuple[int, int, str], Decimal]:
+        """Novedades del resumen aprobado: { (employee_id, period_id, concept_code): monto }."""
         novelty_map = {
             CONCEPT_CODES['overtime_day']: summary.overtime_day_hours,
             CONCEPT_CODES['overtime_night']: summary.overtime_night_hours,
             CONCEPT_CODES['night_bonus']: summary.night_hours,
             CONCEPT_CODES['sundays']: summary.sunday_count,
         }
+        return {
+            (summary.employee_id, summary.period_id, code): Decimal(amount)
+            for code, amount in novelty_map.items()
+            if amount > 0
+        }
 
-        for code, amount in novelty_map.items():
-            if amount > 0:
-                PayrollNovelty.objects.update_or_create(
-                    employee=summary.employee,
-                    period=summary.period,
-                    concept_code=code,
-                    defaults={'amount': amount}
-                )
+    @staticmethod
+    def _push_novelties(summary: AttendancePeriodSummary):
+        """
+        Crea o actualiza las PayrollNovelty para el empleado/periodo
+        basándose en los totales del resumen aprobado.
+        """
+        PeriodAttendanceService._push_novelties_bulk([summary])
+
+    @staticmethod
+    def _push_novelties_bulk(summaries) -> None:
+        """
+        Novedades de varios resúmenes aprobados con un upsert por lotes sobre
+        (employee, period, concept_code).
+        """
+        from payroll_core.services.novelty_batch import NoveltyBatchService
+
+        if isinstance(summaries, QuerySet):
+            summaries = summaries.only(
+                'employee_id', 'period_id', 'overtime_day_hours', 'overtime_night_hours',
+                'night_hours', 'sunday_count'
+            ).iterator(chunk_size=SUMMARY_BATCH_SIZE)
+
+        values = {}
+        for summary in summaries:
+            values.update(PeriodAttendanceService._novelty_values(summary))
+        if values:
+            NoveltyBatchService.upsert(values)
+
+
+def _calculate_summary_chunk(
+    db_name: str,
+    schema_name: str,
+    period_id: int,
+    calc_tz,
+    employee_range: Tuple[int, int]
+) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[AttendanceDay]]:
+    """
+    Calcula la asistencia diaria y los resúmenes de un bloque de empleados
+    (ids consecutivos) dentro de un proceso del pool; la escritura queda en
+    el proceso padre.
+    """
+    from django_tenants.utils import schema_context
+
+    # Misma base de datos que el padre (p. ej. la base de pruebas)
+    default = connections['default']
+    if default.settings_dict['NAME'] != db_name:
+        default.close()
+        default.settings_dict['NAME'] = db_name
+
+    close_old_connections()
+    with schema_context(schema_name):
+        period = PayrollPeriod.objects.get(id=period_id)
+        employees = Employee.objects.filter(
+            is_active=True, id__range=employee_range
+        ).order_by('id')
+        return PeriodAttendanceService._calculate_summaries(period, employees, calc_tz)
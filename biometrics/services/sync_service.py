@@ -16,6 +16,7 @@ from biometrics.models import (
     AttendanceEvent, 
     EmployeeDeviceMapping,
 )
+from biometrics.services.period_attendance import PeriodAttendanceService
 from biometrics.services.hikvision_client import (
     HikvisionClient,
     HikvisionConnectionError,
@@ -184,6 +185,7 @@ class BiometricSyncService:
             'duplicates': 0,
             'mapped_to_employees': 0,
             'unmapped': 0,
+            'dirty_days': 0,
             'errors': [],
         }
         
@@ -222,6 +224,8 @@ class BiometricSyncService:
                     _employee_by_cedula[raw_ni] = emp
             
             latest_event_time = None
+            # (employee_id, timestamp) de los marcajes nuevos, para marcar sus días
+            new_employee_events = []
             
             for event_data in events:
                 try:
@@ -290,6 +294,7 @@ class BiometricSyncService:
                         stats['new_events'] += 1
                         if employee:
                             stats['mapped_to_employees'] += 1
+                            new_employee_events.append((employee.id, event.timestamp))
                         else:
                             stats['unmapped'] += 1
                         
@@ -305,6 +310,9 @@ class BiometricSyncService:
                     stats['errors'].append(str(e))
                     logger.warning(f"Error procesando evento: {e}")
             
+            # Días con marcajes nuevos: los resúmenes se actualizan solo en esos días
+            stats['dirty_days'] = PeriodAttendanceService.mark_dirty_days(new_employee_events)
+            
             # Actualizar estado del dispositivo
             device.last_sync = timezone.now()
             if latest_event_time:
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Signals del módulo Biométrico.
+
+La asistencia materializada (AttendanceDay) queda pendiente de recalcular
+(AttendanceDirtyDay) cuando cambia algo que la determina:
+- Al asignar, cambiar o quitar un turno diario (EmployeeDailyShift), ese día.
+- Al modificar un horario (WorkSchedule), los días calculados con él; si
+  además cambia el conjunto de horarios candidatos del "best fit" (alta,
+  baja, activación o hora de entrada), los días que eligen horario por
+  "best fit" dentro de la ventana de invalidación.
+- Al cambiar el horario fijo de un empleado, todos sus días.
+
+Ventana del "best fit": solo días con marcajes y sin turno diario, desde el
+inicio del periodo de nómina abierto más antiguo (o los últimos
+BEST_FIT_LOOKBACK_DAYS días si no hay periodos abiertos). Los días anteriores
+conservan el horario con que se calcularon; generate_summaries los recalcula
+si hace falta reprocesar un periodo cerrado.
+"""
+from datetime import timedelta
+
+from django.db.models import Exists, Min, OuterRef, Q
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from payroll_core.models import Employee, EmployeeDailyShift, PayrollPeriod, WorkSchedule
+from .models import AttendanceDay
+from .services.attendance_day import AttendanceDayService
+
+# Campos de WorkSchedule que usa el cálculo diario o la vista diaria
+SCHEDULE_FIELDS = (
+    'name', 'check_in_time', 'lunch_start_time', 'lunch_end_time', 'check_out_time',
+    'tolerance_minutes', 'is_active',
+)
+
+# Campos que cambian qué horario elige el "best fit" (ver AttendanceDayService._best_fit)
+BEST_FIT_FIELDS = ('check_in_time', 'is_active')
+
+# Días hacia atrás que se invalidan por "best fit" cuando no hay periodos abiertos
+BEST_FIT_LOOKBACK_DAYS = 62
+
+
+def best_fit_days() -> Q:
+    """
+    Días de la ventana de invalidación que eligen horario por "best fit":
+    con marcajes, sin turno diario y desde el primer periodo abierto.
+    """
+    since = PayrollPeriod.objects.filter(
+        status=PayrollPeriod.Status.OPEN
+    ).aggregate(since=Min('start_date'))['since']
+    if since is None:
+        since = timezone.localdate() - timedelta(days=BEST_FIT_LOOKBACK_DAYS)
+    daily_shift = EmployeeDailyShift.objects.filter(employee_id=OuterRef('employee_id'), date=OuterRef('date'))
+    return Q(event_count__gt=0, date__gte=since) & ~Exists(daily_shift)
+
+
+@receiver(post_save, sender=EmployeeDailyShift)
+@receiver(post_delete, sender=EmployeeDailyShift)
+def mark_daily_shift_day(sender, instance, **kwargs):
+    """Marca el día del turno como pendiente (AttendanceDirtyDay)."""
+    AttendanceDayService.mark_dirty({(instance.employee_id, instance.date)})
+
+
+@receiver(pre_save, sender=WorkSchedule)
+def track_schedule_change(sender, instance, **kwargs):
+    """Guarda los valores anteriores del horario para compararlos en post_save."""
+    instance._old_schedule = None
+    if instance.pk:
+        instance._old_schedule = WorkSchedule.objects.filter(pk=instance.pk).values(*SCHEDULE_FIELDS).first()
+
+
+@receiver(post_save, sender=WorkSchedule)
+def mark_schedule_days(sender, instance, created, **kwargs):
+    """Marca como pendientes los días afectados por el alta o cambio del horario."""
+    old = getattr(instance, '_old_schedule', None)
+    if created or old is None:
+        if instance.is_active:
+            AttendanceDayService.mark_dirty_rows(AttendanceDay.objects.filter(best_fit_days()))
+        return
+
+    changed = {field for field in SCHEDULE_FIELDS if old[field] != getattr(instance, field)}
+    if not changed:
+        return
+    days = Q(work_schedule=instance)
+    if changed & set(BEST_FIT_FIELDS):
+        days |= best_fit_days()
+    AttendanceDayService.mark_dirty_rows(AttendanceDay.objects.filter(days))
+
+
+@receiver(pre_delete, sender=WorkSchedule)
+def mark_deleted_schedule_days(sender, instance, **kwargs):
+    """
+    Antes de borrar el horario (sus días quedan con work_schedule nulo) se
+    marcan sus días y, si era candidato del "best fit", los días de la ventana.
+    """
+    days = Q(work_schedule=instance)
+    if instance.is_active:
+        days |= best_fit_days()
+    AttendanceDayService.mark_dirty_rows(AttendanceDay.objects.filter(days))
+
+
+@receiver(pre_save, sender=Employee)
+def track_employee_schedule(sender, instance, update_fields=None, **kwargs):
+    """Guarda el horario fijo anterior del empleado (si el guardado puede cambiarlo)."""
+    instance.__dict__.pop('_old_work_schedule_id', None)
+    if instance.pk and (update_fields is None or 'work_schedule' in update_fields):
+        instance._old_work_schedule_id = (
+            Employee.objects.filter(pk=instance.pk).values_list('work_schedule_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Employee)
+def mark_employee_schedule_days(sender, instance, created, **kwargs):
+    """Al cambiar el horario fijo del empleado, sus días quedan pendientes."""
+    if created or '_old_work_schedule_id' not in instance.__dict__:
+        return
+    if instance.__dict__.pop('_old_work_schedule_id') != instance.work_schedule_id:
+        AttendanceDayService.mark_dirty_rows(AttendanceDay.objects.filter(employee_id=instance.pk))
@@ -0,0 +1,67 @@
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+from django.test import SimpleTestCase
+from .services.attendance_day import DAY_END, DAY_START, AttendanceDayService
+
+
+def split_minute_by_minute(entry_dt, exit_dt, lunch_seconds=0):
+    """Recorrido minuto a minuto (implementación original) como referencia."""
+    day_seconds = 0
+    night_seconds = 0
+    current = entry_dt
+    while current < exit_dt:
+        if DAY_START <= current.time() < DAY_END:
+            day_seconds += 60
+        else:
+            night_seconds += 60
+        current += timedelta(minutes=1)
+    total = day_seconds + night_seconds
+    if total > 0 and lunch_seconds > 0:
+        day_ratio = day_seconds / total
+        day_seconds -= lunch_seconds * day_ratio
+        night_seconds -= lunch_seconds * (1 - day_ratio)
+    return (
+        Decimal(str(max(0, round(day_seconds / 3600, 2)))),
+        Decimal(str(max(0, round(night_seconds / 3600, 2)))),
+    )
+
+
+class DayNightSplitTests(SimpleTestCase):
+    def _random_shifts(self, count):
+        rng = random.Random(22)
+        tz = ZoneInfo('America/Caracas')
+        shifts = []
+        for _ in range(count):
+            entry = datetime(2025, 1, 1, tzinfo=tz) + timedelta(
+                days=rng.randint(0, 30), hours=rng.choice([0, 4, 5, 18, 19, 23, rng.randint(0, 23)]),
+                minutes=rng.choice([0, 59, rng.randint(0, 59)]), seconds=rng.choice([0, 0, 30, rng.randint(0, 59)]),
+                microseconds=rng.choice([0, 0, 1, 999999]),
+            )
+            duration = rng.choice([
+                timedelta(0), timedelta(seconds=rng.randint(-600, 600)),
+                timedelta(minutes=rng.randint(1, 16 * 60), seconds=rng.randint(0, 59)),
+                timedelta(days=rng.randint(1, 3), minutes=rng.randint(0, 1440)),
+            ])
+            lunch = rng.choice([0, 0, 1800, 3600, rng.uniform(0, 7200)])
+            shifts.append((entry, entry + duration, lunch))
+        return shifts
+
+    def test_closed_form_and_batch_match_minute_walk(self):
+        shifts = self._random_shifts(600)
+        batch = AttendanceDayService._split_day_night_batch(shifts)
+        for shift, batch_result in zip(shifts, batch):
+            expected = split_minute_by_minute(*shift)
+            self.assertEqual(AttendanceDayService._split_day_night(*shift), expected, shift)
+            self.assertEqual(batch_result, expected, shift)
+
+    def test_band_edges_and_midnight(self):
+        tz = ZoneInfo('America/Caracas')
+        entry = datetime(2025, 1, 6, 18, 0, tzinfo=tz)
+        # 18:00 -> 06:00: 1 h diurna antes de las 19:00 y 1 h después de las 05:00
+        self.assertEqual(
+            AttendanceDayService._split_day_night(entry, entry + timedelta(hours=12)),
+            (Decimal('2.0'), Decimal('10.0')),
+        )
+        self.assertEqual(AttendanceDayService._split_day_night_batch([]), [])
@@ -0,0 +1,164 @@
+from datetime import date, datetime, time
+from django.test import TestCase
+from django.utils import timezone
+from payroll_core.models import Employee, EmployeeDailyShift, PayrollPeriod, WorkSchedule
+from .models import (
+    AttendanceDirtyDay, AttendanceEvent, AttendancePeriodSummary,
+    BiometricDevice, BiometricDeviceType
+)
+from .services.attendance_day import AttendanceDayService
+from .services.daily_attendance import DailyAttendanceService
+from .services.period_attendance import PeriodAttendanceService
+
+SUMMARY_FIELDS = [
+    'total_hours', 'regular_day_hours', 'night_hours', 'overtime_day_hours', 'overtime_night_hours',
+    'sunday_hours', 'sunday_count', 'absences', 'days_worked', 'detail_json',
+]
+
+
+class AttendanceTestCase(TestCase):
+    def setUp(self):
+        self.schedule = WorkSchedule.objects.create(
+            name='Diurno', check_in_time=time(8), check_out_time=time(17),
+            lunch_start_time=time(12), lunch_end_time=time(13)
+        )
+        self.period = PayrollPeriod.objects.create(
+            name="Enero 2025 - Q1", start_date=date(2025, 1, 1),
+            end_date=date(2025, 1, 15), payment_date=date(2025, 1, 15)
+        )
+        device_type = BiometricDeviceType.objects.create(name='hikvision', display_name='Hikvision', protocol='isapi')
+        self.device = BiometricDevice.objects.create(
+            name='Entrada', device_type=device_type, ip_address='10.0.0.1', username='admin', password='clave'
+        )
+
+        # 3 empleados con jornada completa del 1 al 5
+        self.employees = []
+        for i in range(3):
+            employee = Employee.objects.create(
+                first_name=f"Empleado{i}", last_name="Perez", national_id=f"V-2000000{i}",
+                position="Operador", hire_date=date(2020, 1, 1), is_active=True, work_schedule=self.schedule
+            )
+            self.employees.append(employee)
+            for day in range(1, 6):
+                for hour in (8, 12, 13, 17 + i):
+                    self._punch(employee, datetime(2025, 1, day, hour))
+
+    def _punch(self, employee, moment):
+        AttendanceEvent.objects.create(
+            device=self.device, employee=employee, employee_device_id=str(employee.id),
+            timestamp=timezone.make_aware(moment)
+        )
+
+    def _summaries(self):
+        return {
+            summary.employee_id: [getattr(summary, field) for field in SUMMARY_FIELDS]
+            for summary in AttendancePeriodSummary.objects.filter(period=self.period)
+        }
+
+
+class AttendanceRefreshTests(AttendanceTestCase):
+    def test_refresh_after_new_events_matches_full_generate(self):
+        """La actualización incremental deja los mismos resúmenes que recalcular todo el periodo"""
+        PeriodAttendanceService.generate_summaries(self.period.id)
+
+        # Turno nocturno del día 7 con salida de madrugada y una jornada el día 9
+        new_events = [
+            (self.employees[1], datetime(2025, 1, 7, 19)),
+            (self.employees[1], datetime(2025, 1, 8, 3)),
+            (self.employees[2], datetime(2025, 1, 9, 8)),
+            (self.employees[2], datetime(2025, 1, 9, 18)),
+        ]
+        for employee, moment in new_events:
+            self._punch(employee, moment)
+        PeriodAttendanceService.mark_dirty_days([(employee.id, moment) for employee, moment in new_events])
+
+        result = PeriodAttendanceService.refresh_summaries(self.period.id)
+        self.assertEqual(result['total'], 2)
+        self.assertFalse(AttendanceDirtyDay.objects.filter(date__lte=self.period.end_date).exists())
+        incremental = self._summaries()
+
+        PeriodAttendanceService.generate_summaries(self.period.id)
+        self.assertEqual(incremental, self._summaries())
+        self.assertGreater(incremental[self.employees[1].id][2], 0)
+
+    def test_inactive_employees_keep_their_dirty_days(self):
+        """Los días pendientes de empleados no recalculados no se descartan"""
+        inactive = Employee.objects.create(
+            first_name="Inactivo", last_name="Perez", national_id="V-29999999",
+            position="Operador", hire_date=date(2020, 1, 1), is_active=False
+        )
+        AttendanceDayService.mark_dirty({(inactive.id, date(2025, 1, 3))})
+        PeriodAttendanceService.mark_dirty_days([(self.employees[0].id, datetime(2025, 1, 4, 8))])
+
+        PeriodAttendanceService.refresh_summaries(self.period.id)
+        PeriodAttendanceService.generate_summaries(self.period.id)
+
+        self.assertEqual(
+            list(AttendanceDirtyDay.objects.values_list('employee_id', 'date')),
+            [(inactive.id, date(2025, 1, 3))]
+        )
+
+
+class ScheduleChangeTests(AttendanceTestCase):
+    def test_daily_view_and_summary_agree_after_schedule_change(self):
+        """Al cambiar el horario, la vista diaria y el resumen del periodo se recalculan con el nuevo"""
+        employee = self.employees[0]
+        # Marcaje extra del día 6: el almuerzo se asigna por cercanía al horario
+        for hour, minute in ((8, 0), (12, 0), (12, 30), (13, 0), (17, 0)):
+            self._punch(employee, datetime(2025, 1, 6, hour, minute))
+        PeriodAttendanceService.generate_summaries(self.period.id)
+
+        self.schedule.lunch_start_time = time(12, 30)
+        self.schedule.lunch_end_time = time(13, 30)
+        self.schedule.save()
+        self.assertTrue(AttendanceDirtyDay.objects.filter(employee=employee, date=date(2025, 1, 6)).exists())
+
+        PeriodAttendanceService.refresh_summaries(self.period.id)
+        daily = {
+            row['employee']['id']: row
+            for row in DailyAttendanceService.get_daily_summary(date(2025, 1, 6))['results']
+        }
+        summary = AttendancePeriodSummary.objects.get(period=self.period, employee=employee)
+        detail = next(day for day in summary.detail_json if day['date'] == '2025-01-06')
+
+        self.assertEqual(daily[employee.id]['effective_hours'], 8.5)
+        self.assertEqual(detail['effective_hours'], daily[employee.id]['effective_hours'])
+
+    def test_employee_schedule_change_marks_days(self):
+        """Cambiar el horario fijo del empleado deja sus días pendientes"""
+        PeriodAttendanceService.generate_summaries(self.period.id)
+        night = WorkSchedule.objects.create(
+            name='Nocturno', check_in_time=time(19), check_out_time=time(4),
+            lunch_start_time=time(23), lunch_end_time=time(23, 30), is_active=False
+        )
+        employee = self.employees[0]
+        employee.work_schedule = night
+        employee.save()
+
+        self.assertEqual(AttendanceDirtyDay.objects.filter(employee=employee).count(), 15)
+        row = next(
+            row for row in DailyAttendanceService.get_daily_summary(date(2025, 1, 10))['results']
+            if row['employee']['id'] == employee.id
+        )
+        self.assertEqual(row['schedule_name'], 'Nocturno')
+
+    def test_new_schedule_marks_best_fit_days_of_open_periods(self):
+        """Un horario nuevo solo invalida los días con "best fit" desde el periodo abierto"""
+        PeriodAttendanceService.generate_summaries(self.period.id)
+        old_employee = self.employees[0]
+        for hour in (8, 17):
+            self._punch(old_employee, datetime(2024, 12, 20, hour))
+        AttendanceDayService.materialize([old_employee], [date(2024, 12, 20)])
+        shift_employee = self.employees[1]
+        EmployeeDailyShift.objects.create(employee=shift_employee, date=date(2025, 1, 2), work_schedule=self.schedule)
+        AttendanceDirtyDay.objects.all().delete()
+
+        WorkSchedule.objects.create(
+            name='Temprano', check_in_time=time(7), check_out_time=time(16),
+            lunch_start_time=time(12), lunch_end_time=time(13)
+        )
+
+        expected = {
+            (employee.id, date(2025, 1, day)) for employee in self.employees for day in range(1, 6)
+        } - {(shift_employee.id, date(2025, 1, 2))}
+        self.assertEqual(set(AttendanceDirtyDay.objects.values_list('employee_id', 'date')), expected)
@@ -408,6 +408,7 @@ class AttendancePeriodSummaryViewSet(viewsets.ModelViewSet):
 
     GET    /api/biometric/period-summary/?period_id=X  → Listar resúmenes
     POST   /api/biometric/period-summary/generate/     → Generar resúmenes
+    POST   /api/biometric/period-summary/refresh/      → Actualizar días con marcajes nuevos
     POST   /api/biometric/period-summary/{id}/approve/  → Aprobar uno
     POST   /api/biometric/period-summary/approve_all/   → Aprobar todos
     """
@@ -464,6 +465,40 @@ class AttendancePeriodSummaryViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['post'])
+    def refresh(self, request):
+        """
+        Actualiza los resúmenes de un periodo recalculando solo los días que
+        recibieron marcajes en las sincronizaciones posteriores al último cálculo.
+
+        POST /api/biometric/period-summary/refresh/
+        Body: { "period_id": 5 }
+        """
+        period_id = request.data.get('period_id')
+        if not period_id:
+            return Response(
+                {'error': 'period_id es obligatorio.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            from payroll_core.models import Company
+            company = Company.objects.first()
+            auto_approve = company.auto_approve_attendance if company else False
+
+            result = PeriodAttendanceService.refresh_summaries(
+                period_id=int(period_id),
+                auto_approve=auto_approve,
+                user=request.user,
+            )
+            return Response(result, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.exception('Error refreshing period attendance summaries')
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         """
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-17 01:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0003_currency_interestratebcv_exchangerate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exchangerate',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última Modificación'),
+        ),
+    ]
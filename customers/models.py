@@ -207,6 +207,7 @@ class ExchangeRate(models.Model):
         verbose_name='Fuente'
     )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Registro')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Última Modificación')
     notes = models.TextField(blank=True, verbose_name='Notas')
 
     class Meta:
@@ -2,39 +2,94 @@
 Motor de Nómina Dinámico (Rule Engine).
 Corregido para soportar funciones (min, max) y Timezones.
 """
-from decimal import Decimal, ROUND_HALF_UP
+import logging
+from decimal import Decimal
 from typing import Optional, Dict, Any
-from datetime import date, datetime, timedelta
-import calendar
-from simpleeval import simple_eval
+from datetime import date
 from django.utils import timezone  # <--- IMPORTANTE PARA TIMEZONES
 
 from .models import (
     PayrollConcept, 
     LaborContract, 
     Currency, 
-    ExchangeRate, 
     PayrollPeriod, 
     PayrollNovelty,
-    Company,
     Loan
 )
 from .services.salary import SalarySplitter
+from .services.formula_cache import FormulaCache
+from .services.payroll_plan import PayrollPlan
+from .services.run_context import DEFAULT_POLICY_FACTORS, PayrollRunContext
+from .services.employee_inputs import EmployeeInputs
+from .services.money import cents_to_float, from_cents, round_cents, to_cents
+from .services.formula_trace import (
+    TraceLevel, expand_calculation_log, get_used_variables, resolve_formula
+)
+
+logger = logging.getLogger(__name__)
 
 # Constantes de Configuración
-FALLBACK_SALARIO_MINIMO = Decimal('130.00')
 MONTO_CESTATICKET_USD = Decimal('40.00')  # Monto legal fijo del cestaticket
 
 class PayrollEngine:
+    # Inventario de variables cacheado (ver _get_inventory)
+    _inventory_cache = None
+
+    # Mapeo de códigos de novedades (DB) a nombres de variables (Fórmulas)
+    NOVELTY_MAP = {
+        'H_EXTRA': 'OVERTIME_HOURS',
+        'B_NOCTURNO': 'NIGHT_HOURS',
+        'BONO_DOMINGO': 'SUNDAY_HOURS',
+        'FERIADO': 'HOLIDAY_HOURS',
+        'FALTAS': 'FALTAS',
+        'REPOSO': 'DIAS_REPOSO',
+        'FERIADO_TRAB': 'FERIADOS_TRABAJADOS',
+        
+        # Alias para Días de Descanso y Feriados (Sincronización con Frontend)
+        'DIAS_DESCANSO': 'DIAS_SABADO',
+        'DIAS_DOMINGO': 'DIAS_DOMINGO',
+        'DIAS_FERIADO': 'DIAS_FERIADO',
+        'DIAS_FERIADOS': 'DIAS_FERIADO',
+        'HED': 'H_EXTRA_DIURNA',
+        'HEN': 'H_EXTRA_NOCTURNA',
+        'BN': 'BONO_NOCTURNO',
+    }
+
+    # Variables derivadas del desglose salarial del contrato (solo se calculan si alguna fórmula las usa)
+    SALARY_VARIABLES = frozenset({
+        'SALARIO_MENSUAL', 'SALARIO_DIARIO', 'SALARIO_TOTAL_MENSUAL', 'SALARIO_TOTAL_DIARIO',
+        'SUELDO_BASE_MENSUAL', 'SUELDO_BASE_DIARIO', 'COMPLEMENTO_MENSUAL', 'COMPLEMENTO_DIARIO',
+    })
+
+    # Variables que el motor siempre define al evaluar fórmulas (además de códigos,
+    # cantidades *_CANT y acumuladores TOTAL_*)
+    SYSTEM_VARIABLES = SALARY_VARIABLES | frozenset(DEFAULT_POLICY_FACTORS) | frozenset({
+        'SALARIO_MINIMO', 'ANTIGUEDAD', 'DIAS', 'DIAS_HABILES', 'DIAS_SABADO', 'DIAS_DOMINGO',
+        'DIAS_FERIADO', 'LUNES', 'OVERTIME_HOURS', 'NIGHT_HOURS', 'SUNDAY_HOURS', 'HOLIDAY_HOURS',
+        'FALTAS', 'DIAS_FALTAS', 'DIAS_REPOSO', 'FERIADOS_TRABAJADOS', 'H_EXTRA_DIURNA',
+        'H_EXTRA_NOCTURNA', 'BONO_NOCTURNO', 'H_EXTRA', 'B_NOCTURNO', 'DIAS_DESCANSO',
+        'COMPLEMENTO_PERIOD', 'SUELDO_BASE_PERIODO', 'COMPLEMENTO_PERIODO',
+        # Variables de las fórmulas de ajuste en conceptos FIXED_AMOUNT
+        'VALOR_BASE', 'CANTIDAD', 'TASA', 'MONTO_CALCULADO',
+    })
+
     def __init__(
         self, 
         contract: LaborContract, 
         period: Optional[PayrollPeriod] = None, 
         payment_date: Optional[date] = None,
-        input_variables: Optional[Dict[str, float]] = None
+        input_variables: Optional[Dict[str, float]] = None,
+        plan: Optional[PayrollPlan] = None,
+        run_context: Optional[PayrollRunContext] = None,
+        trace_level: str = TraceLevel.FULL,
+        inputs: Optional[EmployeeInputs] = None
     ):
         self.contract = contract
         self.period = period
+        # Nivel de detalle de trazas: off / summary / full
+        self.trace_level = TraceLevel.validate(trace_level)
+        # Plan compartido de la corrida (catálogo de conceptos precalculado)
+        self.plan = plan
         
         # Manejo robusto de fechas
         if period:
@@ -44,8 +99,15 @@ class PayrollEngine:
         else:
             self.payment_date = timezone.now().date() # <--- Uso correcto de Timezone
 
+        # Datos de referencia compartidos (empresa, política, tasas, calendario)
+        self.run_context = run_context or PayrollRunContext.build(period, self.payment_date)
+        # Overrides y préstamos precargados para el lote (None: se consultan por empleado)
+        self.inputs = inputs
+
         self.exchange_rate_obj = None
         self._cached_rate_value = None
+        # Desglose salarial del contrato (se calcula una vez por empleado)
+        self._salary_breakdown = None
         
         # Cargar novedades
         if input_variables is not None:
@@ -67,22 +129,7 @@ class PayrollEngine:
         if self._cached_rate_value and self.contract.salary_currency == target_currency:
             return self._cached_rate_value
 
-        # Corrección Timezone: Aseguramos comparar fechas o datetimes conscientes
-        # Convertimos payment_date (date) a datetime con timezone para la consulta
-        query_date = timezone.make_aware(
-            datetime.combine(self.payment_date, datetime.min.time())
-        )
-
-        rate_obj = ExchangeRate.objects.filter(
-            currency=target_currency, 
-            date_valid__lte=query_date 
-        ).order_by('-date_valid').first()
-        if not rate_obj:
-            rate_obj = ExchangeRate.objects.filter(
-                currency=target_currency
-            ).order_by('date_valid').first()
-
-        val = rate_obj.rate if rate_obj else Decimal('1.00')
+        rate_obj, val = self.run_context.get_rate(target_currency)
         if self.contract.salary_currency == target_currency:
             self.exchange_rate_obj = rate_obj
             self._cached_rate_value = val
@@ -238,62 +285,143 @@ class PayrollEngine:
             },
         }
 
+    @classmethod
+    def _get_inventory(cls) -> Dict[str, Dict[str, Any]]:
+        """Inventario de variables (se construye una sola vez por proceso)."""
+        if cls._inventory_cache is None:
+            cls._inventory_cache = cls.get_variable_inventory()
+        return cls._inventory_cache
+
+    @classmethod
+    def expand_calculation_log(cls, log: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Reconstruye bajo demanda la traza completa de un log de cálculo
+        guardado en nivel 'summary' (fórmula + valores).
+        """
+        return expand_calculation_log(log or {}, cls._get_inventory())
+
     def _get_formula_breakdown(self, formula: str, context: Dict[str, Any]) -> Dict[str, Any]:
         """
         Genera una versión legible de la fórmula y el mapeo de variables usadas,
-        incluyendo metadatos de las variables si están disponibles.
+        según el nivel de traza del motor:
+        - off: sin traza.
+        - summary: texto de la fórmula y valores de las variables usadas.
+        - full: fórmula resuelta e información de cada variable del inventario.
         """
-        import re
-        if not formula: return {"trace": "", "variables": {}}
-        
-        inventory = self.get_variable_inventory()
-        words = re.findall(r'[A-Za-z_][A-Za-z0-9_]*', formula)
-        resolved = formula
+        if not formula or self.trace_level == TraceLevel.OFF:
+            return {"trace": "", "variables": {}}
+
+        values = get_used_variables(formula, context)
+        if self.trace_level == TraceLevel.SUMMARY:
+            return {"trace": formula, "variables": values}
+
+        inventory = self._get_inventory()
         variables_used = {}
-        
-        for word in sorted(set(words), key=len, reverse=True):
-            if word in context:
-                val = context[word]
-                meta = inventory.get(word, {})
-                
-                if word not in variables_used:
-                    variables_used[word] = {
-                        "value": float(val) if isinstance(val, Decimal) else val,
-                        "description": meta.get('description', 'Variable de sistema o novedad'),
-                        "category": meta.get('category', 'Otros')
-                    }
-
-                if isinstance(val, (int, float, Decimal)):
-                    str_val = f"{float(val):.2f}"
-                else:
-                    str_val = str(val)
-                
-                # Usar regex para reemplazar solo palabras completas
-                resolved = re.sub(r'\b' + word + r'\b', str_val, resolved)
-        
+        for word, val in values.items():
+            meta = inventory.get(word, {})
+            variables_used[word] = {
+                "value": val,
+                "description": meta.get('description', 'Variable de sistema o novedad'),
+                "category": meta.get('category', 'Otros')
+            }
+
         return {
-            "trace": resolved,
+            "trace": resolve_formula(formula, values),
             "variables": variables_used
         }
 
+    def _get_compiled_formula(self, concept: PayrollConcept):
+        if self.plan:
+            return self.plan.get_formula(concept)
+        return FormulaCache.get(concept)
+
     def _get_formula_trace(self, formula: str, context: Dict[str, Any]) -> str:
         return self._get_formula_breakdown(formula, context)["trace"]
 
+    @classmethod
+    def get_known_variables(cls) -> set:
+        """
+        Nombres de variables que el motor puede definir al evaluar una fórmula,
+        sin contar códigos de concepto ni sus cantidades (*_CANT).
+        """
+        from .serializers import ACCUMULATOR_LABELS
+        known = set(cls.SYSTEM_VARIABLES) | set(cls._get_inventory())
+        known |= {f"TOTAL_{code}" for code in ACCUMULATOR_LABELS}
+        for key, mapped in cls.NOVELTY_MAP.items():
+            known |= {key, mapped, f"{key}_CANT", f"{mapped}_CANT"}
+        return known
+
+    @classmethod
+    def check_formula_dependencies(
+        cls,
+        formula: str,
+        concept_code: Optional[str] = None,
+        extra_names=(),
+        plan: Optional[PayrollPlan] = None
+    ) -> Dict[str, Any]:
+        """
+        Análisis estático de una fórmula contra el catálogo activo:
+        variables no definidas, conceptos de los que depende y, si se indica
+        el concepto al que pertenece, ciclos de dependencia que la incluyan.
+        Lanza SyntaxError si la fórmula no se puede parsear.
+        """
+        compiled = FormulaCache.compile(formula)
+        if plan is None:
+            plan = PayrollPlan.build()
+        code = concept_code or '__FORMULA__'
+        dependencies = plan.dependencies.with_formula(code, compiled)
+        return {
+            'undefined': dependencies.undefined_names(code, cls.get_known_variables() | set(extra_names)),
+            'dependencies': sorted(dependencies.graph[code]),
+            'cycle': dependencies.find_cycle(code) if concept_code else None,
+        }
+
     @staticmethod
-    def validate_formula(formula: str, custom_context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def validate_formula(
+        formula: str,
+        custom_context: Optional[Dict[str, Any]] = None,
+        concept_code: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Prueba una fórmula de forma aislada para validación.
         Carga automáticamente códigos de conceptos y acumuladores para evitar errores de definición.
+        Antes de evaluar verifica estáticamente variables no definidas (en todas
+        las ramas) y ciclos de dependencia con otros conceptos.
         """
-        # 1. Contexto base de variables de sistema
-        context = {k: v['example'] for k, v in PayrollEngine.get_variable_inventory().items()}
-        
-        # 2. Cargar códigos de conceptos existentes (usar su valor base como ejemplo realista)
         try:
-            concept_codes = {c.code: float(c.value) for c in PayrollConcept.objects.filter(active=True)}
-            context.update(concept_codes)
+            plan = PayrollPlan.build()
         except Exception:
-            pass # Fallback si no hay DB en este hilo
+            plan = PayrollPlan([]) # Fallback si no hay DB en este hilo
+
+        try:
+            analysis = PayrollEngine.check_formula_dependencies(
+                formula, concept_code, extra_names=(custom_context or {}).keys(), plan=plan
+            )
+        except SyntaxError as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+        if analysis['undefined']:
+            return {
+                "success": False,
+                "error": f"Variables no definidas: {', '.join(analysis['undefined'])}",
+                "undefined_variables": analysis['undefined']
+            }
+        if analysis['cycle']:
+            return {
+                "success": False,
+                "error": f"Dependencia circular: {' -> '.join(analysis['cycle'])}",
+                "cycle": analysis['cycle']
+            }
+
+        # 1. Contexto base de variables de sistema (valor de ejemplo del inventario si existe)
+        context = {name: 1.0 for name in PayrollEngine.SYSTEM_VARIABLES}
+        context.update(DEFAULT_POLICY_FACTORS)
+        context.update({k: v['example'] for k, v in PayrollEngine.get_variable_inventory().items()})
+        
+        # 2. Cargar códigos de conceptos existentes (usar su valor base como ejemplo realista)
+        context.update({c.code: float(c.value) for c in plan.concepts})
 
         # 3. Cargar acumuladores definidos
         from .serializers import ACCUMULATOR_LABELS
@@ -301,8 +429,11 @@ class PayrollEngine:
         context.update(accumulators)
 
         # 4. Cargar sufijos de cantidad (_CANT) para evitar NameError
-        quantities = {f"{c.code}_CANT": 1.0 for c in PayrollConcept.objects.filter(active=True)}
+        quantities = {f"{c.code}_CANT": 1.0 for c in plan.concepts}
         context.update(quantities)
+        if concept_code:
+            context.setdefault(concept_code, 0.0)
+            context.setdefault(f"{concept_code}_CANT", 1.0)
 
         # 5. Variables especiales para fórmulas de ajuste en conceptos FIXED_AMOUNT
         context.update({
@@ -325,22 +456,14 @@ class PayrollEngine:
         }
 
         try:
-            from simpleeval import simple_eval
-            result = simple_eval(formula, names=context, functions=functions)
-            
-            import re
-            words = re.findall(r'[A-Za-z_][A-Za-z0-9_]*', formula)
-            resolved = formula
-            for word in sorted(set(words), key=len, reverse=True):
-                if word in context:
-                    val = context[word]
-                    str_val = f"{float(val):.2f}" if isinstance(val, (int, float, Decimal)) else str(val)
-                    resolved = re.sub(r'\b' + word + r'\b', str_val, resolved)
+            result = FormulaCache.compile(formula).evaluate(context, functions)
+            resolved = resolve_formula(formula, context)
 
             return {
                 "success": True,
                 "result": float(result) if isinstance(result, (Decimal, int, float)) else result,
-                "trace": resolved
+                "trace": resolved,
+                "dependencies": analysis['dependencies']
             }
         except Exception as e:
             return {
@@ -361,122 +484,34 @@ class PayrollEngine:
             'float': float,
         }
 
+    def _get_salary_breakdown(self):
+        """Tasa y desglose base/complemento del contrato (SalarySplitter), una vez por empleado."""
+        if self._salary_breakdown is None:
+            rate = self._get_exchange_rate_value(self.contract.salary_currency)
+            breakdown = SalarySplitter.get_salary_breakdown(
+                self.contract, exchange_rate=rate, company=self.run_context.company
+            )
+            self._salary_breakdown = (rate, breakdown)
+        return self._salary_breakdown
+
     def _build_eval_context(self) -> Dict[str, Any]:
         """
         Construye SOLO las VARIABLES (Datos).
         """
-        # 1. Determinar Salario Total y Sueldo Base
-        contract_rate = self._get_exchange_rate_value(self.contract.salary_currency)
-        total_salary_ves = float(self.contract.monthly_salary * contract_rate)
-        
-        # Obtener desglose para tener el Sueldo Base real
-        breakdown = SalarySplitter.get_salary_breakdown(self.contract, contract_rate)
-        base_salary_ves = float(breakdown['base'] * contract_rate)
-        
-        # 2. Cálculo de Lunes y desglose de días por tipo
-        mondays = 0
-        workdays_count = 0  # L-V
-        # Contador real del calendario para validación
-        saturdays_calendar = 0 # S
-        sundays_calendar = 0 
-        holidays_calendar = 0
-        
-        # Lista de feriados nacionales venezolanos
-        # TODO: Implementar modelo de Feriados en DB
-        current_year = self.period.start_date.year if self.period else self.payment_date.year
-        national_holidays = [
-            date(current_year, 1, 1),   # Año Nuevo
-            date(current_year, 4, 19),  # Proclamación Independencia
-            date(current_year, 5, 1),   # Día del Trabajador
-            date(current_year, 6, 24),  # Batalla de Carabobo
-            date(current_year, 7, 5),   # Firma Acta Independencia
-            date(current_year, 7, 24),  # Natalicio de Simón Bolívar
-            date(current_year, 10, 12), # Día de la Resistencia Indígena
-            date(current_year, 12, 24), # Víspera de Navidad
-            date(current_year, 12, 25), # Navidad
-            date(current_year, 12, 31), # Fin de Año
-        ]
-
-        if self.period:
-            curr = self.period.start_date
-            while curr <= self.period.end_date:
-                wd = curr.weekday() # 0=Mon, ..., 4=Fri, 5=Sat, 6=Sun
-                is_holiday = curr in national_holidays
-                
-                if wd == 0: mondays += 1
-                
-                if is_holiday:
-                    holidays_calendar += 1
-                elif wd < 5: # Lunes a Viernes
-                    workdays_count += 1
-                elif wd == 5: # Sábado
-                    saturdays_calendar += 1
-                else: # Domingo
-                    sundays_calendar += 1
-                
-                curr += timedelta(days=1)
-        else:
-            # Fallback para simulación (basado en el mes de pago)
-            import calendar
-            curr_month = self.payment_date.month
-            curr_year = self.payment_date.year
-            _, last_day = calendar.monthrange(curr_year, curr_month)
-            for d in range(1, last_day + 1):
-                dt = date(curr_year, curr_month, d)
-                wd = dt.weekday()
-                is_holiday = dt in national_holidays
-                
-                if wd == 0: mondays += 1
-                
-                if is_holiday:
-                    holidays_calendar += 1
-                elif wd < 5: workdays_count += 1
-                elif wd == 5: saturdays_calendar += 1
-                else: sundays_calendar += 1
-        
-        # Ajuste a 15/30 para mantener consistencia comercial si es necesario
-        # Si la suma es 13-16, ajustamos proporcionalmente? 
-        # O simplemente mostramos el real del calendario. El usuario pidió "intervalo de cierre".
-        
-        # Obtener Salario Mínimo y Jornada de la configuración de la empresa
-        company = Company.objects.first()
-        min_salary = company.national_minimum_salary if company else FALLBACK_SALARIO_MINIMO
-        
-        # 3. Determinar días totales del periodo (comercial)
-        days_in_period = 15
-        if company:
-            if company.payroll_journey == 'BIWEEKLY': days_in_period = 15
-            elif company.payroll_journey == 'MONTHLY': days_in_period = 30
-            elif company.payroll_journey == 'WEEKLY': days_in_period = 7
-
-        if self.period:
-            delta = (self.period.end_date - self.period.start_date).days + 1
-            if delta >= 28: days_in_period = 30
-            elif delta >= 13: days_in_period = 15
-            elif delta >= 6: days_in_period = 7
-            else: days_in_period = delta
-
-        # 3. Contexto de Variables
+        run_context = self.run_context
+        cal = run_context.calendar
+        min_salary = run_context.min_salary
+
+        # 1. Contexto de Variables (calendario y datos de empresa cargados una vez por corrida)
         context = {
-            'SALARIO_MENSUAL': total_salary_ves,
-            'SALARIO_DIARIO': total_salary_ves / 30,
-            
-            # Nuevas variables desglosadas
-            'SALARIO_TOTAL_MENSUAL': total_salary_ves,
-            'SALARIO_TOTAL_DIARIO': total_salary_ves / 30,
-            'SUELDO_BASE_MENSUAL': base_salary_ves,
-            'SUELDO_BASE_DIARIO': base_salary_ves / 30,
-            'COMPLEMENTO_MENSUAL': float(breakdown['complement'] * contract_rate),
-            'COMPLEMENTO_DIARIO': float(breakdown['complement'] * contract_rate) / 30,
-            
             'SALARIO_MINIMO': float(min_salary),
             'ANTIGUEDAD': self.contract.employee.seniority_years,
-            'DIAS': days_in_period,
-            'DIAS_HABILES': workdays_count,
+            'DIAS': cal['days_in_period'],
+            'DIAS_HABILES': cal['workdays'],
             'DIAS_SABADO': 0.0,  # Por defecto 0 (pedido por usuario)
             'DIAS_DOMINGO': 0.0, # Por defecto 0 (pedido por usuario)
             'DIAS_FERIADO': 0.0, # Por defecto 0 (pedido por usuario)
-            'LUNES': mondays,
+            'LUNES': cal['mondays'],
             
             # Defaults para evitar errores
             'OVERTIME_HOURS': 0.0,
@@ -493,47 +528,30 @@ class PayrollEngine:
             'H_EXTRA': 0.0,
             'B_NOCTURNO': 0.0,
             'DIAS_DESCANSO': 0.0,
-            'FERIADOS_TRABAJADOS': 0.0,
-            'H_EXTRA_DIURNA': 0.0,
-            
-            # Polítitcas y Factores (de la base de datos)
-            'FACTOR_HED': 1.50,
-            'FACTOR_HEN': 1.80,
-            'TASA_BONO_NOCTURNO': 0.30,
-            'FACTOR_FERIADO': 1.50,
-            'FACTOR_DESCANSO': 1.50,
         }
 
-        # Intentar cargar factores reales de la política de la empresa
-        if company and hasattr(company, 'policy'):
-            policy = company.policy
+        # 2. Salario Total y Sueldo Base: solo si alguna fórmula del plan los referencia
+        if self.plan is None or self.plan.referenced_names & self.SALARY_VARIABLES:
+            contract_rate, breakdown = self._get_salary_breakdown()
+            total_salary_ves = float(self.contract.monthly_salary * contract_rate)
+            base_salary_ves = float(breakdown['base'] * contract_rate)
+            complement_ves = float(breakdown['complement'] * contract_rate)
             context.update({
-                'FACTOR_HED': float(policy.overtime_day_factor),
-                'FACTOR_HEN': float(policy.overtime_night_factor),
-                'TASA_BONO_NOCTURNO': float(policy.night_bonus_rate),
-                'FACTOR_FERIADO': float(policy.holiday_payout_factor),
-                'FACTOR_DESCANSO': float(policy.rest_day_payout_factor),
+                'SALARIO_MENSUAL': total_salary_ves,
+                'SALARIO_DIARIO': total_salary_ves / 30,
+                
+                # Nuevas variables desglosadas
+                'SALARIO_TOTAL_MENSUAL': total_salary_ves,
+                'SALARIO_TOTAL_DIARIO': total_salary_ves / 30,
+                'SUELDO_BASE_MENSUAL': base_salary_ves,
+                'SUELDO_BASE_DIARIO': base_salary_ves / 30,
+                'COMPLEMENTO_MENSUAL': complement_ves,
+                'COMPLEMENTO_DIARIO': complement_ves / 30,
             })
 
-        # Mapeo de códigos de novedades (DB) a nombres de variables (Fórmulas)
-        self.NOVELTY_MAP = {
-            'H_EXTRA': 'OVERTIME_HOURS',
-            'B_NOCTURNO': 'NIGHT_HOURS',
-            'BONO_DOMINGO': 'SUNDAY_HOURS',
-            'FERIADO': 'HOLIDAY_HOURS',
-            'FALTAS': 'FALTAS',
-            'REPOSO': 'DIAS_REPOSO',
-            'FERIADO_TRAB': 'FERIADOS_TRABAJADOS',
-            
-            # Alias para Días de Descanso y Feriados (Sincronización con Frontend)
-            'DIAS_DESCANSO': 'DIAS_SABADO',
-            'DIAS_DOMINGO': 'DIAS_DOMINGO',
-            'DIAS_FERIADO': 'DIAS_FERIADO',
-            'DIAS_FERIADOS': 'DIAS_FERIADO',
-            'HED': 'H_EXTRA_DIURNA',
-            'HEN': 'H_EXTRA_NOCTURNA',
-            'BN': 'BONO_NOCTURNO',
-        }
+        # Polítitcas y Factores (de la política de la empresa o valores por defecto)
+        context.update(run_context.policy_factors)
+
 
         for key, val in self.input_variables.items():
             u_key = key.upper()
@@ -561,11 +579,12 @@ class PayrollEngine:
 
         return context
 
-    def calculate_concept(self, concept: PayrollConcept, override_value=None, multiplier=None, context=None) -> Dict[str, Any]:
+    def calculate_concept(self, concept: PayrollConcept, override_value=None, multiplier=None, context=None, precomputed=None) -> Dict[str, Any]:
         """
         Calcula el monto de un concepto individual.
         - override_value: Pone un nuevo valor base (ej: cambio de sueldo en contrato).
         - multiplier: Multiplica el valor base (ej: cantidad en una novedad).
+        - precomputed: Resultado de la fórmula ya evaluado en modo lote (omite la evaluación).
         """
         # 1. Determinar el Valor Base
         # Si hay override_value (contrato), ese manda sobre el del catálogo.
@@ -600,12 +619,10 @@ class PayrollEngine:
                     context['TASA'] = float(rate)
                     context['MONTO_CALCULADO'] = float(base_amount)
                     
-                    adjustment_result = simple_eval(
-                        concept.formula,
-                        names=context,
-                        functions=self._get_allowed_functions()
+                    adjustment_result = self._get_compiled_formula(concept).evaluate(
+                        context, self._get_allowed_functions()
                     )
-                    adjustment = Decimal(str(adjustment_result)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+                    adjustment = round_cents(adjustment_result)
                     adjustment_breakdown = self._get_formula_breakdown(concept.formula, context)
                     adjustment_trace = f" + Ajuste ({adjustment_breakdown['trace']}) = {float(adjustment):.2f}"
                     variables.update(adjustment_breakdown['variables'])
@@ -614,7 +631,7 @@ class PayrollEngine:
                     print(f"Error evaluando fórmula de ajuste [{concept.code}]: {concept.formula} -> {e}")
                     adjustment_trace = f" (Error ajuste: {str(e)})"
             
-            amount = (base_amount + adjustment).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            amount = round_cents(base_amount + adjustment)
             
             trace_parts = [f"{float(base_val):.2f}"]
             if m != 1: trace_parts.append(f"Qty: {float(m):.2f}")
@@ -635,14 +652,14 @@ class PayrollEngine:
             contract_rate = self._get_exchange_rate_value(self.contract.salary_currency)
             
             if concept.calculation_base == PayrollConcept.CalculationBase.BASE:
-                breakdown = SalarySplitter.get_salary_breakdown(self.contract)
+                breakdown = SalarySplitter.get_salary_breakdown(self.contract, company=self.run_context.company)
                 salary_ves = breakdown['base'] * contract_rate
                 base_name = "Sueldo Base"
             else:
                 salary_ves = self.contract.monthly_salary * contract_rate
                 base_name = "Salario Total"
 
-            amount = (salary_ves * base_val * m) / Decimal('100.00')
+            amount = round_cents((salary_ves * base_val * m) / Decimal('100.00'))
             trace = f"({float(salary_ves):.2f} [{base_name}] * {float(base_val):.2f}%"
             if m != 1: trace += f" * Qty: {m}"
             trace += ") / 100"
@@ -656,12 +673,13 @@ class PayrollEngine:
             
             if concept.formula:
                 try:
-                    result = simple_eval(
-                        concept.formula, 
-                        names=context, 
-                        functions=self._get_allowed_functions()
-                    )
-                    amount = Decimal(str(result)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+                    if precomputed is not None:
+                        result = precomputed
+                    else:
+                        result = self._get_compiled_formula(concept).evaluate(
+                            context, self._get_allowed_functions()
+                        )
+                    amount = round_cents(result)
                     breakdown = self._get_formula_breakdown(concept.formula, context)
                     trace = breakdown["trace"]
                     variables = breakdown["variables"]
@@ -671,7 +689,7 @@ class PayrollEngine:
             elif override_value is not None or multiplier is not None:
                 # Fallback: si no hay fórmula pero hay datos, usar el valor/cantidad directo
                 val = override_value if override_value is not None else concept.value
-                amount = (Decimal(str(val)) * m).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+                amount = round_cents(Decimal(str(val)) * m)
                 trace = f"Valor manual: {float(val):.2f} * {float(m):.2f}"
 
         return {
@@ -702,7 +720,7 @@ class PayrollEngine:
         base_amount = Decimal(str(cc['amount_ves']))
         daily_rate = base_amount / total_period_days if total_period_days > 0 else Decimal('0.00')
         deducted_value = daily_rate * Decimal(str(deducted_days))
-        effective_amount = (base_amount - deducted_value).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        effective_amount = round_cents(base_amount - deducted_value)
         
         trace_parts = [f"{float(base_amount):.2f} Bs. ({total_period_days} días)"]
         if deducted_days > 0:
@@ -766,12 +784,12 @@ class PayrollEngine:
         if params.get('is_weekly'):
             # Lógica SSO/SPF: (Base * 12 / 52) * Lunes * Rate
             semanal = (base_calc * 12) / 52
-            amount = (semanal * num_lunes * rate).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            amount = round_cents(semanal * num_lunes * rate)
             trace = f"({trace_base} * 12 / 52) * {num_lunes} Lun * {float(rate)*100}%"
             variables.update({'LUNES': num_lunes, 'RATE': float(rate)})
         else:
             # Lógica Simple: Base * Rate
-            amount = (base_calc * rate).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            amount = round_cents(base_calc * rate)
             trace = f"{trace_base} * {float(rate)*100}%"
             variables.update({'RATE': float(rate)})
 
@@ -794,16 +812,40 @@ class PayrollEngine:
         Orquesta el cálculo completo recorriendo la tabla de conceptos y 
         despachando la lógica según el campo 'behavior'.
         """
-        results_lines = []
-        company = Company.objects.first()
+        state = self._prepare_payroll_state()
+
+        # --- 2. LOOP DE ASIGNACIONES (EARNINGS) ---
+        for concept in self.plan.earnings:
+            self._process_earning(state, concept)
+
+        # --- 3. LOOP DE DEDUCCIONES ---
+        for concept in self.plan.deductions:
+            self._process_deduction(state, concept)
+
+        # --- 4. PRÉSTAMOS ---
+        self._process_loans(state)
+
+        # --- 5. TOTALES FINALES ---
+        return self._finalize(state)
+
+    def _prepare_payroll_state(self) -> Dict[str, Any]:
+        """
+        Inicializa el estado de cálculo del empleado (contexto, acumuladores,
+        desglose del contrato y overrides). Los pasos de calculate_payroll
+        operan sobre este estado, lo que permite al motor por lotes avanzar
+        a todos los empleados concepto por concepto.
+        """
+        company = self.run_context.company
+        if self.plan is None:
+            self.plan = PayrollPlan.build()
+        plan = self.plan
         eval_context = self._build_eval_context()
         
         # --- 0. INICIALIZACIÓN DE VARIABLES Y ACUMULADORES ---
         accumulators = {}
-        all_concepts = PayrollConcept.objects.filter(active=True).order_by('receipt_order', 'id')
         
         # Pre-pobla códigos de conceptos, cantidades y acumuladores en el contexto
-        for c in all_concepts:
+        for c in plan.concepts:
             # 1. Los códigos de concepto inician en 0.0 (si no vienen en la entrada como novedad)
             if c.code not in eval_context:
                 eval_context[c.code] = 0.0
@@ -820,16 +862,14 @@ class PayrollEngine:
                 # Siempre reseteamos el valor principal para que sea el acumulador de monto
                 eval_context[c.code] = 0.0
             
-            # 2. Los acumuladores inician en 0.0
-            if c.incidences:
-                for tag in c.incidences:
-                    accumulators[tag] = 0.0
-                    eval_context[f'TOTAL_{tag}'] = 0.0
+        # 2. Los acumuladores (en céntimos, ver services/money.py) inician en 0
+        for tag in plan.incidence_tags:
+            accumulators[tag] = 0
+            eval_context[f'TOTAL_{tag}'] = 0.0
 
         # --- 1. PRE-CÁLCULO DE VALORES DE CONTRATO (SalarySplitter) ---
         # Obtenemos el desglose base/complemento para usarlos cuando el loop llegue a esos comportamientos
-        rate = self._get_exchange_rate_value(self.contract.salary_currency)
-        breakdown = SalarySplitter.get_salary_breakdown(self.contract, exchange_rate=rate)
+        rate, breakdown = self._get_salary_breakdown()
         
         # Factor de frecuencia
         salary_factor = Decimal('1.0')
@@ -847,8 +887,8 @@ class PayrollEngine:
             base_ves_calc = (breakdown['base'] * salary_factor * rate)
             
         contract_data = {
-            'base_ves': base_ves_calc.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
-            'complement_ves': (breakdown['complement'] * salary_factor * rate).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
+            'base_ves': round_cents(base_ves_calc),
+            'complement_ves': round_cents(breakdown['complement'] * salary_factor * rate),
             'monthly_base': breakdown['base'],
             'monthly_complement': breakdown['complement'],
             'salary_factor': salary_factor,
@@ -867,306 +907,328 @@ class PayrollEngine:
         # Lista para registrar conceptos que se suman al complemento (para trazabilidad)
         complement_additions = []  # [(nombre, monto), ...]
         
-        print(f"DEBUG ENGINE: Breakdown={breakdown}")
-        print(f"DEBUG ENGINE: Rate={rate}, Factor={salary_factor}")
-        print(f"DEBUG ENGINE: BaseVES={contract_data['base_ves']}, CompVES={contract_data['complement_ves']}")
+        logger.debug(
+            "Desglose %s: breakdown=%s rate=%s factor=%s base_ves=%s complement_ves=%s",
+            self.contract.employee_id, breakdown, rate, salary_factor,
+            contract_data['base_ves'], contract_data['complement_ves']
+        )
 
+        if self.inputs is not None:
+            overrides = self.inputs.get_overrides(self.contract.employee_id)
+        else:
+            overrides = {
+                ec.concept.code: ec.override_value 
+                for ec in self.contract.employee.concepts.filter(active=True)
+            }
 
-        # --- 2. LOOP DE ASIGNACIONES (EARNINGS) ---
-        overrides = {
-            ec.concept.code: ec.override_value 
-            for ec in self.contract.employee.concepts.filter(active=True)
+        return {
+            'lines': [],
+            'context': eval_context,
+            'accumulators': accumulators,
+            'contract_data': contract_data,
+            'complement_additions': complement_additions,
+            # Complemento del periodo en céntimos (base del contrato + bonos que se le suman)
+            'complement_cents': to_cents(contract_data['complement_ves']),
+            'overrides': overrides,
+            'company': company,
         }
 
-        for concept in all_concepts.filter(kind=PayrollConcept.ConceptKind.EARNING):
-            # A. Identificar Valor (Novedad > Override > Fijo/Fórmula)
-            # 1. Novedad (Actúa como multiplicador si es Monto Fijo, o como valor si es Fórmula)
-            novelty_val = self.input_variables.get(concept.code)
-            if novelty_val is None:
-                for k, v in self.input_variables.items():
-                    if concept.code.upper() == k.upper():
-                        novelty_val = v
-                        break
-            
-            # 2. Override del Contrato (Actúa como nuevo precio base)
-            contract_override_val = overrides.get(concept.code)
-
-            # --- FILTRADO DE CONCEPTOS GENÉRICOS ---
-            if concept.behavior == PayrollConcept.ConceptBehavior.FIXED:
-                if novelty_val is None and contract_override_val is None:
-                    continue
-            elif concept.behavior == PayrollConcept.ConceptBehavior.DYNAMIC:
-                if not concept.formula and novelty_val is None and contract_override_val is None:
-                    continue
-
-            # B. Despachar Lógica por Comportamiento
-            amount = Decimal('0.00')
-            trace = ""
-            variables = {}
-            formula = concept.formula
-            tipo_recibo = 'salario'
-
-            if concept.behavior == PayrollConcept.ConceptBehavior.SALARY_BASE:
-                # --- PRE-CÁLCULO DE DÍAS DEDUCIDOS ---
-                deducted_days = 0
-                for deductor_concept in all_concepts.filter(deducts_from_base_salary=True):
-                    deductor_novelty = self.input_variables.get(deductor_concept.code)
-                    if deductor_novelty is None:
-                        for k, v in self.input_variables.items():
-                            if deductor_concept.code.upper() == k.upper():
-                                deductor_novelty = v
-                                break
-                    if deductor_novelty is not None:
-                        deducted_days += float(deductor_novelty)
-                
-                # Lógica de Sueldo Base (Desglose)
-                temp_cc = {
-                    'code': concept.code,
-                    'name': concept.name,
-                    'amount_ves': contract_data['base_ves']
-                }
-                salary_lines = self._handle_salary_base(temp_cc, eval_context, company, deducted_days=int(deducted_days))
-                total_base_ves = Decimal('0.00')
-                for sl in salary_lines:
-                    sl['tipo_recibo'] = 'salario'
-                    results_lines.append(sl)
-                    total_base_ves += Decimal(str(sl['amount_ves']))
-                    # Acumular cada línea desglosada
-                    if concept.incidences:
-                        for tag in concept.incidences:
-                            accumulators[tag] += float(sl['amount_ves'])
-                            eval_context[f'TOTAL_{tag}'] = accumulators[tag]
-                
-                # Inyectar resultado total al contexto
-                eval_context[concept.code] = float(total_base_ves)
-                eval_context[f"{concept.code}_CANT"] = float(eval_context.get('DIAS', 15) - deducted_days)
-                continue # Ya agregamos las líneas, saltamos al siguiente concepto
-            
-            elif concept.behavior == PayrollConcept.ConceptBehavior.CESTATICKET:
-                # Lógica de Cestaticket
-                tipo_recibo = 'cestaticket'
-                # Reutilizamos la lógica de cálculo de ct que estaba en _get_contract_concepts
-                ct_base_amount = concept.value if concept.value > 0 else MONTO_CESTATICKET_USD
-                ct_currency = concept.currency or self.contract.salary_currency
-                
-                if self.contract.includes_cestaticket and company:
-                    ct_rate = self._get_exchange_rate_value(ct_currency)
-                    if company.cestaticket_journey == 'PERIODIC':
-                        amount = ct_base_amount * ct_rate * salary_factor
-                    else:
-                        payment_day = company.cestaticket_payment_day
-                        if self.period and self.period.start_date.day <= payment_day <= self.period.end_date.day:
-                            amount = ct_base_amount * ct_rate
-                        elif not self.period:
-                            amount = ct_base_amount * ct_rate
-                    amount = amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-                    trace = f"{float(ct_base_amount):.2f} {ct_currency.code} * {float(ct_rate):.4f}"
-                    if salary_factor != 1 and company.cestaticket_journey == 'PERIODIC': 
-                        trace += f" * {float(salary_factor):.2f}"
-            
-            elif concept.behavior == PayrollConcept.ConceptBehavior.COMPLEMENT:
-                # Lógica de Complemento
-                tipo_recibo = 'complemento'
-                # * ACTUALIZACIÓN DINÁMICA *
-                # Leemos del contexto acumulado en lugar del dato estático del contrato
-                # Esto permite que bonos previos (adds_to_complement) inflen este monto
-                dyn_base_complement = eval_context.get('COMPLEMENTO_PERIOD', contract_data['complement_ves'])
-                
-                amount = Decimal(str(dyn_base_complement))
-                
-                # Reconstruimos el trace para reflejar que es un valor compuesto con detalle
-                base_complement_val = float(contract_data['complement_ves'])
-                if complement_additions:
-                    # Construir trace detallado: "Base (1500.00) + BONO_X (200.00) + BONO_Y (100.00) = 1800.00"
-                    trace_parts = [f"Base ({base_complement_val:.2f})"]
-                    for nombre, monto in complement_additions:
-                        trace_parts.append(f"{nombre} ({monto:.2f})")
-                    trace = " + ".join(trace_parts) + f" = {float(amount):.2f}"
-                else:
-                    trace = f"{float(contract_data['monthly_complement']):.2f} (Complemento) * {float(salary_factor):.2f} (Fac) * {float(rate):.2f} (Tasa)"
-                
-                # Agregar las variables para auditoría
-                variables = {
-                    'COMPLEMENTO_BASE': base_complement_val,
-                    'COMPLEMENTO_TOTAL': float(amount),
-                    'CONCEPTOS_SUMADOS': [{'nombre': n, 'monto': m} for n, m in complement_additions]
-                }
-
-            else:
-                # Lógica General (Fórmula o Fijo)
-                res = self.calculate_concept(
-                    concept, 
-                    override_value=contract_override_val, 
-                    multiplier=novelty_val,
-                    context=eval_context
-                )
-                amount = res['amount']
-                trace = res['trace']
-                formula = res['formula']
-                variables = res['variables']
-                
-                # Determinar tipo recibo por convención si no es de sistema
-                if 'TICKET' in concept.code: tipo_recibo = 'cestaticket'
-                elif 'COMPLE' in concept.code and not concept.is_salary_incidence: tipo_recibo = 'complemento'
-
-            # C. Agregar Línea si corresponde
-            if amount > 0 or (concept.show_even_if_zero and concept.show_on_payslip):
-                line = {
-                    'code': concept.code,
-                    'name': concept.name,
-                    'kind': concept.kind,
-                    'amount_ves': amount,
-                    'tipo_recibo': tipo_recibo,
-                    'trace': trace,
-                    'formula': formula,
-                    'variables': variables
-                }
-                # Inyectar cantidad si hay novedad mapeada
-                var_name = self.NOVELTY_MAP.get(concept.code)
-                if var_name and eval_context.get(var_name):
-                    line['quantity'] = eval_context[var_name]
-                    line['unit'] = 'hrs' if 'HOURS' in var_name else 'días'
-                
-                # * OCULTAR SI SUMA AL COMPLEMENTO *
-                # Si el usuario pidió que se sume al complemento y no aparezca como línea aparte
-                if not getattr(concept, 'adds_to_complement', False):
-                    results_lines.append(line)
+    def _get_concept_inputs(self, state: Dict[str, Any], concept: PayrollConcept):
+        """
+        Devuelve (novedad, override del contrato) para un concepto.
+        - Novedad: actúa como multiplicador si es Monto Fijo, o como valor si es Fórmula.
+        - Override: actúa como nuevo precio base.
+        """
+        novelty_val = self.input_variables.get(concept.code)
+        if novelty_val is None and concept.kind == PayrollConcept.ConceptKind.EARNING:
+            for k, v in self.input_variables.items():
+                if concept.code.upper() == k.upper():
+                    novelty_val = v
+                    break
 
-                # D. Actualizar Acumuladores e inyectar al contexto para fórmulas subsecuentes
-                eval_context[concept.code] = float(amount)
-                
-                # * SUMA AL COMPLEMENTO / BONO *
-                if getattr(concept, 'adds_to_complement', False):
-                    # Actualizar variables de complemento en el contexto
-                    current_complement_period = eval_context.get('COMPLEMENTO_PERIOD', 0.0)
-                    new_complement_period = current_complement_period + float(amount)
-                    eval_context['COMPLEMENTO_PERIOD'] = new_complement_period
-                    
-                    # Registrar este concepto para la trazabilidad del complemento
-                    complement_additions.append((concept.name, float(amount)))
-                    
-                    # Para mantener consistencia, también actualizamos el mensual proyectado (estimado)
-                    factor = float(contract_data.get('salary_factor', 1))
-                    if factor > 0:
-                        projected_monthly = float(amount) / factor 
-                        eval_context['COMPLEMENTO_MENSUAL'] = eval_context.get('COMPLEMENTO_MENSUAL', 0.0) + projected_monthly
+        contract_override_val = state['overrides'].get(concept.code)
+        return novelty_val, contract_override_val
 
+    def _process_earning(self, state: Dict[str, Any], concept: PayrollConcept, precomputed=None) -> None:
+        """
+        Procesa una asignación sobre el estado del empleado.
+        precomputed: resultado de la fórmula ya evaluado por el motor por lotes (opcional).
+        """
+        results_lines = state['lines']
+        eval_context = state['context']
+        accumulators = state['accumulators']
+        contract_data = state['contract_data']
+        complement_additions = state['complement_additions']
+        company = state['company']
+        plan = self.plan
+        rate = contract_data['rate']
+        salary_factor = contract_data['salary_factor']
+
+        # A. Identificar Valor (Novedad > Override > Fijo/Fórmula)
+        novelty_val, contract_override_val = self._get_concept_inputs(state, concept)
+
+        # --- FILTRADO DE CONCEPTOS GENÉRICOS ---
+        if concept.behavior == PayrollConcept.ConceptBehavior.FIXED:
+            if novelty_val is None and contract_override_val is None:
+                return
+        elif concept.behavior == PayrollConcept.ConceptBehavior.DYNAMIC:
+            if not concept.formula and novelty_val is None and contract_override_val is None:
+                return
+
+        # B. Despachar Lógica por Comportamiento
+        amount = Decimal('0.00')
+        trace = ""
+        variables = {}
+        formula = concept.formula
+        tipo_recibo = 'salario'
+
+        if concept.behavior == PayrollConcept.ConceptBehavior.SALARY_BASE:
+            # --- PRE-CÁLCULO DE DÍAS DEDUCIDOS ---
+            deducted_days = 0
+            for deductor_code in plan.deductor_codes:
+                deductor_novelty = self.input_variables.get(deductor_code)
+                if deductor_novelty is None:
+                    for k, v in self.input_variables.items():
+                        if deductor_code.upper() == k.upper():
+                            deductor_novelty = v
+                            break
+                if deductor_novelty is not None:
+                    deducted_days += float(deductor_novelty)
+
+            # Lógica de Sueldo Base (Desglose)
+            temp_cc = {
+                'code': concept.code,
+                'name': concept.name,
+                'amount_ves': contract_data['base_ves']
+            }
+            salary_lines = self._handle_salary_base(temp_cc, eval_context, company, deducted_days=int(deducted_days))
+            total_base_cents = 0
+            for sl in salary_lines:
+                sl['tipo_recibo'] = 'salario'
+                results_lines.append(sl)
+                line_cents = to_cents(sl['amount_ves'])
+                total_base_cents += line_cents
+                # Acumular cada línea desglosada
                 if concept.incidences:
                     for tag in concept.incidences:
-                        accumulators[tag] += float(amount)
-                        eval_context[f'TOTAL_{tag}'] = accumulators[tag]
-
-        # --- 3. LOOP DE DEDUCCIONES ---
-        for concept in all_concepts.filter(kind=PayrollConcept.ConceptKind.DEDUCTION):
-            # A. Valor
-            novelty_val = self.input_variables.get(concept.code)
-            contract_override_val = overrides.get(concept.code)
-
-            # --- FILTRADO DE CONCEPTOS GENÉRICOS ---
-            if concept.behavior in [PayrollConcept.ConceptBehavior.DYNAMIC, PayrollConcept.ConceptBehavior.FIXED]:
-                if novelty_val is None and contract_override_val is None:
-                    continue
-
-            amount = Decimal('0.00')
-            trace = ""
-            variables = {}
-            formula = concept.formula
-
-            # Lógica de Ley (SOLO si no se especificó una fórmula dinámica explícita)
-            if (concept.behavior == PayrollConcept.ConceptBehavior.LAW_DEDUCTION and 
-                concept.computation_method != PayrollConcept.ComputationMethod.DYNAMIC_FORMULA):
-                
-                # Lógica de Ley (Soporta system_params para configuración dinámica)
-                sm = company.national_minimum_salary if company else FALLBACK_SALARIO_MINIMO
-                num_lunes = eval_context.get('LUNES', 4)
-                
-                # Leer system_params del concepto (si existe)
-                system_params = concept.system_params or {}
-                rate_source = system_params.get('rate_source', 'CONCEPT')
-                
-                # Determinar la tasa de retención
-                if rate_source == 'CONTRACT':
-                    # Tasa desde el contrato del empleado (ej: ISLR)
-                    contract_field = system_params.get('contract_field', 'islr_retention_percentage')
-                    contract_rate_value = getattr(self.contract, contract_field, Decimal('0.00'))
-                    rate = Decimal(str(contract_rate_value)) / 100
+                        accumulators[tag] += line_cents
+                        eval_context[f'TOTAL_{tag}'] = cents_to_float(accumulators[tag])
+
+            # Inyectar resultado total al contexto
+            eval_context[concept.code] = cents_to_float(total_base_cents)
+            eval_context[f"{concept.code}_CANT"] = float(eval_context.get('DIAS', 15) - deducted_days)
+            return # Ya agregamos las líneas, saltamos al siguiente concepto
+
+        elif concept.behavior == PayrollConcept.ConceptBehavior.CESTATICKET:
+            # Lógica de Cestaticket
+            tipo_recibo = 'cestaticket'
+            # Reutilizamos la lógica de cálculo de ct que estaba en _get_contract_concepts
+            ct_base_amount = concept.value if concept.value > 0 else MONTO_CESTATICKET_USD
+            ct_currency = concept.currency or self.contract.salary_currency
+
+            if self.contract.includes_cestaticket and company:
+                ct_rate = self._get_exchange_rate_value(ct_currency)
+                if company.cestaticket_journey == 'PERIODIC':
+                    amount = ct_base_amount * ct_rate * salary_factor
                 else:
-                    # Tasa desde el valor del concepto (ej: IVSS, FAOV, RPE)
-                    rate = concept.value / 100 if concept.computation_method == PayrollConcept.ComputationMethod.DYNAMIC_FORMULA else concept.value
-                
-                # Determinar etiqueta de base (default: CODIGO_BASE)
-                tag = system_params.get('base_label', concept.code + '_BASE')
-                
-                # Determinar tope en salarios mínimos
-                cap_multiplier = system_params.get('cap_multiplier')
-                if cap_multiplier is None:
-                    # Fallback a lógica legacy para conceptos sin system_params
-                    cap_multiplier = 5 if concept.code == 'IVSS' else (10 if concept.code == 'RPE' else None)
-                
-                # Construir params para el handler
-                law_params = {
-                    'rate': rate,
-                    'base_source': system_params.get('base_source', 'ACCUMULATOR'),
-                    'tag': tag,
-                    'is_weekly': concept.code in ['IVSS', 'RPE'],
-                    'tope_sm': cap_multiplier,
-                    'name': concept.name
-                }
-                
-                # Intentar calcular
-                res = self._handle_law_deduction(concept.code, eval_context, sm, law_params, num_lunes)
-                if res:
-                    amount = res['amount_ves']
-                    trace = res['trace']
-                    formula = res['formula']
-                    variables = res['variables']
-            
+                    payment_day = company.cestaticket_payment_day
+                    if self.period and self.period.start_date.day <= payment_day <= self.period.end_date.day:
+                        amount = ct_base_amount * ct_rate
+                    elif not self.period:
+                        amount = ct_base_amount * ct_rate
+                amount = round_cents(amount)
+                trace = f"{float(ct_base_amount):.2f} {ct_currency.code} * {float(ct_rate):.4f}"
+                if salary_factor != 1 and company.cestaticket_journey == 'PERIODIC': 
+                    trace += f" * {float(salary_factor):.2f}"
+
+        elif concept.behavior == PayrollConcept.ConceptBehavior.COMPLEMENT:
+            # Lógica de Complemento
+            tipo_recibo = 'complemento'
+            # * ACTUALIZACIÓN DINÁMICA *
+            # Leemos del contexto acumulado en lugar del dato estático del contrato
+            # Esto permite que bonos previos (adds_to_complement) inflen este monto
+            amount = from_cents(state['complement_cents'])
+
+            # Reconstruimos el trace para reflejar que es un valor compuesto con detalle
+            base_complement_val = float(contract_data['complement_ves'])
+            if complement_additions:
+                # Construir trace detallado: "Base (1500.00) + BONO_X (200.00) + BONO_Y (100.00) = 1800.00"
+                trace_parts = [f"Base ({base_complement_val:.2f})"]
+                for nombre, monto in complement_additions:
+                    trace_parts.append(f"{nombre} ({monto:.2f})")
+                trace = " + ".join(trace_parts) + f" = {float(amount):.2f}"
             else:
-                # Deducción normal
-                res = self.calculate_concept(
-                    concept, 
-                    override_value=contract_override_val, 
-                    multiplier=novelty_val,
-                    context=eval_context
-                )
-                amount = res['amount']
+                trace = f"{float(contract_data['monthly_complement']):.2f} (Complemento) * {float(salary_factor):.2f} (Fac) * {float(rate):.2f} (Tasa)"
+
+            # Agregar las variables para auditoría
+            variables = {
+                'COMPLEMENTO_BASE': base_complement_val,
+                'COMPLEMENTO_TOTAL': float(amount),
+                'CONCEPTOS_SUMADOS': [{'nombre': n, 'monto': m} for n, m in complement_additions]
+            }
+
+        else:
+            # Lógica General (Fórmula o Fijo)
+            res = self.calculate_concept(
+                concept, 
+                override_value=contract_override_val, 
+                multiplier=novelty_val,
+                context=eval_context,
+                precomputed=precomputed
+            )
+            amount = res['amount']
+            trace = res['trace']
+            formula = res['formula']
+            variables = res['variables']
+
+            # Determinar tipo recibo por convención si no es de sistema
+            if 'TICKET' in concept.code: tipo_recibo = 'cestaticket'
+            elif 'COMPLE' in concept.code and not concept.is_salary_incidence: tipo_recibo = 'complemento'
+
+        # C. Agregar Línea si corresponde
+        if amount > 0 or (concept.show_even_if_zero and concept.show_on_payslip):
+            line = {
+                'code': concept.code,
+                'name': concept.name,
+                'kind': concept.kind,
+                'amount_ves': amount,
+                'tipo_recibo': tipo_recibo,
+                'trace': trace,
+                'formula': formula,
+                'variables': variables
+            }
+            # Inyectar cantidad si hay novedad mapeada
+            var_name = self.NOVELTY_MAP.get(concept.code)
+            if var_name and eval_context.get(var_name):
+                line['quantity'] = eval_context[var_name]
+                line['unit'] = 'hrs' if 'HOURS' in var_name else 'días'
+
+            # * OCULTAR SI SUMA AL COMPLEMENTO *
+            # Si el usuario pidió que se sume al complemento y no aparezca como línea aparte
+            if not getattr(concept, 'adds_to_complement', False):
+                results_lines.append(line)
+
+            # D. Actualizar Acumuladores e inyectar al contexto para fórmulas subsecuentes
+            eval_context[concept.code] = float(amount)
+
+            # * SUMA AL COMPLEMENTO / BONO *
+            if getattr(concept, 'adds_to_complement', False):
+                # Actualizar variables de complemento en el contexto
+                state['complement_cents'] += to_cents(amount)
+                eval_context['COMPLEMENTO_PERIOD'] = cents_to_float(state['complement_cents'])
+
+                # Registrar este concepto para la trazabilidad del complemento
+                complement_additions.append((concept.name, float(amount)))
+
+                # Para mantener consistencia, también actualizamos el mensual proyectado (estimado)
+                factor = float(contract_data.get('salary_factor', 1))
+                if factor > 0:
+                    projected_monthly = float(amount) / factor 
+                    eval_context['COMPLEMENTO_MENSUAL'] = eval_context.get('COMPLEMENTO_MENSUAL', 0.0) + projected_monthly
+
+            if concept.incidences:
+                amount_cents = to_cents(amount)
+                for tag in concept.incidences:
+                    accumulators[tag] += amount_cents
+                    eval_context[f'TOTAL_{tag}'] = cents_to_float(accumulators[tag])
+
+    def _process_deduction(self, state: Dict[str, Any], concept: PayrollConcept, precomputed=None) -> None:
+        """
+        Procesa una deducción sobre el estado del empleado.
+        precomputed: resultado de la fórmula ya evaluado por el motor por lotes (opcional).
+        """
+        results_lines = state['lines']
+        eval_context = state['context']
+        accumulators = state['accumulators']
+        plan = self.plan
+
+        # A. Valor
+        novelty_val, contract_override_val = self._get_concept_inputs(state, concept)
+
+        # --- FILTRADO DE CONCEPTOS GENÉRICOS ---
+        if concept.behavior in [PayrollConcept.ConceptBehavior.DYNAMIC, PayrollConcept.ConceptBehavior.FIXED]:
+            if novelty_val is None and contract_override_val is None:
+                return
+
+        amount = Decimal('0.00')
+        trace = ""
+        variables = {}
+        formula = concept.formula
+
+        # Lógica de Ley (SOLO si no se especificó una fórmula dinámica explícita)
+        if concept.id in plan.law_params:
+
+            # Lógica de Ley (system_params ya interpretados en el plan)
+            sm = self.run_context.min_salary
+            num_lunes = eval_context.get('LUNES', 4)
+
+            law_params = dict(plan.law_params[concept.id])
+            if law_params['rate_source'] == 'CONTRACT':
+                # Tasa desde el contrato del empleado (ej: ISLR)
+                contract_rate_value = getattr(self.contract, law_params['contract_field'], Decimal('0.00'))
+                law_params['rate'] = Decimal(str(contract_rate_value)) / 100
+
+            # Intentar calcular
+            res = self._handle_law_deduction(concept.code, eval_context, sm, law_params, num_lunes)
+            if res:
+                amount = res['amount_ves']
                 trace = res['trace']
                 formula = res['formula']
                 variables = res['variables']
 
-            if amount > 0 or (concept.show_even_if_zero and concept.show_on_payslip):
-                results_lines.append({
-                    'code': concept.code,
-                    'name': concept.name,
-                    'kind': concept.kind,
-                    'amount_ves': amount,
-                    'tipo_recibo': 'salario',
-                    'trace': trace,
-                    'formula': formula,
-                    'variables': variables
-                })
-                
-                # Inyectar resultado al contexto
-                eval_context[concept.code] = float(amount)
-                
-                # Determinar cantidad para _CANT (Preferir novedad si existe, si no 1.0)
-                qty = 1.0
-                var_name = self.NOVELTY_MAP.get(concept.code)
-                if var_name and eval_context.get(f"{var_name}_CANT") is not None:
-                    qty = eval_context[f"{var_name}_CANT"]
-                elif eval_context.get(f"{concept.code}_CANT") is not None:
-                    qty = eval_context[f"{concept.code}_CANT"]
-                
-                eval_context[f"{concept.code}_CANT"] = float(qty)
-
-                # Acumular deducciones
-                if concept.incidences:
-                    for tag in concept.incidences:
-                        accumulators[tag] += float(amount)
-                        eval_context[f'TOTAL_{tag}'] = accumulators[tag]
+        else:
+            # Deducción normal
+            res = self.calculate_concept(
+                concept, 
+                override_value=contract_override_val, 
+                multiplier=novelty_val,
+                context=eval_context,
+                precomputed=precomputed
+            )
+            amount = res['amount']
+            trace = res['trace']
+            formula = res['formula']
+            variables = res['variables']
+
+        if amount > 0 or (concept.show_even_if_zero and concept.show_on_payslip):
+            results_lines.append({
+                'code': concept.code,
+                'name': concept.name,
+                'kind': concept.kind,
+                'amount_ves': amount,
+                'tipo_recibo': 'salario',
+                'trace': trace,
+                'formula': formula,
+                'variables': variables
+            })
 
-        # --- 4. PRÉSTAMOS ---
-        active_loans = Loan.objects.filter(employee=self.contract.employee, status=Loan.LoanStatus.Active)
+            # Inyectar resultado al contexto
+            eval_context[concept.code] = float(amount)
+
+            # Determinar cantidad para _CANT (Preferir novedad si existe, si no 1.0)
+            qty = 1.0
+            var_name = self.NOVELTY_MAP.get(concept.code)
+            if var_name and eval_context.get(f"{var_name}_CANT") is not None:
+                qty = eval_context[f"{var_name}_CANT"]
+            elif eval_context.get(f"{concept.code}_CANT") is not None:
+                qty = eval_context[f"{concept.code}_CANT"]
+
+            eval_context[f"{concept.code}_CANT"] = float(qty)
+
+            # Acumular deducciones
+            if concept.incidences:
+                amount_cents = to_cents(amount)
+                for tag in concept.incidences:
+                    accumulators[tag] += amount_cents
+                    eval_context[f'TOTAL_{tag}'] = cents_to_float(accumulators[tag])
+
+    def _process_loans(self, state: Dict[str, Any]) -> None:
+        """Agrega las cuotas de préstamos activos del empleado."""
+        results_lines = state['lines']
+        if self.inputs is not None:
+            active_loans = self.inputs.get_loans(self.contract.employee_id)
+        else:
+            active_loans = Loan.objects.filter(employee=self.contract.employee, status=Loan.LoanStatus.Active)
         for loan in active_loans:
             if loan.balance <= 0 or not loan.installment_amount: continue
             if loan.frequency == Loan.Frequency.SECOND_FORTNIGHT and self.payment_date.day <= 15: continue
@@ -1176,7 +1238,7 @@ class PayrollEngine:
             trace_loan = f"Min({float(loan.installment_amount):.2f}, {float(loan.balance):.2f})"
             if loan.currency.code != 'VES':
                  l_rate = self._get_exchange_rate_value(loan.currency)
-                 amount_ves = (deduction_amount * l_rate).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+                 amount_ves = round_cents(deduction_amount * l_rate)
                  trace_loan += f" * {float(l_rate):.4f} (Tasa)"
 
             if amount_ves > 0:
@@ -1190,10 +1252,22 @@ class PayrollEngine:
                     'loan_id': loan.id
                 })
 
-        # --- 5. TOTALES FINALES ---
-        total_income = sum(l['amount_ves'] for l in results_lines if l['kind'] == 'EARNING')
-        total_deductions = sum(l['amount_ves'] for l in results_lines if l['kind'] == 'DEDUCTION')
-        net_pay_ves = total_income - total_deductions
+    def _finalize(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Calcula totales y arma el resultado final del empleado."""
+        results_lines = state['lines']
+        if self.trace_level == TraceLevel.OFF:
+            # Sin trazas: también se omiten las de sueldo base, ley y préstamos
+            for line in results_lines:
+                line['trace'] = ''
+                if 'variables' in line:
+                    line['variables'] = {}
+
+        # Totales en céntimos: exactos e independientes del orden de las líneas
+        income_cents = sum(to_cents(l['amount_ves']) for l in results_lines if l['kind'] == 'EARNING')
+        deduction_cents = sum(to_cents(l['amount_ves']) for l in results_lines if l['kind'] == 'DEDUCTION')
+        total_income = from_cents(income_cents)
+        total_deductions = from_cents(deduction_cents)
+        net_pay_ves = from_cents(income_cents - deduction_cents)
         ref_rate = self._get_exchange_rate_value(self.contract.salary_currency)
         net_pay_usd = net_pay_ves / ref_rate if ref_rate > 0 else Decimal('0.00')
 
@@ -0,0 +1,165 @@
+import json
+import random
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django_tenants.utils import get_tenant_model, tenant_context
+
+from payroll_core.services.benchmark import (
+    BENCHMARK_FORMAT_VERSION, DEFAULT_TOLERANCE, STATUS_OK, PayrollBenchmark,
+    SyntheticTenantBuilder, compare_results, git_revision,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea un tenant sintético reproducible, mide las etapas de la nómina '
+        '(resúmenes de asistencia, previsualización, cierre, PDF y exportaciones legales) '
+        'y escribe los resultados en JSON para comparar versiones.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=100, help='Empleados activos')
+        parser.add_argument('--contracts', type=int, default=1,
+                            help='Contratos por empleado (los adicionales quedan inactivos)')
+        parser.add_argument('--concepts', type=int, default=10,
+                            help='Conceptos sintéticos además de los estándar de Venezuela')
+        parser.add_argument('--novelties', type=int, default=2, help='Novedades por empleado')
+        parser.add_argument('--loans', type=int, default=20, help='Préstamos activos en total')
+        parser.add_argument('--attendance-days', type=int, default=10,
+                            help='Días hábiles del periodo con marcajes')
+        parser.add_argument('--seed', type=int, default=1, help='Semilla de los datos sintéticos')
+        parser.add_argument('--period-start', default='2025-01-01',
+                            help='Inicio del periodo quincenal (AAAA-MM-DD)')
+        parser.add_argument('--rate', default=None,
+                            help='Tasa manual USD/VES (por defecto la tasa BCV cargada para la fecha de pago)')
+        parser.add_argument('--trace-level', default='full', help='Nivel de traza: off / summary / full')
+        parser.add_argument('--workers', type=int, default=0,
+                            help='Procesos del pool (0 = serial; las consultas de los procesos no se cuentan)')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Repeticiones de las etapas que no modifican datos (se reporta la mediana)')
+        parser.add_argument('--schema', default=None, help='Esquema del tenant (por defecto bench_<semilla>)')
+        parser.add_argument('--keep', action='store_true', help='No elimina el tenant al terminar')
+        parser.add_argument('--output', default=None, help='Archivo JSON de salida ("-" para stdout)')
+        parser.add_argument('--compare', default=None, help='JSON de una corrida anterior como línea base')
+        parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                            help='Fracción de tiempo adicional tolerada antes de marcar regresión')
+
+    def handle(self, *args, **options):
+        try:
+            period_start = date.fromisoformat(options['period_start'])
+        except ValueError:
+            raise CommandError('--period-start debe tener el formato AAAA-MM-DD.')
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        schema_name = options['schema'] or f"bench_{options['seed']}"
+        TenantModel = get_tenant_model()
+        if TenantModel.objects.filter(schema_name=schema_name).exists():
+            raise CommandError(f'El esquema {schema_name} ya existe; use --schema o elimínelo.')
+
+        params = {
+            key: options[key] for key in (
+                'employees', 'contracts', 'concepts', 'novelties', 'loans', 'attendance_days',
+                'seed', 'period_start', 'rate', 'trace_level', 'workers', 'repeat',
+            )
+        }
+        tenant = TenantModel(schema_name=schema_name, name=f'Benchmark {schema_name}', rif=self._free_rif(options['seed']))
+        self._log(options, f'Creando tenant {schema_name}...')
+        tenant.save()
+        try:
+            with tenant_context(tenant):
+                report = self._run(tenant, period_start, params, options)
+        finally:
+            if not options['keep']:
+                tenant.delete(force_drop=True)
+        if options['workers']:
+            from payroll_core.services.parallel import ParallelPayrollRunner
+            ParallelPayrollRunner.shutdown()
+
+        self._write_output(report, options)
+        if baseline is not None:
+            self._compare(baseline, report, options)
+
+    def _run(self, tenant, period_start, params, options):
+        builder = SyntheticTenantBuilder(
+            employees=options['employees'], contracts=options['contracts'], concepts=options['concepts'],
+            novelties=options['novelties'], loans=options['loans'],
+            attendance_days=options['attendance_days'], seed=options['seed'], period_start=period_start,
+        )
+        started = time.perf_counter()
+        data = builder.build(rif=tenant.rif)
+        setup_seconds = time.perf_counter() - started
+        self._log(options, f"Datos sintéticos: {data['counts']} ({setup_seconds:.1f} s)")
+
+        user = get_user_model().objects.create_superuser('benchmark', 'benchmark@example.com', None)
+        benchmark = PayrollBenchmark(
+            data['period'], user=user, tenant=tenant,
+            manual_rate=Decimal(options['rate']) if options['rate'] else None,
+            trace_level=options['trace_level'], workers=options['workers'], repeat=options['repeat'],
+        )
+        results = benchmark.run()
+        return {
+            'version': BENCHMARK_FORMAT_VERSION,
+            'created_at': timezone.now().isoformat(),
+            'git_revision': git_revision(),
+            'params': params,
+            'setup': {'seconds': round(setup_seconds, 2), 'counts': data['counts']},
+            'results': results,
+        }
+
+    @staticmethod
+    def _free_rif(seed):
+        TenantModel = get_tenant_model()
+        rng = random.Random(seed)
+        while True:
+            rif = f'J-{rng.randint(90000000, 99999999)}-{rng.randint(0, 9)}'
+            if not TenantModel.objects.filter(rif=rif).exists():
+                return rif
+
+    def _log(self, options, message):
+        # Con --output - el JSON va a stdout; el avance, a stderr
+        stream = self.stderr if options['output'] == '-' else self.stdout
+        stream.write(message)
+
+    def _write_output(self, report, options):
+        content = json.dumps(report, indent=2, ensure_ascii=False, default=str)
+        if options['output'] == '-':
+            self.stdout.write(content)
+            return
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(content + '\n')
+
+        self.stdout.write(f"  {'Etapa':<22}{'Estado':>9}{'Segundos':>10}{'Consultas':>11}")
+        for result in report['results']:
+            if result['status'] == STATUS_OK:
+                self.stdout.write(
+                    f"  {result['stage']:<22}{result['status']:>9}{result['seconds']:>10.3f}{result['queries']:>11}"
+                )
+            else:
+                self.stdout.write(f"  {result['stage']:<22}{result['status']:>9}  {result['error']}")
+
+    def _compare(self, baseline, report, options):
+        if baseline.get('params') != report['params']:
+            self._log(options, self.style.WARNING('La línea base se generó con otros parámetros.'))
+        regressions = compare_results(baseline, report, tolerance=options['tolerance'])
+        if not regressions:
+            self._log(options, self.style.SUCCESS(
+                f"Sin regresiones respecto de {baseline.get('git_revision') or options['compare']}."
+            ))
+            return
+        for regression in regressions:
+            if regression['reason'] == 'error':
+                detail = regression['error']
+            else:
+                detail = f"{regression['baseline']} -> {regression['current']}"
+            self._log(options, self.style.ERROR(f"  {regression['stage']}: {regression['reason']} {detail}"))
+        raise CommandError(f'{len(regressions)} regresión(es) respecto de la línea base.')
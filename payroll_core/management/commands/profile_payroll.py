@@ -0,0 +1,116 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, transaction
+from django_tenants.utils import get_public_schema_name, get_tenant_model, tenant_context
+
+from payroll_core.models import PayrollPeriod
+from payroll_core.services.payroll import PayrollProcessor
+
+
+class SimulatedClose(Exception):
+    """Revierte el cierre simulado de --close."""
+
+
+class Command(BaseCommand):
+    help = (
+        'Perfila la nómina de cada tenant (tiempo y consultas por etapa, conceptos más lentos) '
+        'sobre su último periodo abierto o el indicado con --period.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', dest='schema_name',
+                            help='Limita el reporte a un esquema')
+        parser.add_argument('--period', type=int, dest='period_id',
+                            help='Periodo a perfilar (requiere --tenant)')
+        parser.add_argument('--close', action='store_true',
+                            help='Simula el cierre completo (se revierte al terminar) en lugar de la previsualización')
+        parser.add_argument('--trace-level', default=None,
+                            help='Nivel de traza: off / summary / full (por defecto full)')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Procesos para calcular en paralelo (por defecto PAYROLL_PARALLEL_WORKERS)')
+        parser.add_argument('--use-cache', action='store_true',
+                            help='Reutiliza la caché de previsualización (por defecto se recalcula todo)')
+        parser.add_argument('--top', type=int, default=10,
+                            help='Conceptos más lentos a listar')
+
+    def handle(self, *args, **options):
+        if options['period_id'] and not options['schema_name']:
+            raise CommandError('--period requiere --tenant.')
+
+        close_old_connections()
+        tenants = get_tenant_model().objects.exclude(schema_name=get_public_schema_name())
+        if options['schema_name']:
+            tenants = tenants.filter(schema_name=options['schema_name'])
+
+        summary = []
+        for tenant in tenants:
+            with tenant_context(tenant):
+                period = self._get_period(options['period_id'])
+                if period is None:
+                    self.stdout.write(self.style.WARNING(f'[{tenant.schema_name}] sin periodo abierto'))
+                    continue
+                try:
+                    profile = self._profile(period, options)
+                except ValueError as e:
+                    self.stdout.write(self.style.ERROR(f'[{tenant.schema_name}] {period}: {e}'))
+                    continue
+            self._write_report(tenant.schema_name, period, profile, options)
+            summary.append((tenant.schema_name, profile))
+
+        if len(summary) > 1:
+            self._write_summary(summary)
+
+    def _get_period(self, period_id):
+        if period_id:
+            period = PayrollPeriod.objects.filter(id=period_id).first()
+            if period is None:
+                raise CommandError(f'El periodo {period_id} no existe.')
+            return period
+        return PayrollPeriod.objects.filter(status=PayrollPeriod.Status.OPEN).order_by('-payment_date').first()
+
+    def _profile(self, period, options):
+        kwargs = {'trace_level': options['trace_level'], 'workers': options['workers'], 'profile': True}
+        if not options['close']:
+            result = PayrollProcessor.preview_period(
+                period.id, use_cache=options['use_cache'], totals_only=True, **kwargs
+            )
+            return result['profile']
+
+        result = {}
+        try:
+            with transaction.atomic():
+                result = PayrollProcessor.process_period(period.id, **kwargs)
+                raise SimulatedClose
+        except SimulatedClose:
+            pass
+        return result['profile']
+
+    def _write_report(self, schema_name, period, profile, options):
+        mode = 'cierre simulado' if options['close'] else 'previsualización'
+        per_employee = profile['queries_per_employee']
+        self.stdout.write(self.style.SUCCESS(
+            f"[{schema_name}] {period} ({mode}): {profile['employees']} empleados, "
+            f"{profile['total_seconds']:.2f} s, {profile['queries']} consultas"
+            + (f" ({per_employee} por empleado)" if per_employee is not None else '')
+        ))
+        self.stdout.write(f"  {'Etapa':<14}{'Segundos':>10}{'Consultas':>11}{'Llamadas':>10}")
+        for stage in profile['stages']:
+            self.stdout.write(
+                f"  {stage['stage']:<14}{stage['seconds']:>10.3f}{stage['queries']:>11}{stage['calls']:>10}"
+            )
+        concepts = profile['slowest_concepts'][:options['top']]
+        if concepts:
+            self.stdout.write(f"  {'Concepto':<24}{'Segundos':>10}{'ms/empleado':>13}")
+            for concept in concepts:
+                self.stdout.write(
+                    f"  {concept['code']:<24}{concept['seconds']:>10.3f}{concept['ms_per_employee']:>13.3f}"
+                )
+
+    def _write_summary(self, summary):
+        self.stdout.write(self.style.NOTICE('Resumen (más lento primero):'))
+        for schema_name, profile in sorted(summary, key=lambda item: item[1]['total_seconds'], reverse=True):
+            slowest = profile['slowest_concepts'][0]['code'] if profile['slowest_concepts'] else '-'
+            ms = profile['total_seconds'] * 1000 / profile['employees'] if profile['employees'] else 0.0
+            self.stdout.write(
+                f"  {schema_name:<20}{profile['total_seconds']:>8.2f} s{ms:>10.2f} ms/empleado"
+                f"  concepto más lento: {slowest}"
+            )
@@ -0,0 +1,70 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django_tenants.utils import get_public_schema_name, get_tenant_model, tenant_context
+
+from payroll_core.services.payroll_jobs import PayrollJobService, get_worker_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta los trabajos de nómina en segundo plano (previsualización y cierre) '
+        'encolados desde la API, recorriendo todos los tenants.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Procesa los trabajos pendientes y termina')
+        parser.add_argument('--tenant', dest='schema_name',
+                            help='Limita la ejecución a un esquema')
+        parser.add_argument('--poll', type=float, default=None,
+                            help='Segundos de espera cuando no hay trabajos (por defecto PAYROLL_JOB_POLL_SECONDS)')
+
+    def handle(self, *args, **options):
+        poll = options['poll'] if options['poll'] is not None else getattr(settings, 'PAYROLL_JOB_POLL_SECONDS', 2)
+        worker = get_worker_name()
+        self.stdout.write(self.style.NOTICE(f'Procesando trabajos de nómina ({worker})...'))
+
+        try:
+            while True:
+                ran = self._run_round(worker, options['schema_name'])
+                if not ran:
+                    if options['once']:
+                        break
+                    time.sleep(poll)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.NOTICE('Detenido.'))
+
+    def _run_round(self, worker: str, schema_name: str = None) -> bool:
+        """Toma a lo sumo un trabajo por tenant. Devuelve True si ejecutó alguno."""
+        close_old_connections()
+        tenants = get_tenant_model().objects.exclude(schema_name=get_public_schema_name())
+        if schema_name:
+            tenants = tenants.filter(schema_name=schema_name)
+
+        ran = False
+        for tenant in tenants:
+            with tenant_context(tenant):
+                stale = PayrollJobService.fail_stale_jobs()
+                if stale:
+                    self.stdout.write(self.style.WARNING(
+                        f'  [{tenant.schema_name}] {stale} trabajo(s) sin avance marcados como fallidos'
+                    ))
+
+                job = PayrollJobService.claim_next(worker)
+                if job is None:
+                    continue
+                ran = True
+                self.stdout.write(f'  [{tenant.schema_name}] {job} ...')
+                job = PayrollJobService.run(job)
+                if job.status == job.Status.SUCCEEDED:
+                    self.stdout.write(self.style.SUCCESS(
+                        f'  [{tenant.schema_name}] [OK] trabajo {job.id}: {job.processed} empleados'
+                    ))
+                else:
+                    self.stdout.write(self.style.ERROR(
+                        f'  [{tenant.schema_name}] [ERROR] trabajo {job.id}: {job.error}'
+                    ))
+        return ran
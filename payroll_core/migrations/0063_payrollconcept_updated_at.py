@@ -0,0 +1,20 @@
+# Generated by Django 5.0 on 2026-10-17 10:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll_core', '0062_company_auto_approve_attendance_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrollconcept',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='Versión del concepto (invalida la caché de fórmulas compiladas)', verbose_name='Última Modificación'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0 on 2026-10-17 00:39
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll_core', '0063_payrollconcept_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('PREVIEW', 'Previsualización'), ('CLOSE', 'Cierre de Periodo')], max_length=10, verbose_name='Tipo')),
+                ('status', models.CharField(choices=[('PENDING', 'En Cola'), ('RUNNING', 'En Ejecución'), ('SUCCEEDED', 'Completado'), ('FAILED', 'Fallido')], db_index=True, default='PENDING', max_length=10, verbose_name='Estado')),
+                ('params', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='Argumentos de PayrollProcessor (manual_rate, trace_level)', verbose_name='Parámetros')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Empleados a Procesar')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Empleados Procesados')),
+                ('warnings', models.JSONField(blank=True, default=list, verbose_name='Advertencias')),
+                ('result', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Resultado')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('worker', models.CharField(blank=True, help_text='host:pid del proceso que ejecuta el trabajo', max_length=100, verbose_name='Proceso')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Inicio')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='Último Avance')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='payroll_core.payrollperiod', verbose_name='Periodo')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Nómina',
+                'verbose_name_plural': 'Trabajos de Nómina',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-17 00:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll_core', '0064_payrolljob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrollperiod',
+            name='close_checkpoint',
+            field=models.JSONField(blank=True, help_text='Cierre por lotes en curso: tasa, nivel de traza y empleados ya procesados', null=True, verbose_name='Avance del Cierre'),
+        ),
+        migrations.AlterField(
+            model_name='payrollperiod',
+            name='status',
+            field=models.CharField(choices=[('OPEN', 'Abierto'), ('CLOSING', 'En Cierre'), ('CLOSED', 'Cerrado')], default='OPEN', max_length=10, verbose_name='Estado'),
+        ),
+    ]
@@ -7,6 +7,7 @@ Este paquete contiene los modelos divididos por dominio:
 - employee: Employee, LaborContract
 - concepts: PayrollConcept, EmployeeConcept
 - payroll: PayrollPeriod, Payslip, PayslipDetail, PayrollNovelty
+- jobs: PayrollJob
 - social_benefits: InterestRateBCV, SocialBenefitsLedger, SocialBenefitsSettlement
 - salary_history: SalaryHistory
 - government_filings: ISLRRetentionTable, ISLRRetention, LPPSSDeclaration, INCESDeclaration
@@ -21,6 +22,7 @@ from .work_schedule import WorkSchedule, EmployeeDailyShift
 from .concepts import PayrollConcept, EmployeeConcept
 from .payroll import PayrollPeriod, PayrollReceipt, PayrollReceiptLine, PayrollNovelty
 from .loans import Loan, LoanPayment
+from .jobs import PayrollJob
 from .endowment import EndowmentEvent
 from .social_benefits import SocialBenefitsLedger, SocialBenefitsSettlement
 from .salary_history import SalaryHistory
@@ -59,6 +61,8 @@ __all__ = [
     # Loans
     'Loan',
     'LoanPayment',
+    # Jobs
+    'PayrollJob',
     # Social Benefits (Prestaciones Sociales)
     'InterestRateBCV',
     'SocialBenefitsLedger',
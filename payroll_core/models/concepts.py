@@ -121,6 +121,12 @@ class PayrollConcept(models.Model):
         verbose_name='Fecha de Creación'
     )
     
+    updated_at: models.DateTimeField = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Última Modificación',
+        help_text='Versión del concepto (invalida la caché de fórmulas compiladas)'
+    )
+    
     formula: models.TextField = models.TextField(
         blank=True, 
         null=True, 
@@ -0,0 +1,116 @@
+"""
+Trabajos de nómina en segundo plano (previsualización y cierre de periodos).
+"""
+from typing import Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+from .payroll import PayrollPeriod
+
+
+class PayrollJob(models.Model):
+    """
+    Operación de PayrollProcessor encolada desde la API y ejecutada por el
+    comando run_payroll_jobs fuera del proceso web.
+    Registra el avance (empleados procesados / total) para calcular el
+    porcentaje y el tiempo restante estimado.
+    """
+    class Kind(models.TextChoices):
+        PREVIEW = 'PREVIEW', 'Previsualización'
+        CLOSE = 'CLOSE', 'Cierre de Periodo'
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'En Cola'
+        RUNNING = 'RUNNING', 'En Ejecución'
+        SUCCEEDED = 'SUCCEEDED', 'Completado'
+        FAILED = 'FAILED', 'Fallido'
+
+    kind = models.CharField(
+        max_length=10,
+        choices=Kind.choices,
+        verbose_name='Tipo'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+        db_index=True,
+        verbose_name='Estado'
+    )
+    period = models.ForeignKey(
+        PayrollPeriod,
+        on_delete=models.CASCADE,
+        related_name='jobs',
+        verbose_name='Periodo'
+    )
+    params = models.JSONField(
+        default=dict,
+        blank=True,
+        encoder=DjangoJSONEncoder,
+        verbose_name='Parámetros',
+        help_text='Argumentos de PayrollProcessor (manual_rate, trace_level)'
+    )
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Solicitado por'
+    )
+
+    # Avance
+    total = models.PositiveIntegerField(default=0, verbose_name='Empleados a Procesar')
+    processed = models.PositiveIntegerField(default=0, verbose_name='Empleados Procesados')
+    warnings = models.JSONField(default=list, blank=True, verbose_name='Advertencias')
+    result = models.JSONField(
+        null=True,
+        blank=True,
+        encoder=DjangoJSONEncoder,
+        verbose_name='Resultado'
+    )
+    error = models.TextField(blank=True, verbose_name='Error')
+    worker = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Proceso',
+        help_text='host:pid del proceso que ejecuta el trabajo'
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Inicio')
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name='Último Avance')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Fin')
+
+    class Meta:
+        verbose_name = 'Trabajo de Nómina'
+        verbose_name_plural = 'Trabajos de Nómina'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.period} ({self.get_status_display()})"
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in (self.Status.PENDING, self.Status.RUNNING)
+
+    @property
+    def percent(self) -> float:
+        """Porcentaje completado (0-100)."""
+        if self.status == self.Status.SUCCEEDED:
+            return 100.0
+        if not self.total:
+            return 0.0
+        return round(min(self.processed / self.total, 1.0) * 100, 1)
+
+    @property
+    def eta_seconds(self) -> Optional[int]:
+        """Segundos restantes estimados según el ritmo observado (None si aún no hay avance)."""
+        if self.status != self.Status.RUNNING or not self.started_at or not self.processed or not self.total:
+            return None
+        elapsed = ((self.heartbeat_at or timezone.now()) - self.started_at).total_seconds()
+        remaining = max(self.total - self.processed, 0)
+        return int(round(elapsed / self.processed * remaining))
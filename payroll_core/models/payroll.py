@@ -11,10 +11,12 @@ from .concepts import PayrollConcept
 class PayrollPeriod(models.Model):
     """
     Define un lapso de tiempo para el procesamiento de nómina.
-    Un periodo puede estar abierto (en preparación) o cerrado (histórico).
+    Un periodo puede estar abierto (en preparación), en cierre (cierre por
+    lotes en curso) o cerrado (histórico).
     """
     class Status(models.TextChoices):
         OPEN = 'OPEN', 'Abierto'
+        CLOSING = 'CLOSING', 'En Cierre'
         CLOSED = 'CLOSED', 'Cerrado'
 
     name = models.CharField(
@@ -31,6 +33,12 @@ class PayrollPeriod(models.Model):
         default=Status.OPEN,
         verbose_name='Estado'
     )
+    close_checkpoint = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name='Avance del Cierre',
+        help_text='Cierre por lotes en curso: tasa, nivel de traza y empleados ya procesados'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
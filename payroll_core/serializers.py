@@ -3,7 +3,7 @@ from .models import (
     Employee, LaborContract, Branch, PayrollConcept, 
     EmployeeConcept, Currency, PayrollPeriod, PayrollReceipt, PayrollReceiptLine,
     PayrollNovelty, Company, Department, Loan, LoanPayment, JobPosition, ExchangeRate,
-    PayrollPolicy,
+    PayrollPolicy, PayrollJob,
     # Social Benefits
     SocialBenefitsLedger, SocialBenefitsSettlement, InterestRateBCV,
     EndowmentEvent
@@ -168,6 +168,24 @@ class PayrollConceptSerializer(serializers.ModelSerializer):
                 except ImportError:
                     pass # Si no puedes importar el modelo aquí, omite esta validación extra
 
+        # 4. Dependencias de la fórmula: variables no definidas y ciclos entre conceptos
+        formula = attrs.get('formula')
+        if formula:
+            from .engine import PayrollEngine
+            code = attrs.get('code') or (instance.code if instance else None)
+            try:
+                analysis = PayrollEngine.check_formula_dependencies(formula, concept_code=code)
+            except SyntaxError as e:
+                raise serializers.ValidationError({'formula': f"Fórmula inválida: {e}"})
+            if analysis['undefined']:
+                raise serializers.ValidationError({
+                    'formula': f"Variables no definidas: {', '.join(analysis['undefined'])}"
+                })
+            if analysis['cycle']:
+                raise serializers.ValidationError({
+                    'formula': f"Dependencia circular: {' -> '.join(analysis['cycle'])}"
+                })
+
         return attrs
 
 
@@ -282,6 +300,14 @@ class PayrollReceiptLineSerializer(serializers.ModelSerializer):
         model = PayrollReceiptLine
         fields = '__all__'
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Los cierres en nivel 'summary' guardan fórmula y valores: la traza
+        # completa se reconstruye al consultarla
+        from .engine import PayrollEngine
+        data['calculation_log'] = PayrollEngine.expand_calculation_log(data.get('calculation_log'))
+        return data
+
 class PayrollReceiptSerializer(serializers.ModelSerializer):
     lines = PayrollReceiptLineSerializer(many=True, read_only=True)
     employee_name = serializers.CharField(source='employee.full_name', read_only=True)
@@ -299,6 +325,29 @@ class PayrollReceiptSerializer(serializers.ModelSerializer):
             'exchange_rate_snapshot', 'currency_code', 'lines', 'status', 'created_at'
         ]
 
+class PayrollJobSerializer(serializers.ModelSerializer):
+    """Estado y avance de un trabajo de nómina (sin el resultado completo)."""
+    kind_display = serializers.CharField(source='get_kind_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    percent = serializers.FloatField(read_only=True)
+    eta_seconds = serializers.IntegerField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = PayrollJob
+        fields = [
+            'id', 'kind', 'kind_display', 'status', 'status_display', 'period', 'params',
+            'requested_by', 'total', 'processed', 'percent', 'eta_seconds', 'warnings',
+            'error', 'created_at', 'started_at', 'heartbeat_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+class PayrollJobDetailSerializer(PayrollJobSerializer):
+    """Incluye el resultado (respuesta de la previsualización o del cierre)."""
+
+    class Meta(PayrollJobSerializer.Meta):
+        fields = PayrollJobSerializer.Meta.fields + ['result']
+        read_only_fields = fields
+
 class CompanySerializer(serializers.ModelSerializer):
     class Meta:
         model = Company
@@ -0,0 +1,408 @@
+"""
+Motor de nómina por lotes (modo columnar con NumPy).
+
+Avanza a todos los empleados de la corrida concepto por concepto, en el
+mismo orden de recibo que PayrollEngine.calculate_payroll. Antes de cada
+concepto de fórmula dinámica arma una columna por variable usada en la
+fórmula (SUELDO_BASE_DIARIO, LUNES, <CODIGO>_CANT, ...) y la evalúa de
+forma vectorizada para toda la plantilla. El resto del paso (líneas,
+acumuladores, complemento, trazas) se ejecuta con la misma lógica escalar
+del motor, por lo que el resultado es idéntico al de calculate_payroll.
+
+Los elementos que no pueden vectorizarse con garantía de paridad (nombres
+no definidos, divisiones por cero, desbordes, resultados booleanos, ...)
+se evalúan con la ruta escalar.
+"""
+import ast
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from simpleeval import MAX_POWER
+
+from ..engine import PayrollEngine
+from .employee_inputs import EmployeeInputs
+from .formula_trace import TraceLevel
+from ..models import LaborContract, PayrollConcept, PayrollPeriod
+from .payroll_plan import PayrollPlan
+from .run_context import PayrollRunContext
+from .run_profiler import RunProfiler, profile_stage
+
+# Magnitud a partir de la cual float64 deja de representar enteros exactos
+MAX_EXACT_FLOAT = float(2 ** 53)
+
+ALLOWED_FUNCTIONS = ('min', 'max', 'round', 'int', 'abs', 'float')
+
+
+class NotVectorizable(Exception):
+    """La fórmula usa una construcción sin equivalente vectorizado."""
+
+
+# Tipo Python de cada elemento: define el resultado de las operaciones
+FLOAT, INT, BOOL = 0, 1, 2
+
+
+class VectorFormula:
+    """
+    Evaluador vectorizado de una fórmula compilada (árbol AST de simpleeval).
+
+    Cada valor intermedio es un par (valores float64, tipo por elemento)
+    para reproducir la semántica de Python: los enteros no tienen -0, una
+    comparación devuelve bool y un resultado final booleano hace fallar la
+    ruta escalar.
+    """
+
+    def __init__(self, compiled):
+        self.source = compiled.source
+        self.node = compiled.node
+        self.names = sorted({
+            n.id for n in ast.walk(self.node)
+            if isinstance(n, ast.Name) and n.id not in ALLOWED_FUNCTIONS
+        })
+
+    def evaluate(self, columns: Dict[str, Tuple[np.ndarray, np.ndarray]], bad: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Evalúa la fórmula sobre las columnas dadas ({nombre: (valores, tipos)}).
+        Devuelve (resultados, máscara de elementos que deben ir a la ruta escalar).
+        """
+        self._columns = columns
+        self._bad = bad.copy()
+        self._size = len(bad)
+        with np.errstate(all='ignore'):
+            values, kinds = self._eval(self.node)
+            self._bad |= kinds == BOOL
+            self._mark_invalid(values)
+        return values, self._bad
+
+    # -------------------------------------------------------------------------
+
+    def _mark_invalid(self, values: np.ndarray) -> None:
+        self._bad |= ~np.isfinite(values) | (np.abs(values) >= MAX_EXACT_FLOAT)
+
+    def _kinds(self, kind) -> np.ndarray:
+        return np.full(self._size, kind, dtype=np.int8)
+
+    @staticmethod
+    def _result(values, kinds):
+        # Un entero Python nunca es -0: -0.0 + 0.0 == +0.0
+        return np.where(kinds != FLOAT, values + 0.0, values), kinds
+
+    @staticmethod
+    def _truthy(value) -> np.ndarray:
+        return value[0] != 0
+
+    def _eval(self, node):
+        if isinstance(node, ast.Expr):
+            return self._eval(node.value)
+
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool):
+                return np.full(self._size, float(node.value)), self._kinds(BOOL)
+            if isinstance(node.value, int):
+                return np.full(self._size, float(node.value)), self._kinds(INT)
+            if isinstance(node.value, float):
+                return np.full(self._size, node.value), self._kinds(FLOAT)
+            raise NotVectorizable(type(node.value).__name__)
+
+        if isinstance(node, ast.Name):
+            if node.id not in self._columns:
+                raise NotVectorizable(node.id)
+            return self._columns[node.id]
+
+        if isinstance(node, ast.BinOp):
+            return self._eval_binop(node)
+
+        if isinstance(node, ast.UnaryOp):
+            values, kinds = self._eval(node.operand)
+            # -True == -1 (int)
+            kinds = np.minimum(kinds, INT)
+            if isinstance(node.op, ast.USub):
+                return self._result(-values, kinds)
+            if isinstance(node.op, ast.UAdd):
+                return self._result(values, kinds)
+            if isinstance(node.op, ast.Not):
+                return (values == 0).astype(float), self._kinds(BOOL)
+            raise NotVectorizable(type(node.op).__name__)
+
+        if isinstance(node, ast.BoolOp):
+            # a and b -> a si a es falso, si no b (idem para or con la condición inversa)
+            result = self._eval(node.values[0])
+            is_and = isinstance(node.op, ast.And)
+            active = self._truthy(result) if is_and else ~self._truthy(result)
+            for value_node in node.values[1:]:
+                value = self._eval(value_node)
+                result = (
+                    np.where(active, value[0], result[0]),
+                    np.where(active, value[1], result[1]),
+                )
+                active = active & (self._truthy(value) if is_and else ~self._truthy(value))
+            return result
+
+        if isinstance(node, ast.Compare):
+            left = self._eval(node.left)[0]
+            result = np.ones(self._size, dtype=bool)
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self._eval(comparator)[0]
+                result &= self._compare(op, left, right)
+                left = right
+            return result.astype(float), self._kinds(BOOL)
+
+        if isinstance(node, ast.IfExp):
+            test = self._truthy(self._eval(node.test))
+            body = self._eval(node.body)
+            orelse = self._eval(node.orelse)
+            return np.where(test, body[0], orelse[0]), np.where(test, body[1], orelse[1])
+
+        if isinstance(node, ast.Call):
+            return self._eval_call(node)
+
+        raise NotVectorizable(type(node).__name__)
+
+    def _eval_binop(self, node):
+        left, left_kinds = self._eval(node.left)
+        right, right_kinds = self._eval(node.right)
+        both_int = (left_kinds != FLOAT) & (right_kinds != FLOAT)
+        kinds = np.where(both_int, INT, FLOAT).astype(np.int8)
+        op = node.op
+
+        if isinstance(op, ast.Add):
+            values = left + right
+        elif isinstance(op, ast.Sub):
+            values = left - right
+        elif isinstance(op, ast.Mult):
+            values = left * right
+        elif isinstance(op, (ast.Div, ast.FloorDiv, ast.Mod)):
+            # Python lanza ZeroDivisionError: se deja a la ruta escalar
+            self._bad |= right == 0
+            if isinstance(op, ast.Div):
+                values = left / right
+                kinds = self._kinds(FLOAT)
+            elif isinstance(op, ast.FloorDiv):
+                values = np.floor_divide(left, right)
+            else:
+                values = np.remainder(left, right)
+        elif isinstance(op, ast.Pow):
+            # Límites de simpleeval (NumberTooHigh), bases negativas con exponente
+            # fraccionario (complejo en Python) y 0 ** negativo
+            self._bad |= (np.abs(left) > MAX_POWER) | (np.abs(right) > MAX_POWER)
+            self._bad |= (left < 0) & (right != np.trunc(right))
+            self._bad |= (left == 0) & (right < 0)
+            values = np.power(left, right)
+            # int ** int negativo devuelve float
+            kinds = np.where(both_int & (right >= 0), INT, FLOAT).astype(np.int8)
+        else:
+            raise NotVectorizable(type(op).__name__)
+
+        self._mark_invalid(values)
+        return self._result(values, kinds)
+
+    @staticmethod
+    def _compare(op, left, right) -> np.ndarray:
+        if isinstance(op, ast.Lt):
+            return left < right
+        if isinstance(op, ast.LtE):
+            return left <= right
+        if isinstance(op, ast.Gt):
+            return left > right
+        if isinstance(op, ast.GtE):
+            return left >= right
+        if isinstance(op, ast.Eq):
+            return left == right
+        if isinstance(op, ast.NotEq):
+            return left != right
+        raise NotVectorizable(type(op).__name__)
+
+    def _eval_call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in ALLOWED_FUNCTIONS or node.keywords:
+            raise NotVectorizable('call')
+        name = node.func.id
+
+        if name == 'round' and len(node.args) == 2:
+            # round con decimales: se usa el round de Python elemento a elemento
+            # (np.round redondea distinto en casos como 2.675)
+            digits = node.args[1]
+            if not isinstance(digits, ast.Constant) or type(digits.value) is not int:
+                raise NotVectorizable('round')
+            values, kinds = self._eval(node.args[0])
+            self._mark_invalid(values)
+            safe = np.where(self._bad, 0.0, values)
+            rounded = np.array([round(v, digits.value) for v in safe.tolist()], dtype=float)
+            return self._result(rounded, np.minimum(kinds, INT))
+
+        args = [self._eval(a) for a in node.args]
+
+        if name in ('min', 'max'):
+            if len(args) < 2:
+                raise NotVectorizable(name)
+            # Igual que Python: se conserva el primer elemento extremo
+            values, kinds = args[0]
+            for other, other_kinds in args[1:]:
+                take = other < values if name == 'min' else other > values
+                values = np.where(take, other, values)
+                kinds = np.where(take, other_kinds, kinds)
+            self._bad |= np.isnan(values)
+            return values, kinds
+
+        if len(args) != 1:
+            raise NotVectorizable(name)
+        values, kinds = args[0]
+
+        if name == 'abs':
+            return self._result(np.abs(values), np.minimum(kinds, INT))
+        if name == 'float':
+            return values, self._kinds(FLOAT)
+        # int(x) trunca; round(x) usa redondeo bancario, igual que np.rint
+        self._mark_invalid(values)
+        values = np.trunc(values) if name == 'int' else np.rint(values)
+        return self._result(values, self._kinds(INT))
+
+
+class BatchPayrollEngine:
+    """
+    Calcula la nómina de toda la plantilla en un solo recorrido del plan.
+
+    Uso:
+        batch = BatchPayrollEngine(period, plan=plan, run_context=run_context)
+        results = batch.calculate([(contract, input_variables), ...])
+
+    Devuelve una lista con el mismo formato de PayrollEngine.calculate_payroll,
+    en el mismo orden de entrada.
+    """
+
+    def __init__(
+        self,
+        period: Optional[PayrollPeriod] = None,
+        plan: Optional[PayrollPlan] = None,
+        run_context: Optional[PayrollRunContext] = None,
+        trace_level: str = TraceLevel.FULL,
+        profiler: Optional[RunProfiler] = None
+    ):
+        self.period = period
+        self.trace_level = TraceLevel.validate(trace_level)
+        self.plan = plan or PayrollPlan.build()
+        self.run_context = run_context or PayrollRunContext.build(period)
+        self._vector_formulas: Dict[int, Optional[VectorFormula]] = {}
+        # Perfil de la corrida (tiempos por etapa y por concepto), opcional
+        self.profiler = profiler
+
+    def calculate(self, entries: List[Tuple[LaborContract, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Calcula la nómina de cada (contrato, novedades) de la corrida."""
+        if not entries:
+            return []
+        profiler = self.profiler
+
+        with profile_stage(profiler, 'prepare'):
+            inputs = EmployeeInputs.load([contract for contract, _ in entries])
+            engines = [
+                PayrollEngine(
+                    contract=contract,
+                    period=self.period,
+                    input_variables=input_vars,
+                    plan=self.plan,
+                    run_context=self.run_context,
+                    trace_level=self.trace_level,
+                    inputs=inputs
+                )
+                for contract, input_vars in entries
+            ]
+            states = [engine._prepare_payroll_state() for engine in engines]
+
+        with profile_stage(profiler, 'earnings'):
+            for concept in self.plan.earnings:
+                start = time.perf_counter() if profiler else None
+                precomputed = self._evaluate_column(concept, engines, states)
+                for i, engine in enumerate(engines):
+                    engine._process_earning(states[i], concept, precomputed[i])
+                if profiler:
+                    profiler.add_concept(concept.code, time.perf_counter() - start, len(engines))
+
+        with profile_stage(profiler, 'deductions'):
+            for concept in self.plan.deductions:
+                start = time.perf_counter() if profiler else None
+                precomputed = self._evaluate_column(concept, engines, states)
+                for i, engine in enumerate(engines):
+                    engine._process_deduction(states[i], concept, precomputed[i])
+                if profiler:
+                    profiler.add_concept(concept.code, time.perf_counter() - start, len(engines))
+
+        with profile_stage(profiler, 'loans'):
+            for engine, state in zip(engines, states):
+                engine._process_loans(state)
+
+        with profile_stage(profiler, 'finalize'):
+            results = [engine._finalize(state) for engine, state in zip(engines, states)]
+        if profiler:
+            profiler.employees += len(engines)
+        return results
+
+    # -------------------------------------------------------------------------
+
+    def _is_vectorizable(self, concept: PayrollConcept) -> bool:
+        """Solo los conceptos cuyo paso evalúa la fórmula vía calculate_concept."""
+        if concept.computation_method != PayrollConcept.ComputationMethod.DYNAMIC_FORMULA or not concept.formula:
+            return False
+        if concept.kind == PayrollConcept.ConceptKind.EARNING:
+            return concept.behavior not in (
+                PayrollConcept.ConceptBehavior.SALARY_BASE,
+                PayrollConcept.ConceptBehavior.CESTATICKET,
+                PayrollConcept.ConceptBehavior.COMPLEMENT,
+            )
+        return concept.id not in self.plan.law_params
+
+    def _get_vector_formula(self, concept: PayrollConcept) -> Optional[VectorFormula]:
+        if concept.id not in self._vector_formulas:
+            compiled = self.plan.formulas.get(concept.id)
+            vector = None
+            if compiled is not None and compiled.source == concept.formula:
+                vector = VectorFormula(compiled)
+            self._vector_formulas[concept.id] = vector
+        return self._vector_formulas[concept.id]
+
+    def _evaluate_column(self, concept: PayrollConcept, engines, states) -> List[Optional[float]]:
+        """
+        Evalúa la fórmula del concepto para todos los empleados.
+        Devuelve un resultado por empleado (None = usar la ruta escalar).
+        """
+        size = len(engines)
+        fallback = [None] * size
+        if not self._is_vectorizable(concept):
+            return fallback
+        vector = self._get_vector_formula(concept)
+        if vector is None:
+            return fallback
+
+        code, cant_code = concept.code, f"{concept.code}_CANT"
+        bad = np.zeros(size, dtype=bool)
+        columns = {name: (np.zeros(size), np.zeros(size, dtype=np.int8)) for name in vector.names}
+
+        for i, (engine, state) in enumerate(zip(engines, states)):
+            context = state['context']
+            # Mismos valores que calculate_concept inyecta antes de evaluar
+            novelty_val, override_val = engine._get_concept_inputs(state, concept)
+            for name, (values, kinds) in columns.items():
+                if name == code and override_val is not None:
+                    value = float(override_val)
+                elif name == cant_code and novelty_val is not None:
+                    value = float(novelty_val)
+                elif name in context:
+                    value = context[name]
+                else:
+                    bad[i] = True
+                    continue
+
+                if isinstance(value, bool):
+                    values[i], kinds[i] = float(value), BOOL
+                elif isinstance(value, int):
+                    values[i], kinds[i] = float(value), INT
+                elif isinstance(value, float):
+                    values[i] = value
+                else:
+                    bad[i] = True
+
+        try:
+            results, bad = vector.evaluate(columns, bad)
+        except NotVectorizable:
+            self._vector_formulas[concept.id] = None
+            return fallback
+
+        return [None if bad[i] else float(results[i]) for i in range(size)]
@@ -0,0 +1,412 @@
+"""
+Benchmark reproducible de la nómina.
+
+SyntheticTenantBuilder llena un tenant vacío con datos sintéticos
+deterministas (misma semilla y mismos conteos -> mismos datos): empresa,
+conceptos estándar (seed_venezuela_concepts) más conceptos sintéticos,
+empleados con sus contratos, novedades, préstamos y marcajes biométricos.
+
+PayrollBenchmark mide sobre ese tenant, etapa por etapa, el tiempo y las
+consultas SQL de la conexión principal:
+    generate_summaries, preview_period, process_period, payslip_pdf y las
+    exportaciones legales (FAOV, IVSS, ISLR, resumen Excel, ARC).
+
+Los resultados de run() son serializables a JSON y compare_results los contrasta con los de
+otra versión para detectar regresiones. Lo usa el comando benchmark_payroll.
+"""
+import logging
+import random
+import statistics
+import subprocess
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ..models import (
+    Branch, Company, Currency, Department, Employee, JobPosition, LaborContract, Loan,
+    PayrollConcept, PayrollNovelty, PayrollPeriod, PayrollPolicy,
+)
+from .formula_trace import TraceLevel
+from .payroll import PayrollProcessor
+
+logger = logging.getLogger(__name__)
+
+# Versión del formato de salida (cambia si cambian las claves del JSON)
+BENCHMARK_FORMAT_VERSION = 1
+
+# Regresión: más lento que la línea base por encima de esta fracción...
+DEFAULT_TOLERANCE = 0.25
+# ...y por más de estos segundos (evita ruido en etapas muy cortas)
+MIN_REGRESSION_SECONDS = 0.05
+
+# Novedades de ley que reciben las novedades sintéticas (además de las BENCH_*)
+NOVELTY_CODES = ['H_EXTRA_DIURNA', 'H_EXTRA_NOCTURNA', 'BONO_NOCTURNO', 'DIAS_DOMINGO']
+
+STATUS_OK = 'ok'
+STATUS_SKIPPED = 'skipped'
+STATUS_ERROR = 'error'
+
+
+def git_revision() -> Optional[str]:
+    """Commit actual del árbol (None si no es un repositorio git)."""
+    try:
+        output = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.stdout.strip() or None
+
+
+class SyntheticTenantBuilder:
+    """
+    Crea los datos sintéticos en el tenant activo.
+
+    Conteos:
+        employees: empleados activos (cada uno con un contrato activo)
+        contracts: contratos por empleado (los adicionales son históricos, inactivos)
+        concepts: conceptos sintéticos BENCH_* además de los estándar
+        novelties: novedades por empleado en el periodo
+        loans: préstamos activos (en total, repartidos entre los empleados)
+        attendance_days: días del periodo con marcajes de entrada/salida
+    """
+
+    def __init__(self, employees: int = 100, contracts: int = 1, concepts: int = 10,
+                 novelties: int = 2, loans: int = 20, attendance_days: int = 10,
+                 seed: int = 1, period_start: date = date(2025, 1, 1)):
+        self.employees = employees
+        self.contracts = max(contracts, 1)
+        self.concepts = concepts
+        self.novelties = novelties
+        self.loans = loans
+        self.attendance_days = attendance_days
+        self.seed = seed
+        self.period_start = period_start
+        self.rng = random.Random(seed)
+
+    def build(self, rif: str) -> Dict[str, Any]:
+        """Crea todo y devuelve el periodo abierto y los conteos creados."""
+        from ..management.commands.seed_venezuela_concepts import create_venezuela_concepts
+
+        ves, _ = Currency.objects.get_or_create(code='VES', defaults={'name': 'Bolívar', 'symbol': 'Bs.'})
+        usd, _ = Currency.objects.get_or_create(code='USD', defaults={'name': 'Dólar', 'symbol': '$'})
+
+        # La señal post_save de Company crea la sede principal y los conceptos de sistema
+        company = Company.objects.create(
+            name=f'Benchmark {self.seed}', rif=rif, national_minimum_salary=Decimal('130.00'),
+        )
+        PayrollPolicy.objects.get_or_create(company=company)
+        create_venezuela_concepts(company)
+        concept_codes = self._build_concepts(ves, usd)
+
+        period = PayrollPeriod.objects.create(
+            name=f'Benchmark {self.period_start:%Y-%m} Q1',
+            start_date=self.period_start,
+            end_date=self.period_start + timedelta(days=14),
+            payment_date=self.period_start + timedelta(days=14),
+        )
+        employees = self._build_employees(ves, usd)
+        counts = {
+            'employees': len(employees),
+            'contracts': LaborContract.objects.count(),
+            'concepts': PayrollConcept.objects.filter(active=True).count(),
+            'novelties': self._build_novelties(employees, period, concept_codes),
+            'loans': self._build_loans(employees, ves, usd),
+            'attendance_events': self._build_attendance(employees, period),
+        }
+        return {'period': period, 'counts': counts}
+
+    def _build_concepts(self, ves: Currency, usd: Currency) -> List[str]:
+        """Conceptos BENCH_*: fórmulas con novedad, montos fijos y porcentajes del básico."""
+        concepts = []
+        for i in range(self.concepts):
+            code = f'BENCH_{i:03d}'
+            common = {'code': code, 'name': f'Concepto sintético {i}', 'receipt_order': 200 + i}
+            if i % 3 == 0:
+                concepts.append(PayrollConcept(
+                    kind=PayrollConcept.ConceptKind.EARNING,
+                    computation_method=PayrollConcept.ComputationMethod.DYNAMIC_FORMULA,
+                    behavior=PayrollConcept.ConceptBehavior.DYNAMIC,
+                    value=0, currency=ves, incidences=['ISLR_BASE'],
+                    formula=f'SUELDO_BASE_DIARIO * {code}_CANT if {code}_CANT > 0 else 0',
+                    **common
+                ))
+            elif i % 3 == 1:
+                concepts.append(PayrollConcept(
+                    kind=PayrollConcept.ConceptKind.EARNING,
+                    computation_method=PayrollConcept.ComputationMethod.FIXED_AMOUNT,
+                    behavior=PayrollConcept.ConceptBehavior.FIXED,
+                    value=Decimal(self.rng.randint(1, 20)), currency=usd,
+                    **common
+                ))
+            else:
+                concepts.append(PayrollConcept(
+                    kind=PayrollConcept.ConceptKind.DEDUCTION,
+                    computation_method=PayrollConcept.ComputationMethod.PERCENTAGE_OF_BASIC,
+                    behavior=PayrollConcept.ConceptBehavior.FIXED,
+                    value=Decimal('0.50'), currency=ves, calculation_base='BASE',
+                    **common
+                ))
+        PayrollConcept.objects.bulk_create(concepts)
+        return [c.code for c in concepts if c.computation_method == PayrollConcept.ComputationMethod.DYNAMIC_FORMULA]
+
+    def _build_employees(self, ves: Currency, usd: Currency) -> List[Employee]:
+        """Empleados con bulk_create; los contratos replican lo que hace LaborContract.save."""
+        rng = self.rng
+        department = Department.objects.create(name='Operaciones', description='', branch=self._main_branch())
+        position = JobPosition.objects.create(
+            name='Analista', code='BENCH', department=department,
+            default_total_salary=Decimal('300.00'), currency=usd,
+        )
+        branch = department.branch
+
+        employees = Employee.objects.bulk_create([
+            Employee(
+                first_name=f'Empleado{i}', last_name='Sintético', national_id=f'V-{30000000 + i}',
+                position=position.name, department=department, job_position=position, branch=branch,
+                hire_date=date(2010 + rng.randint(0, 14), rng.randint(1, 12), 1), is_active=True,
+            )
+            for i in range(self.employees)
+        ])
+
+        contracts = []
+        for i, employee in enumerate(employees):
+            for n in range(self.contracts):
+                active = n == self.contracts - 1
+                currency = usd if rng.random() < 0.7 else ves
+                amount = Decimal(rng.randint(150, 900)) if currency == usd else Decimal(rng.randint(5000, 30000))
+                contracts.append(LaborContract(
+                    employee=employee, position=position.name, department=department, job_position=position,
+                    salary_amount=amount, salary_currency=currency,
+                    start_date=employee.hire_date + timedelta(days=365 * n),
+                    end_date=None if active else employee.hire_date + timedelta(days=365 * (n + 1) - 1),
+                    is_active=active, payment_frequency='MONTHLY',
+                    includes_cestaticket=rng.random() < 0.8,
+                    islr_retention_percentage=Decimal(rng.choice([0, 0, 1, 2])),
+                ))
+        LaborContract.objects.bulk_create(contracts)
+        return employees
+
+    @staticmethod
+    def _main_branch() -> Optional[Branch]:
+        return Branch.objects.order_by('-is_main', 'id').first()
+
+    def _build_novelties(self, employees: List[Employee], period: PayrollPeriod,
+                         concept_codes: List[str]) -> int:
+        codes = NOVELTY_CODES + concept_codes
+        novelties = []
+        for employee in employees:
+            for code in self.rng.sample(codes, min(self.novelties, len(codes))):
+                novelties.append(PayrollNovelty(
+                    employee=employee, period=period, concept_code=code,
+                    amount=Decimal(self.rng.randint(1, 8)),
+                ))
+        PayrollNovelty.objects.bulk_create(novelties)
+        return len(novelties)
+
+    def _build_loans(self, employees: List[Employee], ves: Currency, usd: Currency) -> int:
+        loans = []
+        for i in range(min(self.loans, len(employees))):
+            currency = self.rng.choice([ves, usd])
+            amount = Decimal(self.rng.randint(50, 500))
+            loans.append(Loan(
+                employee=employees[i], description=f'Préstamo sintético {i}', amount=amount,
+                balance=amount, installment_amount=(amount / 5).quantize(Decimal('0.01')),
+                currency=currency, status=Loan.LoanStatus.Active, start_date=self.period_start,
+            ))
+        Loan.objects.bulk_create(loans)
+        return len(loans)
+
+    def _build_attendance(self, employees: List[Employee], period: PayrollPeriod) -> int:
+        """Entrada y salida por día hábil; uno de cada diez empleados trabaja de noche."""
+        from biometrics.models import AttendanceEvent
+
+        tz = timezone.get_current_timezone()
+        days = []
+        current = period.start_date
+        while current <= period.end_date and len(days) < self.attendance_days:
+            if current.weekday() < 5:
+                days.append(current)
+            current += timedelta(days=1)
+
+        events = []
+        for employee in employees:
+            night = self.rng.random() < 0.1
+            for day in days:
+                start_hour = 19 if night else 8
+                entry = datetime(day.year, day.month, day.day, start_hour, self.rng.randint(0, 20), tzinfo=tz)
+                exit_ = entry + timedelta(hours=self.rng.choice([8, 9, 10]), minutes=self.rng.randint(0, 30))
+                for event_type, timestamp in (('entry', entry), ('exit', exit_)):
+                    events.append(AttendanceEvent(
+                        employee=employee, employee_device_id=str(employee.id),
+                        event_type=event_type, timestamp=timestamp,
+                    ))
+        AttendanceEvent.objects.bulk_create(events, batch_size=5000)
+        return len(events)
+
+
+class PayrollBenchmark:
+    """
+    Mide las etapas de la nómina sobre un periodo abierto.
+
+    Las etapas de solo lectura (y generate_summaries, que es idempotente)
+    se repiten `repeat` veces y reportan la mediana; process_period cierra el
+    periodo y corre una sola vez. Las consultas son las de la primera
+    repetición y solo cuentan la conexión principal (con workers > 0 las de
+    los procesos del pool no se ven). Las cachés del proceso (fórmulas,
+    tasas) empiezan frías, por lo que las corridas a comparar deben hacerse
+    cada una en un proceso nuevo, como lo hace benchmark_payroll.
+    """
+
+    def __init__(self, period: PayrollPeriod, user=None, tenant=None,
+                 manual_rate: Optional[Decimal] = None, trace_level: str = TraceLevel.FULL,
+                 workers: int = 0, repeat: int = 1):
+        self.period = period
+        self.user = user
+        self.tenant = tenant
+        self.manual_rate = manual_rate
+        self.trace_level = trace_level
+        self.workers = workers
+        self.repeat = max(repeat, 1)
+        self.results: List[Dict[str, Any]] = []
+
+    def run(self) -> List[Dict[str, Any]]:
+        year, month = self.period.payment_date.year, self.period.payment_date.month
+        self._measure('generate_summaries', self._generate_summaries)
+        self._measure('preview_period', self._preview_period)
+        self._measure('process_period', self._process_period, repeatable=False)
+        self._measure('payslip_pdf', self._payslip_pdf)
+        self._measure('faov_export', lambda: self._text_size(self._faov(year, month)))
+        self._measure('ivss_export', lambda: self._text_size(self._ivss()))
+        self._measure('islr_xml_export', lambda: self._text_size(self._islr(year, month)))
+        self._measure('excel_summary', self._excel_summary)
+        self._measure('arc_export', lambda: self._arc(year))
+        return self.results
+
+    def _measure(self, stage: str, func: Callable[[], Dict[str, Any]], repeatable: bool = True) -> None:
+        runs = []
+        queries = None
+        detail: Dict[str, Any] = {}
+        result = {'stage': stage}
+        try:
+            for _ in range(self.repeat if repeatable else 1):
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    detail = func() or {}
+                    runs.append(time.perf_counter() - start)
+                if queries is None:
+                    queries = len(captured)
+        except (ImportError, OSError) as e:
+            # Dependencia opcional ausente (p. ej. WeasyPrint sin sus bibliotecas nativas)
+            result.update(status=STATUS_SKIPPED, error=str(e))
+        except Exception as e:
+            logger.exception('Error en la etapa %s del benchmark', stage)
+            result.update(status=STATUS_ERROR, error=str(e))
+        else:
+            result.update(
+                status=STATUS_OK,
+                seconds=round(statistics.median(runs), 4),
+                runs=[round(r, 4) for r in runs],
+                queries=queries,
+                detail=detail,
+            )
+        self.results.append(result)
+
+    # -------------------------------------------------------------------------
+    # Etapas
+
+    def _generate_summaries(self) -> Dict[str, Any]:
+        from biometrics.services.period_attendance import PeriodAttendanceService
+        return PeriodAttendanceService.generate_summaries(self.period.id, workers=self.workers)
+
+    def _preview_period(self) -> Dict[str, Any]:
+        result = PayrollProcessor.preview_period(
+            self.period.id, manual_rate=self.manual_rate, trace_level=self.trace_level,
+            use_cache=False, workers=self.workers,
+        )
+        return {'employees': len(result['results'])}
+
+    def _process_period(self) -> Dict[str, Any]:
+        result = PayrollProcessor.process_period(
+            self.period.id, user=self.user, manual_rate=self.manual_rate,
+            trace_level=self.trace_level, workers=self.workers,
+        )
+        return {key: value for key, value in result.items() if isinstance(value, (int, float, str))}
+
+    def _payslip_pdf(self) -> Dict[str, Any]:
+        """PDF masivo de recibos por la misma acción que usa la API (export-pdf)."""
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from ..views import PayrollPeriodViewSet
+
+        request = APIRequestFactory().get(f'/api/payroll/periods/{self.period.id}/export-pdf/')
+        if self.tenant is not None:
+            request.tenant = self.tenant
+        force_authenticate(request, user=self.user)
+        response = PayrollPeriodViewSet.as_view({'get': 'export_pdf'})(request, pk=self.period.id)
+        if response.status_code != 200:
+            raise ValueError(f'export-pdf respondió {response.status_code}')
+        return {'bytes': len(response.content)}
+
+    def _faov(self, year: int, month: int) -> str:
+        from .reports.faov_export import FAOVExport
+        return FAOVExport.generate(year, month)
+
+    def _ivss(self) -> str:
+        from .reports.ivss_export import IVSSExportType, IVSSTiunaExport
+        return IVSSTiunaExport.generate(IVSSExportType.INGRESO, reference_date=self.period.payment_date)
+
+    def _islr(self, year: int, month: int) -> str:
+        from .reports.islr_xml_export import ISLRXMLExport
+        return ISLRXMLExport.generate(year, month)
+
+    def _excel_summary(self) -> Dict[str, Any]:
+        from .reports.excel_report import PayrollExcelReport
+        return {'bytes': len(PayrollExcelReport.generate_period_summary(self.period.id))}
+
+    def _arc(self, year: int) -> Dict[str, Any]:
+        from .reports.arc_export import ARCExportService
+        return {'bytes': len(ARCExportService.generate_batch(year))}
+
+    @staticmethod
+    def _text_size(content: str) -> Dict[str, Any]:
+        return {'bytes': len(content.encode('utf-8')), 'lines': content.count('\n')}
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any],
+                    tolerance: float = DEFAULT_TOLERANCE) -> List[Dict[str, Any]]:
+    """
+    Regresiones de `current` respecto de `baseline` (salidas de benchmark_payroll).
+
+    Una etapa regresa si hace más consultas que en la línea base, o si tarda
+    más de (1 + tolerance) veces lo que tardaba y la diferencia supera
+    MIN_REGRESSION_SECONDS. Una etapa que pasó de ok a error también cuenta.
+    Las etapas omitidas o ausentes en cualquiera de los dos lados se ignoran.
+    """
+    base_stages = {r['stage']: r for r in baseline.get('results', [])}
+    regressions = []
+    for result in current.get('results', []):
+        base = base_stages.get(result['stage'])
+        if base is None or base['status'] != STATUS_OK or result['status'] == STATUS_SKIPPED:
+            continue
+        if result['status'] == STATUS_ERROR:
+            regressions.append({'stage': result['stage'], 'reason': 'error', 'error': result.get('error')})
+            continue
+        if result['queries'] > base['queries']:
+            regressions.append({
+                'stage': result['stage'], 'reason': 'queries',
+                'baseline': base['queries'], 'current': result['queries'],
+            })
+        slower = result['seconds'] - base['seconds']
+        if slower > MIN_REGRESSION_SECONDS and result['seconds'] > base['seconds'] * (1 + tolerance):
+            regressions.append({
+                'stage': result['stage'], 'reason': 'seconds',
+                'baseline': base['seconds'], 'current': result['seconds'],
+            })
+    return regressions
@@ -7,9 +7,9 @@ from typing import Optional, Tuple
 import requests
 from django.utils import timezone
 from django.db import models, transaction
-from django.db.models import QuerySet
 
 from ..models import Currency, ExchangeRate, LaborContract
+from .rate_timeline import RateTimeline
 
 
 class CurrencyNotFoundError(Exception):
@@ -43,30 +43,19 @@ def get_usd_exchange_rate(target_date: Optional[date] = None) -> Optional[Decima
         target_date = timezone.now().date()
     
     try:
-        # Buscar moneda USD
-        try:
-            currency = Currency.objects.get(code='USD')
-        except Currency.DoesNotExist:
-            return None
-        
         # Buscar tasa más reciente <= fecha objetivo
         target_datetime = datetime.combine(
             target_date, 
             datetime.max.time()
         ).replace(tzinfo=timezone.get_current_timezone())
         
-        rate_obj = ExchangeRate.objects.filter(
-            currency=currency,
-            date_valid__lte=target_datetime
-        ).order_by('-date_valid').first()
-        
+        RateTimeline.sync()
+        rate_obj = RateTimeline.rate_at('USD', target_datetime)
         if rate_obj:
             return rate_obj.rate
         
         # Fallback: buscar cualquier tasa USD (la más antigua)
-        rate_obj = ExchangeRate.objects.filter(
-            currency=currency
-        ).order_by('date_valid').first()
+        rate_obj = RateTimeline.earliest('USD')
         
         return rate_obj.rate if rate_obj else None
         
@@ -91,24 +80,25 @@ class SalaryConverter:
     def get_latest_rate(
         currency_code: str,
         target_date: date,
-        source: Optional[str] = None
+        source: Optional[str] = None,
+        fresh: bool = False
     ) -> ExchangeRate:
         """
         Obtiene la tasa de cambio más reciente para una fecha.
         
         Busca la tasa más reciente que sea menor o igual a la fecha objetivo.
         Si se especifica source, filtra por esa fuente (BCV, Monitor, etc.)
+        Con fresh=True se lee de la base de datos en lugar de RateTimeline
+        (cierres de nómina).
         """
-        # Verificar que la moneda existe
-        try:
-            currency = Currency.objects.get(code=currency_code)
-        except Currency.DoesNotExist:
-            raise CurrencyNotFoundError(
-                f"La moneda '{currency_code}' no existe en el sistema"
-            )
-        
         # Si es la moneda local, la tasa es 1
         if currency_code == SalaryConverter.LOCAL_CURRENCY_CODE:
+            try:
+                currency = Currency.objects.get(code=currency_code)
+            except Currency.DoesNotExist:
+                raise CurrencyNotFoundError(
+                    f"La moneda '{currency_code}' no existe en el sistema"
+                )
             # Crear un objeto ExchangeRate temporal (no guardado en DB)
             return ExchangeRate(
                 currency=currency,
@@ -117,25 +107,28 @@ class SalaryConverter:
                 source='SISTEMA'
             )
         
-        # Construir query para buscar la tasa
         target_datetime = datetime.combine(
             target_date, 
             datetime.max.time()
         ).replace(tzinfo=timezone.get_current_timezone())
         
-        queryset: QuerySet[ExchangeRate] = ExchangeRate.objects.filter(
-            currency=currency,
-            date_valid__lte=target_datetime
-        )
-        
-        # Filtrar por fuente si se especifica
-        if source:
-            queryset = queryset.filter(source=source)
-        
-        # Obtener la más reciente
-        exchange_rate: Optional[ExchangeRate] = queryset.order_by('-date_valid').first()
+        # Obtener la más reciente (filtrando por fuente si se especifica)
+        if fresh:
+            exchange_rate: Optional[ExchangeRate] = RateTimeline.query_at(
+                currency_code, target_datetime, source=source or None
+            )
+        else:
+            RateTimeline.sync()
+            exchange_rate = RateTimeline.rate_at(
+                currency_code, target_datetime, source=source or None
+            )
         
         if not exchange_rate:
+            # Sin tasas registradas: distinguir moneda inexistente de tasa faltante
+            if not Currency.objects.filter(code=currency_code).exists():
+                raise CurrencyNotFoundError(
+                    f"La moneda '{currency_code}' no existe en el sistema"
+                )
             source_msg = f" de fuente '{source}'" if source else ""
             raise ExchangeRateNotFoundError(
                 f"No se encontró tasa de cambio para {currency_code}{source_msg} "
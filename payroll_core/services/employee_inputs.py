@@ -0,0 +1,75 @@
+"""
+Entradas por empleado del motor de nómina, cargadas en bloque.
+
+PayrollEngine consulta por su cuenta los conceptos asignados (overrides), los
+préstamos activos y las relaciones del contrato (moneda, cargo, departamento)
+de cada empleado. En una corrida completa eso son varias consultas por
+empleado; EmployeeInputs las reemplaza por una consulta por tabla para todo
+el lote y entrega a cada motor su porción.
+"""
+from typing import Any, Dict, List
+
+from django.db.models import Prefetch, prefetch_related_objects
+
+from ..models import EmployeeConcept, LaborContract, Loan
+
+# Relaciones del contrato que usa el motor (desglose salarial y resumen del recibo)
+CONTRACT_RELATED = (
+    'employee', 'salary_currency', 'job_position__department', 'job_position__split_fixed_currency'
+)
+
+
+def active_contracts_prefetch() -> Prefetch:
+    """
+    Prefetch de los contratos activos de cada empleado en employee.active_contracts,
+    en el orden de LaborContract (el primero equivale a contracts.filter(is_active=True).first()).
+    """
+    return Prefetch(
+        'contracts',
+        queryset=LaborContract.objects.filter(is_active=True).select_related(*CONTRACT_RELATED),
+        to_attr='active_contracts'
+    )
+
+
+class EmployeeInputs:
+    """
+    Overrides y préstamos activos de los empleados de un lote.
+
+    Uso:
+        inputs = EmployeeInputs.load(contracts)
+        engine = PayrollEngine(contract, period, inputs=inputs)
+    """
+
+    def __init__(self, overrides: Dict[int, Dict[str, Any]], loans: Dict[int, List[Loan]]):
+        self._overrides = overrides
+        self._loans = loans
+
+    @classmethod
+    def load(cls, contracts: List[LaborContract]) -> 'EmployeeInputs':
+        """
+        Carga las entradas de los empleados de los contratos dados y completa
+        las relaciones del contrato que aún no estén en caché.
+        """
+        prefetch_related_objects(contracts, *CONTRACT_RELATED)
+        employee_ids = {contract.employee_id for contract in contracts}
+
+        overrides: Dict[int, Dict[str, Any]] = {}
+        for ec in EmployeeConcept.objects.filter(
+            employee_id__in=employee_ids, active=True
+        ).select_related('concept'):
+            overrides.setdefault(ec.employee_id, {})[ec.concept.code] = ec.override_value
+
+        # Mismo orden que Loan.objects.filter(employee=...) (Meta.ordering)
+        loans: Dict[int, List[Loan]] = {}
+        for loan in Loan.objects.filter(
+            employee_id__in=employee_ids, status=Loan.LoanStatus.Active
+        ).select_related('currency'):
+            loans.setdefault(loan.employee_id, []).append(loan)
+
+        return cls(overrides, loans)
+
+    def get_overrides(self, employee_id: int) -> Dict[str, Any]:
+        return self._overrides.get(employee_id, {})
+
+    def get_loans(self, employee_id: int) -> List[Loan]:
+        return self._loans.get(employee_id, [])
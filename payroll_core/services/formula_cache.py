@@ -0,0 +1,86 @@
+"""
+Caché de fórmulas compiladas del motor de nómina.
+
+Cada fórmula de PayrollConcept se parsea una sola vez a un árbol AST
+reutilizable (por proceso). La evaluación posterior solo recorre el árbol
+contra el contexto del empleado, evitando re-parsear el mismo texto miles
+de veces durante un cierre o previsualización.
+"""
+from typing import Any, Dict, Optional, Tuple
+
+from django.db import connection
+from simpleeval import SimpleEval
+
+# Límite de textos distintos retenidos antes de vaciar la caché por texto
+MAX_CACHED_SOURCES = 2048
+
+
+class CompiledFormula:
+    """
+    Fórmula parseada lista para evaluarse contra distintos contextos.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        # SimpleEval.parse lanza SyntaxError si la fórmula es inválida
+        self.node = SimpleEval.parse(source)
+
+    def evaluate(self, names: Dict[str, Any], functions: Dict[str, Any]) -> Any:
+        """Evalúa el árbol cacheado con las variables y funciones dadas."""
+        evaluator = SimpleEval(names=names, functions=functions)
+        return evaluator.eval(self.source, previously_parsed=self.node)
+
+
+class FormulaCache:
+    """
+    Caché por proceso de fórmulas compiladas.
+
+    Las entradas de conceptos se indexan por (schema, concept_id) y guardan
+    la versión (updated_at) y el texto con el que fueron compiladas; si el
+    concepto cambia, la entrada se recompila en el siguiente acceso.
+    """
+
+    _concepts: Dict[Tuple[str, int], Tuple[Any, CompiledFormula]] = {}
+    _sources: Dict[str, CompiledFormula] = {}
+
+    @staticmethod
+    def _schema() -> str:
+        return getattr(connection, 'schema_name', 'public')
+
+    @classmethod
+    def get(cls, concept) -> Optional[CompiledFormula]:
+        """
+        Devuelve la fórmula compilada de un PayrollConcept (None si no tiene).
+        """
+        if not concept.formula:
+            return None
+
+        key = (cls._schema(), concept.pk)
+        version = getattr(concept, 'updated_at', None)
+        entry = cls._concepts.get(key)
+        if entry and entry[0] == version and entry[1].source == concept.formula:
+            return entry[1]
+
+        compiled = cls.compile(concept.formula)
+        cls._concepts[key] = (version, compiled)
+        return compiled
+
+    @classmethod
+    def compile(cls, formula: str) -> CompiledFormula:
+        """Compila (o reutiliza) una fórmula a partir de su texto."""
+        compiled = cls._sources.get(formula)
+        if compiled is None:
+            if len(cls._sources) >= MAX_CACHED_SOURCES:
+                cls._sources.clear()
+            compiled = CompiledFormula(formula)
+            cls._sources[formula] = compiled
+        return compiled
+
+    @classmethod
+    def invalidate(cls, concept_id: Optional[int] = None) -> None:
+        """Elimina la entrada de un concepto (o toda la caché si no se indica)."""
+        if concept_id is None:
+            cls._concepts.clear()
+            cls._sources.clear()
+            return
+        cls._concepts.pop((cls._schema(), concept_id), None)
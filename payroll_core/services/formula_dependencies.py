@@ -0,0 +1,140 @@
+"""
+Análisis estático de dependencias entre fórmulas de conceptos.
+
+A partir de las fórmulas ya compiladas se extraen los nombres que cada una
+referencia (códigos de concepto, cantidades *_CANT, acumuladores TOTAL_* y
+variables de sistema) y se arma el grafo de dependencias entre conceptos.
+
+Con ese grafo el plan de nómina:
+- sabe qué variables de contexto son alcanzables (el resto no se calcula),
+- ordena los conceptos para que una fórmula se evalúe después de los
+  conceptos cuyo monto usa (receipt_order desempata),
+- detecta ciclos y variables no definidas al guardar una fórmula.
+
+Solo las referencias directas a un código (el monto del concepto) son
+dependencias de orden. Los acumuladores TOTAL_* conservan su semántica de
+suma parcial en el orden de evaluación, y *_CANT es un dato de entrada.
+"""
+import ast
+import heapq
+from typing import Dict, Iterable, List, Optional, Set
+
+from .formula_cache import CompiledFormula
+
+
+def extract_names(compiled: CompiledFormula) -> Set[str]:
+    """Variables referenciadas por una fórmula (excluye las funciones llamadas)."""
+    functions = set()
+    names = set()
+    for node in ast.walk(compiled.node):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            functions.add(node.func.id)
+        elif isinstance(node, ast.Name):
+            names.add(node.id)
+    return names - functions
+
+
+class FormulaDependencies:
+    """
+    Grafo de dependencias de un catálogo de conceptos.
+    - names_by_code: { código: variables que referencia su fórmula }
+    - graph: { código: códigos de otros conceptos cuyo monto usa }
+    - referenced_names: unión de todas las variables referenciadas
+    """
+
+    def __init__(self, concepts: List, formulas: Dict[int, CompiledFormula]):
+        self.codes = {c.code for c in concepts}
+        self.names_by_code: Dict[str, Set[str]] = {}
+        for c in concepts:
+            compiled = formulas.get(c.id)
+            if compiled is not None:
+                self.names_by_code[c.code] = extract_names(compiled)
+
+        self.graph: Dict[str, Set[str]] = {
+            code: {name for name in names if name in self.codes and name != code}
+            for code, names in self.names_by_code.items()
+        }
+
+        self.referenced_names: Set[str] = set()
+        for names in self.names_by_code.values():
+            self.referenced_names |= names
+
+    def with_formula(self, code: str, compiled: CompiledFormula) -> 'FormulaDependencies':
+        """Copia del grafo reemplazando (o agregando) la fórmula de un concepto."""
+        names = extract_names(compiled)
+        clone = FormulaDependencies([], {})
+        clone.codes = self.codes | {code}
+        clone.names_by_code = dict(self.names_by_code)
+        clone.names_by_code[code] = names
+        clone.graph = dict(self.graph)
+        clone.graph[code] = {name for name in names if name in clone.codes and name != code}
+        clone.referenced_names = self.referenced_names | names
+        return clone
+
+    def find_cycle(self, start: Optional[str] = None) -> Optional[List[str]]:
+        """
+        Devuelve un ciclo como lista de códigos [A, B, ..., A], o None.
+        Si se indica start, solo se buscan ciclos que pasen por ese concepto.
+        """
+        roots = [start] if start else sorted(self.graph)
+        visiting: List[str] = []
+        done: Set[str] = set()
+
+        def visit(code: str) -> Optional[List[str]]:
+            if code in visiting:
+                cycle = visiting[visiting.index(code):] + [code]
+                return cycle if start is None or start in cycle else None
+            if code in done:
+                return None
+            visiting.append(code)
+            for dep in sorted(self.graph.get(code, ())):
+                cycle = visit(dep)
+                if cycle:
+                    return cycle
+            visiting.pop()
+            done.add(code)
+            return None
+
+        for root in roots:
+            cycle = visit(root)
+            if cycle:
+                return cycle
+        return None
+
+    def undefined_names(self, code: str, known: Iterable[str]) -> List[str]:
+        """Variables de la fórmula del concepto que no están definidas en ningún lado."""
+        known = set(known) | self.codes | {f"{c}_CANT" for c in self.codes}
+        return sorted(n for n in self.names_by_code.get(code, ()) if n not in known)
+
+    def order(self, concepts: List) -> List:
+        """
+        Orden topológico de los conceptos (mismo tipo) según sus dependencias.
+        Entre conceptos sin dependencia pendiente se respeta el orden recibido
+        (receipt_order), por lo que un catálogo consistente no cambia de orden.
+        Los conceptos atrapados en un ciclo se agregan al final en su orden original.
+        """
+        position = {c.code: i for i, c in enumerate(concepts)}
+        pending = {
+            c.code: {dep for dep in self.graph.get(c.code, ()) if dep in position}
+            for c in concepts
+        }
+        dependents: Dict[str, List[str]] = {}
+        for code, deps in pending.items():
+            for dep in deps:
+                dependents.setdefault(dep, []).append(code)
+
+        ready = [position[code] for code, deps in pending.items() if not deps]
+        heapq.heapify(ready)
+        ordered = []
+        while ready:
+            concept = concepts[heapq.heappop(ready)]
+            ordered.append(concept)
+            for code in dependents.get(concept.code, ()):
+                pending[code].discard(concept.code)
+                if not pending[code]:
+                    heapq.heappush(ready, position[code])
+
+        if len(ordered) < len(concepts):
+            emitted = {c.code for c in ordered}
+            ordered.extend(c for c in concepts if c.code not in emitted)
+        return ordered
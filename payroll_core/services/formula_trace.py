@@ -0,0 +1,102 @@
+"""
+Trazas legibles de las fórmulas del motor de nómina.
+
+Centraliza la resolución de fórmulas (reemplazar cada variable por su
+valor) y el nivel de detalle de las trazas. Las líneas calculadas en nivel
+'summary' guardan solo el texto de la fórmula y los valores usados; la
+traza completa se reconstruye bajo demanda con expand_calculation_log.
+"""
+import re
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+IDENTIFIER_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+
+class TraceLevel:
+    """
+    Nivel de detalle de las trazas (trace / variables) de cada línea.
+    - OFF: sin trazas (previsualizaciones en grilla, simulaciones what-if).
+    - SUMMARY: solo el texto de la fórmula y los valores de sus variables.
+    - FULL: fórmula resuelta con valores y metadatos de cada variable.
+    """
+    OFF = 'off'
+    SUMMARY = 'summary'
+    FULL = 'full'
+
+    CHOICES = (OFF, SUMMARY, FULL)
+
+    @classmethod
+    def validate(cls, level: Optional[str]) -> str:
+        """Normaliza el nivel recibido (None = FULL). Lanza ValueError si no es válido."""
+        if level is None or level == '':
+            return cls.FULL
+        level = str(level).lower()
+        if level not in cls.CHOICES:
+            raise ValueError(
+                f"Nivel de traza inválido: '{level}'. Opciones: {', '.join(cls.CHOICES)}."
+            )
+        return level
+
+
+def format_trace_value(val: Any) -> str:
+    """Representación de un valor dentro de una traza."""
+    if isinstance(val, (int, float, Decimal)):
+        return f"{float(val):.2f}"
+    return str(val)
+
+
+def get_used_variables(formula: str, context: Dict[str, Any]) -> Dict[str, Any]:
+    """Valores de las variables del contexto que aparecen en la fórmula."""
+    used = {}
+    for word in sorted(set(IDENTIFIER_RE.findall(formula)), key=len, reverse=True):
+        if word in context:
+            val = context[word]
+            used[word] = float(val) if isinstance(val, Decimal) else val
+    return used
+
+
+def resolve_formula(formula: str, values: Dict[str, Any]) -> str:
+    """Reemplaza cada variable de la fórmula por su valor formateado."""
+    resolved = formula
+    for word in sorted(set(IDENTIFIER_RE.findall(formula)), key=len, reverse=True):
+        if word in values:
+            # Usar regex para reemplazar solo palabras completas
+            resolved = re.sub(r'\b' + word + r'\b', format_trace_value(values[word]), resolved)
+    return resolved
+
+
+def expand_calculation_log(log: Dict[str, Any], inventory: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Reconstruye la traza completa de un log guardado en nivel 'summary':
+    la fórmula aparece sin resolver en la traza (sola, o dentro del
+    "Ajuste (...)" de un monto fijo) y sus variables como valores planos.
+    Los logs completos o sin fórmula se devuelven sin cambios.
+    """
+    formula = log.get('formula') or ''
+    trace = log.get('trace') or ''
+    variables = log.get('variables') or {}
+    adjustment = f"Ajuste ({formula})"
+
+    if not formula:
+        return log
+    if trace != formula and not (variables.get('formula_adjustment') == formula and adjustment in trace):
+        return log
+
+    values = get_used_variables(formula, {
+        k: v.get('value') if isinstance(v, dict) else v
+        for k, v in variables.items()
+    })
+    resolved = resolve_formula(formula, values)
+
+    expanded = dict(log)
+    expanded['trace'] = resolved if trace == formula else trace.replace(adjustment, f"Ajuste ({resolved})")
+    expanded['variables'] = {
+        k: {
+            "value": values[k],
+            "description": inventory.get(k, {}).get('description', 'Variable de sistema o novedad'),
+            "category": inventory.get(k, {}).get('category', 'Otros')
+        } if k in values else v
+        for k, v in variables.items()
+    }
+    return expanded
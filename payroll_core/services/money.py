@@ -0,0 +1,48 @@
+"""
+Aritmética de montos en céntimos enteros.
+
+Política de redondeo (única para todo el motor):
+    - Los montos de nómina se expresan en céntimos (int) de la moneda de la línea.
+    - Un valor pasa a céntimos redondeando a 2 decimales con ROUND_HALF_UP.
+    - Un float (resultado de una fórmula) se toma por su representación decimal
+      más corta (repr), igual que Decimal(str(valor)); nunca por su valor binario.
+    - Las sumas (acumuladores TOTAL_*, totales del recibo) se hacen en céntimos,
+      por lo que son exactas y no dependen del orden de los conceptos.
+    - Las fórmulas reciben céntimos / 100 como float: el double más cercano al
+      total exacto.
+
+La conversión a Decimal con 2 decimales (from_cents) se hace al armar las
+líneas y totales que consumen la persistencia y la API.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Union
+
+CENT = Decimal('0.01')
+
+Number = Union[int, float, Decimal, str]
+
+
+def to_cents(value: Number) -> int:
+    """Céntimos de un monto (ROUND_HALF_UP a 2 decimales)."""
+    # str(float) es su repr más corta; un bool falla igual que Decimal(str(True))
+    amount = value if isinstance(value, Decimal) else Decimal(str(value))
+    exponent = amount.as_tuple().exponent
+    if isinstance(exponent, int) and exponent >= -2:
+        # Ya tiene a lo sumo 2 decimales: el escalado es exacto
+        return int(amount.scaleb(2))
+    return int(amount.quantize(CENT, rounding=ROUND_HALF_UP).scaleb(2))
+
+
+def from_cents(cents: int) -> Decimal:
+    """Decimal con exactamente 2 decimales (mismo resultado que quantize(CENT))."""
+    return Decimal(cents).scaleb(-2)
+
+
+def round_cents(value: Number) -> Decimal:
+    """Redondea un monto a céntimos según la política (equivale a Decimal(str(v)).quantize(CENT, HALF_UP))."""
+    return from_cents(to_cents(value))
+
+
+def cents_to_float(cents: int) -> float:
+    """Valor para el contexto de fórmulas (división entera correctamente redondeada)."""
+    return cents / 100
@@ -0,0 +1,139 @@
+"""
+Carga masiva de novedades (grilla de novedades / pegado desde hoja de cálculo).
+
+Valida todas las filas antes de escribir y luego hace un upsert por lotes
+(INSERT ... ON CONFLICT sobre unique_together employee/period/concept_code)
+en lugar de un update_or_create por celda.
+"""
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Tuple
+
+from django.db import transaction
+
+from ..models import Employee, PayrollNovelty, PayrollPeriod
+from .preview_cache import PreviewCache
+
+# Filas por sentencia INSERT ... ON CONFLICT
+NOVELTY_BATCH_SIZE = 1000
+
+# Límite de PayrollNovelty.amount (max_digits=12, decimal_places=2)
+MAX_NOVELTY_AMOUNT = Decimal('9999999999.99')
+
+CONCEPT_CODE_MAX_LENGTH = PayrollNovelty._meta.get_field('concept_code').max_length
+
+
+class NoveltyBatchService:
+    """
+    Upsert masivo de PayrollNovelty.
+    """
+
+    @staticmethod
+    def _parse_id(value: Any) -> int:
+        if isinstance(value, int) and not isinstance(value, bool):
+            number = value
+        elif isinstance(value, str) and value.strip().isdigit():
+            number = int(value)
+        else:
+            raise ValueError
+        if number < 1:
+            raise ValueError
+        return number
+
+    @classmethod
+    def validate(cls, items: List[Any]) -> Tuple[Dict[Tuple[int, int, str], Decimal], List[Dict[str, Any]]]:
+        """
+        Valida todas las filas en memoria (empleados y periodos se consultan
+        una sola vez). Devuelve ({(employee_id, period_id, concept_code): monto},
+        errores por fila). Si una clave se repite gana la última fila, igual
+        que con la carga fila por fila.
+        """
+        parsed = []
+        errors = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                errors.append({'index': index, 'errors': {'non_field_errors': 'Se esperaba un objeto.'}})
+                continue
+
+            row_errors = {}
+            try:
+                employee_id = cls._parse_id(item.get('employee_id'))
+            except (TypeError, ValueError):
+                row_errors['employee_id'] = 'Identificador de empleado inválido.'
+            try:
+                period_id = cls._parse_id(item.get('period_id'))
+            except (TypeError, ValueError):
+                row_errors['period_id'] = 'Identificador de periodo inválido.'
+
+            concept_code = item.get('concept_code')
+            if not isinstance(concept_code, str) or not concept_code.strip():
+                row_errors['concept_code'] = 'El código de concepto es obligatorio.'
+            elif len(concept_code) > CONCEPT_CODE_MAX_LENGTH:
+                row_errors['concept_code'] = f'Máximo {CONCEPT_CODE_MAX_LENGTH} caracteres.'
+
+            try:
+                amount = Decimal(str(item.get('amount', 0)))
+                if not amount.is_finite() or abs(amount) > MAX_NOVELTY_AMOUNT:
+                    raise InvalidOperation
+            except (InvalidOperation, ValueError):
+                row_errors['amount'] = 'Monto inválido.'
+
+            if row_errors:
+                errors.append({'index': index, 'errors': row_errors})
+            else:
+                parsed.append((index, employee_id, period_id, concept_code, amount))
+
+        employee_ids = set(Employee.objects.filter(
+            id__in={row[1] for row in parsed}
+        ).values_list('id', flat=True))
+        period_status = dict(PayrollPeriod.objects.filter(
+            id__in={row[2] for row in parsed}
+        ).values_list('id', 'status'))
+
+        values: Dict[Tuple[int, int, str], Decimal] = {}
+        for index, employee_id, period_id, concept_code, amount in parsed:
+            row_errors = {}
+            if employee_id not in employee_ids:
+                row_errors['employee_id'] = f'El empleado {employee_id} no existe.'
+            if period_id not in period_status:
+                row_errors['period_id'] = f'El periodo {period_id} no existe.'
+            elif period_status[period_id] != PayrollPeriod.Status.OPEN:
+                row_errors['period_id'] = f'El periodo {period_id} no está abierto.'
+
+            if row_errors:
+                errors.append({'index': index, 'errors': row_errors})
+            else:
+                values[(employee_id, period_id, concept_code)] = amount
+
+        errors.sort(key=lambda e: e['index'])
+        return values, errors
+
+    @staticmethod
+    @transaction.atomic
+    def upsert(values: Dict[Tuple[int, int, str], Decimal]) -> Dict[str, int]:
+        """Inserta o actualiza las novedades validadas. Devuelve los conteos."""
+        keys = list(values)
+        existing = set(PayrollNovelty.objects.filter(
+            employee_id__in={k[0] for k in keys},
+            period_id__in={k[1] for k in keys},
+            concept_code__in={k[2] for k in keys},
+        ).values_list('employee_id', 'period_id', 'concept_code'))
+        updated = sum(1 for key in keys if key in existing)
+
+        PayrollNovelty.objects.bulk_create(
+            [
+                PayrollNovelty(employee_id=employee_id, period_id=period_id, concept_code=concept_code, amount=amount)
+                for (employee_id, period_id, concept_code), amount in values.items()
+            ],
+            batch_size=NOVELTY_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['employee', 'period', 'concept_code'],
+            update_fields=['amount', 'updated_at'],
+        )
+        # bulk_create no emite señales
+        for period_id in {k[1] for k in keys}:
+            PreviewCache.bump_novelty_versions(period_id, [k[0] for k in keys if k[1] == period_id])
+        return {
+            'processed_count': len(keys),
+            'created_count': len(keys) - updated,
+            'updated_count': updated,
+        }
@@ -0,0 +1,190 @@
+"""
+Ejecución paralela del motor de nómina en un pool de procesos.
+
+Los empleados de una corrida se dividen en bloques que se calculan con
+BatchPayrollEngine en procesos independientes. Cada proceso activa el
+esquema del tenant (schema_context) y abre su propia conexión a la base de
+datos; el plan de conceptos y el contexto de la corrida (empresa, tasas y
+calendario) se calculan una sola vez en el proceso padre y se envían a los
+trabajadores, de modo que todos usan exactamente los mismos datos de
+referencia (incluida una tasa manual aún no confirmada en la transacción).
+
+El padre recibe los resultados en el mismo orden de entrada y es el único
+que escribe en la base de datos: el cierre sigue ocurriendo en una sola
+transacción.
+"""
+import math
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import django
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+
+from ..models import Currency, LaborContract, PayrollPeriod
+from .batch_engine import BatchPayrollEngine
+from .employee_inputs import CONTRACT_RELATED
+from .payroll_plan import PayrollPlan
+from .run_context import PayrollRunContext
+from .run_profiler import RunProfiler, profile_queries, profile_stage
+
+# Bloques por proceso: bloques más chicos reparten mejor la carga entre procesos
+CHUNKS_PER_WORKER = 4
+
+# Empleados por lote en modo serie cuando se informa el avance
+PROGRESS_CHUNK_SIZE = 100
+
+
+def get_worker_count(workers: Optional[int] = None) -> int:
+    """Procesos a usar (None = settings.PAYROLL_PARALLEL_WORKERS)."""
+    if workers is None:
+        workers = getattr(settings, 'PAYROLL_PARALLEL_WORKERS', 0)
+    return max(int(workers or 0), 0)
+
+
+def _calculate_chunk(
+    db_name: str,
+    schema_name: str,
+    period_id: int,
+    plan: PayrollPlan,
+    run_context: PayrollRunContext,
+    trace_level: str,
+    chunk: List[Tuple[int, Dict[str, Any]]],
+    profile: bool = False
+) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Calcula un bloque de (contract_id, novedades) dentro del proceso trabajador.
+    Devuelve (resultados, RunProfiler.snapshot() si profile, si no None).
+    """
+    from django_tenants.utils import schema_context
+
+    # Misma base de datos que el padre (p. ej. la base de pruebas)
+    default = connections['default']
+    if default.settings_dict['NAME'] != db_name:
+        default.close()
+        default.settings_dict['NAME'] = db_name
+
+    # Igual que al inicio de un request: descarta conexiones vencidas o rotas
+    close_old_connections()
+    profiler = RunProfiler() if profile else None
+    with schema_context(schema_name), profile_queries(profiler):
+        period = PayrollPeriod.objects.get(id=period_id)
+        with profile_stage(profiler, 'prepare'):
+            contracts = LaborContract.objects.select_related(*CONTRACT_RELATED).in_bulk(
+                [contract_id for contract_id, _ in chunk]
+            )
+
+        batch = BatchPayrollEngine(
+            period, plan=plan, run_context=run_context, trace_level=trace_level, profiler=profiler
+        )
+        results = batch.calculate([(contracts[contract_id], novelties) for contract_id, novelties in chunk])
+    return results, profiler.snapshot() if profiler else None
+
+
+class ParallelPayrollRunner:
+    """
+    Reparte el cálculo de una corrida entre procesos. Con menos de dos
+    procesos o pocos empleados calcula en el proceso actual.
+    """
+
+    # Pool reutilizado entre corridas del mismo proceso: (procesos, executor)
+    _pool: Optional[Tuple[int, ProcessPoolExecutor]] = None
+    _pool_lock = threading.Lock()
+
+    @classmethod
+    def _get_pool(cls, workers: int) -> Tuple[int, ProcessPoolExecutor]:
+        """
+        Pool compartido por las corridas del proceso. Se crea una sola vez,
+        con `workers` procesos, y no se redimensiona: cerrarlo cancelaría los
+        cálculos que otras corridas (otros hilos del servidor) tengan en
+        curso. Solo se vuelve a crear si queda roto (BrokenProcessPool).
+        """
+        with cls._pool_lock:
+            if cls._pool is None:
+                # 'spawn': los hijos no heredan la conexión abierta del padre
+                executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=django.setup,
+                )
+                cls._pool = (workers, executor)
+            return cls._pool
+
+    @classmethod
+    def shutdown(cls, executor: Optional[ProcessPoolExecutor] = None) -> None:
+        """Cierra el pool (con executor, solo si sigue siendo ese pool)."""
+        with cls._pool_lock:
+            if cls._pool is None or (executor is not None and cls._pool[1] is not executor):
+                return
+            pool, cls._pool = cls._pool, None
+        pool[1].shutdown(wait=True, cancel_futures=True)
+
+    @classmethod
+    def calculate(
+        cls,
+        period: PayrollPeriod,
+        entries: List[Tuple[LaborContract, Dict[str, Any]]],
+        plan: PayrollPlan,
+        run_context: PayrollRunContext,
+        trace_level: str,
+        workers: Optional[int] = None,
+        progress: Optional[Callable[[int], None]] = None,
+        profiler: Optional[RunProfiler] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Resultados de BatchPayrollEngine.calculate(entries), en el mismo orden.
+        progress: se llama con la cantidad de empleados ya calculados tras cada bloque.
+        profiler: acumula los tiempos del motor (en paralelo, los de cada trabajador).
+        """
+        workers = get_worker_count(workers)
+        min_employees = getattr(settings, 'PAYROLL_PARALLEL_MIN_EMPLOYEES', 200)
+        if workers < 2 or len(entries) < max(min_employees, 2):
+            batch = BatchPayrollEngine(
+                period, plan=plan, run_context=run_context, trace_level=trace_level, profiler=profiler
+            )
+            if progress is None:
+                return batch.calculate(entries)
+            results = []
+            for i in range(0, len(entries), PROGRESS_CHUNK_SIZE):
+                results.extend(batch.calculate(entries[i:i + PROGRESS_CHUNK_SIZE]))
+                progress(len(results))
+            return results
+
+        # Resolver las tasas en el padre: los trabajadores no ven datos sin confirmar
+        for currency in Currency.objects.all():
+            run_context.get_rate(currency)
+
+        pool_size, executor = cls._get_pool(workers)
+        workers = min(workers, pool_size)
+        items = [(contract.id, novelties) for contract, novelties in entries]
+        size = math.ceil(len(items) / (workers * CHUNKS_PER_WORKER))
+        chunks = [items[i:i + size] for i in range(0, len(items), size)]
+        args = (
+            connection.settings_dict['NAME'],
+            connection.schema_name,
+            period.id,
+            plan,
+            run_context,
+            trace_level,
+        )
+
+        try:
+            futures = [
+                executor.submit(_calculate_chunk, *args, chunk, profiler is not None)
+                for chunk in chunks
+            ]
+            results = []
+            for future in futures:
+                chunk_results, snapshot = future.result()
+                results.extend(chunk_results)
+                if snapshot is not None:
+                    profiler.merge(snapshot)
+                if progress is not None:
+                    progress(len(results))
+            return results
+        except BrokenProcessPool:
+            cls.shutdown(executor)
+            raise
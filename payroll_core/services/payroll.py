@@ -3,20 +3,33 @@ Servicios relacionados con el procesamiento de nómina.
 """
 from decimal import Decimal
 from datetime import datetime
-from typing import Optional
+from typing import Callable, Iterator, List, Optional, Tuple
 from django.db import models, transaction
+from django.db.models import Count, Sum
 from django.utils import timezone
 
-from ..engine import PayrollEngine
 from ..models import (
     PayrollPeriod, PayrollReceipt, PayrollReceiptLine, PayrollNovelty, 
-    Employee, Currency, ExchangeRate, PayrollConcept,
+    Employee, LaborContract, Currency, ExchangeRate, PayrollConcept,
     Loan, LoanPayment
 
 )
 from .currency import SalaryConverter, CurrencyNotFoundError, ExchangeRateNotFoundError
+from .employee_inputs import active_contracts_prefetch
 from .payroll_persistence import PayrollPersistenceService
+from .payroll_plan import PayrollPlan
+from .run_context import PayrollRunContext
+from .rate_timeline import RateTimeline
+from .parallel import ParallelPayrollRunner
+from .formula_trace import TraceLevel
+from .preview_cache import PreviewCache
+from .run_profiler import RunProfiler, profile_queries, profile_stage
 
+# Empleados por transacción en el cierre por lotes (process_period_chunked)
+CLOSE_CHUNK_SIZE = 500
+
+# Empleados calculados por bloque antes de emitir sus filas (iter_preview_period)
+PREVIEW_STREAM_CHUNK_SIZE = 250
 
 
 class PayrollProcessor:
@@ -27,9 +40,21 @@ class PayrollProcessor:
 
     @staticmethod
     @transaction.atomic
-    def process_period(period_id: int, user: Optional[models.Model] = None, manual_rate: Optional[Decimal] = None) -> dict:
+    def process_period(
+        period_id: int,
+        user: Optional[models.Model] = None,
+        manual_rate: Optional[Decimal] = None,
+        trace_level: str = TraceLevel.FULL,
+        workers: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+        profile: bool = False
+    ) -> dict:
         """
         Calcula y cierra el periodo para todos los empleados activos.
+        trace_level: detalle de las trazas guardadas en calculation_log (off / summary / full).
+        workers: procesos para calcular en paralelo (None = settings.PAYROLL_PARALLEL_WORKERS).
+        progress: callback (procesados, total) para informar el avance (ver PayrollJob).
+        profile: agrega al resultado 'profile' con tiempos y consultas por etapa (ver RunProfiler).
         
         Paso 1: Validar periodo.
         Paso 2: Obtener tasa BCV (Automática o Manual).
@@ -37,16 +62,96 @@ class PayrollProcessor:
         Paso 4: Procesar cada empleado y persistir snapshots.
         Paso 5: Cerrar periodo.
         """
-        # 1. Obtener Periodo
-        try:
-            period = PayrollPeriod.objects.select_for_update().get(id=period_id)
-        except PayrollPeriod.DoesNotExist:
-            raise ValueError(f"El periodo {period_id} no existe.")
+        profiler = RunProfiler() if profile else None
+        with profile_queries(profiler):
+            result = PayrollProcessor._process_period(
+                period_id, user, manual_rate, trace_level, workers, progress, profiler
+            )
+        if profiler is not None:
+            result['profile'] = profiler.as_dict()
+        return result
+
+    @staticmethod
+    def _process_period(
+        period_id: int,
+        user: Optional[models.Model],
+        manual_rate: Optional[Decimal],
+        trace_level: str,
+        workers: Optional[int],
+        progress: Optional[Callable[[int, int], None]],
+        profiler: Optional[RunProfiler]
+    ) -> dict:
+        """Cuerpo de process_period (se ejecuta dentro de su transacción)."""
+        trace_level = TraceLevel.validate(trace_level)
 
-        if period.status == PayrollPeriod.Status.CLOSED:
-            raise ValueError("Este periodo ya se encuentra cerrado.")
+        with profile_stage(profiler, 'load'):
+            # 1. Obtener Periodo
+            try:
+                period = PayrollPeriod.objects.select_for_update().get(id=period_id)
+            except PayrollPeriod.DoesNotExist:
+                raise ValueError(f"El periodo {period_id} no existe.")
 
-        # 2. Obtener Tasa BCV
+            if period.status == PayrollPeriod.Status.CLOSED:
+                raise ValueError("Este periodo ya se encuentra cerrado.")
+
+            if period.status == PayrollPeriod.Status.CLOSING:
+                raise ValueError(
+                    "El periodo tiene un cierre por lotes en curso. Reanúdelo o reviértalo."
+                )
+
+            # 2. Obtener Tasa BCV
+            bcv_rate = PayrollProcessor._resolve_close_rate(period, manual_rate)
+
+            # 3. Obtener Empleados y Novedades
+            entries, warnings = PayrollProcessor._collect_close_entries(period)
+
+            # 4. Procesamiento
+            plan = PayrollPlan.build()
+            run_context = PayrollRunContext.build(period, fresh_rates=True)
+        processed_count = 0
+        total_income_ves = Decimal('0.00')
+
+        # Ejecutar Motor por lotes (Lógica Centralizada LOTTT, fórmulas vectorizadas)
+        # Esto incluye: Conceptos de Contrato (Base, Cesta, Compl) + Deducciones Ley + Conceptos Dinámicos
+        if progress is not None:
+            progress(0, len(entries))
+        calculations = ParallelPayrollRunner.calculate(
+            period, entries, plan, run_context, trace_level, workers=workers,
+            progress=(lambda done: progress(done, len(entries))) if progress else None,
+            profiler=profiler
+        )
+
+        to_persist = []
+        for (contract, _), calculation_result in zip(entries, calculations):
+            result_lines = calculation_result.get('lines', [])
+            totals = calculation_result.get('totals', {})
+            
+            if not result_lines:
+                continue
+
+            to_persist.append((contract, calculation_result))
+            processed_count += 1
+            total_income_ves += totals.get('net_pay_ves', Decimal('0.00'))
+
+        # 5. Persistir usando el Servicio Especializado (escrituras masivas)
+        # El servicio maneja snapshots, líneas, auditoría y préstamos.
+        with profile_stage(profiler, 'persistence'):
+            PayrollPersistenceService.save_payroll_batch(period, to_persist, user=user)
+
+            # 6. Finalizar Periodo
+            period.status = PayrollPeriod.Status.CLOSED
+            period.save()
+        PreviewCache.invalidate(period.id)
+
+        return {
+            "processed_employees": processed_count,
+            "total_payroll_ves": float(total_income_ves),
+            "exchange_rate": float(bcv_rate),
+            "warnings": warnings
+        }
+    @staticmethod
+    def _resolve_close_rate(period: PayrollPeriod, manual_rate: Optional[Decimal] = None) -> Decimal:
+        """Tasa BCV del cierre (automática o manual)."""
         bcv_rate = None
         
         if manual_rate:
@@ -64,7 +169,8 @@ class PayrollProcessor:
                 usd_rate_obj = SalaryConverter.get_latest_rate(
                     currency_code='USD',
                     target_date=period.payment_date,
-                    source='BCV'
+                    source='BCV',
+                    fresh=True
                 )
                 bcv_rate = usd_rate_obj.rate
             except (CurrencyNotFoundError, ExchangeRateNotFoundError):
@@ -72,9 +178,12 @@ class PayrollProcessor:
                     f"No hay una tasa BCV válida cargada para la fecha {period.payment_date}. "
                     "Cargue la tasa de cambio antes de proceder al cierre."
                 )
+        return bcv_rate
 
-        # 3. Obtener Empleados y Novedades
-        active_employees = Employee.objects.filter(is_active=True).prefetch_related('contracts')
+    @staticmethod
+    def _collect_close_entries(period: PayrollPeriod) -> Tuple[List[Tuple[LaborContract, dict]], List[str]]:
+        """(contrato activo, novedades) de cada empleado activo y advertencias de los que no tienen contrato."""
+        active_employees = Employee.objects.filter(is_active=True).prefetch_related(active_contracts_prefetch())
         
         # Agrupar novedades: { employee_id: { concept_code: amount, ... }, ... }
         all_novelties = PayrollNovelty.objects.filter(period=period)
@@ -84,142 +193,405 @@ class PayrollProcessor:
                 novelties_map[n.employee_id] = {}
             novelties_map[n.employee_id][n.concept_code] = n.amount
 
-        # 4. Procesamiento
-        processed_count = 0
-        total_income_ves = Decimal('0.00')
         warnings = []
-
+        entries = []
         for employee in active_employees:
-            contract = employee.contracts.filter(is_active=True).first()
+            contract = employee.active_contracts[0] if employee.active_contracts else None
             if not contract:
                 warnings.append(f"Empleado {employee.full_name} ({employee.national_id}) no tiene contrato activo.")
                 continue
 
             # Obtener variables de entrada (novedades)
             input_vars = novelties_map.get(employee.id, {})
+            entries.append((contract, input_vars))
+        return entries, warnings
+
+    @staticmethod
+    def _lock_closing_period(period_id: int) -> PayrollPeriod:
+        """Bloquea el periodo y verifica que siga con un cierre por lotes en curso."""
+        period = PayrollPeriod.objects.select_for_update().get(id=period_id)
+        if period.status != PayrollPeriod.Status.CLOSING:
+            raise ValueError("El cierre por lotes fue revertido o finalizado por otro proceso.")
+        return period
+
+    @staticmethod
+    def process_period_chunked(
+        period_id: int,
+        user: Optional[models.Model] = None,
+        manual_rate: Optional[Decimal] = None,
+        trace_level: str = TraceLevel.FULL,
+        workers: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+        chunk_size: int = CLOSE_CHUNK_SIZE,
+        profile: bool = False
+    ) -> dict:
+        """
+        Cierre por lotes reanudable.
+
+        El periodo pasa a CLOSING y los recibos se confirman en transacciones
+        de chunk_size empleados. Cada lote guarda en close_checkpoint los
+        empleados ya procesados, de modo que si un lote falla los anteriores
+        quedan guardados: volver a llamar a este método reanuda el cierre
+        desde el lote pendiente y rollback_closing lo revierte. El periodo
+        pasa a CLOSED al terminar todos los lotes.
+
+        Al reanudar se conservan las tasas y el nivel de traza con que empezó.
+        profile: agrega al resultado 'profile' (ver RunProfiler).
+        """
+        if chunk_size < 1:
+            raise ValueError("El tamaño de lote debe ser mayor que cero.")
 
-            # Ejecutar Motor (Lógica Centralizada LOTTT)
-            engine = PayrollEngine(
-                contract=contract,
-                period=period,
-                input_variables=input_vars
+        profiler = RunProfiler() if profile else None
+        with profile_queries(profiler):
+            result = PayrollProcessor._process_period_chunked(
+                period_id, user, manual_rate, trace_level, workers, progress, chunk_size, profiler
             )
-            
-            # Obtener resultados calculados por el motor
-            # Esto incluye: Conceptos de Contrato (Base, Cesta, Compl) + Deducciones Ley + Conceptos Dinámicos
-            calculation_result = engine.calculate_payroll()
-            
-            result_lines = calculation_result.get('lines', [])
-            totals = calculation_result.get('totals', {})
-            
-            if not result_lines:
-                continue
+        if profiler is not None:
+            result['profile'] = profiler.as_dict()
+        return result
+
+    @staticmethod
+    def _process_period_chunked(
+        period_id: int,
+        user: Optional[models.Model],
+        manual_rate: Optional[Decimal],
+        trace_level: str,
+        workers: Optional[int],
+        progress: Optional[Callable[[int, int], None]],
+        chunk_size: int,
+        profiler: Optional[RunProfiler]
+    ) -> dict:
+        """Cuerpo de process_period_chunked."""
+        # 1. Iniciar (o reanudar) el cierre
+        with profile_stage(profiler, 'load'), transaction.atomic():
+            try:
+                period = PayrollPeriod.objects.select_for_update().get(id=period_id)
+            except PayrollPeriod.DoesNotExist:
+                raise ValueError(f"El periodo {period_id} no existe.")
+
+            if period.status == PayrollPeriod.Status.CLOSED:
+                raise ValueError("Este periodo ya se encuentra cerrado.")
+
+            if period.status == PayrollPeriod.Status.OPEN:
+                bcv_rate = PayrollProcessor._resolve_close_rate(period, manual_rate)
+                rates = PayrollRunContext.build(period, fresh_rates=True).resolve_rates()
+                period.status = PayrollPeriod.Status.CLOSING
+                period.close_checkpoint = {
+                    'started_at': timezone.now().isoformat(),
+                    'exchange_rate': str(bcv_rate),
+                    'rates': {code: str(value) for code, value in rates.items()},
+                    'trace_level': TraceLevel.validate(trace_level),
+                    'processed_employee_ids': [],
+                }
+                period.save(update_fields=['status', 'close_checkpoint', 'updated_at'])
+            checkpoint = period.close_checkpoint
 
-            # 5. Persistir usando el nuevo Servicio Especializado
-            # El servicio maneja snapshots, líneas, auditoría y préstamos.
-            PayrollPersistenceService.save_payroll_calculation(
-                contract=contract,
-                period=period,
-                calculation_result=calculation_result,
-                user=user
+        trace_level = checkpoint['trace_level']
+        done_ids = set(checkpoint['processed_employee_ids'])
+
+        # 2. Procesar los empleados pendientes por lotes
+        with profile_stage(profiler, 'load'):
+            entries, warnings = PayrollProcessor._collect_close_entries(period)
+            pending = [entry for entry in entries if entry[0].employee_id not in done_ids]
+            plan = PayrollPlan.build()
+            # Todos los lotes usan las tasas resueltas al iniciar el cierre,
+            # aunque entre tanto se hayan cargado tasas nuevas
+            rates = checkpoint.get('rates') or {'USD': checkpoint['exchange_rate']}
+            run_context = PayrollRunContext.build(period, fresh_rates=True).with_overrides(rates=rates)
+
+        total = len(entries)
+        done = total - len(pending)
+        if progress is not None:
+            progress(done, total)
+
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            calculations = ParallelPayrollRunner.calculate(
+                period, chunk, plan, run_context, trace_level, workers=workers,
+                progress=(lambda n, base=done: progress(base + n, total)) if progress else None,
+                profiler=profiler
             )
 
+            with profile_stage(profiler, 'persistence'), transaction.atomic():
+                period = PayrollProcessor._lock_closing_period(period_id)
+                checkpoint = period.close_checkpoint
+                # Otro proceso pudo haber guardado parte del lote mientras se calculaba
+                done_ids = set(checkpoint['processed_employee_ids'])
+                chunk_ids = [contract.employee_id for contract, _ in chunk if contract.employee_id not in done_ids]
 
+                to_persist = [
+                    (contract, calculation_result)
+                    for (contract, _), calculation_result in zip(chunk, calculations)
+                    if contract.employee_id not in done_ids and calculation_result.get('lines')
+                ]
+                PayrollPersistenceService.save_payroll_batch(period, to_persist, user=user)
 
-            processed_count += 1
-            total_income_ves += totals.get('net_pay_ves', Decimal('0.00'))
+                checkpoint['processed_employee_ids'].extend(chunk_ids)
+                period.close_checkpoint = checkpoint
+                period.save(update_fields=['close_checkpoint', 'updated_at'])
+
+            done += len(chunk)
+            if progress is not None:
+                progress(done, total)
 
-        # 6. Finalizar Periodo
-        period.status = PayrollPeriod.Status.CLOSED
-        period.save()
+        # 3. Finalizar Periodo
+        with profile_stage(profiler, 'persistence'), transaction.atomic():
+            period = PayrollProcessor._lock_closing_period(period_id)
+            exchange_rate = Decimal(period.close_checkpoint['exchange_rate'])
+            totals = period.receipts.aggregate(count=Count('id'), net=Sum('net_pay_ves'))
+            period.status = PayrollPeriod.Status.CLOSED
+            period.close_checkpoint = None
+            period.save(update_fields=['status', 'close_checkpoint', 'updated_at'])
+        PreviewCache.invalidate(period.id)
 
         return {
-            "processed_employees": processed_count,
-            "total_payroll_ves": float(total_income_ves),
-            "exchange_rate": float(bcv_rate),
+            "processed_employees": totals['count'],
+            "total_payroll_ves": float(totals['net'] or Decimal('0.00')),
+            "exchange_rate": float(exchange_rate),
             "warnings": warnings
         }
+
     @staticmethod
-    def preview_period(period_id: int, manual_rate: Optional[Decimal] = None) -> dict:
+    @transaction.atomic
+    def rollback_closing(period_id: int, user: Optional[models.Model] = None) -> dict:
         """
-        Calcula la nómina para todos los empleados activos sin guardar cambios.
+        Revierte un cierre por lotes en curso: elimina los recibos guardados,
+        devuelve los abonos a los préstamos y deja el periodo abierto.
         """
-        # 1. Obtener Periodo
         try:
-            period = PayrollPeriod.objects.get(id=period_id)
+            period = PayrollPeriod.objects.select_for_update().get(id=period_id)
         except PayrollPeriod.DoesNotExist:
             raise ValueError(f"El periodo {period_id} no existe.")
 
-        # 2. Obtener Tasa BCV
-        bcv_rate = None
-        if manual_rate:
-            bcv_rate = Decimal(str(manual_rate))
-        else:
-            try:
-                usd_rate_obj = SalaryConverter.get_latest_rate(
-                    currency_code='USD',
-                    target_date=period.payment_date,
-                    source='BCV'
-                )
-                bcv_rate = usd_rate_obj.rate
-            except (CurrencyNotFoundError, ExchangeRateNotFoundError):
-                # Para la previsualización, si no hay tasa, podemos intentar la última disponible
-                # o devolver un error informativo.
-                last_rate = ExchangeRate.objects.filter(currency__code='USD').order_by('-date_valid').first()
-                if last_rate:
-                    bcv_rate = last_rate.rate
-                else:
-                    raise ValueError("No hay una tasa de cambio disponible para la previsualización.")
-
-        # 3. Obtener Empleados y Novedades
-        active_employees = Employee.objects.filter(is_active=True).prefetch_related('contracts')
-        all_novelties = PayrollNovelty.objects.filter(period=period)
-        novelties_map = {}
-        for n in all_novelties:
-            if n.employee_id not in novelties_map:
-                novelties_map[n.employee_id] = {}
-            novelties_map[n.employee_id][n.concept_code] = n.amount
+        if period.status != PayrollPeriod.Status.CLOSING:
+            raise ValueError("El periodo no tiene un cierre por lotes en curso.")
 
-        # 4. Procesamiento
+        result = PayrollPersistenceService.revert_period_receipts(period, user=user)
+        period.status = PayrollPeriod.Status.OPEN
+        period.close_checkpoint = None
+        period.save(update_fields=['status', 'close_checkpoint', 'updated_at'])
+        PreviewCache.invalidate(period.id)
+        return result
+
+    @staticmethod
+    def preview_period(
+        period_id: int,
+        manual_rate: Optional[Decimal] = None,
+        trace_level: str = TraceLevel.FULL,
+        use_cache: bool = True,
+        workers: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+        totals_only: bool = False,
+        profile: bool = False
+    ) -> dict:
+        """
+        Calcula la nómina para todos los empleados activos sin guardar cambios.
+        trace_level: 'off' para grillas y simulaciones, 'summary' o 'full' para auditoría.
+        use_cache: reutiliza el resultado de los empleados cuyas entradas no cambiaron
+        desde la última previsualización del periodo (ver PreviewCache).
+        workers: procesos para calcular en paralelo (None = settings.PAYROLL_PARALLEL_WORKERS).
+        progress: callback (procesados, total) para informar el avance (ver PayrollJob).
+        totals_only: devuelve solo los totales del periodo, sin el detalle por empleado.
+        profile: agrega al resultado 'profile' (ver RunProfiler).
+        """
         results = []
-        total_net_ves = Decimal('0.00')
+        for record in PayrollProcessor.iter_preview_period(
+            period_id, manual_rate=manual_rate, trace_level=trace_level, use_cache=use_cache,
+            workers=workers, progress=progress, totals_only=totals_only, profile=profile
+        ):
+            kind = record.pop('type')
+            if kind == 'header':
+                header = record
+            elif kind == 'row':
+                results.append(record)
+            else:
+                totals = record
 
-        for employee in active_employees:
-            contract = employee.contracts.filter(is_active=True).first()
-            if not contract:
-                continue
+        if totals_only:
+            return {**header, **totals}
+        result = {
+            "period_name": header['period_name'],
+            "exchange_rate": header['exchange_rate'],
+            "total_net_ves": totals['total_net_ves'],
+            "results": results
+        }
+        if profile:
+            result['profile'] = totals['profile']
+        return result
 
-            input_vars = novelties_map.get(employee.id, {})
-            engine = PayrollEngine(
-                contract=contract,
-                period=period,
-                input_variables=input_vars
-            )
-            
-            calc = engine.calculate_payroll()
-            totals = calc.get('totals', {})
-            
-            # Asegurar que los montos en las líneas sean floats para el JSON del frontend
-            lines = calc.get('lines', [])
-            for l in lines:
-                if isinstance(l.get('amount_ves'), Decimal):
-                    l['amount_ves'] = float(l['amount_ves'])
-
-            results.append({
-                'employee_id': employee.id,
-                'full_name': employee.full_name,
-                'national_id': employee.national_id,
-                'income_ves': float(totals.get('income_ves', 0)),
-                'deductions_ves': float(totals.get('deductions_ves', 0)),
-                'net_pay_ves': float(totals.get('net_pay_ves', 0)),
-                'net_pay_usd_ref': float(totals.get('net_pay_usd_ref', 0)),
-                'lines': lines
-            })
-            total_net_ves += totals.get('net_pay_ves', Decimal('0.00'))
+    @staticmethod
+    def iter_preview_period(
+        period_id: int,
+        manual_rate: Optional[Decimal] = None,
+        trace_level: str = TraceLevel.FULL,
+        use_cache: bool = True,
+        workers: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+        totals_only: bool = False,
+        chunk_size: int = PREVIEW_STREAM_CHUNK_SIZE,
+        profile: bool = False
+    ) -> Iterator[dict]:
+        """
+        Previsualización como flujo de registros, para respuestas NDJSON:
+        - {'type': 'header', 'period_name', 'exchange_rate', 'employee_count'}
+        - {'type': 'row', ...} por empleado, en el orden de preview_period
+        - {'type': 'totals', 'total_net_ves', 'total_income_ves', 'total_deductions_ves'}
 
-        return {
-            "period_name": period.name,
-            "exchange_rate": float(bcv_rate),
-            "total_net_ves": float(total_net_ves),
-            "results": results
+        Los empleados se calculan por bloques de chunk_size y cada fila se
+        emite en cuanto está lista, sin armar la respuesta completa en memoria.
+        totals_only: omite las filas (solo header y totals).
+        profile: el registro totals incluye 'profile' (ver RunProfiler).
+        """
+        profiler = RunProfiler() if profile else None
+        with profile_queries(profiler):
+            for record in PayrollProcessor._iter_preview_period(
+                period_id, manual_rate, trace_level, use_cache, workers, progress,
+                totals_only, chunk_size, profiler
+            ):
+                if record['type'] == 'totals' and profiler is not None:
+                    record['profile'] = profiler.as_dict()
+                yield record
+
+    @staticmethod
+    def _iter_preview_period(
+        period_id: int,
+        manual_rate: Optional[Decimal],
+        trace_level: str,
+        use_cache: bool,
+        workers: Optional[int],
+        progress: Optional[Callable[[int, int], None]],
+        totals_only: bool,
+        chunk_size: int,
+        profiler: Optional[RunProfiler]
+    ) -> Iterator[dict]:
+        """Cuerpo de iter_preview_period."""
+        trace_level = TraceLevel.validate(trace_level)
+
+        with profile_stage(profiler, 'load'):
+            # 1. Obtener Periodo
+            try:
+                period = PayrollPeriod.objects.get(id=period_id)
+            except PayrollPeriod.DoesNotExist:
+                raise ValueError(f"El periodo {period_id} no existe.")
+
+            # 2. Obtener Tasa BCV
+            bcv_rate = None
+            if manual_rate:
+                bcv_rate = Decimal(str(manual_rate))
+            else:
+                try:
+                    usd_rate_obj = SalaryConverter.get_latest_rate(
+                        currency_code='USD',
+                        target_date=period.payment_date,
+                        source='BCV'
+                    )
+                    bcv_rate = usd_rate_obj.rate
+                except (CurrencyNotFoundError, ExchangeRateNotFoundError):
+                    # Para la previsualización, si no hay tasa, podemos intentar la última disponible
+                    # o devolver un error informativo.
+                    last_rate = RateTimeline.latest('USD')
+                    if last_rate:
+                        bcv_rate = last_rate.rate
+                    else:
+                        raise ValueError("No hay una tasa de cambio disponible para la previsualización.")
+
+            # 3. Obtener Empleados y Novedades
+            active_employees = Employee.objects.filter(is_active=True).prefetch_related(active_contracts_prefetch())
+            all_novelties = PayrollNovelty.objects.filter(period=period)
+            novelties_map = {}
+            for n in all_novelties:
+                if n.employee_id not in novelties_map:
+                    novelties_map[n.employee_id] = {}
+                novelties_map[n.employee_id][n.concept_code] = n.amount
+
+            # 4. Procesamiento
+            catalog_version = PreviewCache.catalog_version() if use_cache else None
+            plan = PayrollPlan.build()
+            run_context = PayrollRunContext.build(period)
+
+            employees, entries = [], []
+            for employee in active_employees:
+                contract = employee.active_contracts[0] if employee.active_contracts else None
+                if not contract:
+                    continue
+                employees.append(employee)
+                entries.append((contract, novelties_map.get(employee.id, {})))
+
+        yield {
+            'type': 'header',
+            'period_name': period.name,
+            'exchange_rate': float(bcv_rate),
+            'employee_count': len(employees),
+        }
+
+        # 5. Reutilizar empleados cuya huella de entradas no cambió
+        rows = {}
+        if use_cache:
+            with profile_stage(profiler, 'cache'):
+                run_fingerprint = PreviewCache.run_fingerprint(period, run_context, trace_level, catalog_version)
+                fingerprints = PreviewCache.employee_fingerprints(run_fingerprint, period.id, employees, entries)
+                rows = PreviewCache.get_many(period.id, trace_level, fingerprints)
+
+        pending = [i for i, employee in enumerate(employees) if employee.id not in rows]
+        done = len(employees) - len(pending)
+        if progress is not None:
+            progress(done, len(employees))
+
+        totals = {
+            'total_net_ves': Decimal('0.00'),
+            'total_income_ves': Decimal('0.00'),
+            'total_deductions_ves': Decimal('0.00'),
         }
+        emitted = 0
+        for start in range(0, len(pending) + 1, chunk_size):
+            block = pending[start:start + chunk_size]
+            calculations = ParallelPayrollRunner.calculate(
+                period, [entries[i] for i in block], plan, run_context, trace_level, workers=workers,
+                progress=(lambda n, base=done: progress(base + n, len(employees))) if progress else None,
+                profiler=profiler
+            ) if block else []
+            done += len(block)
+
+            fresh = {}
+            for i, calc in zip(block, calculations):
+                employee = employees[i]
+                calc_totals = calc.get('totals', {})
+                
+                # Asegurar que los montos en las líneas sean floats para el JSON del frontend
+                lines = calc.get('lines', [])
+                for l in lines:
+                    if isinstance(l.get('amount_ves'), Decimal):
+                        l['amount_ves'] = float(l['amount_ves'])
+
+                row = {
+                    'employee_id': employee.id,
+                    'full_name': employee.full_name,
+                    'national_id': employee.national_id,
+                    'income_ves': float(calc_totals.get('income_ves', 0)),
+                    'deductions_ves': float(calc_totals.get('deductions_ves', 0)),
+                    'net_pay_ves': float(calc_totals.get('net_pay_ves', 0)),
+                    'net_pay_usd_ref': float(calc_totals.get('net_pay_usd_ref', 0)),
+                    'lines': lines
+                }
+                net = calc_totals.get('net_pay_ves', Decimal('0.00'))
+                rows[employee.id] = (row, net)
+                if use_cache:
+                    fresh[employee.id] = (fingerprints[employee.id], row, net)
+
+            if fresh:
+                with profile_stage(profiler, 'cache'):
+                    PreviewCache.set_many(period.id, trace_level, fresh)
+
+            # Emitir en orden hasta el último empleado calculado del bloque
+            # (o hasta el final en la última vuelta)
+            stop = block[-1] + 1 if block and start + chunk_size < len(pending) else len(employees)
+            for employee in employees[emitted:stop]:
+                row, net = rows.pop(employee.id)
+                totals['total_net_ves'] += net
+                totals['total_income_ves'] += Decimal(str(row['income_ves']))
+                totals['total_deductions_ves'] += Decimal(str(row['deductions_ves']))
+                if not totals_only:
+                    yield {'type': 'row', **row}
+            emitted = max(emitted, stop)
+
+        yield {'type': 'totals', **{key: float(value) for key, value in totals.items()}}
@@ -0,0 +1,313 @@
+"""
+Trabajos de nómina en segundo plano.
+
+La API encola un PayrollJob (previsualización o cierre) y responde de
+inmediato; el comando run_payroll_jobs toma los trabajos pendientes de cada
+tenant y los ejecuta con PayrollProcessor en su propio proceso, sin ocupar
+procesos web ni depender de un broker externo.
+
+El avance se escribe por una conexión propia a la base de datos: el cierre
+corre dentro de una transacción, y por la conexión principal el avance no
+sería visible hasta el commit. Un hilo aparte renueva heartbeat_at durante
+las etapas sin avance por empleado (persistencia, finalización), para que
+fail_stale_jobs no dé por caído un cierre largo que sigue trabajando.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from ..models import PayrollJob, PayrollPeriod
+from .formula_trace import TraceLevel
+from .payroll import PayrollProcessor
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre escrituras de avance de un mismo trabajo
+PROGRESS_MIN_INTERVAL_SECONDS = 1.0
+
+# Intervalo entre latidos mientras el trabajo está en ejecución
+HEARTBEAT_INTERVAL_SECONDS = 30.0
+
+
+def get_worker_name() -> str:
+    """Identificador host:pid del proceso que ejecuta trabajos."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobProgressReporter:
+    """
+    Callback de avance (procesados, total) para PayrollProcessor.
+    Actualiza processed/total/heartbeat_at del trabajo por una conexión
+    separada en autocommit, para que la API lo vea mientras el cierre sigue
+    en su transacción.
+    """
+
+    def __init__(self, job: PayrollJob):
+        self.job = job
+        self._connection = None
+        self._last_write = 0.0
+
+    def __call__(self, processed: int, total: int) -> None:
+        self.job.processed = processed
+        self.job.total = total
+        self.job.heartbeat_at = timezone.now()
+
+        now = time.monotonic()
+        if 0 < processed < total and now - self._last_write < PROGRESS_MIN_INTERVAL_SECONDS:
+            return
+        self._last_write = now
+        try:
+            with self._get_connection().cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {PayrollJob._meta.db_table} '
+                    'SET processed = %s, total = %s, heartbeat_at = %s '
+                    'WHERE id = %s AND status = %s',
+                    [processed, total, self.job.heartbeat_at, self.job.id, PayrollJob.Status.RUNNING]
+                )
+        except Exception:
+            # El avance es informativo: nunca debe interrumpir el cálculo
+            logger.warning("No se pudo registrar el avance del trabajo %s", self.job.id, exc_info=True)
+
+    def _get_connection(self):
+        if self._connection is None:
+            self._connection = connections.create_connection('default')
+            self._connection.set_schema(connection.schema_name)
+        return self._connection
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class JobHeartbeat:
+    """
+    Renueva heartbeat_at del trabajo cada `interval` segundos desde un hilo
+    propio, con su propia conexión (las conexiones de Django no se comparten
+    entre hilos). Cubre las etapas en que no hay avance por empleado que
+    informar: persistencia de recibos, cierre del periodo, resumen final.
+    Solo escribe mientras el trabajo siga RUNNING; si otro proceso lo marcó
+    como fallido, el hilo se detiene.
+    """
+
+    def __init__(self, job: PayrollJob, interval: Optional[float] = None):
+        self.job = job
+        self.interval = interval if interval is not None else getattr(
+            settings, 'PAYROLL_JOB_HEARTBEAT_SECONDS', HEARTBEAT_INTERVAL_SECONDS
+        )
+        self._schema_name = connection.schema_name
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'JobHeartbeat':
+        self._thread = threading.Thread(
+            target=self._run, name=f'payroll-job-{self.job.id}-heartbeat', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def beat(self, conn) -> bool:
+        """Escribe un latido. Devuelve False si el trabajo ya no está en ejecución."""
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {PayrollJob._meta.db_table} SET heartbeat_at = %s '
+                'WHERE id = %s AND status = %s',
+                [timezone.now(), self.job.id, PayrollJob.Status.RUNNING]
+            )
+            return cursor.rowcount > 0
+
+    def _run(self) -> None:
+        conn = None
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    if conn is None:
+                        conn = connections.create_connection('default')
+                        conn.set_schema(self._schema_name)
+                    if not self.beat(conn):
+                        logger.warning("El trabajo %s ya no está en ejecución; se detiene el latido", self.job.id)
+                        return
+                except Exception:
+                    logger.warning("No se pudo registrar el latido del trabajo %s", self.job.id, exc_info=True)
+        finally:
+            if conn is not None:
+                conn.close()
+
+
+class PayrollJobService:
+    """
+    Encola, asigna y ejecuta trabajos de nómina del tenant activo.
+    """
+
+    @staticmethod
+    def enqueue(
+        kind: str,
+        period: PayrollPeriod,
+        user=None,
+        manual_rate: Optional[Any] = None,
+        trace_level: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        profile: bool = False
+    ) -> PayrollJob:
+        """
+        Crea un trabajo pendiente. Valida de antemano lo que haría fallar el
+        cierre para informarlo en la respuesta y no en el trabajo.
+        chunk_size: cierre por lotes reanudable (ver process_period_chunked).
+        profile: el resultado del trabajo incluye 'profile' (ver RunProfiler).
+        """
+        if kind not in PayrollJob.Kind.values:
+            raise ValueError(f"Tipo de trabajo inválido: {kind}")
+
+        params: Dict[str, Any] = {'trace_level': TraceLevel.validate(trace_level)}
+        if manual_rate:
+            params['manual_rate'] = str(manual_rate)
+        if chunk_size:
+            params['chunk_size'] = int(chunk_size)
+        if profile:
+            params['profile'] = True
+
+        if kind == PayrollJob.Kind.CLOSE:
+            if period.status == PayrollPeriod.Status.CLOSED:
+                raise ValueError("Este periodo ya se encuentra cerrado.")
+            if period.status == PayrollPeriod.Status.CLOSING and not chunk_size:
+                raise ValueError("El periodo tiene un cierre por lotes en curso. Reanúdelo o reviértalo.")
+            active = PayrollJob.objects.filter(
+                period=period, kind=PayrollJob.Kind.CLOSE,
+                status__in=[PayrollJob.Status.PENDING, PayrollJob.Status.RUNNING]
+            )
+            if active.exists():
+                raise ValueError("Ya hay un cierre en curso para este periodo.")
+
+        return PayrollJob.objects.create(
+            kind=kind,
+            period=period,
+            params=params,
+            requested_by=user if user is not None and user.is_authenticated else None,
+        )
+
+    @staticmethod
+    def claim_next(worker: Optional[str] = None) -> Optional[PayrollJob]:
+        """
+        Toma el trabajo pendiente más antiguo y lo marca en ejecución.
+        skip_locked permite varios procesos run_payroll_jobs en paralelo.
+        """
+        with transaction.atomic():
+            job = (
+                PayrollJob.objects.select_for_update(skip_locked=True)
+                .filter(status=PayrollJob.Status.PENDING)
+                .order_by('created_at', 'id')
+                .first()
+            )
+            if job is None:
+                return None
+            now = timezone.now()
+            job.status = PayrollJob.Status.RUNNING
+            job.started_at = now
+            job.heartbeat_at = now
+            job.worker = worker or get_worker_name()
+            job.save(update_fields=['status', 'started_at', 'heartbeat_at', 'worker'])
+        return job
+
+    @staticmethod
+    def run(job: PayrollJob) -> PayrollJob:
+        """
+        Ejecuta el trabajo con PayrollProcessor y guarda resultado o error.
+        El estado final solo se escribe si el trabajo sigue RUNNING: si
+        fail_stale_jobs lo dio por caído entretanto, este proceso perdió la
+        propiedad del trabajo y se conserva lo registrado en la base de datos.
+        """
+        reporter = JobProgressReporter(job)
+        heartbeat = JobHeartbeat(job).start()
+        params = job.params or {}
+        try:
+            if job.kind == PayrollJob.Kind.CLOSE and params.get('chunk_size'):
+                result = PayrollProcessor.process_period_chunked(
+                    job.period_id,
+                    user=job.requested_by,
+                    manual_rate=params.get('manual_rate'),
+                    trace_level=params.get('trace_level'),
+                    progress=reporter,
+                    chunk_size=params['chunk_size'],
+                    profile=params.get('profile', False),
+                )
+            elif job.kind == PayrollJob.Kind.CLOSE:
+                result = PayrollProcessor.process_period(
+                    job.period_id,
+                    user=job.requested_by,
+                    manual_rate=params.get('manual_rate'),
+                    trace_level=params.get('trace_level'),
+                    progress=reporter,
+                    profile=params.get('profile', False),
+                )
+            else:
+                result = PayrollProcessor.preview_period(
+                    job.period_id,
+                    manual_rate=params.get('manual_rate'),
+                    trace_level=params.get('trace_level'),
+                    progress=reporter,
+                    profile=params.get('profile', False),
+                )
+        except Exception as e:
+            logger.exception("Falló el trabajo de nómina %s", job.id)
+            job.status = PayrollJob.Status.FAILED
+            job.error = str(e)
+        else:
+            job.status = PayrollJob.Status.SUCCEEDED
+            job.result = result
+            job.warnings = result.get('warnings', [])
+            job.processed = job.total
+        finally:
+            heartbeat.stop()
+            reporter.close()
+
+        job.finished_at = timezone.now()
+        job.heartbeat_at = job.finished_at
+        updated = PayrollJob.objects.filter(pk=job.pk, status=PayrollJob.Status.RUNNING).update(
+            status=job.status,
+            error=job.error,
+            result=job.result,
+            warnings=job.warnings,
+            processed=job.processed,
+            total=job.total,
+            finished_at=job.finished_at,
+            heartbeat_at=job.heartbeat_at,
+        )
+        if not updated:
+            logger.error(
+                "El trabajo %s dejó de pertenecer a este proceso (estado %s descartado)",
+                job.id, job.status
+            )
+            job.refresh_from_db()
+        return job
+
+    @staticmethod
+    def fail_stale_jobs(stale_seconds: Optional[int] = None) -> int:
+        """
+        Marca como fallidos los trabajos en ejecución sin avance reciente
+        (proceso caído o reiniciado). Devuelve la cantidad afectada.
+        """
+        if stale_seconds is None:
+            stale_seconds = getattr(settings, 'PAYROLL_JOB_STALE_SECONDS', 900)
+        now = timezone.now()
+        return PayrollJob.objects.filter(
+            status=PayrollJob.Status.RUNNING,
+            heartbeat_at__lt=now - timedelta(seconds=stale_seconds)
+        ).update(
+            status=PayrollJob.Status.FAILED,
+            error="El proceso que ejecutaba el trabajo dejó de informar avance.",
+            finished_at=now
+        )
@@ -1,10 +1,17 @@
 from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
 from decimal import Decimal
+from typing import Any, Dict, List, Tuple
+from simple_history.utils import bulk_update_with_history
 from ..models import (
     PayrollReceipt, PayrollReceiptLine, Loan, LoanPayment, 
     LaborContract, PayrollPeriod
 )
 
+# Filas por INSERT/UPDATE en las escrituras masivas del cierre
+BULK_BATCH_SIZE = 1000
+
 class PayrollPersistenceService:
     """
     Servicio especializado en la persistencia de resultados de nómina.
@@ -23,12 +30,13 @@ class PayrollPersistenceService:
             calculation_result: Salida del método calculate_payroll() del motor.
             user: Usuario que realiza la acción (opcional).
         """
-        totals = calculation_result.get('totals', {})
-        results_lines = calculation_result.get('lines', [])
-        exchange_rate = calculation_result.get('exchange_rate_used', Decimal('1.00'))
+        return PayrollPersistenceService.save_payroll_batch(
+            period, [(contract, calculation_result)], user=user
+        )[0]
 
-        # 1. Crear Snapshot del contrato
-        contract_snapshot = {
+    @staticmethod
+    def _contract_snapshot(contract: LaborContract) -> Dict[str, Any]:
+        return {
             'position': contract.position,
             'job_position': contract.job_position.name if contract.job_position else contract.position,
             'department': contract.department.name if contract.department else None,
@@ -39,86 +47,164 @@ class PayrollPersistenceService:
             'payment_frequency': contract.payment_frequency,
         }
 
-        # 2. Crear Cabecera del Recibo (Snapshot de montos y tipos)
-        receipt = PayrollReceipt.objects.create(
-            period=period,
-            employee=contract.employee,
-            contract_snapshot=contract_snapshot,
-            salary_base_snapshot=contract.salary_amount,
-            total_income_ves=totals.get('income_ves', Decimal('0.00')),
-            total_deductions_ves=totals.get('deductions_ves', Decimal('0.00')),
-            net_pay_ves=totals.get('net_pay_ves', Decimal('0.00')),
-            exchange_rate_snapshot=exchange_rate,
-            currency_code='VES', # Moneda legal base
-            status=PayrollReceipt.ReceiptStatus.DRAFT
-        )
+    @staticmethod
+    @transaction.atomic
+    def save_payroll_batch(
+        period: PayrollPeriod,
+        items: List[Tuple[LaborContract, dict]],
+        user=None
+    ) -> List[PayrollReceipt]:
+        """
+        Guarda los resultados de todos los empleados de un cierre con
+        escrituras masivas: un bulk_create de recibos, las líneas y los abonos
+        en lotes, y los saldos de préstamos en un bulk_update tras bloquear
+        todos los préstamos afectados en una sola consulta.
+
+        Args:
+            period: Periodo de nómina relacionado.
+            items: Lista de (contrato, salida de calculate_payroll()).
+            user: Usuario que realiza la acción (opcional).
+
+        Returns:
+            Recibos creados, en el mismo orden de items.
+        """
+        contracts = [contract for contract, _ in items]
+        # Relaciones del snapshot cargadas en una consulta por relación
+        prefetch_related_objects(contracts, 'job_position', 'department', 'branch', 'salary_currency')
 
-        # 3. Crear Líneas de Detalle
+        # 1. Cabeceras de recibo (Snapshot de contrato, montos y tipos)
+        receipts = []
+        for contract, calculation_result in items:
+            totals = calculation_result.get('totals', {})
+            receipts.append(PayrollReceipt(
+                period=period,
+                employee_id=contract.employee_id,
+                contract_snapshot=PayrollPersistenceService._contract_snapshot(contract),
+                salary_base_snapshot=contract.salary_amount,
+                total_income_ves=totals.get('income_ves', Decimal('0.00')),
+                total_deductions_ves=totals.get('deductions_ves', Decimal('0.00')),
+                net_pay_ves=totals.get('net_pay_ves', Decimal('0.00')),
+                exchange_rate_snapshot=calculation_result.get('exchange_rate_used', Decimal('1.00')),
+                currency_code='VES', # Moneda legal base
+                status=PayrollReceipt.ReceiptStatus.DRAFT
+            ))
+        # En PostgreSQL bulk_create devuelve los ids generados
+        PayrollReceipt.objects.bulk_create(receipts, batch_size=BULK_BATCH_SIZE)
+
+        # 2. Líneas de detalle y descuentos de préstamos
         detail_objs = []
-        for line in results_lines:
-            # Capturar logs de cálculo del motor
-            calc_log = {
-                'trace': line.get('trace', ''),
-                'formula': line.get('formula', ''),
-                'variables': line.get('variables', {})
-            }
-
-            # Determinar si tiene incidencia salarial (basado en el código o metadatos)
-            # Nota: Esto podría venir directamente de la configuración del concepto en DB
-            is_incidence = line.get('is_salary_incidence', False)
-
-            detail_objs.append(
-                PayrollReceiptLine(
-                    receipt=receipt,
-                    concept_code=line['code'],
-                    concept_name=line['name'],
-                    kind=line['kind'],
-                    amount_ves=line['amount_ves'],
-                    tipo_recibo=line.get('tipo_recibo', 'salario'),
-                    quantity=line.get('quantity', 0) or 0,
-                    unit=line.get('unit', 'días'),
-                    percentage=line.get('percentage', 0) or 0,
-                    calculation_log=calc_log,
-                    is_salary_incidence=is_incidence,
-                    # Referencial en moneda origen
-                    amount_src=(line['amount_ves'] / exchange_rate).quantize(Decimal('0.01')) if exchange_rate > 0 else 0
-                )
-            )
+        loan_lines = []
+        for receipt, (_, calculation_result) in zip(receipts, items):
+            exchange_rate = calculation_result.get('exchange_rate_used', Decimal('1.00'))
+            for line in calculation_result.get('lines', []):
+                # Capturar logs de cálculo del motor
+                calc_log = {
+                    'trace': line.get('trace', ''),
+                    'formula': line.get('formula', ''),
+                    'variables': line.get('variables', {})
+                }
 
-            # 4. Amortización de Préstamos (Cuentas por Cobrar)
-            if line.get('code') == 'LOAN' and line.get('loan_id'):
-                try:
-                    loan = Loan.objects.select_for_update().get(id=line['loan_id'])
-                    
-                    # El monto del descuento en VES debemos convertirlo a la moneda del préstamo
-                    payment_amount_ves = line['amount_ves']
-                    payment_amount_loan_curr = payment_amount_ves
-                    
-                    if loan.currency.code != 'VES':
-                        # Usamos la tasa del recibo
-                        payment_amount_loan_curr = (payment_amount_ves / exchange_rate).quantize(Decimal('0.01'))
-
-                    # Crear registro de abono
-                    LoanPayment.objects.create(
-                        loan=loan,
+                detail_objs.append(
+                    PayrollReceiptLine(
                         receipt=receipt,
-                        amount=payment_amount_loan_curr,
-                        payment_date=receipt.period.payment_date,
-                        exchange_rate_applied=exchange_rate if loan.currency.code != 'VES' else Decimal('1.00'),
-                        reference=f"Deducción Nómina {receipt.period.name}"
+                        concept_code=line['code'],
+                        concept_name=line['name'],
+                        kind=line['kind'],
+                        amount_ves=line['amount_ves'],
+                        tipo_recibo=line.get('tipo_recibo', 'salario'),
+                        quantity=line.get('quantity', 0) or 0,
+                        unit=line.get('unit', 'días'),
+                        percentage=line.get('percentage', 0) or 0,
+                        calculation_log=calc_log,
+                        is_salary_incidence=line.get('is_salary_incidence', False),
+                        # Referencial en moneda origen
+                        amount_src=(line['amount_ves'] / exchange_rate).quantize(Decimal('0.01')) if exchange_rate > 0 else 0
                     )
+                )
+
+                if line.get('code') == 'LOAN' and line.get('loan_id'):
+                    loan_lines.append((receipt, exchange_rate, line))
+
+        PayrollReceiptLine.objects.bulk_create(detail_objs, batch_size=BULK_BATCH_SIZE)
 
-                    # Actualizar Saldo
-                    loan.balance -= payment_amount_loan_curr
-                    if loan.balance <= Decimal('0.01'):
-                        loan.balance = Decimal('0.00')
-                        loan.status = Loan.LoanStatus.Paid
-                    
-                    loan.save()
-                except Loan.DoesNotExist:
-                    pass
+        # 3. Amortización de Préstamos (Cuentas por Cobrar)
+        if loan_lines:
+            PayrollPersistenceService._apply_loan_payments(period, loan_lines, user)
 
-        # Persistir todas las líneas en una sola operación
-        PayrollReceiptLine.objects.bulk_create(detail_objs)
+        return receipts
 
-        return receipt
+    @staticmethod
+    def _apply_loan_payments(period: PayrollPeriod, loan_lines: List[Tuple], user=None) -> None:
+        """Abonos y saldos de los préstamos descontados en el cierre."""
+        loans = Loan.objects.select_for_update(of=('self',)).select_related('currency').in_bulk(
+            sorted({line['loan_id'] for _, _, line in loan_lines})
+        )
+
+        payments = []
+        updated = {}
+        now = timezone.now()
+        for receipt, exchange_rate, line in loan_lines:
+            loan = loans.get(line['loan_id'])
+            if loan is None:
+                continue
+
+            # El monto del descuento en VES debemos convertirlo a la moneda del préstamo
+            payment_amount_ves = line['amount_ves']
+            payment_amount_loan_curr = payment_amount_ves
+
+            if loan.currency.code != 'VES':
+                # Usamos la tasa del recibo
+                payment_amount_loan_curr = (payment_amount_ves / exchange_rate).quantize(Decimal('0.01'))
+
+            payments.append(LoanPayment(
+                loan=loan,
+                receipt=receipt,
+                amount=payment_amount_loan_curr,
+                payment_date=period.payment_date,
+                exchange_rate_applied=exchange_rate if loan.currency.code != 'VES' else Decimal('1.00'),
+                reference=f"Deducción Nómina {period.name}"
+            ))
+
+            # Actualizar Saldo
+            loan.balance -= payment_amount_loan_curr
+            if loan.balance <= Decimal('0.01'):
+                loan.balance = Decimal('0.00')
+                loan.status = Loan.LoanStatus.Paid
+            loan.updated_at = now
+            updated[loan.id] = loan
+
+        LoanPayment.objects.bulk_create(payments, batch_size=BULK_BATCH_SIZE)
+        # Conserva el historial de auditoría (django-simple-history) de cada préstamo
+        bulk_update_with_history(
+            list(updated.values()), Loan, ['balance', 'status', 'updated_at'],
+            batch_size=BULK_BATCH_SIZE, default_user=user
+        )
+
+    @staticmethod
+    @transaction.atomic
+    def revert_period_receipts(period: PayrollPeriod, user=None) -> Dict[str, int]:
+        """
+        Elimina los recibos ya guardados de un periodo y devuelve a cada
+        préstamo el monto abonado en esos recibos (reverso de un cierre por
+        lotes interrumpido).
+        """
+        payments = list(LoanPayment.objects.filter(receipt__period=period).values_list('loan_id', 'amount'))
+        loans = Loan.objects.select_for_update().in_bulk(sorted({loan_id for loan_id, _ in payments}))
+
+        now = timezone.now()
+        for loan_id, amount in payments:
+            loan = loans[loan_id]
+            loan.balance += amount
+            if loan.status == Loan.LoanStatus.Paid and loan.balance > Decimal('0.01'):
+                loan.status = Loan.LoanStatus.Active
+            loan.updated_at = now
+
+        LoanPayment.objects.filter(receipt__period=period).delete()
+        if loans:
+            bulk_update_with_history(
+                list(loans.values()), Loan, ['balance', 'status', 'updated_at'],
+                batch_size=BULK_BATCH_SIZE, default_user=user
+            )
+        # Las líneas se eliminan en cascada con su recibo
+        deleted_receipts = PayrollReceipt.objects.filter(period=period).delete()[1].get(PayrollReceipt._meta.label, 0)
+        return {'deleted_receipts': deleted_receipts, 'restored_loans': len(loans)}
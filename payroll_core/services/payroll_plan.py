@@ -0,0 +1,109 @@
+"""
+Plan de nómina precalculado para una corrida (preview o cierre).
+
+Reúne todo lo que depende únicamente del catálogo de conceptos y no del
+empleado: conceptos activos ordenados, deductores del sueldo base,
+etiquetas de incidencia, parámetros de deducciones de ley ya interpretados,
+fórmulas compiladas y el grafo de dependencias entre ellas. Se construye
+una sola vez por corrida y lo comparten todas las instancias de PayrollEngine.
+"""
+from typing import Any, Dict, List, Optional
+
+from ..models import PayrollConcept
+from .formula_cache import CompiledFormula, FormulaCache
+from .formula_dependencies import FormulaDependencies
+
+
+class PayrollPlan:
+    """
+    Vista inmutable del catálogo de conceptos activos para una corrida.
+    """
+
+    def __init__(self, concepts: List[PayrollConcept]):
+        self.concepts = concepts
+
+        # Códigos cuyas novedades restan días del sueldo base
+        self.deductor_codes = [c.code for c in concepts if c.deducts_from_base_salary]
+
+        # Etiquetas de acumuladores (TOTAL_{tag}) presentes en el catálogo
+        self.incidence_tags = []
+        for c in concepts:
+            for tag in (c.incidences or []):
+                if tag not in self.incidence_tags:
+                    self.incidence_tags.append(tag)
+
+        self.law_params = {
+            c.id: self._parse_law_params(c)
+            for c in concepts
+            if c.kind == PayrollConcept.ConceptKind.DEDUCTION
+            and c.behavior == PayrollConcept.ConceptBehavior.LAW_DEDUCTION
+            and c.computation_method != PayrollConcept.ComputationMethod.DYNAMIC_FORMULA
+        }
+
+        # Las fórmulas inválidas se dejan fuera: el motor reporta el error al evaluarlas
+        self.formulas: Dict[int, CompiledFormula] = {}
+        for c in concepts:
+            if not c.formula:
+                continue
+            try:
+                self.formulas[c.id] = FormulaCache.get(c)
+            except SyntaxError:
+                pass
+
+        # Variables alcanzables por las fórmulas y orden de evaluación por dependencias
+        # (receipt_order desempata; un catálogo consistente conserva su orden)
+        self.dependencies = FormulaDependencies(concepts, self.formulas)
+        self.referenced_names = self.dependencies.referenced_names
+        self.earnings = self.dependencies.order(
+            [c for c in concepts if c.kind == PayrollConcept.ConceptKind.EARNING]
+        )
+        self.deductions = self.dependencies.order(
+            [c for c in concepts if c.kind == PayrollConcept.ConceptKind.DEDUCTION]
+        )
+
+    @classmethod
+    def build(cls) -> 'PayrollPlan':
+        """Carga los conceptos activos (una consulta) y arma el plan."""
+        concepts = list(
+            PayrollConcept.objects.filter(active=True)
+            .select_related('currency')
+            .order_by('receipt_order', 'id')
+        )
+        return cls(concepts)
+
+    def get_formula(self, concept: PayrollConcept) -> Optional[CompiledFormula]:
+        """Fórmula compilada del concepto (compila bajo demanda si no está en el plan)."""
+        compiled = self.formulas.get(concept.id)
+        if compiled is None or compiled.source != concept.formula:
+            compiled = FormulaCache.get(concept)
+        return compiled
+
+    @staticmethod
+    def _parse_law_params(concept: PayrollConcept) -> Dict[str, Any]:
+        """
+        Interpreta system_params de una deducción de ley.
+        La tasa tomada del contrato (rate_source=CONTRACT) se resuelve por empleado.
+        """
+        system_params = concept.system_params or {}
+        rate_source = system_params.get('rate_source', 'CONCEPT')
+
+        rate = None
+        if rate_source != 'CONTRACT':
+            # Tasa desde el valor del concepto (ej: IVSS, FAOV, RPE)
+            rate = concept.value / 100 if concept.computation_method == PayrollConcept.ComputationMethod.DYNAMIC_FORMULA else concept.value
+
+        cap_multiplier = system_params.get('cap_multiplier')
+        if cap_multiplier is None:
+            # Fallback a lógica legacy para conceptos sin system_params
+            cap_multiplier = 5 if concept.code == 'IVSS' else (10 if concept.code == 'RPE' else None)
+
+        return {
+            'rate_source': rate_source,
+            'contract_field': system_params.get('contract_field', 'islr_retention_percentage'),
+            'rate': rate,
+            'base_source': system_params.get('base_source', 'ACCUMULATOR'),
+            'tag': system_params.get('base_label', concept.code + '_BASE'),
+            'is_weekly': concept.code in ['IVSS', 'RPE'],
+            'tope_sm': cap_multiplier,
+            'name': concept.name,
+        }
@@ -0,0 +1,181 @@
+"""
+Caché incremental de la previsualización de nómina.
+
+Cada empleado de un periodo tiene una huella (fingerprint) de todo lo que
+alimenta su cálculo: contrato, cargo, datos del empleado, novedades,
+conceptos asignados (overrides), préstamos activos y los datos comunes de la
+corrida (catálogo de conceptos, empresa, política, calendario y tasas).
+
+preview_period solo recalcula a los empleados cuya huella cambió desde la
+última previsualización; el resto se toma de la caché. Así, al editar una
+celda de la grilla de novedades se recalcula un único empleado.
+
+Las filas se guardan en la caché de Django (settings.CACHES), compartida por
+los workers de gunicorn y run_payroll_jobs. Los cambios del catálogo de
+conceptos se detectan con una versión por tenant y los de las novedades con
+una versión por empleado y periodo; ambas las cambian las señales (y
+NoveltyBatchService.upsert), sin comparar campos del catálogo.
+"""
+import hashlib
+import json
+from typing import Any, Dict, List, Tuple
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ..models import Currency, EmployeeConcept, JobPosition, Loan
+
+# Se incrementa cuando cambia la lógica del motor para descartar resultados viejos
+PREVIEW_CACHE_VERSION = 3
+
+# Segundos que se conserva la fila de un empleado en la caché
+PREVIEW_CACHE_TIMEOUT = 12 * 60 * 60
+
+CACHE_KEY_PREFIX = 'payroll_preview'
+
+
+def _digest(payload: Any) -> str:
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _snapshot(instance) -> Dict[str, Any]:
+    """Valores de los campos concretos de un modelo."""
+    return {f.attname: getattr(instance, f.attname) for f in instance._meta.concrete_fields}
+
+
+def _tenant_key(*parts) -> str:
+    """Clave de la caché dentro del tenant activo."""
+    return ':'.join([CACHE_KEY_PREFIX, getattr(connection, 'schema_name', 'public'), *map(str, parts)])
+
+
+def _token(key: str) -> str:
+    """Versión guardada en la clave (se crea una nueva si no existe o fue expulsada)."""
+    token = cache.get(key)
+    if token is None:
+        cache.add(key, uuid4().hex, timeout=None)
+        token = cache.get(key)
+    return token
+
+
+class PreviewCache:
+    """
+    Resultados de preview por empleado, indexados por (schema, periodo, versión
+    del periodo, nivel de traza, empleado). Cada entrada guarda (huella, fila
+    del preview, neto en VES).
+    """
+
+    @staticmethod
+    def catalog_version() -> str:
+        """
+        Versión del catálogo de conceptos y novedades del tenant. Se lee antes
+        de cargar el plan, de modo que un cambio posterior invalide la corrida.
+        """
+        return _token(_tenant_key('catalog'))
+
+    @staticmethod
+    def bump_catalog_version() -> None:
+        """Cambia la versión del catálogo del tenant cuando se confirme la transacción en curso."""
+        key = _tenant_key('catalog')
+        transaction.on_commit(lambda: cache.set(key, uuid4().hex, timeout=None))
+
+    @staticmethod
+    def bump_novelty_versions(period_id: int, employee_ids) -> None:
+        """Cambia la versión de novedades de los empleados en el periodo al confirmarse la transacción."""
+        keys = [_tenant_key(period_id, 'novelties', employee_id) for employee_id in set(employee_ids)]
+        transaction.on_commit(lambda: cache.set_many({key: uuid4().hex for key in keys}, timeout=None))
+
+    @staticmethod
+    def _row_prefix(period_id: int, trace_level: str) -> str:
+        return _tenant_key(period_id, _token(_tenant_key(period_id, 'version')), trace_level)
+
+    @staticmethod
+    def run_fingerprint(period, run_context, trace_level: str, catalog_version: str) -> str:
+        """Huella de los datos comunes a todos los empleados de la corrida."""
+        company = run_context.company
+        rates = {
+            currency.code: run_context.get_rate(currency)[1]
+            for currency in Currency.objects.all()
+        }
+        return _digest({
+            'version': PREVIEW_CACHE_VERSION,
+            'period': _snapshot(period),
+            'today': timezone.now().date(),  # ANTIGUEDAD depende de la fecha actual
+            'trace_level': trace_level,
+            'company': _snapshot(company) if company else None,
+            'policy': run_context.policy_factors,
+            'min_salary': run_context.min_salary,
+            'calendar': run_context.calendar,
+            'catalog': catalog_version,
+            'rates': rates,
+        })
+
+    @staticmethod
+    def employee_fingerprints(
+        run_fingerprint: str,
+        period_id: int,
+        employees: List,
+        entries: List[Tuple[Any, Dict[str, Any]]]
+    ) -> Dict[int, str]:
+        """
+        Huella por empleado. Carga overrides, préstamos y cargos de todos los
+        empleados en tres consultas, y sus versiones de novedades en una
+        lectura de la caché.
+        """
+        employee_ids = [e.id for e in employees]
+
+        novelty_versions = cache.get_many([_tenant_key(period_id, 'novelties', i) for i in employee_ids])
+
+        overrides: Dict[int, List] = {}
+        for employee_id, concept_id, value in EmployeeConcept.objects.filter(
+            employee_id__in=employee_ids, active=True
+        ).values_list('employee_id', 'concept_id', 'override_value'):
+            overrides.setdefault(employee_id, []).append((concept_id, value))
+
+        loans: Dict[int, List] = {}
+        for loan in Loan.objects.filter(employee_id__in=employee_ids, status=Loan.LoanStatus.Active):
+            loans.setdefault(loan.employee_id, []).append(_snapshot(loan))
+
+        position_ids = {contract.job_position_id for contract, _ in entries if contract.job_position_id}
+        positions = {p.id: _snapshot(p) for p in JobPosition.objects.filter(id__in=position_ids)}
+
+        fingerprints = {}
+        for employee, (contract, novelties) in zip(employees, entries):
+            fingerprints[employee.id] = _digest({
+                'run': run_fingerprint,
+                'employee': _snapshot(employee),
+                'contract': _snapshot(contract),
+                'position': positions.get(contract.job_position_id),
+                'novelties': novelties,
+                'novelty_version': novelty_versions.get(_tenant_key(period_id, 'novelties', employee.id)),
+                'overrides': sorted(overrides.get(employee.id, []), key=str),
+                'loans': sorted(loans.get(employee.id, []), key=lambda l: l['id']),
+            })
+        return fingerprints
+
+    @classmethod
+    def get_many(cls, period_id: int, trace_level: str, fingerprints: Dict[int, str]) -> Dict[int, Tuple[Dict[str, Any], Any]]:
+        """Filas vigentes (cuya huella no cambió): { employee_id: (fila, neto) }."""
+        prefix = cls._row_prefix(period_id, trace_level)
+        entries = cache.get_many([f'{prefix}:{employee_id}' for employee_id in fingerprints])
+        hits = {}
+        for employee_id, fingerprint in fingerprints.items():
+            entry = entries.get(f'{prefix}:{employee_id}')
+            if entry and entry[0] == fingerprint:
+                hits[employee_id] = (entry[1], entry[2])
+        return hits
+
+    @classmethod
+    def set_many(cls, period_id: int, trace_level: str, rows: Dict[int, Tuple[str, Dict[str, Any], Any]]) -> None:
+        """Guarda filas recién calculadas: { employee_id: (huella, fila, neto) }."""
+        prefix = cls._row_prefix(period_id, trace_level)
+        cache.set_many(
+            {f'{prefix}:{employee_id}': entry for employee_id, entry in rows.items()},
+            timeout=PREVIEW_CACHE_TIMEOUT
+        )
+
+    @staticmethod
+    def invalidate(period_id: int) -> None:
+        """Descarta las previsualizaciones de un periodo del tenant actual."""
+        cache.set(_tenant_key(period_id, 'version'), uuid4().hex, timeout=None)
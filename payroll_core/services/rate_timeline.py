@@ -0,0 +1,171 @@
+"""
+Línea de tiempo de tasas de cambio.
+
+Carga el histórico de ExchangeRate de una moneda en una sola consulta y lo
+guarda en listas ordenadas por fecha de validez (una por fuente y otra con
+todas las fuentes). La pregunta "¿qué tasa rige en la fecha D?" se responde
+con búsqueda binaria en memoria, sin volver a consultar la base de datos.
+
+ExchangeRate vive en el esquema público, por lo que la caché es común a
+todos los tenants del proceso. Se invalida al confirmarse un cambio de
+ExchangeRate en este proceso (señales de guardado y borrado) y, para los
+cambios hechos por otros procesos, con sync(): una consulta que compara la
+huella (cantidad, último id, última modificación) de cada moneda con la de
+la carga anterior. Cada corrida de nómina sincroniza al empezar; las
+conversiones sueltas (SalaryConverter, get_usd_exchange_rate) sincronizan a
+lo sumo una vez cada RATE_SYNC_SECONDS. Los cierres no usan la caché: leen
+la tasa directamente de la base de datos (query_at / query_earliest).
+"""
+import time
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Count, Max
+
+from ..models import ExchangeRate
+
+# Segundos durante los que una conversión suelta confía en el último sync()
+RATE_SYNC_SECONDS = 60
+
+
+class RateSeries:
+    """
+    Tasas de una moneda (y opcionalmente una fuente) ordenadas por fecha.
+    """
+
+    def __init__(self, rates: List[ExchangeRate]):
+        self.rates = rates
+        self.dates: List[datetime] = [r.date_valid for r in rates]
+
+    def at(self, moment: datetime) -> Optional[ExchangeRate]:
+        """Tasa más reciente con date_valid <= moment (None si no hay)."""
+        index = bisect_right(self.dates, moment)
+        return self.rates[index - 1] if index else None
+
+    def earliest(self) -> Optional[ExchangeRate]:
+        return self.rates[0] if self.rates else None
+
+    def latest(self) -> Optional[ExchangeRate]:
+        return self.rates[-1] if self.rates else None
+
+
+class RateTimeline:
+    """
+    Caché por proceso de las series de tasas, indexada por código de moneda.
+    Los puntos de entrada llaman a sync() antes de consultarla:
+    PayrollRunContext.build con force=True (una vez por corrida) y
+    SalaryConverter / get_usd_exchange_rate sin forzar.
+    """
+
+    # { currency_code: { source | None: RateSeries } }
+    _timelines: Dict[str, Dict[Optional[str], RateSeries]] = {}
+
+    # Huella de cada moneda en el último sync(): { currency_code: (cantidad, último id, última modificación) }
+    _stamps: Dict[str, Tuple] = {}
+
+    # time.monotonic() del último sync() (None = nunca)
+    _synced_at: Optional[float] = None
+
+    @classmethod
+    def sync(cls, force: bool = False) -> None:
+        """
+        Descarta las series de las monedas cuyas tasas cambiaron (en este u
+        otro proceso) desde el sync anterior. Una consulta para todas las monedas.
+        Sin force no consulta si el último sync fue hace menos de
+        RATE_SYNC_SECONDS (los cambios de este proceso ya invalidan con changed()).
+        """
+        now = time.monotonic()
+        if not force and cls._synced_at is not None and now - cls._synced_at < RATE_SYNC_SECONDS:
+            return
+        cls._synced_at = now
+        stamps = {
+            row['currency_id']: (row['count'], row['last_id'], row['last_update'])
+            for row in ExchangeRate.objects.order_by().values('currency_id').annotate(
+                count=Count('id'), last_id=Max('id'), last_update=Max('updated_at')
+            )
+        }
+        for currency_code in list(cls._timelines):
+            if stamps.get(currency_code) != cls._stamps.get(currency_code):
+                cls._timelines.pop(currency_code, None)
+        cls._stamps = stamps
+
+    @classmethod
+    def changed(cls, currency_code: str) -> None:
+        """
+        Descarta la serie de la moneda cuando se confirme la transacción en
+        curso (si se revierte, la serie cargada sigue siendo válida).
+        """
+        transaction.on_commit(lambda: cls.invalidate(currency_code))
+
+    @classmethod
+    def get_series(cls, currency_code: str, source: Optional[str] = None) -> RateSeries:
+        """Serie de la moneda para la fuente dada (None = todas las fuentes)."""
+        series = cls._timelines.get(currency_code)
+        if series is None:
+            series = cls._load(currency_code)
+            cls._timelines[currency_code] = series
+        return series.get(source) or RateSeries([])
+
+    @staticmethod
+    def _load(currency_code: str) -> Dict[Optional[str], RateSeries]:
+        """Una consulta por moneda; las series por fuente se arman en memoria."""
+        rates = list(
+            ExchangeRate.objects.filter(currency_id=currency_code)
+            .select_related('currency')
+            .order_by('date_valid', 'id')
+        )
+        by_source: Dict[str, List[ExchangeRate]] = {}
+        for rate in rates:
+            by_source.setdefault(rate.source, []).append(rate)
+
+        series: Dict[Optional[str], RateSeries] = {None: RateSeries(rates)}
+        for source, source_rates in by_source.items():
+            series[source] = RateSeries(source_rates)
+        return series
+
+    @classmethod
+    def rate_at(
+        cls,
+        currency_code: str,
+        moment: datetime,
+        source: Optional[str] = None
+    ) -> Optional[ExchangeRate]:
+        """Tasa vigente en el momento dado (la más reciente con date_valid <= moment)."""
+        return cls.get_series(currency_code, source).at(moment)
+
+    @classmethod
+    def earliest(cls, currency_code: str, source: Optional[str] = None) -> Optional[ExchangeRate]:
+        """Primera tasa registrada (fallback cuando no hay tasa anterior a la fecha)."""
+        return cls.get_series(currency_code, source).earliest()
+
+    @classmethod
+    def latest(cls, currency_code: str, source: Optional[str] = None) -> Optional[ExchangeRate]:
+        """Última tasa registrada, sin importar la fecha."""
+        return cls.get_series(currency_code, source).latest()
+
+    @staticmethod
+    def query_at(currency_code: str, moment: datetime, source: Optional[str] = None) -> Optional[ExchangeRate]:
+        """Como rate_at, pero leyendo de la base de datos (sin caché)."""
+        rates = ExchangeRate.objects.filter(currency_id=currency_code, date_valid__lte=moment)
+        if source:
+            rates = rates.filter(source=source)
+        return rates.select_related('currency').order_by('-date_valid', '-id').first()
+
+    @staticmethod
+    def query_earliest(currency_code: str, source: Optional[str] = None) -> Optional[ExchangeRate]:
+        """Como earliest, pero leyendo de la base de datos (sin caché)."""
+        rates = ExchangeRate.objects.filter(currency_id=currency_code)
+        if source:
+            rates = rates.filter(source=source)
+        return rates.select_related('currency').order_by('date_valid', 'id').first()
+
+    @classmethod
+    def invalidate(cls, currency_code: Optional[str] = None) -> None:
+        """Descarta la serie de una moneda (o todas, y el estado de sync(), si no se indica)."""
+        if currency_code is None:
+            cls._timelines.clear()
+            cls._synced_at = None
+            return
+        cls._timelines.pop(currency_code, None)
@@ -0,0 +1,219 @@
+"""
+Contexto de referencia compartido por una corrida de nómina.
+
+Agrupa los datos que no dependen del empleado: empresa, factores de la
+política de nómina, salario mínimo, tasas de cambio aplicables por moneda
+y el calendario del periodo. Se carga una sola vez por corrida (preview o
+cierre) de modo que el número de consultas de datos de referencia no
+crezca con la cantidad de empleados.
+"""
+import calendar
+import copy
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional, Tuple
+
+from django.utils import timezone
+
+from ..models import Company, Currency, ExchangeRate, PayrollPeriod
+from .rate_timeline import RateTimeline
+from vacations.services.work_calendar import (
+    BUSINESS_DAYS, HOLIDAYS, MONDAYS, SATURDAYS, SUNDAYS, WorkCalendar
+)
+
+# Constantes de Configuración (mismos valores por defecto del motor)
+FALLBACK_SALARIO_MINIMO = Decimal('130.00')
+
+DEFAULT_POLICY_FACTORS = {
+    'FACTOR_HED': 1.50,
+    'FACTOR_HEN': 1.80,
+    'TASA_BONO_NOCTURNO': 0.30,
+    'FACTOR_FERIADO': 1.50,
+    'FACTOR_DESCANSO': 1.50,
+}
+
+
+class PayrollRunContext:
+    """
+    Datos de referencia de una corrida, compartidos por todas las
+    instancias de PayrollEngine que calculan el mismo periodo.
+    """
+
+    def __init__(
+        self,
+        company: Optional[Company],
+        payment_date: date,
+        period: Optional[PayrollPeriod] = None,
+        fresh_rates: bool = False
+    ):
+        self.company = company
+        self.period = period
+        self.payment_date = payment_date
+        # Cierres: las tasas se leen de la base de datos, no de RateTimeline
+        self.fresh_rates = fresh_rates
+
+        self.min_salary = company.national_minimum_salary if company else FALLBACK_SALARIO_MINIMO
+
+        self.policy_factors = dict(DEFAULT_POLICY_FACTORS)
+        policy = self._get_policy(company)
+        if policy:
+            self.policy_factors.update({
+                'FACTOR_HED': float(policy.overtime_day_factor),
+                'FACTOR_HEN': float(policy.overtime_night_factor),
+                'TASA_BONO_NOCTURNO': float(policy.night_bonus_rate),
+                'FACTOR_FERIADO': float(policy.holiday_payout_factor),
+                'FACTOR_DESCANSO': float(policy.rest_day_payout_factor),
+            })
+
+        self.calendar = self._build_calendar()
+
+        # Tasas resueltas por moneda: { currency_code: (ExchangeRate | None, Decimal) }
+        self._rates: Dict[str, Tuple[Optional[ExchangeRate], Decimal]] = {}
+
+    @classmethod
+    def build(
+        cls,
+        period: Optional[PayrollPeriod] = None,
+        payment_date: Optional[date] = None,
+        fresh_rates: bool = False
+    ) -> 'PayrollRunContext':
+        """
+        Carga empresa y política (una consulta) y arma el contexto. Verifica
+        una vez que las tasas en memoria sigan vigentes (RateTimeline.sync).
+        """
+        if period:
+            payment_date = period.payment_date
+        elif payment_date is None:
+            payment_date = timezone.now().date()
+
+        if not fresh_rates:
+            RateTimeline.sync(force=True)
+        company = Company.objects.select_related('policy').first()
+        return cls(company, payment_date, period, fresh_rates)
+
+    def with_overrides(
+        self,
+        min_salary: Optional[Decimal] = None,
+        policy_factors: Optional[Dict[str, float]] = None,
+        rates: Optional[Dict[str, Decimal]] = None,
+        company_fields: Optional[Dict[str, Any]] = None
+    ) -> 'PayrollRunContext':
+        """
+        Copia del contexto con valores modificados (simulación de escenarios,
+        reanudación de un cierre por lotes con sus tasas originales).
+        No toca la empresa ni las tasas de la corrida original.
+        """
+        context = copy.copy(self)
+        context.policy_factors = {**self.policy_factors, **(policy_factors or {})}
+        context._rates = dict(self._rates)
+        for code, rate in (rates or {}).items():
+            context._rates[code] = (None, Decimal(rate))
+        if company_fields:
+            if self.company is None:
+                raise ValueError("No hay empresa configurada para modificar sus parámetros.")
+            context.company = copy.copy(self.company)
+            for field, value in company_fields.items():
+                setattr(context.company, field, value)
+            if 'national_minimum_salary' in company_fields:
+                context.min_salary = company_fields['national_minimum_salary']
+        if min_salary is not None:
+            context.min_salary = Decimal(min_salary)
+        return context
+
+    @staticmethod
+    def _get_policy(company: Optional[Company]):
+        if not company:
+            return None
+        try:
+            return company.policy
+        except Company.policy.RelatedObjectDoesNotExist:
+            return None
+
+    # =========================================================================
+    # TASAS DE CAMBIO
+    # =========================================================================
+
+    def get_rate(self, currency: Currency) -> Tuple[Optional[ExchangeRate], Decimal]:
+        """
+        Tasa aplicable a la fecha de pago para la moneda dada.
+        Se resuelve una sola vez por moneda durante la corrida.
+        """
+        if currency.code == 'VES':
+            return None, Decimal('1.00')
+
+        cached = self._rates.get(currency.code)
+        if cached is not None:
+            return cached
+
+        # Convertimos payment_date (date) a datetime con timezone para la consulta
+        query_date = timezone.make_aware(
+            datetime.combine(self.payment_date, datetime.min.time())
+        )
+
+        if self.fresh_rates:
+            rate_obj = RateTimeline.query_at(currency.code, query_date)
+            if not rate_obj:
+                rate_obj = RateTimeline.query_earliest(currency.code)
+        else:
+            rate_obj = RateTimeline.rate_at(currency.code, query_date)
+            if not rate_obj:
+                rate_obj = RateTimeline.earliest(currency.code)
+
+        val = rate_obj.rate if rate_obj else Decimal('1.00')
+        self._rates[currency.code] = (rate_obj, val)
+        return rate_obj, val
+
+    def resolve_rates(self) -> Dict[str, Decimal]:
+        """
+        Resuelve la tasa de todas las monedas y devuelve { código: valor }.
+        El cierre por lotes la guarda en su checkpoint para reanudar con las
+        mismas tasas (ver with_overrides).
+        """
+        return {
+            currency.code: self.get_rate(currency)[1]
+            for currency in Currency.objects.exclude(code='VES')
+        }
+
+    # =========================================================================
+    # CALENDARIO DEL PERIODO
+    # =========================================================================
+
+    def _build_calendar(self) -> Dict[str, Any]:
+        """
+        Cuenta lunes, días hábiles, sábados, domingos y feriados del periodo
+        (o del mes de pago si no hay periodo) y determina los días comerciales.
+        """
+        if self.period:
+            start, end = self.period.start_date, self.period.end_date
+        else:
+            # Fallback para simulación (basado en el mes de pago)
+            _, last_day = calendar.monthrange(self.payment_date.year, self.payment_date.month)
+            start = date(self.payment_date.year, self.payment_date.month, 1)
+            end = date(self.payment_date.year, self.payment_date.month, last_day)
+
+        # Feriados del tenant (modelo Holiday, o los nacionales si no hay cargados);
+        # un feriado no cuenta como hábil ni fin de semana
+        counts = WorkCalendar.current(legacy_fallback=True).counts(start, end)
+
+        # Días totales del periodo (comercial)
+        days_in_period = 15
+        if self.company:
+            if self.company.payroll_journey == 'BIWEEKLY': days_in_period = 15
+            elif self.company.payroll_journey == 'MONTHLY': days_in_period = 30
+            elif self.company.payroll_journey == 'WEEKLY': days_in_period = 7
+
+        if self.period:
+            delta = (self.period.end_date - self.period.start_date).days + 1
+            if delta >= 28: days_in_period = 30
+            elif delta >= 13: days_in_period = 15
+            elif delta >= 6: days_in_period = 7
+            else: days_in_period = delta
+
+        return {
+            'mondays': counts[MONDAYS],
+            'workdays': counts[BUSINESS_DAYS],
+            'saturdays': counts[SATURDAYS],
+            'sundays': counts[SUNDAYS],
+            'holidays': counts[HOLIDAYS],
+            'days_in_period': days_in_period,
+        }
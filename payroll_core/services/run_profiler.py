@@ -0,0 +1,137 @@
+"""
+Perfil de una corrida de nómina (previsualización o cierre).
+
+Mide, por corrida:
+- tiempo y consultas SQL por etapa (carga, preparación del estado,
+  asignaciones, deducciones, préstamos, totales, persistencia);
+- consultas por empleado calculado;
+- conceptos más lentos según su tiempo de evaluación en toda la plantilla.
+
+Se activa con profile=True en PayrollProcessor (y profile=true en la API);
+sin perfil el motor no toma tiempos. En modo paralelo cada proceso
+trabajador mide sus bloques y el padre suma los resultados, por lo que los
+tiempos de las etapas del motor son tiempo de CPU acumulado de todos los
+procesos y pueden superar al tiempo total.
+"""
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, Optional
+
+from django.db import connection
+
+# Conceptos listados en slowest_concepts
+SLOWEST_CONCEPTS_LIMIT = 10
+
+# Etapa a la que se asignan las consultas hechas fuera de toda etapa
+OTHER_STAGE = 'other'
+
+
+def profile_stage(profiler: Optional['RunProfiler'], name: str):
+    """profiler.stage(name), o un contexto vacío si la corrida no se perfila."""
+    return profiler.stage(name) if profiler is not None else nullcontext()
+
+
+def profile_queries(profiler: Optional['RunProfiler']):
+    """profiler.capture_queries(), o un contexto vacío si la corrida no se perfila."""
+    return profiler.capture_queries() if profiler is not None else nullcontext()
+
+
+class RunProfiler:
+    """
+    Acumula tiempos y consultas de una corrida.
+
+    Uso:
+        profiler = RunProfiler()
+        with profiler.capture_queries():
+            with profiler.stage('load'):
+                ...
+        report = profiler.as_dict()
+    """
+
+    def __init__(self):
+        # etapa -> {'seconds', 'queries', 'calls'} (en orden de aparición)
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        # código de concepto -> {'seconds', 'employees'}
+        self.concepts: Dict[str, Dict[str, Any]] = {}
+        self.employees = 0
+        self._current: Optional[str] = None
+        self._started = time.perf_counter()
+
+    def _get_stage(self, name: str) -> Dict[str, Any]:
+        if name not in self.stages:
+            self.stages[name] = {'seconds': 0.0, 'queries': 0, 'calls': 0}
+        return self.stages[name]
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Mide una etapa. Las consultas se asignan a la etapa más interna."""
+        previous = self._current
+        self._current = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats = self._get_stage(name)
+            stats['seconds'] += time.perf_counter() - start
+            stats['calls'] += 1
+            self._current = previous
+
+    def add_concept(self, code: str, seconds: float, employees: int) -> None:
+        """Tiempo de procesar un concepto para un bloque de empleados."""
+        stats = self.concepts.setdefault(code, {'seconds': 0.0, 'employees': 0})
+        stats['seconds'] += seconds
+        stats['employees'] += employees
+
+    @contextmanager
+    def capture_queries(self) -> Iterator[None]:
+        """Cuenta las consultas de la conexión actual mientras dure el bloque."""
+        with connection.execute_wrapper(self._count_query):
+            yield
+
+    def _count_query(self, execute, sql, params, many, context):
+        self._get_stage(self._current or OTHER_STAGE)['queries'] += 1
+        return execute(sql, params, many, context)
+
+    # -------------------------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Datos crudos (serializables) para enviar desde un proceso trabajador."""
+        return {'stages': self.stages, 'concepts': self.concepts, 'employees': self.employees}
+
+    def merge(self, snapshot: Dict[str, Any]) -> None:
+        """Suma los datos de snapshot() de otro proceso."""
+        for name, data in snapshot['stages'].items():
+            stats = self._get_stage(name)
+            for key in ('seconds', 'queries', 'calls'):
+                stats[key] += data[key]
+        for code, data in snapshot['concepts'].items():
+            self.add_concept(code, data['seconds'], data['employees'])
+        self.employees += snapshot['employees']
+
+    def as_dict(self, limit: int = SLOWEST_CONCEPTS_LIMIT) -> Dict[str, Any]:
+        """Reporte para la respuesta de la API y el comando profile_payroll."""
+        queries = sum(stats['queries'] for stats in self.stages.values())
+        slowest = sorted(self.concepts.items(), key=lambda item: item[1]['seconds'], reverse=True)[:limit]
+        return {
+            'total_seconds': round(time.perf_counter() - self._started, 4),
+            'employees': self.employees,
+            'queries': queries,
+            'queries_per_employee': round(queries / self.employees, 2) if self.employees else None,
+            'stages': [
+                {
+                    'stage': name,
+                    'seconds': round(stats['seconds'], 4),
+                    'queries': stats['queries'],
+                    'calls': stats['calls'],
+                }
+                for name, stats in self.stages.items()
+            ],
+            'slowest_concepts': [
+                {
+                    'code': code,
+                    'seconds': round(stats['seconds'], 4),
+                    'ms_per_employee': round(stats['seconds'] * 1000 / stats['employees'], 4) if stats['employees'] else 0.0,
+                }
+                for code, stats in slowest
+            ],
+        }
@@ -1,6 +1,7 @@
 """
 Servicios relacionados con cálculos salariales y distribución de ingresos.
 """
+import logging
 from decimal import Decimal
 from typing import Dict, Optional, Union
 from django.core.exceptions import ObjectDoesNotExist
@@ -8,6 +9,8 @@ from django.core.exceptions import ObjectDoesNotExist
 from ..models.organization import Company
 from ..models.employee import LaborContract
 
+logger = logging.getLogger(__name__)
+
 
 class SalarySplitter:
     """
@@ -17,13 +20,19 @@ class SalarySplitter:
     """
 
     @staticmethod
-    def get_salary_breakdown(contract: LaborContract, exchange_rate: Decimal = None) -> Dict[str, Decimal]:
+    def get_salary_breakdown(
+        contract: LaborContract,
+        exchange_rate: Decimal = None,
+        company: Optional[Company] = None
+    ) -> Dict[str, Decimal]:
         """
         Calcula el desglose del salario para un contrato dado.
 
         Args:
             contract: Instancia de LaborContract.
             exchange_rate: Tasa de cambio USD->VES (opcional, para convertir montos fijos en VES)
+            company: Empresa ya cargada (opcional, evita consultarla en cada llamada
+                     cuando se procesa una corrida completa)
 
         Returns:
             Dict con claves:
@@ -36,7 +45,8 @@ class SalarySplitter:
         
         # 2. Obtener Configuración de la Empresa
         try:
-            company = Company.objects.first()
+            if company is None:
+                company = Company.objects.first()
             if not company:
                 return {
                     'base': total_salary,
@@ -57,7 +67,7 @@ class SalarySplitter:
         base_salary = Decimal('0.00')
         complement = Decimal('0.00')
         mode = company.salary_split_mode
-        print(f"DEBUG SPLIT: Mode={mode}, Total={total_salary}")
+        logger.debug("Desglose salarial: modo=%s total=%s", mode, total_salary)
         
         if mode == Company.SalarySplitMode.PERCENTAGE:
             # Calcular base como porcentaje del total
@@ -79,7 +89,7 @@ class SalarySplitter:
                 except Exception:
                     pass
                 
-                print(f"DEBUG SPLIT: Fixed={fixed_base}, Currency={curr_code}, Rate={exchange_rate}")
+                logger.debug("Base fija: %s %s (tasa=%s)", fixed_base, curr_code, exchange_rate)
 
                 # Si está en VES, convertir a USD SOLO para la comparación lógica
                 if curr_code == 'VES':
@@ -0,0 +1,353 @@
+"""
+Simulación de escenarios ("qué pasa si") sobre toda la plantilla activa.
+
+Cada escenario modifica, solo en memoria, los datos de referencia de la
+corrida: salario mínimo, tasas de cambio, factores de la política de
+nómina, parámetros de la empresa y valor / fórmula / estado de conceptos.
+Los empleados y novedades del periodo se cargan una vez; la corrida base
+(sin cambios) y cada escenario se calculan con ParallelPayrollRunner sobre
+copias del plan y del contexto, sin guardar nada.
+
+Formato de un escenario:
+    {
+        "name": "Salario mínimo 200",
+        "minimum_salary": "200.00",
+        "rates": {"USD": "45.50"},
+        "policy": {"overtime_day_factor": "2.00"},
+        "company": {"salary_split_mode": "FIXED_BASE"},
+        "concepts": {"CESTATICKET": {"value": "50.00"}, "BONO": {"active": false}}
+    }
+
+El resultado trae, para la base y cada escenario, los totales y su
+diferencia contra la base por departamento, sede y concepto.
+"""
+import copy
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..engine import PayrollEngine
+from ..models import Branch, Company, Department, PayrollConcept, PayrollPeriod
+from .formula_cache import FormulaCache
+from .formula_trace import TraceLevel
+from .money import cents_to_float, to_cents
+from .parallel import ParallelPayrollRunner
+from .payroll import PayrollProcessor
+from .payroll_plan import PayrollPlan
+from .run_context import PayrollRunContext
+
+# Escenarios por llamada
+MAX_SCENARIOS = 10
+
+# Campos de PayrollPolicy -> variable de fórmula del contexto
+POLICY_FACTOR_FIELDS = {
+    'overtime_day_factor': 'FACTOR_HED',
+    'overtime_night_factor': 'FACTOR_HEN',
+    'night_bonus_rate': 'TASA_BONO_NOCTURNO',
+    'holiday_payout_factor': 'FACTOR_FERIADO',
+    'rest_day_payout_factor': 'FACTOR_DESCANSO',
+}
+
+# Parámetros de Company que el motor lee y un escenario puede cambiar
+COMPANY_FIELDS = (
+    'national_minimum_salary', 'salary_split_mode', 'split_percentage_base',
+    'payroll_journey', 'cestaticket_journey', 'cestaticket_payment_day',
+)
+
+# Campos de PayrollConcept que un escenario puede cambiar
+CONCEPT_FIELDS = ('value', 'formula', 'active')
+
+
+def _decimal(value: Any, label: str) -> Decimal:
+    try:
+        result = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"{label}: '{value}' no es un número válido.")
+    if not result.is_finite():
+        raise ValueError(f"{label}: '{value}' no es un número válido.")
+    return result
+
+
+class PayrollScenario:
+    """
+    Escenario validado. apply() devuelve el plan y el contexto modificados.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        minimum_salary: Optional[Decimal] = None,
+        rates: Optional[Dict[str, Decimal]] = None,
+        policy: Optional[Dict[str, float]] = None,
+        company: Optional[Dict[str, Any]] = None,
+        concepts: Optional[Dict[str, Dict[str, Any]]] = None
+    ):
+        self.name = name
+        self.minimum_salary = minimum_salary
+        self.rates = rates or {}
+        self.policy = policy or {}
+        self.company = company or {}
+        self.concepts = concepts or {}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], index: int = 0) -> 'PayrollScenario':
+        """Valida un escenario de la API (ValueError con el motivo)."""
+        if not isinstance(data, dict):
+            raise ValueError(f"El escenario {index + 1} debe ser un objeto.")
+        name = str(data.get('name') or f"Escenario {index + 1}")
+        unknown = set(data) - {'name', 'minimum_salary', 'rates', 'policy', 'company', 'concepts'}
+        if unknown:
+            raise ValueError(f"{name}: claves desconocidas {sorted(unknown)}.")
+
+        minimum_salary = None
+        if data.get('minimum_salary') is not None:
+            minimum_salary = _decimal(data['minimum_salary'], f"{name} / minimum_salary")
+            if minimum_salary <= 0:
+                raise ValueError(f"{name}: el salario mínimo debe ser mayor que cero.")
+
+        rates = {}
+        for code, rate in (data.get('rates') or {}).items():
+            code = str(code).upper()
+            if code == 'VES':
+                raise ValueError(f"{name}: la tasa de VES es siempre 1.")
+            rates[code] = _decimal(rate, f"{name} / rates.{code}")
+            if rates[code] <= 0:
+                raise ValueError(f"{name}: la tasa de {code} debe ser mayor que cero.")
+
+        policy = {}
+        for field, value in (data.get('policy') or {}).items():
+            if field not in POLICY_FACTOR_FIELDS:
+                raise ValueError(f"{name}: '{field}' no es un factor de la política de nómina.")
+            policy[POLICY_FACTOR_FIELDS[field]] = float(_decimal(value, f"{name} / policy.{field}"))
+
+        company = {}
+        for field, value in (data.get('company') or {}).items():
+            if field not in COMPANY_FIELDS:
+                raise ValueError(f"{name}: '{field}' no es un parámetro de empresa simulable.")
+            company[field] = cls._clean_company_field(name, field, value)
+
+        concepts = {}
+        for code, changes in (data.get('concepts') or {}).items():
+            if not isinstance(changes, dict) or set(changes) - set(CONCEPT_FIELDS):
+                raise ValueError(f"{name}: el concepto {code} solo admite {list(CONCEPT_FIELDS)}.")
+            clean = {}
+            if 'value' in changes:
+                clean['value'] = _decimal(changes['value'], f"{name} / {code}.value")
+            if 'formula' in changes:
+                formula = str(changes['formula'] or '')
+                if formula:
+                    try:
+                        FormulaCache.compile(formula)
+                    except SyntaxError as e:
+                        raise ValueError(f"{name}: fórmula inválida en {code}: {e}")
+                clean['formula'] = formula
+            if 'active' in changes:
+                clean['active'] = bool(changes['active'])
+            concepts[code] = clean
+
+        return cls(name, minimum_salary, rates, policy, company, concepts)
+
+    @staticmethod
+    def _clean_company_field(name: str, field: str, value: Any) -> Any:
+        model_field = Company._meta.get_field(field)
+        if model_field.choices:
+            valid = [choice for choice, _ in model_field.choices]
+            if value not in valid:
+                raise ValueError(f"{name}: {field} debe ser uno de {valid}.")
+            return value
+        if field == 'cestaticket_payment_day':
+            day = int(_decimal(value, f"{name} / company.{field}"))
+            if not 1 <= day <= 31:
+                raise ValueError(f"{name}: {field} debe estar entre 1 y 31.")
+            return day
+        return _decimal(value, f"{name} / company.{field}")
+
+    def apply(self, plan: PayrollPlan, run_context: PayrollRunContext) -> Tuple[PayrollPlan, PayrollRunContext]:
+        """Plan y contexto del escenario (los originales no se modifican)."""
+        context = run_context.with_overrides(
+            min_salary=self.minimum_salary, policy_factors=self.policy,
+            rates=self.rates, company_fields=self.company,
+        )
+        if not self.concepts:
+            return plan, context
+        return self._apply_concepts(plan), context
+
+    def _apply_concepts(self, plan: PayrollPlan) -> PayrollPlan:
+        by_code = {c.code: c for c in plan.concepts}
+        # Un concepto inactivo no está en el plan: se carga para poder activarlo
+        missing = [code for code in self.concepts if code not in by_code]
+        if missing:
+            for concept in PayrollConcept.objects.filter(code__in=missing).select_related('currency'):
+                by_code[concept.code] = concept
+
+        concepts = []
+        for concept in sorted(by_code.values(), key=lambda c: (c.receipt_order, c.id)):
+            changes = self.concepts.get(concept.code)
+            if changes:
+                concept = copy.copy(concept)
+                for field, value in changes.items():
+                    setattr(concept, field, value)
+            if concept.active:
+                concepts.append(concept)
+        scenario_plan = PayrollPlan(concepts)
+        self._check_formulas(scenario_plan)
+        return scenario_plan
+
+    def _check_formulas(self, plan: PayrollPlan) -> None:
+        """
+        Variables no definidas y ciclos de las fórmulas modificadas contra el
+        catálogo del escenario, igual que al guardar un concepto.
+        """
+        for code, changes in self.concepts.items():
+            formula = changes.get('formula')
+            if not formula:
+                continue
+            analysis = PayrollEngine.check_formula_dependencies(formula, concept_code=code, plan=plan)
+            if analysis['undefined']:
+                raise ValueError(
+                    f"{self.name}: variables no definidas en {code}: {', '.join(analysis['undefined'])}"
+                )
+            if analysis['cycle']:
+                raise ValueError(
+                    f"{self.name}: dependencia circular en {code}: {' -> '.join(analysis['cycle'])}"
+                )
+
+
+def summarize(results: List[Dict[str, Any]], groups: List[Tuple[Any, Any]]) -> Dict[str, Any]:
+    """
+    Acumula en céntimos los resultados del motor.
+    groups: (departamento, sede) de cada resultado, en el mismo orden.
+    """
+    def empty():
+        return {'employees': 0, 'income': 0, 'deductions': 0, 'net': 0}
+
+    summary = {'totals': empty(), 'departments': {}, 'branches': {}, 'concepts': {}}
+    for result, (department, branch) in zip(results, groups):
+        totals = result['totals']
+        income = to_cents(totals['income_ves'])
+        deductions = to_cents(totals['deductions_ves'])
+        for bucket in (
+            summary['totals'],
+            summary['departments'].setdefault(department, empty()),
+            summary['branches'].setdefault(branch, empty()),
+        ):
+            bucket['employees'] += 1
+            bucket['income'] += income
+            bucket['deductions'] += deductions
+            bucket['net'] += income - deductions
+        for line in result['lines']:
+            entry = summary['concepts'].setdefault(
+                line['code'], {'name': line.get('name', line['code']), 'kind': line['kind'], 'amount': 0}
+            )
+            entry['amount'] += to_cents(line['amount_ves'])
+    return summary
+
+
+def _totals(bucket: Dict[str, int], base: Optional[Dict[str, int]]) -> Dict[str, Any]:
+    base = base or {'employees': 0, 'income': 0, 'deductions': 0, 'net': 0}
+    return {
+        'employees': bucket['employees'],
+        'income_ves': cents_to_float(bucket['income']),
+        'deductions_ves': cents_to_float(bucket['deductions']),
+        'net_pay_ves': cents_to_float(bucket['net']),
+        'delta_income_ves': cents_to_float(bucket['income'] - base['income']),
+        'delta_deductions_ves': cents_to_float(bucket['deductions'] - base['deductions']),
+        'delta_net_pay_ves': cents_to_float(bucket['net'] - base['net']),
+    }
+
+
+def present(summary: Dict[str, Any], base: Dict[str, Any], names: Dict[str, Dict[Any, str]]) -> Dict[str, Any]:
+    """Totales, desgloses y diferencias contra la base en el formato de la API."""
+    def grouped(key, label):
+        keys = list(summary[key]) + [k for k in base[key] if k not in summary[key]]
+        empty = {'employees': 0, 'income': 0, 'deductions': 0, 'net': 0}
+        return [
+            {'id': k, 'name': names[label].get(k, 'Sin asignar'),
+             **_totals(summary[key].get(k, empty), base[key].get(k))}
+            for k in keys
+        ]
+
+    concept_codes = list(summary['concepts']) + [c for c in base['concepts'] if c not in summary['concepts']]
+    by_concept = []
+    for code in concept_codes:
+        entry = summary['concepts'].get(code)
+        base_entry = base['concepts'].get(code)
+        reference = entry or base_entry
+        amount = entry['amount'] if entry else 0
+        by_concept.append({
+            'code': code,
+            'name': reference['name'],
+            'kind': reference['kind'],
+            'amount_ves': cents_to_float(amount),
+            'delta_ves': cents_to_float(amount - (base_entry['amount'] if base_entry else 0)),
+        })
+
+    return {
+        'totals': _totals(summary['totals'], base['totals']),
+        'by_department': grouped('departments', 'departments'),
+        'by_branch': grouped('branches', 'branches'),
+        'by_concept': by_concept,
+    }
+
+
+class ScenarioSimulator:
+    """
+    Corre varios escenarios sobre el mismo periodo sin persistir nada.
+    """
+
+    @staticmethod
+    def simulate(
+        period_id: int,
+        scenarios: List[Dict[str, Any]],
+        workers: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Calcula la base y cada escenario para toda la plantilla activa.
+        workers: procesos para calcular en paralelo (None = settings.PAYROLL_PARALLEL_WORKERS).
+        """
+        if not isinstance(scenarios, list) or not scenarios:
+            raise ValueError("Debe indicar al menos un escenario.")
+        if len(scenarios) > MAX_SCENARIOS:
+            raise ValueError(f"Se admiten hasta {MAX_SCENARIOS} escenarios por simulación.")
+        parsed = [PayrollScenario.from_dict(data, i) for i, data in enumerate(scenarios)]
+        codes = {code for scenario in parsed for code in scenario.concepts}
+        missing = codes - set(PayrollConcept.objects.filter(code__in=codes).values_list('code', flat=True))
+        if missing:
+            raise ValueError(f"Conceptos inexistentes: {sorted(missing)}.")
+
+        try:
+            period = PayrollPeriod.objects.get(id=period_id)
+        except PayrollPeriod.DoesNotExist:
+            raise ValueError(f"El periodo {period_id} no existe.")
+
+        entries, warnings = PayrollProcessor._collect_close_entries(period)
+        groups = [
+            (contract.employee.department_id, contract.employee.branch_id)
+            for contract, _ in entries
+        ]
+        names = {
+            'departments': {d.id: d.name for d in Department.objects.filter(id__in={g[0] for g in groups})},
+            'branches': {b.id: b.name for b in Branch.objects.filter(id__in={g[1] for g in groups})},
+        }
+
+        plan = PayrollPlan.build()
+        run_context = PayrollRunContext.build(period)
+        # Se aplican todos antes de calcular: un escenario inválido falla sin costo
+        prepared = [(scenario, *scenario.apply(plan, run_context)) for scenario in parsed]
+
+        def run(scenario_plan, scenario_context):
+            results = ParallelPayrollRunner.calculate(
+                period, entries, scenario_plan, scenario_context, TraceLevel.OFF, workers=workers
+            )
+            return summarize(results, groups)
+
+        base = run(plan, run_context)
+        response = {
+            'period_name': period.name,
+            'warnings': warnings,
+            'baseline': present(base, base, names),
+            'scenarios': [],
+        }
+        for scenario, scenario_plan, scenario_context in prepared:
+            summary = run(scenario_plan, scenario_context)
+            response['scenarios'].append({'name': scenario.name, **present(summary, base, names)})
+        return response
@@ -1,9 +1,14 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django_tenants.signals import post_schema_sync
 from django_tenants.utils import schema_context
 from .services.initialization import create_system_concepts
 from .models.organization import Company, Branch
+from .models.concepts import PayrollConcept
+from .services.formula_cache import FormulaCache
+from .services.preview_cache import PreviewCache
+from .services.rate_timeline import RateTimeline
+from .models import ExchangeRate, PayrollNovelty
 import logging
 
 logger = logging.getLogger(__name__)
@@ -64,3 +69,30 @@ def on_company_created(sender, instance, created, **kwargs):
 
     except Exception as e:
         logger.error(f"Error en onboarding automático: {e}")
+
+
+@receiver(post_delete, sender=PayrollConcept)
+def on_concept_deleted(sender, instance, **kwargs):
+    """Descarta la fórmula compilada del concepto eliminado."""
+    FormulaCache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=PayrollConcept)
+@receiver(post_delete, sender=PayrollConcept)
+def on_concept_changed(sender, instance, **kwargs):
+    """Las previsualizaciones en caché del tenant dejan de ser válidas."""
+    PreviewCache.bump_catalog_version()
+
+
+@receiver(post_save, sender=PayrollNovelty)
+@receiver(post_delete, sender=PayrollNovelty)
+def on_novelty_changed(sender, instance, **kwargs):
+    """La previsualización en caché del empleado en el periodo deja de ser válida."""
+    PreviewCache.bump_novelty_versions(instance.period_id, [instance.employee_id])
+
+
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+def on_exchange_rate_changed(sender, instance, **kwargs):
+    """Recarga la línea de tiempo de la moneda (en todos los procesos) al confirmar el cambio."""
+    RateTimeline.changed(instance.currency_id)
@@ -0,0 +1,38 @@
+from django.test import SimpleTestCase
+from .services.benchmark import compare_results
+
+
+def _report(*results):
+    return {'results': list(results)}
+
+
+def _ok(stage, seconds, queries):
+    return {'stage': stage, 'status': 'ok', 'seconds': seconds, 'queries': queries}
+
+
+class CompareResultsTests(SimpleTestCase):
+    def test_flags_extra_queries_and_slower_stages(self):
+        baseline = _report(_ok('preview_period', 1.0, 20), _ok('process_period', 2.0, 40))
+        current = _report(_ok('preview_period', 1.1, 21), _ok('process_period', 3.0, 40))
+
+        regressions = compare_results(baseline, current, tolerance=0.25)
+        self.assertEqual(
+            [(r['stage'], r['reason']) for r in regressions],
+            [('preview_period', 'queries'), ('process_period', 'seconds')]
+        )
+
+    def test_ignores_noise_skipped_and_new_stages(self):
+        baseline = _report(
+            _ok('islr_xml_export', 0.002, 4),
+            {'stage': 'payslip_pdf', 'status': 'skipped', 'error': 'libpango'},
+            _ok('faov_export', 0.5, 60),
+        )
+        current = _report(
+            _ok('islr_xml_export', 0.02, 4),  # 10x pero por debajo del mínimo absoluto
+            _ok('payslip_pdf', 9.0, 10),
+            {'stage': 'faov_export', 'status': 'error', 'error': 'boom'},
+            _ok('new_stage', 1.0, 1),
+        )
+
+        regressions = compare_results(baseline, current)
+        self.assertEqual([(r['stage'], r['reason']) for r in regressions], [('faov_export', 'error')])
@@ -0,0 +1,136 @@
+from decimal import Decimal
+from django.test import TestCase
+from django.utils import timezone
+from datetime import date, datetime
+from unittest.mock import patch
+from .models import (
+    Employee, LaborContract, Currency, ExchangeRate, PayrollPeriod,
+    PayrollReceipt, Loan, LoanPayment, Company
+)
+from .services import PayrollProcessor
+from .services.payroll_persistence import PayrollPersistenceService
+from .services.parallel import ParallelPayrollRunner
+
+
+class ChunkedCloseTests(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name="Test Co", rif="J-123456")
+        Currency.objects.get_or_create(code='VES', defaults={'name': 'Bolívar', 'symbol': 'Bs.'})
+        self.currency_usd, _ = Currency.objects.get_or_create(code='USD', defaults={'name': 'Dólar', 'symbol': '$'})
+        ExchangeRate.objects.create(
+            currency=self.currency_usd, rate=Decimal('50.00'), source=ExchangeRate.RateSource.BCV,
+            date_valid=timezone.make_aware(datetime(2025, 1, 2, 9))
+        )
+
+        # 5 empleados con sueldo en dólares, el primero con un préstamo
+        self.employees = []
+        for i in range(5):
+            employee = Employee.objects.create(
+                first_name=f"Empleado{i}", last_name="Perez",
+                national_id=f"V-1000000{i}", position="Analista",
+                hire_date=date(2020, 1, 1), is_active=True
+            )
+            LaborContract.objects.create(
+                employee=employee,
+                position="Analista",
+                salary_amount=Decimal('100.00') + i * 10,
+                salary_currency=self.currency_usd,
+                is_active=True,
+                start_date=date(2025, 1, 1)
+            )
+            self.employees.append(employee)
+
+        self.loan = Loan.objects.create(
+            employee=self.employees[0],
+            amount=Decimal('200.00'),
+            balance=Decimal('200.00'),
+            installment_amount=Decimal('20.00'),
+            currency=self.currency_usd,
+            status=Loan.LoanStatus.Active,
+            start_date=date(2025, 1, 1)
+        )
+
+        self.period = PayrollPeriod.objects.create(
+            name="Enero 2025 - Q1",
+            start_date=date(2025, 1, 1),
+            end_date=date(2025, 1, 15),
+            payment_date=date(2025, 1, 15)
+        )
+
+    def _net_by_employee(self):
+        return dict(self.period.receipts.values_list('employee_id', 'net_pay_ves'))
+
+    def _fail_second_batch(self):
+        """Persistencia que falla en el segundo lote (proceso interrumpido)."""
+        original = PayrollPersistenceService.save_payroll_batch
+        calls = []
+
+        def save(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError("Conexión perdida")
+            return original(*args, **kwargs)
+        return patch.object(PayrollPersistenceService, 'save_payroll_batch', side_effect=save)
+
+    def test_chunked_close_matches_single_pass(self):
+        """El cierre por lotes produce los mismos recibos que el cierre en una pasada"""
+        result = PayrollProcessor.process_period_chunked(self.period.id, chunk_size=2)
+        chunked = self._net_by_employee()
+        self.assertEqual(result['processed_employees'], 5)
+
+        # Se reabre el periodo para cerrarlo en una pasada
+        PayrollPersistenceService.revert_period_receipts(self.period)
+        PayrollPeriod.objects.filter(pk=self.period.pk).update(status=PayrollPeriod.Status.OPEN)
+        single = PayrollProcessor.process_period(self.period.id)
+
+        self.assertEqual(self._net_by_employee(), chunked)
+        self.assertEqual(single['total_payroll_ves'], result['total_payroll_ves'])
+        self.assertEqual(single['exchange_rate'], result['exchange_rate'])
+
+    def test_resume_skips_processed_employees_and_keeps_rates(self):
+        """Al reanudar solo se calculan los pendientes, con las tasas del inicio del cierre"""
+        with self._fail_second_batch(), self.assertRaises(RuntimeError):
+            PayrollProcessor.process_period_chunked(self.period.id, chunk_size=2)
+
+        self.period.refresh_from_db()
+        self.assertEqual(self.period.status, PayrollPeriod.Status.CLOSING)
+        self.assertEqual(Decimal(self.period.close_checkpoint['rates']['USD']), Decimal('50.00'))
+        first_ids = set(self.period.receipts.values_list('id', flat=True))
+        self.assertEqual(len(first_ids), 2)
+
+        # Una tasa nueva cargada durante la interrupción no afecta el cierre en curso
+        ExchangeRate.objects.create(
+            currency=self.currency_usd, rate=Decimal('60.00'), source=ExchangeRate.RateSource.BCV,
+            date_valid=timezone.make_aware(datetime(2025, 1, 14, 9))
+        )
+        with patch.object(ParallelPayrollRunner, 'calculate', wraps=ParallelPayrollRunner.calculate) as calculate:
+            result = PayrollProcessor.process_period_chunked(self.period.id, chunk_size=2)
+
+        calculated = sum(len(call.args[1]) for call in calculate.call_args_list)
+        self.assertEqual(calculated, 3)
+        self.assertEqual(result['processed_employees'], 5)
+        self.assertEqual(result['exchange_rate'], 50.0)
+        self.assertTrue(first_ids <= set(self.period.receipts.values_list('id', flat=True)))
+        self.assertEqual(
+            set(PayrollReceipt.objects.filter(period=self.period).values_list('exchange_rate_snapshot', flat=True)),
+            {Decimal('50.00')}
+        )
+
+    def test_rollback_restores_loans_and_deletes_receipts(self):
+        """Revertir un cierre interrumpido devuelve los abonos y elimina los recibos parciales"""
+        with self._fail_second_batch(), self.assertRaises(RuntimeError):
+            PayrollProcessor.process_period_chunked(self.period.id, chunk_size=2)
+
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.balance, Decimal('180.00'))
+
+        result = PayrollProcessor.rollback_closing(self.period.id)
+
+        self.assertEqual(result, {'deleted_receipts': 2, 'restored_loans': 1})
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.balance, Decimal('200.00'))
+        self.assertFalse(LoanPayment.objects.exists())
+        self.assertFalse(PayrollReceipt.objects.filter(period=self.period).exists())
+        self.period.refresh_from_db()
+        self.assertEqual(self.period.status, PayrollPeriod.Status.OPEN)
+        self.assertIsNone(self.period.close_checkpoint)
@@ -0,0 +1,61 @@
+from decimal import Decimal
+from datetime import date
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from .models import (
+    Employee, LaborContract, Currency, PayrollPeriod, Company, Department, JobPosition
+)
+from .services.batch_engine import BatchPayrollEngine
+
+
+class EmployeeInputsQueryTests(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name="Test Co", rif="J-123456")
+        self.currency_ves, _ = Currency.objects.get_or_create(code='VES', defaults={'name': 'Bolívar', 'symbol': 'Bs.'})
+        self.currency_usd, _ = Currency.objects.get_or_create(code='USD', defaults={'name': 'Dólar', 'symbol': '$'})
+        department = Department.objects.create(name="Operaciones", description="Operaciones")
+
+        # Cada empleado con su propio cargo: la moneda de la base fija no se comparte en caché
+        for i in range(4):
+            job_position = JobPosition.objects.create(
+                department=department, name=f"Analista {i}", code=f"AN-{i}",
+                split_fixed_amount=Decimal('30.00'),
+                split_fixed_currency=self.currency_usd if i % 2 else self.currency_ves
+            )
+            employee = Employee.objects.create(
+                first_name=f"Empleado{i}", last_name="Perez",
+                national_id=f"V-4000000{i}", position="Analista",
+                hire_date=date(2020, 1, 1), is_active=True
+            )
+            LaborContract.objects.create(
+                employee=employee,
+                position="Analista",
+                job_position=job_position,
+                salary_amount=Decimal('100.00'),
+                salary_currency=self.currency_usd,
+                is_active=True,
+                start_date=date(2025, 1, 1)
+            )
+
+        self.period = PayrollPeriod.objects.create(
+            name="Enero 2025 - Q1",
+            start_date=date(2025, 1, 1),
+            end_date=date(2025, 1, 15),
+            payment_date=date(2025, 1, 15)
+        )
+
+    def _count_queries(self, size):
+        batch = BatchPayrollEngine(self.period)
+        contracts = list(LaborContract.objects.order_by('id')[:size])
+        with CaptureQueriesContext(connection) as queries:
+            batch.calculate([(contract, {}) for contract in contracts])
+        return len(queries)
+
+    def test_fixed_split_queries_do_not_grow_with_employees(self):
+        """Con base o complemento fijo, las consultas del lote no dependen del número de empleados"""
+        for mode in (Company.SalarySplitMode.FIXED_BASE, Company.SalarySplitMode.FIXED_BONUS):
+            with self.subTest(mode=mode):
+                Company.objects.filter(pk=self.company.pk).update(salary_split_mode=mode)
+                self._count_queries(1)  # calienta las cachés compartidas de la corrida
+                self.assertEqual(self._count_queries(2), self._count_queries(4))
@@ -0,0 +1,126 @@
+from datetime import datetime
+import numpy as np
+from django.test import SimpleTestCase
+from .models import PayrollConcept
+from .services.batch_engine import FLOAT, INT, VectorFormula
+from .services.formula_cache import FormulaCache
+from .services.formula_dependencies import FormulaDependencies
+from .services.formula_trace import expand_calculation_log
+
+FUNCTIONS = {'min': min, 'max': max, 'round': round, 'int': int, 'abs': abs, 'float': float}
+
+
+class FormulaCacheTests(SimpleTestCase):
+    def setUp(self):
+        FormulaCache.invalidate()
+
+    def test_reuses_compiled_tree_for_same_version(self):
+        concept = PayrollConcept(id=1, code='H_EXTRA', formula='SUELDO_BASE_DIARIO / 8 * H_EXTRA_CANT * 1.5')
+        concept.updated_at = datetime(2025, 1, 1)
+
+        first = FormulaCache.get(concept)
+        second = FormulaCache.get(concept)
+        self.assertIs(first, second)
+
+        result = first.evaluate({'SUELDO_BASE_DIARIO': 80.0, 'H_EXTRA_CANT': 4.0}, FUNCTIONS)
+        self.assertEqual(result, 60.0)
+
+    def test_recompiles_when_concept_changes(self):
+        concept = PayrollConcept(id=2, code='BONO', formula='DIAS * 2')
+        concept.updated_at = datetime(2025, 1, 1)
+        old = FormulaCache.get(concept)
+
+        concept.formula = 'DIAS * 3'
+        concept.updated_at = datetime(2025, 2, 1)
+        new = FormulaCache.get(concept)
+
+        self.assertIsNot(old, new)
+        self.assertEqual(new.evaluate({'DIAS': 15}, FUNCTIONS), 45)
+
+    def test_concept_without_formula(self):
+        concept = PayrollConcept(id=3, code='FIJO', formula='')
+        self.assertIsNone(FormulaCache.get(concept))
+
+    def test_invalid_formula_raises(self):
+        with self.assertRaises(SyntaxError):
+            FormulaCache.compile('DIAS *')
+
+
+class VectorFormulaTests(SimpleTestCase):
+    def _columns(self, rows, names):
+        return {
+            name: (
+                np.array([float(r[name]) for r in rows]),
+                np.array([INT if isinstance(r[name], int) else FLOAT for r in rows], dtype=np.int8),
+            )
+            for name in names
+        }
+
+    def test_matches_scalar_evaluation(self):
+        rows = [
+            {'SUELDO_BASE_DIARIO': 80.0, 'BONO_CANT': 2.5, 'LUNES': 4},
+            {'SUELDO_BASE_DIARIO': 33.33, 'BONO_CANT': 0.0, 'LUNES': 5},
+            {'SUELDO_BASE_DIARIO': 2.675, 'BONO_CANT': 1.0, 'LUNES': 2},
+        ]
+        for source in [
+            'max(SUELDO_BASE_DIARIO * BONO_CANT, 10) if BONO_CANT > 0 else 0',
+            'round(SUELDO_BASE_DIARIO * LUNES / 7, 2)',
+            'int(SUELDO_BASE_DIARIO) % 3 + abs(-BONO_CANT)',
+        ]:
+            vector = VectorFormula(FormulaCache.compile(source))
+            results, bad = vector.evaluate(self._columns(rows, vector.names), np.zeros(len(rows), dtype=bool))
+            self.assertFalse(bad.any())
+            for row, value in zip(rows, results):
+                self.assertEqual(value, FormulaCache.compile(source).evaluate(row, FUNCTIONS))
+
+    def test_division_by_zero_goes_to_scalar_path(self):
+        rows = [{'BONO_ANT': 10.0, 'DESC_CANT': 0.0}, {'BONO_ANT': 10.0, 'DESC_CANT': 4.0}]
+        vector = VectorFormula(FormulaCache.compile('BONO_ANT / DESC_CANT'))
+        results, bad = vector.evaluate(self._columns(rows, vector.names), np.zeros(2, dtype=bool))
+        self.assertEqual(list(bad), [True, False])
+        self.assertEqual(results[1], 2.5)
+
+
+class TraceExpansionTests(SimpleTestCase):
+    def test_summary_log_expands_to_full_trace(self):
+        log = {
+            'formula': 'SUELDO_BASE_DIARIO * H_EXTRA_CANT',
+            'trace': 'SUELDO_BASE_DIARIO * H_EXTRA_CANT',
+            'variables': {'SUELDO_BASE_DIARIO': 80.0, 'H_EXTRA_CANT': 2.0},
+        }
+        inventory = {'SUELDO_BASE_DIARIO': {'description': 'Sueldo diario', 'category': 'Salario'}}
+
+        expanded = expand_calculation_log(log, inventory)
+
+        self.assertEqual(expanded['trace'], '80.00 * 2.00')
+        self.assertEqual(expanded['variables']['SUELDO_BASE_DIARIO']['category'], 'Salario')
+        self.assertEqual(expanded['variables']['H_EXTRA_CANT']['value'], 2.0)
+
+    def test_full_log_is_unchanged(self):
+        log = {'formula': 'SALARIO_PERIOD', 'trace': '45.00 Bs. (15 días)', 'variables': {'SALARIO_PERIOD': 45.0}}
+        self.assertEqual(expand_calculation_log(log, {}), log)
+
+
+class FormulaDependenciesTests(SimpleTestCase):
+    def _build(self, *specs):
+        concepts = [PayrollConcept(id=i, code=code, formula=formula) for i, (code, formula) in enumerate(specs, 1)]
+        formulas = {c.id: FormulaCache.compile(c.formula) for c in concepts if c.formula}
+        return concepts, FormulaDependencies(concepts, formulas)
+
+    def test_orders_by_dependency_and_keeps_consistent_order(self):
+        concepts, deps = self._build(
+            ('A', 'B * 2 + A_CANT'), ('B', 'max(SALARIO_DIARIO, 1)'), ('C', 'A + TOTAL_FAOV_BASE'),
+        )
+        self.assertEqual([c.code for c in deps.order(concepts)], ['B', 'A', 'C'])
+        self.assertEqual(deps.referenced_names, {'B', 'A_CANT', 'SALARIO_DIARIO', 'A', 'TOTAL_FAOV_BASE'})
+
+        consistent = [concepts[1], concepts[0], concepts[2]]
+        self.assertEqual(deps.order(consistent), consistent)
+
+    def test_detects_cycles_and_undefined_names(self):
+        _, deps = self._build(('A', 'B + 1'), ('B', 'C if X > 0 else 0'), ('C', 'SALARIO_DIARIO'))
+        updated = deps.with_formula('C', FormulaCache.compile('A * 2'))
+
+        self.assertIsNone(deps.find_cycle('C'))
+        self.assertEqual(updated.find_cycle('C'), ['C', 'A', 'B', 'C'])
+        self.assertEqual(deps.undefined_names('B', {'SALARIO_DIARIO'}), ['X'])
@@ -0,0 +1,53 @@
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import patch
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from .models import PayrollJob, PayrollPeriod
+from .services.payroll_jobs import JobHeartbeat, PayrollJobService
+
+
+class PayrollJobProgressTests(SimpleTestCase):
+    def test_percent_and_eta_from_observed_pace(self):
+        started = datetime(2025, 1, 15, 9, tzinfo=timezone.utc)
+        job = PayrollJob(status=PayrollJob.Status.RUNNING, total=400, processed=100,
+                         started_at=started, heartbeat_at=started + timedelta(seconds=30))
+
+        self.assertEqual(job.percent, 25.0)
+        self.assertEqual(job.eta_seconds, 90)
+
+    def test_no_eta_without_progress_or_when_finished(self):
+        job = PayrollJob(status=PayrollJob.Status.PENDING, total=0, processed=0)
+        self.assertEqual(job.percent, 0.0)
+        self.assertIsNone(job.eta_seconds)
+
+        job.status = PayrollJob.Status.SUCCEEDED
+        self.assertEqual(job.percent, 100.0)
+        self.assertIsNone(job.eta_seconds)
+
+
+class PayrollJobOwnershipTests(TestCase):
+    def setUp(self):
+        period = PayrollPeriod.objects.create(name="Enero 2025 - Q1", start_date=date(2025, 1, 1),
+                                              end_date=date(2025, 1, 15), payment_date=date(2025, 1, 15))
+        PayrollJobService.enqueue(PayrollJob.Kind.PREVIEW, period)
+        self.job = PayrollJobService.claim_next('host:1')
+
+    def test_heartbeat_only_while_running(self):
+        heartbeat = JobHeartbeat(self.job)
+        self.assertTrue(heartbeat.beat(connection))
+
+        PayrollJob.objects.filter(pk=self.job.pk).update(status=PayrollJob.Status.FAILED)
+        self.assertFalse(heartbeat.beat(connection))
+
+    def test_job_failed_by_another_worker_keeps_its_status(self):
+        def preview(*args, **kwargs):
+            # Otro proceso dio el trabajo por caído mientras se calculaba
+            PayrollJob.objects.filter(pk=self.job.pk).update(status=PayrollJob.Status.FAILED, error='sin avance')
+            return {'warnings': []}
+
+        with patch('payroll_core.services.payroll_jobs.PayrollProcessor.preview_period', side_effect=preview):
+            job = PayrollJobService.run(self.job)
+
+        self.assertEqual(job.status, PayrollJob.Status.FAILED)
+        self.assertEqual(job.error, 'sin avance')
+        self.assertIsNone(job.result)
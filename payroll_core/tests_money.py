@@ -0,0 +1,33 @@
+import random
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from django.test import SimpleTestCase
+from .services.money import cents_to_float, from_cents, round_cents, to_cents
+
+
+class MoneyRoundingTests(SimpleTestCase):
+    def test_round_cents_matches_decimal_quantize(self):
+        rng = random.Random(17)
+        for _ in range(2000):
+            value = rng.uniform(-100000, 100000) * rng.choice([1, 0.001, 1.1])
+            expected = Decimal(str(value)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            self.assertEqual(round_cents(value), expected)
+
+    def test_half_up_and_exact_scale(self):
+        self.assertEqual(to_cents(Decimal('1.005')), 101)
+        self.assertEqual(to_cents(Decimal('-1.005')), -101)
+        self.assertEqual(to_cents(2.675), 268)  # por repr, no por el valor binario
+        self.assertEqual(to_cents(Decimal('1E+2')), 10000)
+        self.assertEqual(str(from_cents(0)), '0.00')
+        self.assertEqual(str(from_cents(-5)), '-0.05')
+        self.assertEqual(str(round_cents(-0.001)), '0.00')  # sin cero negativo
+
+    def test_sums_in_cents_are_exact(self):
+        total = sum(to_cents(v) for v in [0.1, 0.2, 0.3])
+        self.assertEqual(cents_to_float(total), 0.6)
+        self.assertNotEqual(0.1 + 0.2 + 0.3, 0.6)
+
+    def test_invalid_values_raise_like_decimal(self):
+        with self.assertRaises(InvalidOperation):
+            to_cents(True)
+        with self.assertRaises(InvalidOperation):
+            to_cents(float('inf'))
@@ -0,0 +1,92 @@
+from decimal import Decimal
+from datetime import date
+from django.db import DataError
+from django.test import TestCase
+from .models import Employee, PayrollNovelty, PayrollPeriod
+from .services.novelty_batch import NoveltyBatchService
+
+
+class NoveltyBatchTests(TestCase):
+    def setUp(self):
+        self.employees = [
+            Employee.objects.create(
+                first_name=f"Empleado{i}", last_name="Perez",
+                national_id=f"V-3000000{i}", position="Operador",
+                hire_date=date(2020, 1, 1), is_active=True
+            )
+            for i in range(2)
+        ]
+        self.period = PayrollPeriod.objects.create(
+            name="Enero 2025 - Q1",
+            start_date=date(2025, 1, 1),
+            end_date=date(2025, 1, 15),
+            payment_date=date(2025, 1, 15)
+        )
+        PayrollNovelty.objects.create(
+            employee=self.employees[0], period=self.period, concept_code='H_EXTRA', amount=Decimal('2')
+        )
+
+    def _row(self, employee, concept_code, amount, period=None):
+        return {
+            'employee_id': employee.id,
+            'period_id': (period or self.period).id,
+            'concept_code': concept_code,
+            'amount': amount,
+        }
+
+    def _stored(self):
+        return {
+            (employee_id, concept_code): amount
+            for employee_id, concept_code, amount in PayrollNovelty.objects.values_list(
+                'employee_id', 'concept_code', 'amount'
+            )
+        }
+
+    def test_mixed_batch_creates_and_updates(self):
+        """Un lote con novedades nuevas y existentes actualiza unas y crea las otras"""
+        values, errors = NoveltyBatchService.validate([
+            self._row(self.employees[0], 'H_EXTRA', '4.50'),
+            self._row(self.employees[0], 'B_NOCTURNO', 3),
+            self._row(self.employees[1], 'H_EXTRA', '1.25'),
+        ])
+        self.assertEqual(errors, [])
+
+        counts = NoveltyBatchService.upsert(values)
+
+        self.assertEqual(counts, {'processed_count': 3, 'created_count': 2, 'updated_count': 1})
+        self.assertEqual(self._stored(), {
+            (self.employees[0].id, 'H_EXTRA'): Decimal('4.50'),
+            (self.employees[0].id, 'B_NOCTURNO'): Decimal('3.00'),
+            (self.employees[1].id, 'H_EXTRA'): Decimal('1.25'),
+        })
+
+    def test_invalid_row_rejects_whole_batch(self):
+        """Si una fila es inválida no se guarda ninguna novedad"""
+        before = self._stored()
+        values, errors = NoveltyBatchService.validate([
+            self._row(self.employees[0], 'H_EXTRA', '9'),
+            self._row(self.employees[1], 'H_EXTRA', 'no-es-monto'),
+        ])
+        self.assertEqual(errors, [{'index': 1, 'errors': {'amount': 'Monto inválido.'}}])
+
+        # Si la base de datos rechaza una fila, el upsert no deja las demás a medias
+        values[(self.employees[1].id, self.period.id, 'H_EXTRA')] = Decimal('1E+12')
+        with self.assertRaises(DataError):
+            NoveltyBatchService.upsert(values)
+        self.assertEqual(self._stored(), before)
+
+    def test_closed_period_is_rejected(self):
+        """Las novedades de un periodo cerrado se rechazan"""
+        closed = PayrollPeriod.objects.create(
+            name="Diciembre 2024 - Q2",
+            start_date=date(2024, 12, 16),
+            end_date=date(2024, 12, 31),
+            payment_date=date(2024, 12, 31),
+            status=PayrollPeriod.Status.CLOSED
+        )
+
+        values, errors = NoveltyBatchService.validate([self._row(self.employees[1], 'H_EXTRA', 5, period=closed)])
+
+        self.assertEqual(values, {})
+        self.assertEqual(errors, [{'index': 0, 'errors': {'period_id': f'El periodo {closed.id} no está abierto.'}}])
+        self.assertFalse(PayrollNovelty.objects.filter(period=closed).exists())
@@ -0,0 +1,32 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from .services.preview_cache import PreviewCache
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PreviewCacheTests(SimpleTestCase):
+    def tearDown(self):
+        cache.clear()
+
+    def test_rows_are_reused_while_fingerprint_matches(self):
+        PreviewCache.set_many(7, 'off', {1: ('a', {'employee_id': 1}, 10), 2: ('b', {'employee_id': 2}, 20)})
+
+        hits = PreviewCache.get_many(7, 'off', {1: 'a', 2: 'changed', 3: 'c'})
+        self.assertEqual(hits, {1: ({'employee_id': 1}, 10)})
+        self.assertEqual(PreviewCache.get_many(7, 'summary', {1: 'a'}), {})
+
+    def test_invalidate_drops_period_rows(self):
+        PreviewCache.set_many(7, 'off', {1: ('a', {'employee_id': 1}, 10)})
+        PreviewCache.set_many(8, 'off', {1: ('a', {'employee_id': 1}, 10)})
+
+        PreviewCache.invalidate(7)
+        self.assertEqual(PreviewCache.get_many(7, 'off', {1: 'a'}), {})
+        self.assertEqual(len(PreviewCache.get_many(8, 'off', {1: 'a'})), 1)
+
+    def test_catalog_version_is_stable_until_bumped(self):
+        version = PreviewCache.catalog_version()
+        self.assertEqual(PreviewCache.catalog_version(), version)
+        with mock.patch('payroll_core.services.preview_cache.transaction.on_commit', side_effect=lambda f: f()):
+            PreviewCache.bump_catalog_version()
+        self.assertNotEqual(PreviewCache.catalog_version(), version)
@@ -0,0 +1,35 @@
+from django.test import SimpleTestCase
+from .services.run_profiler import RunProfiler
+
+
+class RunProfilerTests(SimpleTestCase):
+    def test_stages_and_slowest_concepts(self):
+        profiler = RunProfiler()
+        with profiler.stage('earnings'):
+            pass
+        with profiler.stage('earnings'):
+            pass
+        profiler.add_concept('BONO', 0.2, 100)
+        profiler.add_concept('SUELDO', 0.05, 100)
+        profiler.employees = 100
+
+        report = profiler.as_dict(limit=1)
+        self.assertEqual(report['stages'][0]['stage'], 'earnings')
+        self.assertEqual(report['stages'][0]['calls'], 2)
+        self.assertEqual(report['slowest_concepts'], [{'code': 'BONO', 'seconds': 0.2, 'ms_per_employee': 2.0}])
+        self.assertIsNotNone(report['queries_per_employee'])
+
+    def test_merge_worker_snapshot(self):
+        parent = RunProfiler()
+        worker = RunProfiler()
+        with worker.stage('prepare'):
+            pass
+        worker.add_concept('BONO', 0.1, 50)
+        worker.employees = 50
+
+        parent.merge(worker.snapshot())
+        parent.merge(worker.snapshot())
+        report = parent.as_dict()
+        self.assertEqual(report['employees'], 100)
+        self.assertEqual(report['stages'][0]['calls'], 2)
+        self.assertEqual(report['slowest_concepts'][0]['ms_per_employee'], 2.0)
@@ -0,0 +1,80 @@
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase
+from .models import Currency, ExchangeRate
+from .services.currency import SalaryConverter
+from .services.rate_timeline import RateSeries, RateTimeline
+
+
+def rate(day, value, hour=9):
+    return ExchangeRate(currency_id='USD', rate=Decimal(value), source='BCV',
+                        date_valid=datetime(2025, 1, day, hour, tzinfo=timezone.utc))
+
+
+class RateSeriesTests(SimpleTestCase):
+    def test_returns_rate_valid_at_moment(self):
+        series = RateSeries([rate(2, '36.50'), rate(10, '40.12'), rate(20, '45.00')])
+
+        self.assertIsNone(series.at(datetime(2025, 1, 1, tzinfo=timezone.utc)))
+        self.assertEqual(series.at(datetime(2025, 1, 2, 9, tzinfo=timezone.utc)).rate, Decimal('36.50'))
+        self.assertEqual(series.at(datetime(2025, 1, 15, tzinfo=timezone.utc)).rate, Decimal('40.12'))
+        self.assertEqual(series.at(datetime(2025, 3, 1, tzinfo=timezone.utc)).rate, Decimal('45.00'))
+
+    def test_earliest_and_latest(self):
+        series = RateSeries([rate(2, '36.50'), rate(10, '40.12')])
+        self.assertEqual(series.earliest().rate, Decimal('36.50'))
+        self.assertEqual(series.latest().rate, Decimal('40.12'))
+        self.assertIsNone(RateSeries([]).at(datetime(2025, 1, 1, tzinfo=timezone.utc)))
+
+
+
+class RateTimelineSyncTests(TestCase):
+    def setUp(self):
+        RateTimeline.invalidate()
+        self.usd, _ = Currency.objects.get_or_create(code='USD', defaults={'name': 'Dólar', 'symbol': '$'})
+        self.rate = ExchangeRate.objects.create(currency=self.usd, rate=Decimal('36.50'), source='BCV',
+                                                date_valid=datetime(2025, 1, 2, 9, tzinfo=timezone.utc))
+        self.moment = datetime(2025, 1, 15, tzinfo=timezone.utc)
+        RateTimeline.sync()
+
+    def test_sync_reloads_rates_changed_by_another_process(self):
+        self.assertEqual(RateTimeline.rate_at('USD', self.moment).rate, Decimal('36.50'))
+
+        # Cambio hecho por otro proceso (sus señales no llegan a este)
+        ExchangeRate.objects.filter(pk=self.rate.pk).update(
+            rate=Decimal('40.12'), updated_at=self.rate.updated_at + timedelta(seconds=1)
+        )
+        self.assertEqual(RateTimeline.rate_at('USD', self.moment).rate, Decimal('36.50'))
+
+        # Una corrida nueva sincroniza siempre (PayrollRunContext.build)
+        RateTimeline.sync(force=True)
+        self.assertEqual(RateTimeline.rate_at('USD', self.moment).rate, Decimal('40.12'))
+
+    def test_loose_conversions_do_not_query_within_sync_window(self):
+        SalaryConverter.get_latest_rate('USD', date(2025, 1, 15), source='BCV')
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                rate_obj = SalaryConverter.get_latest_rate('USD', date(2025, 1, 15), source='BCV')
+        self.assertEqual(rate_obj.rate, Decimal('36.50'))
+
+    def test_close_reads_rate_from_database(self):
+        RateTimeline.rate_at('USD', self.moment)
+        ExchangeRate.objects.filter(pk=self.rate.pk).update(rate=Decimal('42.00'))
+
+        self.assertEqual(RateTimeline.rate_at('USD', self.moment).rate, Decimal('36.50'))
+        rate_obj = SalaryConverter.get_latest_rate('USD', date(2025, 1, 15), source='BCV', fresh=True)
+        self.assertEqual(rate_obj.rate, Decimal('42.00'))
+
+    def test_rolled_back_rate_is_not_cached(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    ExchangeRate.objects.create(currency=self.usd, rate=Decimal('50.00'), source='BCV',
+                                                date_valid=datetime(2025, 1, 10, 9, tzinfo=timezone.utc))
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(callbacks, [])
+        RateTimeline.sync()
+        self.assertEqual(RateTimeline.rate_at('USD', self.moment).rate, Decimal('36.50'))
@@ -0,0 +1,101 @@
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import patch
+from django.test import SimpleTestCase
+from .models import PayrollConcept
+from .services.parallel import ParallelPayrollRunner
+from .services.payroll_plan import PayrollPlan
+from .services.scenarios import PayrollScenario, present, summarize
+
+
+def _result(income, deductions, lines):
+    return {
+        'totals': {'income_ves': Decimal(income), 'deductions_ves': Decimal(deductions)},
+        'lines': [{'code': code, 'name': code, 'kind': kind, 'amount_ves': Decimal(amount)} for code, kind, amount in lines],
+    }
+
+
+class PayrollScenarioTests(SimpleTestCase):
+    def test_from_dict_maps_policy_fields_and_validates(self):
+        scenario = PayrollScenario.from_dict({
+            'name': 'Presupuesto',
+            'minimum_salary': '200',
+            'rates': {'usd': '45.5'},
+            'policy': {'overtime_day_factor': '2'},
+            'company': {'salary_split_mode': 'FIXED_BASE', 'cestaticket_payment_day': 15},
+            'concepts': {'CESTATICKET': {'value': '50'}, 'BONO': {'active': False}},
+        })
+        self.assertEqual(scenario.minimum_salary, Decimal('200'))
+        self.assertEqual(scenario.rates, {'USD': Decimal('45.5')})
+        self.assertEqual(scenario.policy, {'FACTOR_HED': 2.0})
+        self.assertEqual(scenario.company, {'salary_split_mode': 'FIXED_BASE', 'cestaticket_payment_day': 15})
+        self.assertEqual(scenario.concepts['BONO'], {'active': False})
+
+        for invalid in (
+            {'rates': {'USD': 'abc'}},
+            {'rates': {'VES': '2'}},
+            {'minimum_salary': '0'},
+            {'policy': {'FACTOR_HED': 2}},
+            {'company': {'salary_split_mode': 'OTRO'}},
+            {'concepts': {'BONO': {'formula': 'SUELDO *'}}},
+            {'concepts': {'BONO': {'code': 'X'}}},
+            {'tasa': 1},
+        ):
+            with self.assertRaises(ValueError, msg=invalid):
+                PayrollScenario.from_dict(invalid)
+
+
+    def test_formula_overrides_checked_against_scenario_catalog(self):
+        concepts = []
+        for i, (code, formula) in enumerate([('BONO', 'SUELDO_BASE_DIARIO * 2'), ('PRIMA', 'BONO + 10')], 1):
+            concept = PayrollConcept(id=i, code=code, formula=formula, kind='EARNING', receipt_order=i, active=True)
+            concept.updated_at = datetime(2025, 1, 1)
+            concepts.append(concept)
+        plan = PayrollPlan(concepts)
+
+        valid = PayrollScenario.from_dict({'concepts': {'BONO': {'formula': 'SUELDO_BASE_DIARIO * 3'}}})
+        self.assertIsNotNone(valid._apply_concepts(plan))
+
+        for formula, message in (('NO_EXISTE * 2', 'no definidas'), ('PRIMA * 2', 'circular')):
+            scenario = PayrollScenario.from_dict({'concepts': {'BONO': {'formula': formula}}})
+            with self.assertRaisesMessage(ValueError, message):
+                scenario._apply_concepts(plan)
+
+
+class SharedPoolTests(SimpleTestCase):
+    def test_pool_is_not_resized_per_run(self):
+        with patch('payroll_core.services.parallel.ProcessPoolExecutor') as executor_cls, \
+                patch.object(ParallelPayrollRunner, '_pool', None):
+            first = ParallelPayrollRunner._get_pool(2)
+            second = ParallelPayrollRunner._get_pool(16)
+
+        self.assertIs(first, second)
+        self.assertEqual(first[0], 2)
+        executor_cls.assert_called_once()
+        executor_cls.return_value.shutdown.assert_not_called()
+
+
+class ScenarioSummaryTests(SimpleTestCase):
+    def test_deltas_by_group_and_concept(self):
+        groups = [(1, 10), (2, 10)]
+        base = summarize([
+            _result('100.10', '10.01', [('SUELDO', 'EARNING', '100.10'), ('IVSS', 'DEDUCTION', '10.01')]),
+            _result('50.00', '0.00', [('SUELDO', 'EARNING', '50.00')]),
+        ], groups)
+        scenario = summarize([
+            _result('120.10', '12.01', [('SUELDO', 'EARNING', '120.10'), ('IVSS', 'DEDUCTION', '12.01')]),
+            _result('50.00', '0.00', [('SUELDO', 'EARNING', '50.00')]),
+        ], groups)
+
+        result = present(scenario, base, {'departments': {1: 'Ventas', 2: 'Almacén'}, 'branches': {10: 'Principal'}})
+        self.assertEqual(result['totals']['net_pay_ves'], 158.09)
+        self.assertEqual(result['totals']['delta_net_pay_ves'], 18.0)
+        self.assertEqual(
+            [(d['name'], d['delta_net_pay_ves']) for d in result['by_department']],
+            [('Ventas', 18.0), ('Almacén', 0.0)]
+        )
+        self.assertEqual([(b['name'], b['employees']) for b in result['by_branch']], [('Principal', 2)])
+        self.assertEqual(
+            {c['code']: c['delta_ves'] for c in result['by_concept']},
+            {'SUELDO': 20.0, 'IVSS': 2.0}
+        )
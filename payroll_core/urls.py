@@ -7,7 +7,7 @@ from .views import (
     LatestExchangeRateView,
     EmployeeViewSet, BranchViewSet, LaborContractViewSet,
     CurrencyViewSet, PayrollConceptViewSet, EmployeeConceptViewSet,
-    PayrollPeriodViewSet, PayrollReceiptViewSet, PayrollNoveltyViewSet,
+    PayrollPeriodViewSet, PayrollReceiptViewSet, PayrollNoveltyViewSet, PayrollJobViewSet,
     CompanyConfigView, DepartmentViewSet, LoanViewSet, LoanPaymentViewSet,
     PayrollVariablesView, ValidateFormulaView, JobPositionViewSet,
     ConceptConfigMetadataView, PayrollPolicyView,
@@ -42,6 +42,7 @@ router.register(r'payroll-concepts', PayrollConceptViewSet, basename='payroll-co
 router.register(r'employee-concepts', EmployeeConceptViewSet, basename='employee-concept')
 router.register(r'payroll-periods', PayrollPeriodViewSet, basename='payroll-period')
 router.register(r'payslips', PayrollReceiptViewSet, basename='payslip')
+router.register(r'payroll-jobs', PayrollJobViewSet, basename='payroll-job')
 
 router.register(r'payroll-novelties', PayrollNoveltyViewSet, basename='payroll-novelty')
 router.register(r'departments', DepartmentViewSet, basename='department')
@@ -1,4 +1,4 @@
-from django.db import transaction
+from django.db import connection
 from rest_framework import views, viewsets, response, status, filters, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -10,17 +10,19 @@ from openpyxl.utils import get_column_letter
 from decimal import Decimal
 from django_filters.rest_framework import DjangoFilterBackend
 from django.template.loader import render_to_string
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models import ProtectedError
 import weasyprint
 import csv
+import json
 from ..services import BCVRateService
 from rest_framework.views import APIView
 from ..models import (
     PayrollPeriod, PayrollReceipt, PayrollNovelty, Employee, 
     LaborContract, PayrollConcept, Company, Loan, Branch,
     ExchangeRate, EmployeeConcept, Currency, Department, LoanPayment, JobPosition,
-    PayrollPolicy,
+    PayrollPolicy, PayrollJob,
     # Social Benefits
     SocialBenefitsLedger, SocialBenefitsSettlement, InterestRateBCV
 )
@@ -30,6 +32,7 @@ from ..serializers import (
     CompanySerializer, LoanSerializer, BranchSerializer,
     CurrencySerializer, EmployeeConceptSerializer, DepartmentSerializer, 
     LoanPaymentSerializer, JobPositionSerializer, PayrollPolicySerializer,
+    PayrollJobSerializer, PayrollJobDetailSerializer,
     ACCUMULATOR_LABELS, BEHAVIOR_REQUIRED_PARAMS, ExchangeRateSerializer,
     # Social Benefits Serializers
     SocialBenefitsLedgerSerializer, SocialBenefitsSettlementSerializer,
@@ -460,33 +463,144 @@ class PayrollPeriodViewSet(viewsets.ModelViewSet):
         """
         GET/POST /api/payroll-periods/{id}/preview-payroll/
         Calcula la nómina proyectada para todos los empleados del periodo.
+        Con background=true encola un PayrollJob y responde 202 (ver /api/payroll-jobs/).
+        Con totals_only=true devuelve solo los totales del periodo.
+        Con profile=true agrega 'profile' con tiempos y consultas por etapa.
         """
         try:
             from ..services.payroll import PayrollProcessor
-            manual_rate = request.data.get('manual_rate') if request.method == 'POST' else request.query_params.get('manual_rate')
-            result = PayrollProcessor.preview_period(pk, manual_rate=manual_rate)
+            params = request.data if request.method == 'POST' else request.query_params
+            manual_rate = params.get('manual_rate')
+            if str(params.get('background', '')).lower() in ('1', 'true'):
+                return self._enqueue_job(request, PayrollJob.Kind.PREVIEW, params)
+            # trace_level: off (grilla) / summary / full (por defecto)
+            result = PayrollProcessor.preview_period(
+                pk, manual_rate=manual_rate, trace_level=params.get('trace_level'),
+                totals_only=str(params.get('totals_only', '')).lower() in ('1', 'true'),
+                profile=str(params.get('profile', '')).lower() in ('1', 'true')
+            )
             return Response(result, status=status.HTTP_200_OK)
         except ValueError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({"error": f"Falla inesperada en previsualización: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=True, methods=['get', 'post'], url_path='preview-stream')
+    def preview_stream(self, request, pk=None):
+        """
+        GET/POST /api/payroll-periods/{id}/preview-stream/
+        Previsualización en NDJSON (application/x-ndjson): una línea de cabecera,
+        una por empleado a medida que se calcula y una final con los totales.
+        Acepta los mismos parámetros que preview-payroll (manual_rate, trace_level,
+        totals_only, profile: en la línea de totales).
+        """
+        from django_tenants.utils import schema_context
+        from ..services.payroll import PayrollProcessor
+        params = request.data if request.method == 'POST' else request.query_params
+        records = PayrollProcessor.iter_preview_period(
+            pk, manual_rate=params.get('manual_rate'), trace_level=params.get('trace_level'),
+            totals_only=str(params.get('totals_only', '')).lower() in ('1', 'true'),
+            profile=str(params.get('profile', '')).lower() in ('1', 'true')
+        )
+        try:
+            # La cabecera se calcula antes de responder para informar errores con su status
+            header = next(records)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # El cuerpo se genera después de que la vista retorna: fijar el esquema del tenant
+        schema_name = connection.schema_name
+
+        def lines():
+            yield json.dumps(header, cls=DjangoJSONEncoder) + '\n'
+            with schema_context(schema_name):
+                for record in records:
+                    yield json.dumps(record, cls=DjangoJSONEncoder) + '\n'
+
+        response = StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+        response['X-Accel-Buffering'] = 'no'  # Sin buffer en nginx: las filas llegan a medida que se calculan
+        return response
+
+    @action(detail=True, methods=['post'], url_path='simulate-scenarios')
+    def simulate_scenarios(self, request, pk=None):
+        """
+        POST /api/payroll-periods/{id}/simulate-scenarios/
+        Calcula la plantilla activa con cambios hipotéticos (salario mínimo, tasas,
+        factores de política, parámetros de empresa, valor o fórmula de conceptos)
+        sin guardar nada. Body: {"scenarios": [...]}. Los procesos de cálculo
+        los fija PAYROLL_PARALLEL_WORKERS, no el cliente.
+        Devuelve totales y diferencias contra la base por departamento, sede y concepto
+        (formato de escenario en services/scenarios.py).
+        """
+        try:
+            from ..services.scenarios import ScenarioSimulator
+            result = ScenarioSimulator.simulate(pk, request.data.get('scenarios'))
+            return Response(result, status=status.HTTP_200_OK)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({"error": f"Falla inesperada en simulación: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
     @action(detail=True, methods=['post'], url_path='close-period')
     def close_period(self, request, pk=None):
         """
         POST /api/payroll-periods/{id}/close-period/
         Inicia el proceso de cálculo masivo y cierre inmutable.
+        Con background=true encola un PayrollJob y responde 202 (ver /api/payroll-jobs/).
+        Con chunk_size=N cierra por lotes de N empleados; sobre un periodo
+        en cierre (CLOSING) reanuda desde el último lote guardado.
+        Con profile=true agrega 'profile' con tiempos y consultas por etapa.
         """
         try:
             from ..services import PayrollProcessor
             manual_rate = request.data.get('manual_rate')
-            result = PayrollProcessor.process_period(pk, user=request.user, manual_rate=manual_rate)
+            profile = str(request.data.get('profile', '')).lower() in ('1', 'true')
+            if str(request.data.get('background', '')).lower() in ('1', 'true'):
+                return self._enqueue_job(request, PayrollJob.Kind.CLOSE, request.data)
+            chunk_size = int(request.data.get('chunk_size') or 0)
+            if chunk_size:
+                result = PayrollProcessor.process_period_chunked(
+                    pk, user=request.user, manual_rate=manual_rate,
+                    trace_level=request.data.get('trace_level'), chunk_size=chunk_size, profile=profile
+                )
+                return Response(result, status=status.HTTP_200_OK)
+            result = PayrollProcessor.process_period(
+                pk, user=request.user, manual_rate=manual_rate,
+                trace_level=request.data.get('trace_level'), profile=profile
+            )
             return Response(result, status=status.HTTP_200_OK)
         except ValueError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({"error": f"Falla inesperada en cierre: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=True, methods=['post'], url_path='rollback-closing')
+    def rollback_closing(self, request, pk=None):
+        """
+        POST /api/payroll-periods/{id}/rollback-closing/
+        Revierte un cierre por lotes interrumpido y deja el periodo abierto.
+        """
+        try:
+            from ..services import PayrollProcessor
+            result = PayrollProcessor.rollback_closing(pk, user=request.user)
+            return Response(result, status=status.HTTP_200_OK)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    def _enqueue_job(self, request, kind, params):
+        """Encola la operación para run_payroll_jobs y devuelve el trabajo creado."""
+        from ..services.payroll_jobs import PayrollJobService
+        period = PayrollPeriod.objects.filter(pk=self.kwargs['pk']).first()
+        if period is None:
+            raise ValueError(f"El periodo {self.kwargs['pk']} no existe.")
+        job = PayrollJobService.enqueue(
+            kind, period, user=request.user,
+            manual_rate=params.get('manual_rate'), trace_level=params.get('trace_level'),
+            chunk_size=int(params.get('chunk_size') or 0) or None,
+            profile=str(params.get('profile', '')).lower() in ('1', 'true')
+        )
+        return Response(PayrollJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
     @action(detail=True, methods=['get'], url_path='export-pdf')
     def export_pdf(self, request, pk=None):
         """
@@ -698,6 +812,22 @@ class PayrollPeriodViewSet(viewsets.ModelViewSet):
         wb.save(response)
         return response
 
+class PayrollJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Consulta de trabajos de nómina en segundo plano: estado, porcentaje,
+    tiempo restante estimado, advertencias y (en el detalle) el resultado.
+    """
+    queryset = PayrollJob.objects.all()
+    permission_classes = [permissions.IsAuthenticated, DjangoModelPermissions]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['period', 'kind', 'status']
+
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return PayrollJobDetailSerializer
+        return PayrollJobSerializer
+
+
 class PayrollReceiptViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet solo lectura para consultar recibos históricos.
@@ -851,31 +981,29 @@ class PayrollNoveltyViewSet(viewsets.ModelViewSet):
         POST /api/payroll-novelties/batch/
         Carga masiva de novedades.
         Recibe: [{"employee_id": 1, "period_id": 5, "concept_code": "H_EXTRA", "amount": 4}, ...]
+        Valida todas las filas antes de escribir: si alguna es inválida no se
+        guarda ninguna y se devuelven los errores por fila (índice en la lista).
         """
+        from ..services.novelty_batch import NoveltyBatchService
         data = request.data
         if not isinstance(data, list):
             return Response(
                 {"error": "Se esperaba una lista de novedades (array)."}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
-            
-        processed_ids = []
-        try:
-            with transaction.atomic():
-                for item in data:
-                    # Usamos update_or_create para manejar ediciones rápidas en el grid
-                    obj, created = PayrollNovelty.objects.update_or_create(
-                        employee_id=item.get('employee_id'),
-                        period_id=item.get('period_id'),
-                        concept_code=item.get('concept_code'),
-                        defaults={'amount': Decimal(str(item.get('amount', 0)))}
-                    )
-                    processed_ids.append(obj.id)
-            
+
+        values, errors = NoveltyBatchService.validate(data)
+        if errors:
             return Response({
-                "status": "success", 
-                "processed_count": len(processed_ids)
-            }, status=status.HTTP_201_CREATED)
+                "error": f"{len(errors)} fila(s) con errores. No se guardó ninguna novedad.",
+                "errors": errors,
+                "valid_count": len(data) - len(errors),
+                "error_count": len(errors)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            counts = NoveltyBatchService.upsert(values)
+            return Response({"status": "success", **counts}, status=status.HTTP_201_CREATED)
             
         except Exception as e:
             return Response(
@@ -949,7 +1077,8 @@ class ValidateFormulaView(APIView):
         if not formula:
             return Response({"error": "Fórmula no proporcionada"}, status=status.HTTP_400_BAD_REQUEST)
         
-        result = PayrollEngine.validate_formula(formula, context)
+        # concept_code (opcional): permite detectar ciclos con el concepto que se está editando
+        result = PayrollEngine.validate_formula(formula, context, request.data.get('concept_code'))
         return Response(result)
 
 
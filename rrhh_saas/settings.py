@@ -175,6 +175,28 @@ DATABASE_ROUTERS: List[str] = [
     'django_tenants.routers.TenantSyncRouter',
 ]
 
+# =============================================================================
+# CACHÉ - Compartida por los workers de gunicorn y run_payroll_jobs
+# =============================================================================
+
+# Con REDIS_URL (ej: redis://redis:6379/0) la caché es común a todos los
+# procesos; sin ella se usa una caché en memoria por proceso (desarrollo/tests).
+REDIS_URL: str = os.environ.get('REDIS_URL', '')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # =============================================================================
 # VALIDACIÓN DE CONTRASEÑAS
 # =============================================================================
@@ -259,3 +281,22 @@ DEFAULT_CURRENCY: str = 'VES'
 
 # Fuentes de tasas de cambio
 EXCHANGE_RATE_SOURCES: List[str] = ['BCV', 'MONITOR']
+
+# =============================================================================
+# MOTOR DE NÓMINA
+# =============================================================================
+
+# Procesos para calcular preview/cierre en paralelo (0 o 1 = secuencial)
+PAYROLL_PARALLEL_WORKERS: int = int(os.environ.get('PAYROLL_PARALLEL_WORKERS', '0'))
+
+# Cantidad mínima de empleados para usar el pool de procesos
+PAYROLL_PARALLEL_MIN_EMPLOYEES: int = int(os.environ.get('PAYROLL_PARALLEL_MIN_EMPLOYEES', '200'))
+
+# Segundos entre consultas de run_payroll_jobs cuando no hay trabajos pendientes
+PAYROLL_JOB_POLL_SECONDS: float = float(os.environ.get('PAYROLL_JOB_POLL_SECONDS', '2'))
+
+# Un trabajo en ejecución sin avance durante este tiempo se marca como fallido
+PAYROLL_JOB_STALE_SECONDS: int = int(os.environ.get('PAYROLL_JOB_STALE_SECONDS', '900'))
+
+# Segundos entre latidos de un trabajo en ejecución (muy por debajo de PAYROLL_JOB_STALE_SECONDS)
+PAYROLL_JOB_HEARTBEAT_SECONDS: float = float(os.environ.get('PAYROLL_JOB_HEARTBEAT_SECONDS', '30'))
@@ -548,7 +548,8 @@ class Holiday(models.Model):
         Returns:
             True si es feriado, False si no
         """
-        return cls.objects.filter(date=check_date).exists()
+        from vacations.services.work_calendar import WorkCalendar
+        return WorkCalendar.current().is_holiday(check_date)
     
     @classmethod
     def get_holidays_for_year(cls, year: int):
@@ -446,10 +446,10 @@ TOTAL A PAGAR: {total:,.2f}
             (2 fines de semana) = 14 días calendario total a pagar.
         """
         from datetime import timedelta
-        from vacations.models import Holiday
         from payroll_core.models import Company as CompanyModel
         from payroll_core.services.salary import SalarySplitter
         from vacations.services.vacation_novelties import count_mondays_in_range
+        from vacations.services.work_calendar import WEEKDAY_HOLIDAYS, WEEKEND_DAYS, WorkCalendar
         employee = contract.employee
         years_of_service = employee.seniority_years
         # Variables para compatibilidad de reporte
@@ -505,54 +505,23 @@ TOTAL A PAGAR: {total:,.2f}
         # 2. CARGAR FERIADOS SI NO SE PROVEEN
         # =====================================================================
         if holidays is None:
-            holiday_dates = set(
-                Holiday.objects.filter(
-                    date__year=start_date.year
-                ).values_list('date', flat=True)
-            )
-            # También cargar del año siguiente si el período cruza años
-            holiday_dates.update(
-                Holiday.objects.filter(
-                    date__year=start_date.year + 1
-                ).values_list('date', flat=True)
-            )
+            work_calendar = WorkCalendar.current()
         else:
-            holiday_dates = set(holidays)
+            work_calendar = WorkCalendar.from_dates(holidays)
         
         # =====================================================================
         # 3. CALCULAR PERÍODO CALENDARIO Y DÍAS DE DESCANSO/FERIADOS
         # =====================================================================
         vacation_days = days_to_enjoy
-        rest_days = 0  # Sábados y Domingos
-        holiday_days = 0  # Feriados nacionales
-        mondays_count = 0  # Contador de lunes
-        
-        current_date = start_date
-        business_days_counted = 0
         
-        # Iterar hasta completar los días hábiles de vacaciones
-        while business_days_counted < vacation_days:
-            weekday = current_date.weekday()  # 0=Lunes, 5=Sábado, 6=Domingo
-            
-            if weekday == 0:
-                mondays_count += 1
-            
-            if weekday in (5, 6):  # Fin de semana
-                rest_days += 1
-            elif current_date in holiday_dates:  # Feriado
-                holiday_days += 1
-            else:  # Día hábil
-                business_days_counted += 1
-            
-            current_date += timedelta(days=1)
+        # end_date es el último día de vacaciones (el día hábil N desde start_date)
+        end_date = work_calendar.add_business_days(start_date, vacation_days)
         
-        # end_date es el último día de vacaciones
-        end_date = current_date - timedelta(days=1)
+        rest_days = work_calendar.count(WEEKEND_DAYS, start_date, end_date)  # Sábados y Domingos
+        holiday_days = work_calendar.count(WEEKDAY_HOLIDAYS, start_date, end_date)  # Feriados nacionales
         
         # Calcular fecha de retorno (siguiente día hábil después de end_date)
-        return_date = current_date
-        while return_date.weekday() in (5, 6) or return_date in holiday_dates:
-            return_date += timedelta(days=1)
+        return_date = work_calendar.next_business_day(end_date + timedelta(days=1))
         
         # =====================================================================
         # 4. CALCULAR BONO VACACIONAL (Art. 192)
@@ -5,18 +5,13 @@ from decimal import Decimal
 from django.db import transaction
 from django.utils import timezone
 from payroll_core.models import PayrollPeriod, PayrollNovelty, Company
+from .work_calendar import WorkCalendar
 
 logger = logging.getLogger(__name__)
 
 def count_mondays_in_range(start_date: date, end_date: date) -> int:
     """Calcula cuántos lunes hay en un rango de fechas (inclusivo)."""
-    count = 0
-    current = start_date
-    while current <= end_date:
-        if current.weekday() == 0:  # Monday is 0
-            count += 1
-        current += timedelta(days=1)
-    return count
+    return WorkCalendar.count_weekday(start_date, end_date, 0)  # Monday is 0
 
 def get_period_dates(target_date: date) -> tuple[date, date]:
     """
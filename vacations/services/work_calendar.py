@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Calendario laboral compartido (feriados, días hábiles, lunes, fines de semana).
+
+Construido sobre el modelo Holiday. Por cada año se precalcula un bitset de
+feriados y sumas acumuladas por tipo de día, de modo que contar días hábiles
+o lunes en un rango y sumar N días hábiles no recorre el rango día a día.
+
+Se cachea una instancia por tenant (esquema) y se invalida con las señales
+de Holiday. Los feriados recurrentes se proyectan a cada año consultado.
+Si el tenant no tiene feriados cargados, el motor de nómina (y solo él)
+usa los feriados nacionales que antes tenía fijos (legacy_fallback=True);
+vacaciones y asistencia siguen sin feriados, como antes.
+"""
+import time
+from bisect import bisect_left
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection
+
+# Segundos que el calendario de un tenant se considera vigente sin recargarlo
+CALENDAR_TTL_SECONDS = 300
+
+# Feriados nacionales (mes, día) usados cuando el tenant no tiene feriados cargados
+LEGACY_NATIONAL_HOLIDAYS = [
+    (1, 1),    # Año Nuevo
+    (4, 19),   # Proclamación Independencia
+    (5, 1),    # Día del Trabajador
+    (6, 24),   # Batalla de Carabobo
+    (7, 5),    # Firma Acta Independencia
+    (7, 24),   # Natalicio de Simón Bolívar
+    (10, 12),  # Día de la Resistencia Indígena
+    (12, 24),  # Víspera de Navidad
+    (12, 25),  # Navidad
+    (12, 31),  # Fin de Año
+]
+
+# Tipos de conteo disponibles
+MONDAYS = 'mondays'
+BUSINESS_DAYS = 'business_days'        # Lunes a viernes que no son feriado
+SATURDAYS = 'saturdays'                # Sábados que no son feriado
+SUNDAYS = 'sundays'                    # Domingos que no son feriado
+HOLIDAYS = 'holidays'                  # Feriados (cualquier día de la semana)
+WEEKEND_DAYS = 'weekend_days'          # Sábados y domingos (sean o no feriado)
+WEEKDAY_HOLIDAYS = 'weekday_holidays'  # Feriados de lunes a viernes
+
+COUNT_KINDS = (MONDAYS, BUSINESS_DAYS, SATURDAYS, SUNDAYS, HOLIDAYS, WEEKEND_DAYS, WEEKDAY_HOLIDAYS)
+
+
+class YearCalendar:
+    """
+    Bitset de feriados y sumas acumuladas de un año.
+    prefix[kind][i] = cantidad de días del tipo en los primeros i días del año.
+    """
+
+    def __init__(self, year: int, holidays: Iterable[date]):
+        self.year = year
+        self.first_day = date(year, 1, 1)
+        self.length = (date(year + 1, 1, 1) - self.first_day).days
+
+        self.holiday_bits = 0
+        for holiday in holidays:
+            self.holiday_bits |= 1 << (holiday - self.first_day).days
+
+        self.prefix: Dict[str, List[int]] = {kind: [0] * (self.length + 1) for kind in COUNT_KINDS}
+        weekday = self.first_day.weekday()
+        for i in range(self.length):
+            is_holiday = bool(self.holiday_bits >> i & 1)
+            flags = {
+                MONDAYS: weekday == 0,
+                BUSINESS_DAYS: weekday < 5 and not is_holiday,
+                SATURDAYS: weekday == 5 and not is_holiday,
+                SUNDAYS: weekday == 6 and not is_holiday,
+                HOLIDAYS: is_holiday,
+                WEEKEND_DAYS: weekday >= 5,
+                WEEKDAY_HOLIDAYS: weekday < 5 and is_holiday,
+            }
+            for kind, flag in flags.items():
+                self.prefix[kind][i + 1] = self.prefix[kind][i] + flag
+            weekday = (weekday + 1) % 7
+
+    def index(self, day: date) -> int:
+        return (day - self.first_day).days
+
+    def is_holiday(self, day: date) -> bool:
+        return bool(self.holiday_bits >> self.index(day) & 1)
+
+    def count(self, kind: str, start_index: int, end_index: int) -> int:
+        """Días del tipo entre los índices dados (ambos inclusive)."""
+        prefix = self.prefix[kind]
+        return prefix[end_index + 1] - prefix[start_index]
+
+
+class WorkCalendar:
+    """
+    Calendario laboral de un tenant.
+
+    Uso:
+        calendar = WorkCalendar.current()
+        calendar.count(BUSINESS_DAYS, period.start_date, period.end_date)
+        end_date = calendar.add_business_days(start_date, 15)
+    """
+
+    # { schema_name: (cargado_en, WorkCalendar) }
+    _tenants: Dict[str, Tuple[float, 'WorkCalendar']] = {}
+
+    # Calendario con LEGACY_NATIONAL_HOLIDAYS (se construye en el primer uso)
+    _legacy: Optional['WorkCalendar'] = None
+
+    def __init__(self, fixed_dates: Iterable[date] = (), recurring: Iterable[Tuple[int, int]] = ()):
+        self.fixed_dates = set(fixed_dates)
+        self.recurring = set(recurring)
+        self._years: Dict[int, YearCalendar] = {}
+
+    @classmethod
+    def from_dates(cls, holidays: Iterable[date]) -> 'WorkCalendar':
+        """Calendario con una lista explícita de feriados (sin recurrencia)."""
+        return cls(fixed_dates=holidays)
+
+    @classmethod
+    def current(cls, legacy_fallback: bool = False) -> 'WorkCalendar':
+        """
+        Calendario del tenant activo (una consulta por tenant mientras siga vigente).
+        legacy_fallback: sin feriados cargados, usar LEGACY_NATIONAL_HOLIDAYS
+        (motor de nómina).
+        """
+        schema = getattr(connection, 'schema_name', 'public')
+        entry = cls._tenants.get(schema)
+        if entry is None or time.monotonic() - entry[0] > CALENDAR_TTL_SECONDS:
+            entry = (time.monotonic(), cls._load())
+            cls._tenants[schema] = entry
+        calendar = entry[1]
+        if legacy_fallback and not calendar.fixed_dates and not calendar.recurring:
+            if cls._legacy is None:
+                cls._legacy = cls(recurring=LEGACY_NATIONAL_HOLIDAYS)
+            return cls._legacy
+        return calendar
+
+    @classmethod
+    def _load(cls) -> 'WorkCalendar':
+        from vacations.models import Holiday
+
+        rows = list(Holiday.objects.values_list('date', 'is_recurring'))
+        return cls(
+            fixed_dates=[d for d, is_recurring in rows if not is_recurring],
+            recurring=[(d.month, d.day) for d, is_recurring in rows if is_recurring],
+        )
+
+    @classmethod
+    def invalidate(cls, schema_name: Optional[str] = None) -> None:
+        """Descarta el calendario de un tenant (o de todos si no se indica)."""
+        if schema_name is None:
+            cls._tenants.clear()
+            return
+        cls._tenants.pop(schema_name, None)
+
+    # =========================================================================
+    # CONSULTAS
+    # =========================================================================
+
+    def year(self, year: int) -> YearCalendar:
+        """Calendario precalculado del año (se construye en el primer uso)."""
+        year_calendar = self._years.get(year)
+        if year_calendar is None:
+            holidays = {d for d in self.fixed_dates if d.year == year}
+            for month, day in self.recurring:
+                try:
+                    holidays.add(date(year, month, day))
+                except ValueError:
+                    # 29 de febrero en año no bisiesto
+                    continue
+            year_calendar = YearCalendar(year, holidays)
+            self._years[year] = year_calendar
+        return year_calendar
+
+    def is_holiday(self, day: date) -> bool:
+        return self.year(day.year).is_holiday(day)
+
+    def is_business_day(self, day: date) -> bool:
+        return day.weekday() < 5 and not self.is_holiday(day)
+
+    def count(self, kind: str, start_date: date, end_date: date) -> int:
+        """Días del tipo indicado en [start_date, end_date] (0 si el rango es vacío)."""
+        total = 0
+        for year in range(start_date.year, end_date.year + 1):
+            year_calendar = self.year(year)
+            first = year_calendar.index(start_date) if year == start_date.year else 0
+            last = year_calendar.index(end_date) if year == end_date.year else year_calendar.length - 1
+            if first <= last:
+                total += year_calendar.count(kind, first, last)
+        return total
+
+    def counts(self, start_date: date, end_date: date) -> Dict[str, int]:
+        """Todos los conteos de COUNT_KINDS para el rango."""
+        return {kind: self.count(kind, start_date, end_date) for kind in COUNT_KINDS}
+
+    def add_business_days(self, start_date: date, days: int) -> date:
+        """
+        Último día de un tramo de `days` días hábiles que comienza en
+        start_date (el día hábil número `days` contando desde start_date).
+        Con days <= 0 devuelve el día anterior a start_date.
+        """
+        if days <= 0:
+            return start_date - timedelta(days=1)
+
+        remaining = days
+        year = start_date.year
+        offset = self.year(year).index(start_date)
+        while True:
+            prefix = self.year(year).prefix[BUSINESS_DAYS]
+            available = prefix[-1] - prefix[offset]
+            if available >= remaining:
+                # Primer índice cuya suma acumulada alcanza el objetivo
+                position = bisect_left(prefix, prefix[offset] + remaining)
+                return date(year, 1, 1) + timedelta(days=position - 1)
+            remaining -= available
+            year += 1
+            offset = 0
+
+    def next_business_day(self, day: date) -> date:
+        """Primer día hábil igual o posterior a la fecha dada."""
+        return self.add_business_days(day, 1)
+
+    @staticmethod
+    def count_weekday(start_date: date, end_date: date, weekday: int) -> int:
+        """Cantidad de días de la semana dada (0=lunes) en [start_date, end_date]."""
+        if end_date < start_date:
+            return 0
+        first = start_date + timedelta(days=(weekday - start_date.weekday()) % 7)
+        if first > end_date:
+            return 0
+        return (end_date - first).days // 7 + 1
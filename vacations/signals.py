@@ -5,13 +5,15 @@ Signals del módulo de Vacaciones.
 Este módulo implementa las reglas de negocio automáticas:
 - Al aprobar una solicitud, crear registro USAGE en VacationBalance
 """
-from django.db.models.signals import post_save, pre_save
+from django.db import connection
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 
 import logging
 
-from .models import VacationRequest, VacationBalance
+from .models import Holiday, VacationRequest, VacationBalance
+from .services.work_calendar import WorkCalendar
 
 logger = logging.getLogger(__name__)
 
@@ -82,3 +84,10 @@ def on_vacation_request_approved(sender, instance, created, **kwargs):
             )
             # No re-lanzamos la excepción para no bloquear el guardado
             # pero el log quedará registrado para auditoría
+
+
+@receiver(post_save, sender=Holiday)
+@receiver(post_delete, sender=Holiday)
+def on_holiday_changed(sender, instance, **kwargs):
+    """Recarga el calendario laboral del tenant en la siguiente consulta."""
+    WorkCalendar.invalidate(getattr(connection, 'schema_name', 'public'))
@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+from unittest import mock
+from django.test import SimpleTestCase
+from vacations.services.work_calendar import (
+    BUSINESS_DAYS, HOLIDAYS, MONDAYS, SATURDAYS, SUNDAYS, WorkCalendar
+)
+
+
+class WorkCalendarTests(SimpleTestCase):
+    def setUp(self):
+        self.calendar = WorkCalendar(fixed_dates=[date(2025, 3, 3)], recurring=[(1, 1), (12, 25)])
+
+    def test_counts_match_day_by_day_walk(self):
+        start, end = date(2024, 12, 16), date(2025, 3, 15)
+        counts = self.calendar.counts(start, end)
+
+        expected = {MONDAYS: 0, BUSINESS_DAYS: 0, SATURDAYS: 0, SUNDAYS: 0, HOLIDAYS: 0}
+        current = start
+        while current <= end:
+            holiday = current in (date(2024, 12, 25), date(2025, 1, 1), date(2025, 3, 3))
+            weekday = current.weekday()
+            expected[MONDAYS] += weekday == 0
+            expected[HOLIDAYS] += holiday
+            expected[BUSINESS_DAYS] += weekday < 5 and not holiday
+            expected[SATURDAYS] += weekday == 5 and not holiday
+            expected[SUNDAYS] += weekday == 6 and not holiday
+            current += timedelta(days=1)
+
+        for kind, value in expected.items():
+            self.assertEqual(counts[kind], value, kind)
+
+    def test_add_business_days_skips_weekends_and_holidays(self):
+        # Viernes 20/12/2024 + 5 hábiles: 20, 23, 24, 26, 27 (25 es feriado recurrente)
+        self.assertEqual(self.calendar.add_business_days(date(2024, 12, 20), 5), date(2024, 12, 27))
+        # Cruza de año: 31/12, (1/1 feriado), 2/1
+        self.assertEqual(self.calendar.add_business_days(date(2024, 12, 31), 2), date(2025, 1, 2))
+        self.assertEqual(self.calendar.next_business_day(date(2025, 3, 1)), date(2025, 3, 4))
+        self.assertEqual(WorkCalendar.count_weekday(date(2025, 1, 1), date(2025, 1, 31), 0), 4)
+
+
+class WorkCalendarFallbackTests(SimpleTestCase):
+    def tearDown(self):
+        WorkCalendar.invalidate()
+
+    def test_legacy_holidays_only_for_payroll_when_tenant_has_none(self):
+        WorkCalendar.invalidate()
+        with mock.patch.object(WorkCalendar, '_load', return_value=WorkCalendar()):
+            # Vacaciones y asistencia: sin feriados cargados no hay feriados
+            self.assertFalse(WorkCalendar.current().is_holiday(date(2025, 1, 1)))
+            # Motor de nómina: feriados nacionales de respaldo
+            self.assertTrue(WorkCalendar.current(legacy_fallback=True).is_holiday(date(2025, 1, 1)))
+
+    def test_loaded_holidays_replace_legacy_list(self):
+        WorkCalendar.invalidate()
+        with mock.patch.object(WorkCalendar, '_load', return_value=WorkCalendar(recurring=[(3, 10)])):
+            calendar = WorkCalendar.current(legacy_fallback=True)
+        self.assertTrue(calendar.is_holiday(date(2025, 3, 10)))
+        self.assertFalse(calendar.is_holiday(date(2025, 1, 1)))